@@ -0,0 +1,5 @@
+"""
+Offline benchmarks of the slicing and backprojection hot paths, on synthetic data.
+
+Run `python -m benchmarks` from the python package folder. See `python -m benchmarks --help`.
+"""
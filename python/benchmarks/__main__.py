@@ -0,0 +1,111 @@
+import argparse
+from pathlib import Path
+import sys
+
+from .cases import BENCHMARKS
+from .runner import (
+    DEFAULT_TOLERANCE,
+    compare_results,
+    format_comparison,
+    load_results,
+    machine_differences,
+    over_budget,
+    run_benchmarks,
+    save_results,
+    select_benchmarks,
+)
+
+# Timings only compare on the machine that recorded them, so the baseline is kept locally and not committed
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark the slicing and backprojection hot paths and compare them against a baseline.",
+    )
+    parser.add_argument("-k", "--filter", default=None, help="Only run benchmarks whose name matches this regex.")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit.")
+    parser.add_argument("--repeat", type=int, default=None, help="Timed runs of each benchmark (overrides defaults).")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs before the timed ones.")
+    parser.add_argument("--output", type=str, default=None, help="Save the results to this JSON file.")
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=str(DEFAULT_BASELINE),
+        help="The baseline results to compare against.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="The fraction the fastest run time may grow before it counts as a regression.",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Save the results as the new baseline instead of comparing against it.",
+    )
+    args = parser.parse_args()
+
+    benchmarks = select_benchmarks(BENCHMARKS, args.filter)
+
+    if args.list:
+        print("\n".join(benchmark.name for benchmark in benchmarks))
+        return
+
+    if len(benchmarks) == 0:
+        print(f"No benchmarks match: {args.filter}", file=sys.stderr)
+        sys.exit(2)
+
+    results = run_benchmarks(benchmarks, args.repeat, args.warmup)
+
+    if args.output:
+        save_results(args.output, results)
+        print(f"Results saved to: {args.output}")
+
+    if args.save_baseline:
+        save_results(args.baseline, results)
+        print(f"Baseline saved to: {args.baseline}")
+        return
+
+    # Budgets are absolute, so they are checked even without a baseline
+    over = over_budget(results)
+
+    if over:
+        print(f"\nOver budget: {', '.join(over)}", file=sys.stderr)
+        sys.exit(1)
+
+    baseline = load_results(args.baseline)
+
+    if baseline is None:
+        print(f"No baseline at {args.baseline}, skipping the comparison. Record one with --save-baseline.")
+        return
+
+    differences = machine_differences(results, baseline)
+
+    if differences:
+        print(
+            f"The baseline at {args.baseline} was recorded on another machine ({'; '.join(differences)}), "
+            "skipping the comparison. Record one here with --save-baseline.",
+            file=sys.stderr,
+        )
+        return
+
+    # Benchmarks left out by the filter are not missing
+    names = {benchmark.name for benchmark in benchmarks}
+    baseline["results"] = {name: result for name, result in baseline["results"].items() if name in names}
+
+    rows = compare_results(results, baseline, args.tolerance)
+    print()
+    print(format_comparison(rows))
+
+    regressions = [row["name"] for row in rows if row["status"] == "regression"]
+
+    if regressions:
+        print(f"\nRegressions (over {args.tolerance:.0%} slower): {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
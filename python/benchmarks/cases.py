@@ -0,0 +1,348 @@
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import tifffile
+
+from ouroboros.common.pipelines import backproject_pipeline, slice_pipeline
+from ouroboros.helpers.bounding_boxes import BoundingBox, calculate_bounding_boxes_bsp_link_rects
+from ouroboros.helpers.files import volume_from_intermediates, write_small_intermediate
+from ouroboros.helpers.network_shaper import NetworkShaper
+from ouroboros.helpers.options import BackprojectOptions, SliceOptions
+from ouroboros.helpers.shapes import ImgSlice
+from ouroboros.helpers.slice import (
+    backproject_box,
+    calculate_slice_rects,
+    coordinate_grid,
+    slice_volume_from_grids,
+)
+from ouroboros.helpers.spline import Spline
+from ouroboros.helpers.synthetic import create_synthetic_dataset, synthetic_path
+from ouroboros.helpers.volume_cache import update_writable_rects
+from ouroboros.helpers.worker_pool import WorkerPool
+
+from .runner import Benchmark
+
+SEED = 0
+
+# The synthetic volume (X, Y, Z) and the slices cut from it
+VOLUME_SIZE = (256, 256, 160)
+VOLUME_CHUNK_SIZE = (64, 64, 32)
+SLICE_SIZE = 64
+PIPELINE_PROCESSES = min(4, os.cpu_count() or 1)
+
+# Downloads of the shaped slicing benchmark, as if from a remote volume
+SHAPED_LATENCY = 0.05
+SHAPED_BANDWIDTH = 50e6
+
+# The longest the CLI may take to import, in seconds
+STARTUP_BUDGET = 0.3
+
+
+def helix_points() -> np.ndarray:
+    return synthetic_path(VOLUME_SIZE, np.linspace(0, 1, 40))
+
+
+def helix_rects(
+    count: int, width: int = SLICE_SIZE, height: int = SLICE_SIZE
+) -> tuple[Spline, np.ndarray, np.ndarray]:
+    """
+    A spline through `helix_points`, evenly spaced times along it, and the slice rects at those times.
+    """
+
+    spline = Spline(helix_points(), degree=3)
+    times = np.linspace(0, 1, count)
+
+    return spline, times, calculate_slice_rects(times, spline, width, height)
+
+
+# Geometry
+
+def setup_coordinate_grid(folder: Path):
+    _, _, rects = helix_rects(256)
+    return rects
+
+
+def run_coordinate_grid(rects):
+    for rect in rects:
+        coordinate_grid(rect, (SLICE_SIZE, SLICE_SIZE))
+
+
+def setup_spline(folder: Path):
+    spline = Spline(helix_points(), degree=3)
+    return spline, np.linspace(0, 1, 4000)
+
+
+def run_rotation_minimizing_vectors(state):
+    spline, times = state
+    spline.calculate_rotation_minimizing_vectors(times)
+
+
+def run_calculate_slice_rects(state):
+    spline, times = state
+    calculate_slice_rects(times, spline, SLICE_SIZE, SLICE_SIZE)
+
+
+def setup_bounding_boxes(folder: Path):
+    _, _, rects = helix_rects(4000)
+    return rects
+
+
+def run_bounding_boxes(rects):
+    calculate_bounding_boxes_bsp_link_rects(rects)
+
+
+# Slicing and backprojection of a single bounding box
+
+def setup_slice_box(folder: Path):
+    _, _, rects = helix_rects(512)
+    rects = rects[:32]
+
+    bounding_box = BoundingBox.from_rects(rects)
+    shape = bounding_box.get_shape()
+    volume = np.random.default_rng(SEED).integers(0, 255, shape, dtype=np.uint8)
+    grids = np.array([coordinate_grid(rect, (SLICE_SIZE, SLICE_SIZE)) for rect in rects])
+
+    return SimpleNamespace(rects=rects, bounding_box=bounding_box, volume=volume, grids=grids)
+
+
+def run_slice_volume_from_grids(state):
+    slice_volume_from_grids(state.volume, state.bounding_box, state.grids, SLICE_SIZE, SLICE_SIZE)
+
+
+def setup_backproject_box(folder: Path):
+    state = setup_slice_box(folder)
+    state.slices = slice_volume_from_grids(state.volume, state.bounding_box, state.grids, SLICE_SIZE, SLICE_SIZE)
+    return state
+
+
+def run_backproject_box(state):
+    backproject_box(state.bounding_box, state.rects, state.slices)
+
+
+# Backprojection bookkeeping and merging
+
+def setup_volume_from_intermediates(folder: Path):
+    rng = np.random.default_rng(SEED)
+    shape = ImgSlice(512, 512)
+
+    # Intermediates of one output plane, as written by the chunks that cover it
+    for index in range(32):
+        lookup = np.sort(rng.choice(shape.Y * shape.X, 20000, replace=False)).astype(np.uint32)
+        write_small_intermediate(
+            folder / f"{index}.tif",
+            np.array([shape.X, shape.X, 0, 0], dtype=np.uint32),
+            lookup,
+            rng.random(len(lookup), dtype=np.float32) * 255,
+            rng.random(len(lookup), dtype=np.float32),
+        )
+
+    return folder, shape
+
+
+def run_volume_from_intermediates(state):
+    folder, shape = state
+    volume_from_intermediates(folder, shape)
+
+
+def setup_update_writable_rects(folder: Path):
+    _, _, rects = helix_rects(4000)
+    min_dim = int(np.floor(rects[..., 2].min()))
+    planes = int(np.floor(rects[..., 2].max())) - min_dim + 2
+
+    return rects, min_dim, planes
+
+
+def run_update_writable_rects(state):
+    rects, min_dim, planes = state
+    processed = np.zeros((-(-len(rects) // 32), 2, 2), dtype=bool)
+    writeable = np.zeros(planes, dtype=int)
+
+    # As chunks finish, in the order they are processed
+    for index in np.ndindex(processed.shape):
+        processed[index] = True
+        update_writable_rects(processed, rects, min_dim, writeable, 32)
+
+
+# End to end pipeline steps, on a local volume
+
+def _prepare_step(pipeline, input_data):
+    """
+    Run every step of a pipeline but the last, and return the input of the last step.
+    """
+
+    for step in pipeline.steps[:-1]:
+        input_data, error = step.process(input_data)
+
+        if error is not None:
+            raise RuntimeError(f"{step.step_name}: {error}")
+
+    return input_data
+
+
+def _slice_options(neuroglancer_json: str, output_folder: Path) -> SliceOptions:
+    return SliceOptions(
+        slice_width=SLICE_SIZE,
+        slice_height=SLICE_SIZE,
+        output_file_folder=str(output_folder),
+        output_file_name="slices",
+        neuroglancer_json=neuroglancer_json,
+    )
+
+
+def _reset_folder(folder: Path):
+    shutil.rmtree(folder, ignore_errors=True)
+    folder.mkdir(parents=True)
+
+
+def _run_step(state):
+    # A new step each run, so timings and progress do not carry over
+    pipeline, _ = state.make_pipeline()
+    _, error = pipeline.steps[-1].process(state.input_data)
+
+    if error is not None:
+        raise RuntimeError(error)
+
+
+def _teardown_pipeline(state):
+    state.worker_pool.shutdown()
+
+
+def _synthetic_dataset(folder: Path) -> str:
+    dataset = create_synthetic_dataset(str(folder / "dataset"), VOLUME_SIZE, chunk_size=VOLUME_CHUNK_SIZE)
+    return dataset.neuroglancer_json
+
+
+def setup_slice_pipeline(folder: Path, network_shaper: NetworkShaper | None = None):
+    neuroglancer_json = _synthetic_dataset(folder)
+    options = _slice_options(neuroglancer_json, folder / "out")
+    worker_pool = WorkerPool(PIPELINE_PROCESSES).prestart()
+
+    def make_pipeline():
+        return slice_pipeline(
+            options, worker_pool=worker_pool, processes=PIPELINE_PROCESSES, network_shaper=network_shaper
+        )
+
+    pipeline, input_data = make_pipeline()
+    state = SimpleNamespace(output=folder / "out", worker_pool=worker_pool, make_pipeline=make_pipeline)
+    state.input_data = _prepare_step(pipeline, input_data)
+
+    return state
+
+
+def setup_shaped_slice_pipeline(folder: Path):
+    return setup_slice_pipeline(folder, NetworkShaper(SHAPED_LATENCY, SHAPED_BANDWIDTH))
+
+
+def setup_backproject_pipeline(folder: Path):
+    neuroglancer_json = _synthetic_dataset(folder)
+    slice_options = _slice_options(neuroglancer_json, folder / "slices")
+    _reset_folder(folder / "slices")
+    worker_pool = WorkerPool(PIPELINE_PROCESSES).prestart()
+
+    pipeline, input_data = slice_pipeline(slice_options, worker_pool=worker_pool, processes=PIPELINE_PROCESSES)
+    _, error = pipeline.process(input_data)
+
+    if error is not None:
+        raise RuntimeError(error)
+
+    straightened = folder / "slices" / "slices.tif"
+    assert tifffile.TiffFile(straightened).series[0].shape[0] > 0
+
+    options = BackprojectOptions(
+        output_file_folder=str(folder / "out"),
+        output_file_name="backprojected",
+        straightened_volume_path=str(straightened),
+        slice_options_path="",
+    )
+
+    def make_pipeline():
+        return backproject_pipeline(options, slice_options, worker_pool=worker_pool, processes=PIPELINE_PROCESSES)
+
+    pipeline, input_data = make_pipeline()
+    state = SimpleNamespace(output=folder / "out", worker_pool=worker_pool, make_pipeline=make_pipeline)
+    state.input_data = _prepare_step(pipeline, input_data)
+
+    return state
+
+
+def reset_pipeline(state):
+    _reset_folder(state.output)
+
+
+# Startup
+
+def import_time(module: str) -> float:
+    """
+    Import a module in a new interpreter, and return how long it took in seconds (from `python -X importtime`).
+    """
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(Path(__file__).parents[1]), env.get("PYTHONPATH")]))
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+
+    # Lines are "import time: self [us] | cumulative | imported package", the module's own line is its total
+    for line in result.stderr.splitlines():
+        fields = line.removeprefix("import time:").split("|")
+
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def setup_import(module: str):
+    return lambda folder: module
+
+
+BENCHMARKS = [
+    Benchmark("coordinate_grid", setup_coordinate_grid, run_coordinate_grid, repeat=10),
+    Benchmark("slice_volume_from_grids", setup_slice_box, run_slice_volume_from_grids, repeat=10),
+    Benchmark("calculate_slice_rects", setup_spline, run_calculate_slice_rects, repeat=10),
+    Benchmark(
+        "Spline.calculate_rotation_minimizing_vectors", setup_spline, run_rotation_minimizing_vectors, repeat=10
+    ),
+    Benchmark("calculate_bounding_boxes_bsp_link_rects", setup_bounding_boxes, run_bounding_boxes, repeat=10),
+    Benchmark("backproject_box", setup_backproject_box, run_backproject_box, repeat=10),
+    Benchmark("volume_from_intermediates", setup_volume_from_intermediates, run_volume_from_intermediates),
+    Benchmark("update_writable_rects", setup_update_writable_rects, run_update_writable_rects, repeat=10),
+    Benchmark(
+        "SliceParallelPipelineStep",
+        setup_slice_pipeline,
+        _run_step,
+        reset=reset_pipeline,
+        teardown=_teardown_pipeline,
+        repeat=3,
+    ),
+    Benchmark(
+        "SliceParallelPipelineStep[50ms, 50MB/s]",
+        setup_shaped_slice_pipeline,
+        _run_step,
+        reset=reset_pipeline,
+        teardown=_teardown_pipeline,
+        repeat=3,
+    ),
+    Benchmark(
+        "BackprojectPipelineStep",
+        setup_backproject_pipeline,
+        _run_step,
+        reset=reset_pipeline,
+        teardown=_teardown_pipeline,
+        repeat=3,
+    ),
+    Benchmark(
+        "import ouroboros.cli", setup_import("ouroboros.cli"), import_time, self_timed=True, budget=STARTUP_BUDGET
+    ),
+    Benchmark("import ouroboros.server", setup_import("ouroboros.server"), import_time, self_timed=True),
+]
@@ -0,0 +1,248 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import re
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+RESULTS_VERSION = 1
+DEFAULT_TOLERANCE = 0.25
+
+# Metadata that must match for timings to be comparable
+MACHINE_KEYS = ("platform", "processor", "cpu_count", "python", "numpy")
+
+
+@dataclass
+class Benchmark:
+    name: str  # Unique name, used to match results against the baseline
+    setup: Callable[[Path], Any]  # Builds the inputs in a scratch folder, not timed
+    run: Callable[[Any], Any]  # The timed call, given the inputs from setup
+    reset: Callable[[Any], None] | None = None  # Called before each run, not timed (e.g. to remove outputs)
+    teardown: Callable[[Any], None] | None = None  # Called once after the last run
+    repeat: int = 5  # Number of timed runs
+    self_timed: bool = False  # The run returns its own duration in seconds (e.g. measured in a subprocess)
+    budget: float | None = None  # The fastest run may not take longer than this, in seconds, whatever the baseline
+
+
+def run_benchmark(benchmark: Benchmark, repeat: int = None, warmup: int = 1) -> dict:
+    """
+    Time a benchmark in its own scratch folder.
+
+    Parameters
+    ----------
+    benchmark : Benchmark
+        The benchmark to run.
+    repeat : int, optional
+        The number of timed runs, by default None (the benchmark's own repeat)
+    warmup : int, optional
+        The number of untimed runs before the timed ones, by default 1
+
+    Returns
+    -------
+    dict
+        The summary statistics of the run times, in seconds.
+    """
+
+    repeat = benchmark.repeat if repeat is None else repeat
+
+    with tempfile.TemporaryDirectory(prefix="ouroboros-benchmark-") as folder:
+        state = benchmark.setup(Path(folder))
+
+        try:
+            times = []
+
+            for i in range(warmup + repeat):
+                if benchmark.reset is not None:
+                    benchmark.reset(state)
+
+                start = time.perf_counter()
+                duration = benchmark.run(state)
+
+                if not benchmark.self_timed:
+                    duration = time.perf_counter() - start
+
+                if i >= warmup:
+                    times.append(duration)
+        finally:
+            if benchmark.teardown is not None:
+                benchmark.teardown(state)
+
+    result = {
+        "repeat": len(times),
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+    if benchmark.budget is not None:
+        result["budget"] = benchmark.budget
+
+    return result
+
+
+def run_benchmarks(
+    benchmarks: list[Benchmark], repeat: int = None, warmup: int = 1, log: Callable[[str], None] = print
+) -> dict:
+    """
+    Run benchmarks in order and collect their results with a description of the machine.
+    """
+
+    results = {}
+
+    for benchmark in benchmarks:
+        result = run_benchmark(benchmark, repeat, warmup)
+        results[benchmark.name] = result
+        log(f"{benchmark.name:<48} {format_seconds(result['min']):>10} (median {format_seconds(result['median'])})")
+
+    return {"version": RESULTS_VERSION, "metadata": machine_metadata(), "results": results}
+
+
+def select_benchmarks(benchmarks: list[Benchmark], pattern: str | None) -> list[Benchmark]:
+    """
+    The benchmarks whose name matches a regular expression (all of them if there is no pattern).
+    """
+
+    if not pattern:
+        return list(benchmarks)
+
+    return [benchmark for benchmark in benchmarks if re.search(pattern, benchmark.name)]
+
+
+def machine_metadata() -> dict:
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def machine_differences(results: dict, baseline: dict) -> list[str]:
+    """
+    The machine metadata that differs between two sets of results, as "key: baseline != current".
+    """
+
+    current = results.get("metadata", {})
+    previous = baseline.get("metadata", {})
+
+    return [
+        f"{key}: {previous.get(key)} != {current.get(key)}"
+        for key in MACHINE_KEYS
+        if previous.get(key) != current.get(key)
+    ]
+
+
+def save_results(path: str | os.PathLike, results: dict):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+
+
+def load_results(path: str | os.PathLike) -> dict | None:
+    """
+    Load saved results, or None if there are none at the path.
+    """
+
+    try:
+        with open(path, "r") as f:
+            results = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    if results.get("version") != RESULTS_VERSION:
+        raise ValueError(f"Unsupported benchmark results version in {path}: {results.get('version')}")
+
+    return results
+
+
+def over_budget(results: dict) -> list[str]:
+    """
+    The benchmarks whose fastest run took longer than their budget.
+    """
+
+    return [
+        name for name, result in results["results"].items()
+        if result.get("budget") is not None and result["min"] > result["budget"]
+    ]
+
+
+def compare_results(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list[dict]:
+    """
+    Compare the fastest run of each benchmark against a baseline. The fastest run is the one
+    least disturbed by other load on the machine, so it is the most repeatable.
+
+    Parameters
+    ----------
+    results : dict
+        The current results, from `run_benchmarks`.
+    baseline : dict
+        The baseline results, in the same format.
+    tolerance : float, optional
+        The fraction a run time may grow before it counts as a regression, by default 0.25
+
+    Returns
+    -------
+    list[dict]
+        One row per benchmark in either set of results, with a status of "ok", "regression",
+        "improvement", "new" (no baseline) or "missing" (not run).
+    """
+
+    current = results["results"]
+    previous = baseline["results"]
+    rows = []
+
+    for name in list(current) + [name for name in previous if name not in current]:
+        row = {
+            "name": name,
+            "baseline": previous[name]["min"] if name in previous else None,
+            "current": current[name]["min"] if name in current else None,
+            "ratio": None,
+        }
+
+        if row["baseline"] is None:
+            row["status"] = "new"
+        elif row["current"] is None:
+            row["status"] = "missing"
+        else:
+            row["ratio"] = row["current"] / row["baseline"] if row["baseline"] > 0 else float("inf")
+
+            if row["ratio"] > 1 + tolerance:
+                row["status"] = "regression"
+            elif row["ratio"] < 1 / (1 + tolerance):
+                row["status"] = "improvement"
+            else:
+                row["status"] = "ok"
+
+        rows.append(row)
+
+    return rows
+
+
+def format_comparison(rows: list[dict]) -> str:
+    lines = [f"{'benchmark':<48} {'baseline':>10} {'current':>10} {'ratio':>7}  status"]
+
+    for row in rows:
+        baseline = format_seconds(row["baseline"]) if row["baseline"] is not None else "-"
+        current = format_seconds(row["current"]) if row["current"] is not None else "-"
+        ratio = f"{row['ratio']:.2f}x" if row["ratio"] is not None else "-"
+        lines.append(f"{row['name']:<48} {baseline:>10} {current:>10} {ratio:>7}  {row['status']}")
+
+    return "\n".join(lines)
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds:.3f}s"
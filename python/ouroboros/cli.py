@@ -1,15 +1,12 @@
 import argparse
 from multiprocessing import freeze_support
 import sys
+from typing import TYPE_CHECKING
 
-from ouroboros.common.pipelines import backproject_pipeline, slice_pipeline
-from ouroboros.helpers.models import pretty_json_output
-from ouroboros.helpers.options import (
-    DEFAULT_BACKPROJECT_OPTIONS,
-    DEFAULT_SLICE_OPTIONS,
-    BackprojectOptions,
-    SliceOptions,
-)
+# Each command imports the modules it needs when it runs, so `--help` and quick commands start fast
+if TYPE_CHECKING:
+    from ouroboros.helpers.options import BackprojectOptions
+    from ouroboros.pipeline import Pipeline
 
 
 def main():
@@ -34,6 +31,71 @@ def main():
         action="store_true",
         help="Output timing statistics for the calculations.",
     )
+    parser_slice.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run with the same options, skipping the volumes it already sliced.",
+    )
+    parser_slice.add_argument(
+        "--simulate-latency",
+        type=float,
+        default=0.0,
+        help="Delay each volume download by this latency in seconds, to profile a local volume as if remote.",
+    )
+    parser_slice.add_argument(
+        "--simulate-bandwidth",
+        type=float,
+        default=0.0,
+        help="Limit volume downloads to this bandwidth in MB/s, to profile a local volume as if remote.",
+    )
+    parser_slice.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        metavar="OUT.json",
+        help="Record when each step, download, worker task and write ran, as a Chrome trace (open in Perfetto).",
+    )
+
+    # Create the parser for the slice-batch command
+    parser_batch = subparsers.add_parser(
+        "slice-batch",
+        help="Slice several paths through the same volume in one run, downloading overlapping regions once.",
+    )
+    parser_batch.add_argument(
+        "options",
+        type=str,
+        nargs="+",
+        help="The paths to the options json files, one per path (each writes its own output).",
+    )
+    parser_batch.add_argument(
+        "--layers",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Slice each of these annotation layers with each options file, adding the layer to the output name.",
+    )
+    parser_batch.add_argument(
+        "--all-layers",
+        action="store_true",
+        help="Slice every annotation layer of the neuroglancer JSON of each options file, as with --layers.",
+    )
+    parser_batch.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Output timing statistics for the calculations.",
+    )
+    parser_batch.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run with the same options, skipping the volumes it already sliced.",
+    )
+    parser_batch.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        metavar="OUT.json",
+        help="Record when each step, download, worker task and write ran, as a Chrome trace (open in Perfetto).",
+    )
 
     # Create the parser for the backproject command
     parser_backproject = subparsers.add_parser(
@@ -50,6 +112,80 @@ def main():
         action="store_true",
         help="Output timing statistics for the calculations.",
     )
+    parser_backproject.add_argument(
+        "--compute-processes",
+        type=int,
+        default=None,
+        help="Number of backprojection compute processes (overrides the options file).",
+    )
+    parser_backproject.add_argument(
+        "--writer-processes",
+        type=int,
+        default=None,
+        help="Number of processes writing output planes (overrides the options file).",
+    )
+    parser_backproject.add_argument(
+        "--io-threads",
+        type=int,
+        default=None,
+        help="Number of I/O threads per process (overrides the options file).",
+    )
+    parser_backproject.add_argument(
+        "--auto-topology",
+        action="store_true",
+        help="Rebalance compute and writer processes from measured throughput during the run.",
+    )
+    parser_backproject.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run with the same options, reusing its intermediates and written planes.",
+    )
+    parser_backproject.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        metavar="OUT.json",
+        help="Record when each step, download, worker task and write ran, as a Chrome trace (open in Perfetto).",
+    )
+
+    # Create the parser for the plan command
+    parser_plan = subparsers.add_parser(
+        "plan",
+        help="Estimate the downloads, memory and output of slicing or backprojecting, without running them.",
+    )
+    parser_plan.add_argument(
+        "kind",
+        choices=["slice", "backproject"],
+        help="Whether the options are for slicing or backprojecting.",
+    )
+    parser_plan.add_argument(
+        "options",
+        type=str,
+        help="The path to the options json file.",
+    )
+    parser_plan.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Number of processes to plan for (defaults to the CPU count).",
+    )
+    parser_plan.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="Number of download threads to plan for (slicing only).",
+    )
+    parser_plan.add_argument(
+        "--bandwidth",
+        type=float,
+        default=0.0,
+        help="Download bandwidth in MB/s, to estimate the download time (slicing only).",
+    )
+    parser_plan.add_argument(
+        "--estimate-time",
+        action="store_true",
+        help="Time a small run of slicing or backprojection on this machine to estimate the duration.",
+    )
 
     # Create the parser for the sample-options command
     subparsers.add_parser(
@@ -57,6 +193,41 @@ def main():
         help="Export sample options files into the current folder.",
     )
 
+    # Create the parser for the synthetic-dataset command
+    parser_synthetic = subparsers.add_parser(
+        "synthetic-dataset",
+        help="Create a local precomputed volume and a neuroglancer JSON with a path through it, for offline testing.",
+    )
+    parser_synthetic.add_argument(
+        "folder",
+        type=str,
+        help="The folder to create the dataset in.",
+    )
+    # Sizes left out use the defaults of ouroboros.helpers.synthetic, which imports numpy when the command runs
+    parser_synthetic.add_argument(
+        "--size", type=int, nargs=3, metavar=("X", "Y", "Z"), help="The volume size, by default 256 256 160."
+    )
+    parser_synthetic.add_argument(
+        "--chunk-size",
+        type=int,
+        nargs=3,
+        metavar=("X", "Y", "Z"),
+        help="The chunk size of the volume, by default 64 64 64.",
+    )
+    parser_synthetic.add_argument(
+        "--slice-size",
+        type=int,
+        nargs=2,
+        metavar=("WIDTH", "HEIGHT"),
+        help="The largest slice size to slice the path with, by default 100 100 (as in the sample options). "
+        "The path keeps half a slice diagonal away from the sides of the volume, so every side of the volume "
+        "must be at least the slice diagonal plus a few voxels.",
+    )
+    parser_synthetic.add_argument("--dtype", type=str, default="uint8", help="The data type of the volume.")
+    parser_synthetic.add_argument("--channels", type=int, default=1, help="The number of channels.")
+    parser_synthetic.add_argument("--mips", type=int, default=1, help="The number of MIP levels.")
+    parser_synthetic.add_argument("--seed", type=int, default=0, help="The seed of the random data.")
+
     # Parse the arguments
     args = parser.parse_args()
 
@@ -64,26 +235,89 @@ def main():
     match args.command:
         case "slice":
             handle_slice(args)
+        case "slice-batch":
+            handle_slice_batch(args)
         case "backproject":
             handle_backproject(args)
+        case "plan":
+            handle_plan(args)
         case "sample-options":
             handle_sample_options()
+        case "synthetic-dataset":
+            handle_synthetic_dataset(args)
         case _:
             parser.print_help()
 
 
 def handle_slice(args):
-    print(f"Loading slice options from: {args.options}")
-    slice_options = SliceOptions.load_from_json(args.options)
+    from ouroboros.common.pipelines import slice_pipeline
+    from ouroboros.helpers.models import pretty_json_output
+    from ouroboros.helpers.network_shaper import NetworkShaper
+    from ouroboros.helpers.options import SliceOptions
+    from ouroboros.helpers.worker_pool import WorkerPool
 
-    if isinstance(slice_options, str):
-        print("Exiting due to errors loading slice options.", file=sys.stderr)
-        sys.exit(1)
+    # Start warming the worker processes while the options and geometry are prepared
+    with WorkerPool().prestart() as worker_pool:
+        print(f"Loading slice options from: {args.options}")
+        slice_options = SliceOptions.load_from_json(args.options)
+
+        if isinstance(slice_options, str):
+            print("Exiting due to errors loading slice options.", file=sys.stderr)
+            sys.exit(1)
 
-    print("Slice options loaded successfully.")
-    pipeline, input_data = slice_pipeline(slice_options, True)
+        print("Slice options loaded successfully.")
+        network_shaper = NetworkShaper(args.simulate_latency, args.simulate_bandwidth * 1e6)
 
-    _, error = pipeline.process(input_data)
+        pipeline, input_data = slice_pipeline(
+            slice_options,
+            True,
+            worker_pool=worker_pool,
+            resume=args.resume,
+            network_shaper=network_shaper if network_shaper.enabled else None,
+        )
+
+        error = process_pipeline(pipeline, input_data, args.trace)
+
+    if error:
+        print(f"Pipeline Error: {error}", file=sys.stderr)
+
+    if args.verbose:
+        print("\nCalculation Statistics:\n")
+        stat_dict = {stat.pop("pipeline"): stat for stat in pipeline.get_step_statistics()}
+        print(pretty_json_output(stat_dict))
+
+
+def handle_slice_batch(args):
+    from ouroboros.common.pipelines import batch_slice_options, batch_slice_pipeline
+    from ouroboros.helpers.models import pretty_json_output
+    from ouroboros.helpers.options import SliceOptions
+    from ouroboros.helpers.worker_pool import WorkerPool
+
+    # Start warming the worker processes while the options and geometry are prepared
+    with WorkerPool().prestart() as worker_pool:
+        options = []
+
+        for options_path in args.options:
+            print(f"Loading slice options from: {options_path}")
+            slice_options = SliceOptions.load_from_json(options_path)
+
+            if isinstance(slice_options, str):
+                print(f"Exiting due to errors loading slice options ({options_path}).", file=sys.stderr)
+                sys.exit(1)
+
+            options.append(slice_options)
+
+        options = batch_slice_options(options, args.layers, args.all_layers)
+
+        if isinstance(options, str):
+            print(f"Exiting due to errors reading the annotation layers: {options}", file=sys.stderr)
+            sys.exit(1)
+
+        print(f"Slicing {len(options)} paths.")
+
+        pipeline, input_data = batch_slice_pipeline(options, True, worker_pool=worker_pool, resume=args.resume)
+
+        error = process_pipeline(pipeline, input_data, args.trace)
 
     if error:
         print(f"Pipeline Error: {error}", file=sys.stderr)
@@ -95,27 +329,37 @@ def handle_slice(args):
 
 
 def handle_backproject(args):
-    print(f"Loading backproject options from: {args.options}")
-    backproject_options = BackprojectOptions.load_from_json(args.options)
+    from ouroboros.common.pipelines import backproject_pipeline
+    from ouroboros.helpers.models import pretty_json_output
+    from ouroboros.helpers.options import BackprojectOptions, SliceOptions
+    from ouroboros.helpers.worker_pool import WorkerPool
 
-    if isinstance(backproject_options, str):
-        print("Exiting due to errors loading backproject options.", file=sys.stderr)
-        sys.exit(1)
+    # Start warming the worker processes while the options and geometry are prepared
+    with WorkerPool().prestart() as worker_pool:
+        print(f"Loading backproject options from: {args.options}")
+        backproject_options = BackprojectOptions.load_from_json(args.options)
 
-    print("Backproject options loaded successfully."
-          f"Loading slice options from: {backproject_options.slice_options_path}")
+        if isinstance(backproject_options, str):
+            print("Exiting due to errors loading backproject options.", file=sys.stderr)
+            sys.exit(1)
 
-    slice_options = SliceOptions.load_from_json(backproject_options.slice_options_path)
+        print("Backproject options loaded successfully."
+              f"Loading slice options from: {backproject_options.slice_options_path}")
 
-    if isinstance(slice_options, str):
-        print("Exiting due to errors loading slice options file specified within backproject options"
-              f"({backproject_options.slice_options_path}).", file=sys.stderr)
-        sys.exit(1)
+        apply_worker_args(backproject_options, args)
 
-    print("Slice options loaded successfully.")
-    pipeline, input_data = backproject_pipeline(backproject_options, slice_options, True)
+        slice_options = SliceOptions.load_from_json(backproject_options.slice_options_path)
 
-    _, error = pipeline.process(input_data)
+        if isinstance(slice_options, str):
+            print("Exiting due to errors loading slice options file specified within backproject options"
+                  f"({backproject_options.slice_options_path}).", file=sys.stderr)
+            sys.exit(1)
+
+        print("Slice options loaded successfully.")
+        pipeline, input_data = backproject_pipeline(backproject_options, slice_options, True,
+                                                    worker_pool=worker_pool, resume=args.resume)
+
+        error = process_pipeline(pipeline, input_data, args.trace)
 
     if error:
         print(f"Pipeline Error: {error}", file=sys.stderr)
@@ -127,7 +371,79 @@ def handle_backproject(args):
         print(pretty_json_output(stat_dict))
 
 
+def process_pipeline(pipeline: "Pipeline", input_data, trace_path: str | None = None) -> str | None:
+    from ouroboros.helpers.tracing import Tracer, tracing
+
+    # Spans are only recorded when a trace is requested
+    tracer = Tracer() if trace_path else None
+
+    with tracing(tracer):
+        _, error = pipeline.process(input_data)
+
+    if tracer is not None:
+        tracer.write(trace_path)
+        print(f"Trace written to: {trace_path}")
+
+    return error
+
+
+def apply_worker_args(backproject_options: "BackprojectOptions", args):
+    # Command line worker settings take precedence over the options file
+    worker_params = backproject_options.worker_params
+
+    if args.compute_processes is not None:
+        worker_params.compute_processes = args.compute_processes
+    if args.writer_processes is not None:
+        worker_params.writer_processes = args.writer_processes
+    if args.io_threads is not None:
+        worker_params.io_threads = args.io_threads
+    if args.auto_topology:
+        worker_params.auto_tune = True
+
+
+def handle_plan(args):
+    from ouroboros.common.plan import plan_backproject, plan_slice
+    from ouroboros.helpers.models import pretty_json_output
+    from ouroboros.helpers.options import BackprojectOptions, SliceOptions
+
+    if args.kind == "slice":
+        slice_options = SliceOptions.load_from_json(args.options)
+
+        if isinstance(slice_options, str):
+            print("Exiting due to errors loading slice options.", file=sys.stderr)
+            sys.exit(1)
+
+        plan = plan_slice(slice_options, args.processes, args.threads, args.bandwidth * 1e6, args.estimate_time)
+    else:
+        backproject_options = BackprojectOptions.load_from_json(args.options)
+
+        if isinstance(backproject_options, str):
+            print("Exiting due to errors loading backproject options.", file=sys.stderr)
+            sys.exit(1)
+
+        slice_options = SliceOptions.load_from_json(backproject_options.slice_options_path)
+
+        if isinstance(slice_options, str):
+            print("Exiting due to errors loading slice options file specified within backproject options"
+                  f"({backproject_options.slice_options_path}).", file=sys.stderr)
+            sys.exit(1)
+
+        plan = plan_backproject(backproject_options, slice_options, args.processes, args.estimate_time)
+
+    if isinstance(plan, str):
+        print(f"Pipeline Error: {plan}", file=sys.stderr)
+        sys.exit(1)
+
+    print(pretty_json_output(plan))
+
+    if "failure" in plan:
+        print(f"Planned Failure: {plan['failure']}", file=sys.stderr)
+        sys.exit(1)
+
+
 def handle_sample_options():
+    from ouroboros.helpers.options import DEFAULT_BACKPROJECT_OPTIONS, DEFAULT_SLICE_OPTIONS
+
     # Create sample options files
     sample_slice_options = DEFAULT_SLICE_OPTIONS
     sample_backproject_options = DEFAULT_BACKPROJECT_OPTIONS
@@ -137,6 +453,33 @@ def handle_sample_options():
     sample_backproject_options.save_to_json("./sample-backproject-options.json")
 
 
+def handle_synthetic_dataset(args):
+    from ouroboros.helpers.synthetic import (
+        DEFAULT_CHUNK_SIZE,
+        DEFAULT_SIZE,
+        DEFAULT_SLICE_SIZE,
+        create_synthetic_dataset,
+    )
+
+    try:
+        dataset = create_synthetic_dataset(
+            args.folder,
+            size=tuple(args.size or DEFAULT_SIZE),
+            dtype=args.dtype,
+            chunk_size=tuple(args.chunk_size or DEFAULT_CHUNK_SIZE),
+            channels=args.channels,
+            mips=args.mips,
+            slice_size=tuple(args.slice_size or DEFAULT_SLICE_SIZE),
+            seed=args.seed,
+        )
+    except ValueError as e:
+        print(f"Error creating synthetic dataset: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"Volume created at: {dataset.source_url}")
+    print(f"Neuroglancer JSON created at: {dataset.neuroglancer_json}")
+
+
 if __name__ == "__main__":
     # Necessary to run multiprocessing in child processes
     freeze_support()
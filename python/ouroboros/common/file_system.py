@@ -12,6 +12,7 @@ from ouroboros.helpers.files import (
     format_backproject_output_multiple,
     format_slice_output_file,
     format_slice_output_multiple,
+    format_slice_output_zarr,
 )
 from ouroboros.helpers.options import BackprojectOptions, SliceOptions
 
@@ -96,7 +97,7 @@ def load_options_for_backproject_docker(
             host_output_folder,
             format_backproject_output_multiple(options.output_file_name),
         )
-        if options.make_single_file is False
+        if options.make_single_file is False and options.output_format == "tiff"
         else None
     )
 
@@ -128,6 +129,47 @@ def load_options_for_backproject_docker(
     )
 
 
+def load_options_for_backproject_plan_docker(
+    options_path: str, target_path: str = "./"
+) -> tuple[BackprojectOptions, SliceOptions] | str:
+    """
+    Loads the options for planning a backprojection in docker.
+
+    Unlike `load_options_for_backproject_docker`, the straightened volume is not copied, since planning does
+    not read it.
+
+    Parameters
+    ----------
+    options_path : str
+        The path to the options file.
+    target_path : str, optional
+        The path to the target folder in the docker volume, by default "./"
+
+    Returns
+    -------
+    tuple[BackprojectOptions, SliceOptions] | str
+        The options for backprojecting the volume and the options for slicing the volume.
+    """
+
+    files = [{"sourcePath": options_path, "targetPath": target_path}]
+    success, error = copy_to_volume(files)
+
+    if not success:
+        return error
+
+    options = load_options_for_backproject(get_volume_path() + get_path_name(options_path))
+
+    if isinstance(options, str):
+        return options
+
+    slice_load_result = load_options_for_slice_docker(options.slice_options_path, target_path)
+
+    if isinstance(slice_load_result, str):
+        return slice_load_result
+
+    return options, slice_load_result[0]
+
+
 def save_output_for_backproject_docker(
     host_output_file: str,
     host_output_slices: str = None,
@@ -228,14 +270,17 @@ def load_options_for_slice_docker(
 
     host_output_folder = slice_options.output_file_folder
     host_output_file = combine_unknown_folder(
-        host_output_folder, format_slice_output_file(slice_options.output_file_name)
+        host_output_folder,
+        format_slice_output_zarr(slice_options.output_file_name)
+        if slice_options.output_format == "ome-zarr"
+        else format_slice_output_file(slice_options.output_file_name),
     )
     host_output_slices = (
         combine_unknown_folder(
             host_output_folder,
             format_slice_output_multiple(slice_options.output_file_name),
         )
-        if slice_options.make_single_file is False
+        if slice_options.make_single_file is False and slice_options.output_format != "ome-zarr"
         else None
     )
 
@@ -1,4 +1,9 @@
+import re
+
+from ouroboros.helpers.network_shaper import NetworkShaper
 from ouroboros.helpers.options import BackprojectOptions, SliceOptions
+from ouroboros.helpers.parse import neuroglancer_config_to_annotations, parse_neuroglancer_json
+from ouroboros.helpers.worker_pool import WorkerPool
 from ouroboros.pipeline import (
     Pipeline,
     PipelineInput,
@@ -6,20 +11,41 @@ from ouroboros.pipeline import (
     SlicesGeometryPipelineStep,
     VolumeCachePipelineStep,
     SliceParallelPipelineStep,
+    SliceStreamPipelineStep,
     BackprojectPipelineStep,
+    BatchGeometryPipelineStep,
+    BatchSlicePipelineStep,
 )
 
 
-def slice_pipeline(slice_options: SliceOptions, verbose: bool = False) -> tuple[Pipeline, PipelineInput]:
+def slice_pipeline(
+    slice_options: SliceOptions,
+    verbose: bool = False,
+    worker_pool: WorkerPool | None = None,
+    processes: int | None = None,
+    resume: bool = False,
+    network_shaper: NetworkShaper | None = None,
+) -> tuple[Pipeline, PipelineInput]:
     """
     Creates a pipeline for slicing a volume, as well as the default input data for the pipeline.
 
+    If the options set `slicing_params.stream_window_slices`, the path is sliced one window of slices
+    at a time (see SliceStreamPipelineStep), so memory stays bounded however long the path is.
+
     Parameters
     ----------
     slice_options : SliceOptions
         The options for slicing the volume.
     verbose : bool, optional
         Whether to show a progress bar for the pipeline, by default False
+    worker_pool : WorkerPool | None, optional
+        A shared pool of worker processes to borrow from, by default None (create a new pool)
+    processes : int | None, optional
+        The number of processes to use for slicing, by default None (the CPU count)
+    resume : bool, optional
+        Whether to continue an interrupted run from its checkpoint, by default False
+    network_shaper : NetworkShaper | None, optional
+        Simulated network conditions for the volume downloads, by default None (no delay)
 
     Returns
     -------
@@ -27,21 +53,157 @@ def slice_pipeline(slice_options: SliceOptions, verbose: bool = False) -> tuple[
         The pipeline for slicing the volume and the default input data for the pipeline
     """
 
+    if slice_options.slicing_params.stream_window_slices > 0:
+        # The geometry of each window is calculated as it is sliced
+        steps = [SliceStreamPipelineStep().with_network_shaper(network_shaper)]
+    else:
+        steps = [
+            SlicesGeometryPipelineStep(),
+            VolumeCachePipelineStep().with_network_shaper(network_shaper),
+            SliceParallelPipelineStep(),
+        ]
+
+    if verbose:
+        steps[-1].with_progress_bar()
+
     pipeline = Pipeline(
         [
             ParseJSONPipelineStep(),
-            SlicesGeometryPipelineStep(),
-            VolumeCachePipelineStep(),
+            *steps[:-1],
+            steps[-1].with_worker_pool(worker_pool).with_resume(resume),
+        ]
+    )
+
+    if processes is not None:
+        pipeline.steps[-1].with_processes(processes)
+
+    default_input_data = PipelineInput(
+        slice_options=slice_options, json_path=slice_options.neuroglancer_json
+    )
+
+    return pipeline, default_input_data
+
+
+def _layer_output_name(output_file_name: str, layer: str) -> str:
+    # Layer names may contain characters that are not allowed in file names
+    return f"{output_file_name}-{re.sub(r'[^A-Za-z0-9_.-]+', '_', layer)}"
+
+
+def batch_slice_options(
+    options: list[SliceOptions], layers: list[str] | None = None, all_layers: bool = False
+) -> list[SliceOptions] | str:
+    """
+    The options of each path of a batch.
+
+    Parameters
+    ----------
+    options : list[SliceOptions]
+        The options for slicing each path.
+    layers : list[str] | None, optional
+        Annotation layers to slice from each options file, by default None (the layer of the options)
+    all_layers : bool, optional
+        Whether to slice every annotation layer (with at least two points) of the neuroglancer JSON of each
+        options file, by default False
+
+    Returns
+    -------
+    list[SliceOptions] | str
+        The options, with one copy per annotation layer, named after the layer, if layers are given,
+        or an error message.
+    """
+
+    if not layers and not all_layers:
+        return list(options)
+
+    batch = []
+
+    for slice_options in options:
+        option_layers = layers
+
+        if all_layers:
+            # The parsed state is cached, so the pipelines of the layers do not parse it again
+            ng_config, error = parse_neuroglancer_json(slice_options.neuroglancer_json)
+
+            if error:
+                return error
+
+            annotations, error = neuroglancer_config_to_annotations(ng_config)
+
+            if error:
+                return error
+
+            option_layers = [name for name, layer in annotations.items() if len(layer.path) > 1]
+
+        batch += [
+            slice_options.model_copy(
+                update={
+                    "neuroglancer_annotation_layer": layer,
+                    "output_file_name": _layer_output_name(slice_options.output_file_name, layer),
+                },
+                deep=True,
+            )
+            for layer in option_layers
+        ]
+
+    return batch
+
+
+def batch_slice_pipeline(
+    options: list[SliceOptions],
+    verbose: bool = False,
+    worker_pool: WorkerPool | None = None,
+    processes: int | None = None,
+    resume: bool = False,
+    network_shaper: NetworkShaper | None = None,
+) -> tuple[Pipeline, PipelineInput]:
+    """
+    Creates a pipeline for slicing several paths in one run, as well as the default input data for the pipeline.
+
+    The bounding boxes of all paths are planned together, so where paths run close together their
+    overlapping boxes are downloaded once and shared. Each path is sliced into its own output.
+
+    Parameters
+    ----------
+    options : list[SliceOptions]
+        The options for slicing each path (see `batch_slice_options`).
+    verbose : bool, optional
+        Whether to show a progress bar for the pipeline, by default False
+    worker_pool : WorkerPool | None, optional
+        A shared pool of worker processes to borrow from, by default None (create a new pool)
+    processes : int | None, optional
+        The number of processes to use for slicing, by default None (the CPU count)
+    resume : bool, optional
+        Whether to continue an interrupted run from the checkpoint of each path, by default False
+    network_shaper : NetworkShaper | None, optional
+        Simulated network conditions for the volume downloads, by default None (no delay)
+
+    Returns
+    -------
+    tuple[Pipeline, PipelineInput]
+        The pipeline for slicing the paths and the default input data for the pipeline
+    """
+
+    pipeline = Pipeline(
+        [
+            BatchGeometryPipelineStep().with_network_shaper(network_shaper),
             (
-                SliceParallelPipelineStep().with_progress_bar()
+                BatchSlicePipelineStep().with_progress_bar()
                 if verbose
-                else SliceParallelPipelineStep()
-            ),
+                else BatchSlicePipelineStep()
+            )
+            .with_worker_pool(worker_pool)
+            .with_resume(resume),
         ]
     )
 
+    if processes is not None:
+        pipeline.steps[-1].with_processes(processes)
+
     default_input_data = PipelineInput(
-        slice_options=slice_options, json_path=slice_options.neuroglancer_json
+        batch_inputs=[
+            PipelineInput(slice_options=slice_options, json_path=slice_options.neuroglancer_json)
+            for slice_options in options
+        ]
     )
 
     return pipeline, default_input_data
@@ -51,6 +213,9 @@ def backproject_pipeline(
     backproject_options: BackprojectOptions,
     slice_options: SliceOptions,
     verbose: bool = False,
+    worker_pool: WorkerPool | None = None,
+    processes: int | None = None,
+    resume: bool = False,
 ) -> tuple[Pipeline, PipelineInput]:
     """
     Creates a pipeline for backprojecting a volume, as well as the default input data for the pipeline.
@@ -63,6 +228,12 @@ def backproject_pipeline(
         The options for slicing the volume.
     verbose : bool, optional
         Whether to show a progress bar for the pipeline, by default False
+    worker_pool : WorkerPool | None, optional
+        A shared pool of worker processes to borrow from, by default None (create new pools)
+    processes : int | None, optional
+        The number of processes to use for backprojecting, by default None (the CPU count)
+    resume : bool, optional
+        Whether to continue an interrupted run from its checkpoint, by default False
 
     Returns
     -------
@@ -79,10 +250,15 @@ def backproject_pipeline(
                 BackprojectPipelineStep().with_progress_bar()
                 if verbose
                 else BackprojectPipelineStep()
-            ),
+            )
+            .with_worker_pool(worker_pool)
+            .with_resume(resume),
         ]
     )
 
+    if processes is not None:
+        pipeline.steps[-1].with_processes(processes)
+
     default_input_data = PipelineInput(
         slice_options=slice_options,
         backproject_options=backproject_options,
@@ -0,0 +1,302 @@
+from dataclasses import astuple
+from functools import partial
+from multiprocessing import cpu_count
+
+import numpy as np
+
+from ouroboros.common.pipelines import visualization_pipeline
+from ouroboros.helpers.bounding_boxes import BoundingBox
+from ouroboros.helpers.cost_estimate import (
+    ACCUMULATION_BYTES_PER_VOXEL,
+    BACKPROJECT_BYTES_PER_PIXEL,
+    GRID_BYTES_PER_PIXEL,
+    INTERMEDIATE_BYTES_PER_VOXEL,
+    MERGE_BYTES_PER_VOXEL,
+    box_voxels,
+    calibrate_backprojection,
+    calibrate_sampling,
+    chunk_bounds,
+    clip_bounds,
+    cutout_bounds,
+    intermediate_voxels,
+    pyramid_fraction,
+    union_voxels,
+)
+from ouroboros.helpers.options import BackprojectOptions, SliceOptions
+from ouroboros.helpers.precomputed import PRECOMPUTED_FORMAT
+from ouroboros.helpers.shapes import DataRange
+from ouroboros.helpers.slice import BackProjectIter, FrontProjStack
+from ouroboros.helpers.topology import resolve_worker_topology
+from ouroboros.pipeline import PipelineInput
+from ouroboros.pipeline.backproject_pipeline import DEFAULT_CHUNK_SIZE
+
+# Backprojected volumes are always written as uint16
+BACKPROJECT_OUTPUT_BYTES_PER_VOXEL = 2
+
+
+def run_geometry(slice_options: SliceOptions) -> PipelineInput | str:
+    """
+    Parse the annotations, compute the slices and bounding boxes and read the volume metadata.
+
+    Nothing is downloaded, sliced or written.
+
+    Returns
+    -------
+    PipelineInput | str
+        The pipeline input with the slice rects and volume cache, or an error message.
+    """
+
+    pipeline, input_data = visualization_pipeline(slice_options)
+
+    _, error = pipeline.process(input_data)
+
+    if error:
+        return error
+
+    return input_data
+
+
+def _stats(values: np.ndarray) -> dict:
+    values = np.asarray(values)
+
+    if len(values) == 0:
+        return {"min": 0, "mean": 0, "max": 0}
+
+    return {"min": int(values.min()), "mean": float(values.mean()), "max": int(values.max())}
+
+
+def plan_slice(
+    slice_options: SliceOptions,
+    processes: int | None = None,
+    threads: int = 1,
+    bandwidth: float = 0.0,
+    estimate_time: bool = False,
+) -> dict | str:
+    """
+    Estimate the downloads, memory and output of slicing, without downloading or slicing anything.
+
+    Parameters
+    ----------
+    slice_options : SliceOptions
+        The options for slicing the volume.
+    processes : int | None, optional
+        The number of slicing processes, by default None (the CPU count)
+    threads : int, optional
+        The number of download threads, by default 1 (as in SliceParallelPipelineStep)
+    bandwidth : float, optional
+        The download bandwidth in bytes per second, used for the time estimate, by default 0 (unknown)
+    estimate_time : bool, optional
+        Whether to time a small slicing run to estimate the duration, by default False
+
+    Returns
+    -------
+    dict | str
+        The plan (geometry, download, memory, output and, if requested, time), or an error message.
+        If the job would fail, the plan also has a `failure` message.
+    """
+
+    input_data = run_geometry(slice_options)
+
+    if isinstance(input_data, str):
+        return input_data
+
+    processes = processes if processes is not None else cpu_count()
+    volume_cache = input_data.volume_cache
+    num_slices = len(input_data.slice_rects)
+    slice_pixels = slice_options.slice_width * slice_options.slice_height
+
+    bytes_per_voxel = int(np.dtype(volume_cache.get_volume_dtype()).itemsize * volume_cache.get_num_channels())
+    offset = volume_cache.get_voxel_offset()
+    size = volume_cache.get_volume_shape()
+    chunk_size = volume_cache.get_chunk_size()
+
+    bounds = cutout_bounds(volume_cache.bounding_boxes, volume_cache.get_volume_max())
+    voxels = box_voxels(bounds)
+    unique_voxels = union_voxels(bounds)
+
+    # The volume is bounded, so downloading a box that is not fully inside it fails the job
+    clipped = clip_bounds(bounds, offset, size)
+    out_of_bounds = np.flatnonzero(np.any(clipped != bounds, axis=1))
+
+    # Chunks are kept in the on-disk cache of CloudVolume, so each one is only fetched once
+    chunks = chunk_bounds(clipped[box_voxels(clipped) > 0], chunk_size, offset)
+    chunk_reads = int(box_voxels(chunks).sum())
+    unique_chunks = union_voxels(chunks)
+    chunk_bytes = int(np.prod(chunk_size)) * bytes_per_voxel
+
+    # A worker holds its box, and the coordinate grids and samples of the box's slices
+    slices_per_box = np.bincount(volume_cache.link_rects, minlength=len(bounds))
+    box_bytes = voxels * bytes_per_voxel
+    work_bytes = slices_per_box * slice_pixels * (GRID_BYTES_PER_PIXEL + bytes_per_voxel)
+
+    # Boxes being downloaded and boxes being sliced, assuming slicing keeps up with the downloads
+    largest = np.sort(box_bytes)[::-1]
+    peak_bytes = int(largest[:threads + processes].sum() + np.sort(work_bytes)[::-1][:processes].sum())
+
+    output_bytes = num_slices * slice_pixels * bytes_per_voxel
+
+    if slice_options.output_format == "ome-zarr":
+        output_bytes *= 1 + pyramid_fraction(slice_options.zarr_params.pyramid_levels, (2, 2, 2))
+
+    plan = {
+        "geometry": {
+            "slices": num_slices,
+            "slice_shape": [slice_options.slice_height, slice_options.slice_width],
+            "boxes": len(bounds),
+            "volume_shape": [int(value) for value in size],
+            "bytes_per_voxel": bytes_per_voxel,
+        },
+        "download": {
+            "total_voxels": int(voxels.sum()),
+            "unique_voxels": unique_voxels,
+            "total_bytes": int(voxels.sum()) * bytes_per_voxel,
+            "unique_bytes": unique_voxels * bytes_per_voxel,
+            "chunk_size": [int(value) for value in chunk_size],
+            "chunk_reads": chunk_reads,
+            "unique_chunks": unique_chunks,
+            "cache_bytes": unique_chunks * chunk_bytes,
+        },
+        "memory": {
+            "processes": processes,
+            "threads": threads,
+            "box_bytes": _stats(box_bytes),
+            "peak_bytes": peak_bytes,
+        },
+        "output": {
+            "format": slice_options.output_format,
+            "bytes": int(output_bytes),
+        },
+    }
+
+    if len(out_of_bounds) > 0:
+        low = np.asarray(offset, dtype=np.int64)
+        first = bounds[out_of_bounds[0]]
+        plan["failure"] = (
+            f"{len(out_of_bounds)} of {len(bounds)} bounding boxes are not fully inside the volume "
+            f"{low.tolist()}-{(low + np.asarray(size, dtype=np.int64)).tolist()}, "
+            f"so downloading them would fail (the first is {first[0::2].tolist()}-{first[1::2].tolist()})."
+        )
+
+    if estimate_time:
+        sampling = num_slices * slice_pixels * calibrate_sampling() / processes
+        download = unique_chunks * chunk_bytes / bandwidth if bandwidth > 0 else None
+
+        # Downloads and slicing overlap, so the slower of the two sets the pace
+        plan["time"] = {
+            "sampling_seconds": sampling,
+            "download_seconds": download,
+            "seconds": max(sampling, download or 0.0),
+        }
+
+    return plan
+
+
+def plan_backproject(
+    backproject_options: BackprojectOptions,
+    slice_options: SliceOptions,
+    processes: int | None = None,
+    estimate_time: bool = False,
+) -> dict | str:
+    """
+    Estimate the memory, intermediates and output of backprojection, without reading or writing anything.
+
+    The straightened volume is assumed to be the output of slicing with `slice_options`.
+
+    Parameters
+    ----------
+    backproject_options : BackprojectOptions
+        The options for backprojecting the volume.
+    slice_options : SliceOptions
+        The options for slicing the volume.
+    processes : int | None, optional
+        The process budget, split between compute and writer processes, by default None (the CPU count)
+    estimate_time : bool, optional
+        Whether to time a small backprojection to estimate the duration, by default False
+
+    Returns
+    -------
+    dict | str
+        The plan (geometry, memory, intermediates, output and, if requested, time), or an error message.
+    """
+
+    input_data = run_geometry(slice_options)
+
+    if isinstance(input_data, str):
+        return input_data
+
+    config = backproject_options
+    slice_rects = np.array(input_data.slice_rects)
+    num_slices = len(slice_rects)
+    slice_pixels = slice_options.slice_width * slice_options.slice_height
+
+    full_bounding_box = BoundingBox.bound_boxes(input_data.volume_cache.bounding_boxes)
+    write_shape = np.flip(full_bounding_box.get_shape())
+    plane_voxels = int(np.prod(write_shape[1:]))
+    output_voxels = int(np.prod(write_shape))
+
+    topology = resolve_worker_topology(
+        processes if processes is not None else cpu_count(),
+        compute_processes=config.worker_params.compute_processes,
+        writer_processes=config.worker_params.writer_processes,
+        io_threads=config.worker_params.io_threads,
+    )
+
+    # The same chunks of the straightened volume as BackprojectPipelineStep
+    shape = FrontProjStack(D=num_slices, V=slice_options.slice_height, U=slice_options.slice_width)
+    chunk_range = DataRange(shape.make_with(0), shape, shape.make_with(DEFAULT_CHUNK_SIZE))
+    chunk_iter = partial(BackProjectIter, shape=shape, slice_rects=slice_rects)
+
+    chunk_bytes = np.array([
+        ACCUMULATION_BYTES_PER_VOXEL * np.prod(bbox.get_shape(), dtype=np.int64)
+        + BACKPROJECT_BYTES_PER_PIXEL * np.prod(astuple(chunk_shape))
+        for _, chunk_shape, _, bbox, _ in chunk_range.get_iter(chunk_iter)
+    ])
+
+    # Planes are merged one at a time for tiff output, and a slab of chunks at a time for chunked output
+    if config.output_format == "ome-zarr":
+        slab_depth = config.zarr_params.chunk_shape[0]
+        levels = config.zarr_params.pyramid_levels
+    elif config.output_format == PRECOMPUTED_FORMAT:
+        slab_depth = config.precomputed_params.chunk_size[2]
+        levels = config.precomputed_params.pyramid_levels
+    else:
+        slab_depth = 1
+        levels = 0
+
+    slab_bytes = min(slab_depth, int(write_shape[0])) * plane_voxels * MERGE_BYTES_PER_VOXEL
+    compute_peak = int(np.sort(chunk_bytes)[::-1][:topology.compute_processes].sum())
+    writer_peak = topology.writer_processes * slab_bytes
+
+    intermediates = intermediate_voxels(num_slices * slice_pixels, slice_options.slicing_params.dist_between_slices)
+    output_bytes = output_voxels * BACKPROJECT_OUTPUT_BYTES_PER_VOXEL
+    output_bytes *= 1 + pyramid_fraction(levels, config.pyramid_factor)
+
+    plan = {
+        "geometry": {
+            "slices": num_slices,
+            "slice_shape": [slice_options.slice_height, slice_options.slice_width],
+            "chunks": len(chunk_bytes),
+            "output_shape": [int(value) for value in write_shape],
+        },
+        "memory": {
+            "topology": topology.to_dict(),
+            "chunk_bytes": _stats(chunk_bytes),
+            "slab_bytes": slab_bytes,
+            "peak_bytes": compute_peak + writer_peak,
+        },
+        "intermediates": {
+            "voxels": int(intermediates),
+            "bytes": int(intermediates * INTERMEDIATE_BYTES_PER_VOXEL),
+        },
+        "output": {
+            "format": config.output_format,
+            "bytes": int(output_bytes),
+        },
+    }
+
+    if estimate_time:
+        plan["time"] = {
+            "seconds": num_slices * slice_pixels * calibrate_backprojection() / topology.compute_processes,
+        }
+
+    return plan
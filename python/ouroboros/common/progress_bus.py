@@ -0,0 +1,143 @@
+import asyncio
+from collections import defaultdict
+import threading
+
+from ouroboros.common.server_types import Task
+
+
+class ProgressBus:
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Push task status and progress changes to subscribers on the event loop.
+
+        Publishing is safe from any thread. Changes are coalesced: however many times a
+        task is published before the loop gets to it, subscribers are woken once, and
+        tasks without subscribers cost a dictionary lookup.
+
+        Parameters
+        ----------
+            loop : asyncio.AbstractEventLoop
+                The event loop the subscribers run on.
+        """
+
+        self.loop = loop
+
+        self._subscribers = defaultdict(set)
+        self._versions = defaultdict(int)
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def track(self, task: Task):
+        """
+        Publish every change of the task.
+        """
+
+        task.listeners.append(self.publish)
+
+    def publish(self, task: Task):
+        task_id = task.task_id
+
+        if task_id not in self._subscribers:
+            return
+
+        with self._lock:
+            # A notification is already scheduled, it will pick up this change too
+            if task_id in self._pending:
+                return
+            self._pending.add(task_id)
+
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, task_id)
+        except RuntimeError:
+            # The loop is closed, so there is nobody left to notify
+            pass
+
+    def _deliver(self, task_id: str):
+        with self._lock:
+            self._pending.discard(task_id)
+
+        self._versions[task_id] += 1
+
+        for event in self._subscribers.get(task_id, ()):
+            event.set()
+
+    def version(self, task_id: str) -> int:
+        """
+        A counter that increases every time changes of the task are delivered.
+
+        Counters are only kept while the task has subscribers, so unknown tasks read as 0.
+        """
+
+        return self._versions.get(task_id, 0)
+
+    def subscribe(self, task_id: str) -> asyncio.Event:
+        """
+        Subscribe to a task. The returned event is set when the task changes.
+
+        The event starts set, so the subscriber reads the current state first.
+        """
+
+        event = asyncio.Event()
+        event.set()
+        self._subscribers[task_id].add(event)
+        return event
+
+    def has_subscribers(self, task_id: str) -> bool:
+        return task_id in self._subscribers
+
+    def unsubscribe(self, task_id: str, event: asyncio.Event):
+        subscribers = self._subscribers.get(task_id)
+
+        if subscribers is None:
+            return
+
+        subscribers.discard(event)
+
+        if len(subscribers) == 0:
+            del self._subscribers[task_id]
+            self._versions.pop(task_id, None)
+
+
+def status_delta(previous: dict, current: dict) -> dict:
+    """
+    The changes between two status results.
+
+    Changed steps are sent as `progress_changes`, a list of [index, name, progress, duration].
+    The full progress list is sent only when the steps themselves change.
+
+    Parameters
+    ----------
+        previous : dict
+            The previously sent status.
+        current : dict
+            The current status.
+
+    Returns
+    -------
+        dict
+            The changed fields.
+    """
+
+    delta = {
+        key: value
+        for key, value in current.items()
+        if key != "progress" and previous.get(key) != value
+    }
+
+    previous_progress = previous.get("progress", [])
+    current_progress = current.get("progress", [])
+
+    if len(previous_progress) != len(current_progress) or any(
+        old[0] != new[0] for old, new in zip(previous_progress, current_progress)
+    ):
+        delta["progress"] = current_progress
+    else:
+        changes = [
+            [i, *new]
+            for i, (old, new) in enumerate(zip(previous_progress, current_progress))
+            if list(old) != list(new)
+        ]
+        if len(changes) > 0:
+            delta["progress_changes"] = changes
+
+    return delta
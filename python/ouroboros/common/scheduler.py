@@ -0,0 +1,352 @@
+import asyncio
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from enum import IntEnum
+import heapq
+from itertools import count
+import math
+from multiprocessing import cpu_count
+from statistics import fmean
+import time
+from typing import Callable
+
+import psutil
+
+from ouroboros.common.logging import logger
+from ouroboros.common.server_types import Task
+from ouroboros.helpers.memory_usage import GIGABYTE
+
+# Expected task durations (seconds) used until real durations have been measured
+DEFAULT_EXPECTED_DURATIONS = {
+    "SliceTask": 60.0,
+    "BatchSliceTask": 300.0,
+    "BackProjectTask": 600.0,
+}
+DEFAULT_EXPECTED_DURATION = 120.0
+
+# Only trust progress-based estimates once a task is this far along
+MIN_PROGRESS_FOR_ESTIMATE = 0.05
+
+# Number of finished durations kept per task type
+DURATION_HISTORY = 20
+
+# Share of the CPU budget a task reserves unless it asks for a specific amount
+DEFAULT_TASK_CPU_FRACTION = 0.5
+
+
+class TaskPriority(IntEnum):
+    INTERACTIVE = 0
+    NORMAL = 1
+    BATCH = 2
+
+    @classmethod
+    def parse(cls, value: str | int | None, default: "TaskPriority") -> "TaskPriority":
+        if value is None or value == "":
+            return default
+        if isinstance(value, str) and not value.isdigit():
+            return cls[value.upper()]
+        return cls(int(value))
+
+
+@dataclass
+class ResourceBudget:
+    cpus: float
+    ram_gb: float
+    disk_gb: float
+
+    def fits(self, task: Task) -> bool:
+        return task.cpus <= self.cpus and task.ram_gb <= self.ram_gb and task.disk_gb <= self.disk_gb
+
+    def take(self, task: Task):
+        self.cpus -= task.cpus
+        self.ram_gb -= task.ram_gb
+        self.disk_gb -= task.disk_gb
+
+    def give(self, task: Task):
+        self.cpus += task.cpus
+        self.ram_gb += task.ram_gb
+        self.disk_gb += task.disk_gb
+
+    def copy(self) -> "ResourceBudget":
+        return ResourceBudget(self.cpus, self.ram_gb, self.disk_gb)
+
+
+class TaskScheduler:
+    def __init__(
+        self,
+        handler: Callable[[Task], None],
+        executor: Executor,
+        cpus: float = 0,
+        ram_gb: float = 0,
+        disk_gb: float = 0,
+        estimator: Callable[[Task, int], tuple[float, float]] | None = None,
+    ) -> None:
+        """
+        Run server tasks concurrently within CPU, RAM and disk budgets.
+
+        Tasks start in priority order (then submission order). A task that does not fit
+        in the remaining budget waits, and so do the tasks queued behind it, so large
+        tasks are never starved by a stream of small ones.
+
+        A task reserves part of the CPU budget, but a task started on an idle server runs
+        with the whole budget. RAM and disk requests that were not given are estimated
+        before the task starts.
+
+        Parameters
+        ----------
+            handler : Callable[[Task], None]
+                Runs a task to completion (in a thread of the executor).
+            executor : Executor
+                The executor the handler is run in.
+            cpus : float, optional
+                The CPU budget, by default 0 (the CPU count).
+            ram_gb : float, optional
+                The RAM budget in GB, by default 0 (the total system memory).
+            disk_gb : float, optional
+                The disk budget in GB, by default 0 (no limit).
+            estimator : Callable[[Task, int], tuple[float, float]] | None, optional
+                Estimates the RAM and disk (in GB) a task needs with a number of processes
+                (in a thread of the executor), by default None (tasks need what they request).
+        """
+
+        self.handler = handler
+        self.executor = executor
+        self.estimator = estimator
+        self.total = ResourceBudget(
+            cpus if cpus > 0 else cpu_count(),
+            ram_gb if ram_gb > 0 else psutil.virtual_memory().total / GIGABYTE,
+            disk_gb if disk_gb > 0 else math.inf,
+        )
+        self.available = self.total.copy()
+
+        self._queue = []
+        self._counter = count()
+        self._running = {}
+        self._durations = {}
+        self._wakeup = asyncio.Event()
+
+    def configure(
+        self,
+        task: Task,
+        priority: str | int | None,
+        default_priority: TaskPriority,
+        cpus: float = 0,
+        ram_gb: float = 0,
+        disk_gb: float = 0,
+    ) -> str | None:
+        """
+        Set the priority and resource requests of a task before it is submitted.
+
+        Returns
+        -------
+            str | None
+                An error message if the priority is invalid.
+        """
+
+        try:
+            task.priority = TaskPriority.parse(priority, default_priority)
+        except (KeyError, ValueError):
+            return f"Invalid priority: {priority}. Use one of {[p.name.lower() for p in TaskPriority]}."
+
+        task.cpus = cpus if cpus > 0 else max(self.total.cpus * DEFAULT_TASK_CPU_FRACTION, 1)
+        task.ram_gb = ram_gb
+        task.disk_gb = disk_gb
+
+        # A task asking for CPUs runs with that many processes, otherwise it is decided when it starts
+        task.processes = max(int(cpus), 1) if cpus > 0 else None
+        task.estimating = self.estimator is not None and (ram_gb <= 0 or disk_gb <= 0)
+
+        return None
+
+    def clamp(self, task: Task):
+        # A task asking for more than the whole budget could never start, so cap its request
+        task.cpus = min(max(task.cpus, 0), self.total.cpus)
+        task.ram_gb = min(max(task.ram_gb, 0), self.total.ram_gb)
+        task.disk_gb = min(max(task.disk_gb, 0), self.total.disk_gb)
+
+    def submit(self, task: Task):
+        self.clamp(task)
+        task.status = "enqueued"
+        task.enqueued_at = time.time()
+        heapq.heappush(self._queue, (task.priority, next(self._counter), task))
+
+        if task.estimating:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self.executor, self.estimator, task, task.processes or max(int(self.total.cpus), 1)
+            )
+            future.add_done_callback(lambda f, task=task: self._estimated(task, f))
+
+        self._wakeup.set()
+        self._notify_queued()
+
+    def _estimated(self, task: Task, future: asyncio.Future):
+        if future.exception() is not None:
+            # The task still runs, it just does not reserve what was not requested
+            logger.warning(f"Could not estimate the resources of task {task.task_id}: {future.exception()}")
+        else:
+            ram_gb, disk_gb = future.result()
+            task.ram_gb = task.ram_gb if task.ram_gb > 0 else ram_gb
+            task.disk_gb = task.disk_gb if task.disk_gb > 0 else disk_gb
+            self.clamp(task)
+
+        task.estimating = False
+        self._wakeup.set()
+
+    def cancel(self, task_id: str) -> bool:
+        """
+        Remove a task from the queue if it has not started yet.
+        """
+
+        for i, (_, _, task) in enumerate(self._queue):
+            if task.task_id == task_id:
+                self._queue.pop(i)
+                heapq.heapify(self._queue)
+                self._wakeup.set()
+                self._notify_queued()
+                return True
+
+        return False
+
+    def _notify_queued(self):
+        # Queue positions and estimated start times changed for every queued task
+        for _, _, task in self._queue:
+            task.notify()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def running_count(self) -> int:
+        return len(self._running)
+
+    async def run(self):
+        while True:
+            self._start_ready_tasks()
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+    def _start_ready_tasks(self):
+        started = False
+
+        # The next task waits for its estimate, since it cannot be known to fit before
+        while (
+            len(self._queue) > 0
+            and not self._queue[0][2].estimating
+            and self.available.fits(self._queue[0][2])
+        ):
+            started = True
+            _, _, task = heapq.heappop(self._queue)
+
+            # A task that has the server to itself runs with the whole CPU budget
+            if task.processes is None:
+                idle = len(self._running) == 0 and len(self._queue) == 0
+                task.processes = max(int(self.total.cpus if idle else task.cpus), 1)
+
+            self.available.take(task)
+            task.status = "started"
+            task.started_at = time.time()
+            self._running[task.task_id] = task
+
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, self.handler, task)
+            future.add_done_callback(lambda f, task=task: self._finish(task, f))
+
+        if started:
+            self._notify_queued()
+
+    def _finish(self, task: Task, future: asyncio.Future):
+        self.available.give(task)
+        self._running.pop(task.task_id, None)
+        task.finished_at = time.time()
+
+        if future.exception() is not None:
+            task.status = "error"
+            task.error = str(future.exception())
+            logger.error(f"Task {task.task_id} failed: {task.error}")
+        elif task.status != "error":
+            task.status = "done"
+            history = self._durations.setdefault(type(task).__name__, [])
+            history.append(task.finished_at - task.started_at)
+            del history[:-DURATION_HISTORY]
+
+        task.notify()
+        self._wakeup.set()
+
+    def expected_duration(self, task: Task) -> float:
+        history = self._durations.get(type(task).__name__, [])
+
+        if len(history) > 0:
+            return fmean(history)
+
+        return DEFAULT_EXPECTED_DURATIONS.get(type(task).__name__, DEFAULT_EXPECTED_DURATION)
+
+    def expected_remaining(self, task: Task, now: float) -> float:
+        elapsed = now - task.started_at
+
+        # Extrapolate from the pipeline progress when there is enough of it
+        if task.pipeline is not None:
+            try:
+                progress = fmean([progress for _, progress in task.pipeline.get_steps_progress()])
+                if progress >= MIN_PROGRESS_FOR_ESTIMATE:
+                    return elapsed * (1 - progress) / progress
+            except BaseException:
+                pass
+
+        return max(self.expected_duration(task) - elapsed, 0.0)
+
+    def queue_position(self, task_id: str) -> int | None:
+        """
+        The 0-based position of a task in the queue, or None if it is not queued.
+        """
+
+        for position, (_, _, task) in enumerate(sorted(self._queue)):
+            if task.task_id == task_id:
+                return position
+
+        return None
+
+    def estimate_start_times(self) -> dict[str, float]:
+        """
+        Estimate when each queued task will start, as a unix timestamp.
+
+        Simulates the queue against the expected finish times of running tasks.
+        """
+
+        now = time.time()
+        available = self.available.copy()
+
+        # (finish time, seq, task) for every running or simulated task
+        finishes = [
+            (now + self.expected_remaining(task, now), i, task)
+            for i, task in enumerate(self._running.values())
+        ]
+        heapq.heapify(finishes)
+        seq = count(len(finishes))
+
+        estimates = {}
+        clock = now
+
+        for _, _, task in sorted(self._queue):
+            while not available.fits(task) and len(finishes) > 0:
+                finish_time, _, finished = heapq.heappop(finishes)
+                clock = max(clock, finish_time)
+                available.give(finished)
+
+            estimates[task.task_id] = clock
+            available.take(task)
+            heapq.heappush(finishes, (clock + self.expected_duration(task), next(seq), task))
+
+        return estimates
+
+    def queue_status(self, task_id: str) -> dict:
+        position = self.queue_position(task_id)
+
+        if position is None:
+            return {"queue_position": None, "estimated_start": None}
+
+        return {
+            "queue_position": position,
+            "estimated_start": self.estimate_start_times().get(task_id),
+        }
@@ -1,10 +1,16 @@
-from concurrent.futures import Executor, ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import asyncio
 
-from ouroboros.common.server_handlers import handle_task, handle_task_docker
+from ouroboros.common.progress_bus import ProgressBus
+from ouroboros.common.scheduler import TaskScheduler
+from ouroboros.common.server_handlers import estimate_task_resources, handle_task, handle_task_docker
+from ouroboros.common.task_store import DEFAULT_MAX_TASKS, DEFAULT_TASK_TTL_SECONDS, TaskStore
+from ouroboros.helpers.metrics import enable_metrics
+from ouroboros.helpers.worker_pool import WorkerPool
 
 
 HOST = "127.0.0.1"
@@ -14,7 +20,15 @@ DOCKER_HOST = "0.0.0.0"
 DOCKER_PORT = 8000
 
 
-def create_server(docker: bool = False) -> FastAPI:
+def create_server(
+    docker: bool = False,
+    cpus: float = 0,
+    ram_gb: float = 0,
+    disk_gb: float = 0,
+    task_ttl_seconds: float = DEFAULT_TASK_TTL_SECONDS,
+    max_tasks: int = DEFAULT_MAX_TASKS,
+    task_db_path: str | None = None,
+) -> FastAPI:
     """
     Create Ouroboros's FastAPI server.
 
@@ -22,6 +36,20 @@ def create_server(docker: bool = False) -> FastAPI:
     ----------
     docker : bool
         If True, the server will be created for a Docker environment.
+    cpus : float, optional
+        The CPU budget shared by concurrently running tasks, by default 0 (the CPU count).
+    ram_gb : float, optional
+        The RAM budget in GB, by default 0 (the total system memory).
+    disk_gb : float, optional
+        The disk budget in GB, by default 0 (no limit).
+        Tasks that do not request RAM or disk reserve what a plan of their job estimates
+        (outside of Docker, where only requests are reserved).
+    task_ttl_seconds : float, optional
+        How long finished tasks are kept, by default DEFAULT_TASK_TTL_SECONDS
+    max_tasks : int, optional
+        The maximum number of finished tasks kept, by default DEFAULT_MAX_TASKS
+    task_db_path : str | None, optional
+        A SQLite file to keep finished tasks in across restarts, by default None
 
     Returns
     -------
@@ -30,25 +58,40 @@ def create_server(docker: bool = False) -> FastAPI:
     """
 
     task_handler = handle_task_docker if docker else handle_task
-
-    async def process_requests(queue: asyncio.Queue, pool: Executor):
-        while True:
-            task = await queue.get()
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(pool, task_handler, task)
-            queue.task_done()
-            if task.status != "error":
-                task.status = "done"
+    task_store = TaskStore(task_ttl_seconds, max_tasks, task_db_path)
 
     @asynccontextmanager
     async def lifespan(app: FastAPI):
-        queue = asyncio.Queue()  # note that asyncio.Queue() is not thread safe
         pool = ThreadPoolExecutor()
-        asyncio.create_task(process_requests(queue, pool))
-        yield {"queue": queue, "pool": pool}
+        # Counters are shared with the worker processes, so they must exist before the workers start
+        enable_metrics()
+        # Worker processes are started and warmed once, then borrowed by every task
+        worker_pool = WorkerPool().prestart()
+        scheduler = TaskScheduler(
+            partial(task_handler, worker_pool=worker_pool),
+            pool,
+            cpus=cpus,
+            ram_gb=ram_gb,
+            disk_gb=disk_gb,
+            # Docker options are copied into the container when a task runs, so only their requests are used
+            estimator=None if docker else estimate_task_resources,
+        )
+        progress_bus = ProgressBus(asyncio.get_running_loop())
+        scheduler_task = asyncio.create_task(scheduler.run())
+        yield {
+            "scheduler": scheduler,
+            "progress_bus": progress_bus,
+            "pool": pool,
+            "worker_pool": worker_pool,
+        }
+        scheduler_task.cancel()
         pool.shutdown()
+        worker_pool.shutdown()
+        task_store.close()
 
     app = FastAPI(lifespan=lifespan)
+    # Shared with the API, see create_api
+    app.state.task_store = task_store
 
     app.add_middleware(
         CORSMiddleware,
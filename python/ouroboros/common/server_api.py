@@ -1,17 +1,38 @@
 import json
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Query, Request
 
 from sse_starlette.sse import EventSourceResponse
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import asyncio
 import uuid
 
 from ouroboros.common.file_system import (
+    get_path_name,
+    load_options_for_backproject,
+    load_options_for_backproject_plan_docker,
     load_options_for_slice,
     load_options_for_slice_docker,
 )
-from ouroboros.common.pipelines import visualization_pipeline
-from ouroboros.common.server_types import BackProjectTask, SliceTask
+from ouroboros.common.progress_bus import status_delta
+from ouroboros.common.scheduler import TaskPriority, TaskScheduler
+from ouroboros.common.server_types import BackProjectTask, BatchSliceTask, SliceTask
+from ouroboros.common.task_store import TaskStore
+from ouroboros.common.visualization import (
+    VISUALIZATION_COMPRESSIONS,
+    VISUALIZATION_FORMATS,
+    VISUALIZATION_MEDIA_TYPES,
+    VisualizationCache,
+    compress_payload,
+    decimate_visualization,
+    encode_visualization,
+    visualization_data,
+)
+from ouroboros.common.volume_server_interface import get_volume_path
+from ouroboros.helpers.metrics import render_metrics
+from ouroboros.helpers.tracing import Tracer
+
+# Streams wake up at least this often to detect disconnected clients
+STREAM_KEEPALIVE_SECONDS = 15
 
 
 def create_api(app: FastAPI, docker: bool = False):
@@ -26,22 +47,113 @@ def create_api(app: FastAPI, docker: bool = False):
         Whether the server is running in a Docker container, by default False
     """
 
-    tasks = {}
+    tasks = app.state.task_store if hasattr(app.state, "task_store") else TaskStore()
+    visualization_cache = VisualizationCache()
 
     @app.get("/")
     async def server_active():
         return JSONResponse("Server is active")
 
     @app.post("/slice/")
-    async def add_slice_task(options: str, request: Request):
+    async def add_slice_task(
+        options: str,
+        request: Request,
+        priority: str | None = None,
+        cpus: float = 0,
+        ram_gb: float = 0,
+        disk_gb: float = 0,
+        resume: bool = False,
+        trace: bool = False,
+    ):
         task_id = str(uuid.uuid4())
-        task = SliceTask(task_id=task_id, options=options)
+        task = SliceTask(task_id=task_id, options=options, resume=resume, tracer=Tracer() if trace else None)
+
+        error = request.state.scheduler.configure(task, priority, TaskPriority.NORMAL, cpus, ram_gb, disk_gb)
+        if error:
+            return JSONResponse({"task_id": None, "error": error}, status_code=400)
+
+        tasks[task_id] = task
+        request.state.progress_bus.track(task)
+        request.state.scheduler.submit(task)  # Add request to the queue
+        return {"task_id": task_id}
+
+    @app.post("/slice_batch/")
+    async def add_batch_slice_task(
+        request: Request,
+        options: list[str] = Query(),
+        layers: list[str] | None = Query(None),
+        all_layers: bool = False,
+        priority: str | None = None,
+        cpus: float = 0,
+        ram_gb: float = 0,
+        disk_gb: float = 0,
+        resume: bool = False,
+        trace: bool = False,
+    ):
+        """
+        Slice several paths through the same volume in one task, downloading overlapping regions once.
+
+        Give `options` once per options file, and `layers` to slice each of these annotation layers with
+        each options file (or `all_layers` to slice every annotation layer).
+        """
+
+        # The outputs of a docker task are copied to the host one file at a time
+        if docker:
+            return JSONResponse(
+                {"task_id": None, "error": "Batch slicing is not supported in the Docker server."}, status_code=400
+            )
+
+        task_id = str(uuid.uuid4())
+        task = BatchSliceTask(
+            task_id=task_id,
+            options=options,
+            layers=layers,
+            all_layers=all_layers,
+            resume=resume,
+            tracer=Tracer() if trace else None,
+        )
+
+        error = request.state.scheduler.configure(task, priority, TaskPriority.BATCH, cpus, ram_gb, disk_gb)
+        if error:
+            return JSONResponse({"task_id": None, "error": error}, status_code=400)
+
         tasks[task_id] = task
-        request.state.queue.put_nowait(task)  # Add request to the queue
+        request.state.progress_bus.track(task)
+        request.state.scheduler.submit(task)  # Add request to the queue
         return {"task_id": task_id}
 
+    def check_visualization_params(format: str, compression: str | None) -> str | None:
+        if format not in VISUALIZATION_FORMATS:
+            return f"Invalid format: {format}. Use one of {VISUALIZATION_FORMATS}."
+        if compression is not None and compression not in VISUALIZATION_COMPRESSIONS:
+            return f"Invalid compression: {compression}. Use one of {VISUALIZATION_COMPRESSIONS}."
+        return None
+
+    def visualization_response(
+        data: dict, format: str, compression: str | None, step: int, max_rects: int
+    ) -> Response:
+        payload = encode_visualization(decimate_visualization(data, step, max_rects), format)
+        headers = {}
+
+        if compression is not None:
+            payload = compress_payload(payload, compression)
+            headers["Content-Encoding"] = compression
+
+        return Response(
+            payload,
+            status_code=200,
+            media_type=VISUALIZATION_MEDIA_TYPES[format],
+            headers=headers,
+        )
+
     @app.get("/slice_visualization/")
-    async def get_slice_visualization(task_id: str):
+    async def get_slice_visualization(
+        task_id: str,
+        format: str = "json",
+        compression: str | None = None,
+        step: int = 1,
+        max_rects: int = 0,
+    ):
         """
         Get the slice visualization data for an existing task.
 
@@ -49,10 +161,18 @@ def create_api(app: FastAPI, docker: bool = False):
         ----------
         task_id : str
             The ID of the task.
+        format : str, optional
+            The response format, "json", "binary" or "npy" (see `encode_visualization`), by default "json"
+        compression : str | None, optional
+            Compress the response with "gzip" or "zstd", by default None
+        step : int, optional
+            Only send every `step`-th slice (and the last one), by default 1
+        max_rects : int, optional
+            The maximum number of slices to send, by default 0 (no limit)
 
         Returns
         -------
-        JSONResponse
+        Response
             The slice visualization data.
         """
 
@@ -61,23 +181,26 @@ def create_api(app: FastAPI, docker: bool = False):
             "error": None,
         }
 
+        error = check_visualization_params(format, compression)
+        if error:
+            result["error"] = error
+            return JSONResponse(result, status_code=400)
+
         if task_id in tasks:
             task = tasks[task_id]
-            if task.status == "done":
-                data = {
-                    "rects": task.pipeline_input.slice_rects.tolist(),
-                    "bounding_boxes": [
-                        {
-                            "min": [bbox.x_min, bbox.y_min, bbox.z_min],
-                            "max": [bbox.x_max, bbox.y_max, bbox.z_max],
-                        }
-                        for bbox in task.pipeline_input.volume_cache.bounding_boxes
-                    ],
-                    "link_rects": task.pipeline_input.volume_cache.link_rects,
-                }
-                result["data"] = data
-
-                return JSONResponse(result, status_code=200)
+            if task.status == "done" and task.visualization is None:
+                result["error"] = "Visualization data is not available for this task."
+                return JSONResponse(result, status_code=404)
+            elif task.status == "done":
+                return await asyncio.get_running_loop().run_in_executor(
+                    None,
+                    visualization_response,
+                    task.visualization,
+                    format,
+                    compression,
+                    step,
+                    max_rects,
+                )
             else:
                 result["error"] = "Task is not done."
                 return JSONResponse(result, status_code=400)
@@ -85,8 +208,58 @@ def create_api(app: FastAPI, docker: bool = False):
             result["error"] = "Item ID Not Found"
             return JSONResponse(result, status_code=404)
 
+    def create_visualization(options: str) -> dict | str:
+        """
+        Run the visualization pipeline for an options file, reusing cached results.
+
+        Returns the visualization data (see `visualization_data`), or an error message.
+        """
+
+        try:
+            load_result = (
+                load_options_for_slice_docker(options)
+                if docker
+                else load_options_for_slice(options)
+            )
+        except BaseException as e:
+            return f"Error loading options: {str(e)}"
+
+        if isinstance(load_result, str):
+            return load_result
+
+        slice_options = load_result[0] if docker else load_result
+
+        # In docker, the options were copied into the docker volume
+        options_path = get_volume_path() + get_path_name(options) if docker else options
+        key = visualization_cache.key(options_path, slice_options.neuroglancer_json)
+
+        cached = visualization_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # The pipelines are slow to import, so they are loaded by the first request rather than at startup
+        from ouroboros.common.pipelines import visualization_pipeline
+
+        pipeline, input_data = visualization_pipeline(slice_options)
+
+        _, error = pipeline.process(input_data)
+
+        if error:
+            return error
+
+        visualization = visualization_data(input_data.slice_rects, input_data.volume_cache)
+        visualization_cache.put(key, visualization)
+
+        return visualization
+
     @app.get("/create_slice_visualization/")
-    async def on_demand_slice_visualization(options: str):
+    async def on_demand_slice_visualization(
+        options: str,
+        format: str = "json",
+        compression: str | None = None,
+        step: int = 1,
+        max_rects: int = 0,
+    ):
         """
         Create the slice visualization data from the options.
 
@@ -94,10 +267,18 @@ def create_api(app: FastAPI, docker: bool = False):
         ----------
         options : str
             The options for slicing the volume.
+        format : str, optional
+            The response format, "json", "binary" or "npy" (see `encode_visualization`), by default "json"
+        compression : str | None, optional
+            Compress the response with "gzip" or "zstd", by default None
+        step : int, optional
+            Only send every `step`-th slice (and the last one), by default 1
+        max_rects : int, optional
+            The maximum number of slices to send, by default 0 (no limit)
 
         Returns
         -------
-        JSONResponse
+        Response
             The slice visualization data.
         """
 
@@ -106,6 +287,31 @@ def create_api(app: FastAPI, docker: bool = False):
             "error": None,
         }
 
+        error = check_visualization_params(format, compression)
+        if error:
+            result["error"] = error
+            return JSONResponse(result, status_code=400)
+
+        loop = asyncio.get_running_loop()
+
+        # Parsing, slicing geometry and volume metadata take seconds, so keep them off the event loop
+        visualization = await loop.run_in_executor(None, create_visualization, options)
+
+        if isinstance(visualization, str):
+            result["error"] = visualization
+            return JSONResponse(result, status_code=400)
+
+        return await loop.run_in_executor(
+            None,
+            visualization_response,
+            visualization,
+            format,
+            compression,
+            step,
+            max_rects,
+        )
+
+    def create_slice_plan(options: str, processes: int, threads: int, bandwidth: float, estimate_time: bool):
         try:
             load_result = (
                 load_options_for_slice_docker(options)
@@ -113,56 +319,151 @@ def create_api(app: FastAPI, docker: bool = False):
                 else load_options_for_slice(options)
             )
         except BaseException as e:
-            result["error"] = f"Error loading options: {str(e)}"
-            return JSONResponse(result, status_code=400)
+            return f"Error loading options: {str(e)}"
 
         if isinstance(load_result, str):
-            result["error"] = load_result
-            return JSONResponse(result, status_code=400)
+            return load_result
 
         slice_options = load_result[0] if docker else load_result
 
-        pipeline, input_data = visualization_pipeline(slice_options)
+        from ouroboros.common.plan import plan_slice
 
-        _, error = pipeline.process(input_data)
+        return plan_slice(slice_options, processes, threads, bandwidth, estimate_time)
 
-        if error:
-            result["error"] = error
-            return JSONResponse(result, status_code=400)
+    def create_backproject_plan(options: str, processes: int, estimate_time: bool):
+        try:
+            if docker:
+                load_result = load_options_for_backproject_plan_docker(options)
+            else:
+                load_result = load_options_for_backproject(options)
 
-        data = {
-            "rects": input_data.slice_rects.tolist(),
-            "bounding_boxes": [
-                {
-                    "min": [bbox.x_min, bbox.y_min, bbox.z_min],
-                    "max": [bbox.x_max, bbox.y_max, bbox.z_max],
-                }
-                for bbox in input_data.volume_cache.bounding_boxes
-            ],
-            "link_rects": input_data.volume_cache.link_rects,
-        }
-        result["data"] = data
+                if not isinstance(load_result, str):
+                    load_result = (load_result, load_options_for_slice(load_result.slice_options_path))
+        except BaseException as e:
+            return f"Error loading options: {str(e)}"
+
+        if isinstance(load_result, str):
+            return load_result
+
+        backproject_options, slice_options = load_result
+
+        if isinstance(slice_options, str):
+            return slice_options
+
+        from ouroboros.common.plan import plan_backproject
+
+        return plan_backproject(backproject_options, slice_options, processes, estimate_time)
+
+    @app.get("/plan_slice/")
+    async def get_slice_plan(
+        options: str,
+        request: Request,
+        processes: int | None = None,
+        threads: int = 1,
+        bandwidth: float = 0,
+        estimate_time: bool = False,
+    ):
+        """
+        Estimate the downloads, memory and output of slicing, without downloading or slicing anything.
+
+        Parameters
+        ----------
+        options : str
+            The options for slicing the volume.
+        processes : int | None, optional
+            The number of slicing processes, by default None (the size of the worker pool)
+        threads : int, optional
+            The number of download threads, by default 1
+        bandwidth : float, optional
+            The download bandwidth in bytes per second, for the time estimate, by default 0 (unknown)
+        estimate_time : bool, optional
+            Whether to time a small slicing run to estimate the duration, by default False
+
+        Returns
+        -------
+        JSONResponse
+            The plan (see `plan_slice`), or an error. If the job would fail, the plan is returned
+            with its planned failure as the error.
+        """
+
+        processes = processes if processes is not None else request.state.worker_pool.max_workers
+        plan = await asyncio.get_running_loop().run_in_executor(
+            None, create_slice_plan, options, processes, threads, bandwidth, estimate_time
+        )
+
+        if isinstance(plan, str):
+            return JSONResponse({"plan": None, "error": plan}, status_code=400)
+
+        # The plan is still returned when the job would fail
+        return JSONResponse({"plan": plan, "error": plan.get("failure")}, status_code=200)
+
+    @app.get("/plan_backproject/")
+    async def get_backproject_plan(
+        options: str,
+        request: Request,
+        processes: int | None = None,
+        estimate_time: bool = False,
+    ):
+        """
+        Estimate the memory, intermediates and output of backprojection, without reading or writing anything.
+
+        Parameters
+        ----------
+        options : str
+            The options for backprojecting the volume.
+        processes : int | None, optional
+            The process budget, by default None (the size of the worker pool)
+        estimate_time : bool, optional
+            Whether to time a small backprojection to estimate the duration, by default False
+
+        Returns
+        -------
+        JSONResponse
+            The plan (see `plan_backproject`), or an error.
+        """
+
+        processes = processes if processes is not None else request.state.worker_pool.max_workers
+        plan = await asyncio.get_running_loop().run_in_executor(
+            None, create_backproject_plan, options, processes, estimate_time
+        )
 
-        return JSONResponse(result, status_code=200)
+        if isinstance(plan, str):
+            return JSONResponse({"plan": None, "error": plan}, status_code=400)
+
+        return JSONResponse({"plan": plan, "error": None}, status_code=200)
 
     @app.post("/backproject/")
     async def add_backproject_task(
         request: Request,
         options: str,
+        priority: str | None = None,
+        cpus: float = 0,
+        ram_gb: float = 0,
+        disk_gb: float = 0,
+        resume: bool = False,
+        trace: bool = False,
     ):
         task_id = str(uuid.uuid4())
         task = BackProjectTask(
             task_id=task_id,
             options=options,
+            resume=resume,
+            tracer=Tracer() if trace else None,
         )
+
+        error = request.state.scheduler.configure(task, priority, TaskPriority.BATCH, cpus, ram_gb, disk_gb)
+        if error:
+            return JSONResponse({"task_id": None, "error": error}, status_code=400)
+
         tasks[task_id] = task
-        request.state.queue.put_nowait(task)  # Add request to the queue
+        request.state.progress_bus.track(task)
+        request.state.scheduler.submit(task)  # Add request to the queue
         return {"task_id": task_id}
 
-    def get_status(task_id: str):
+    def get_status(task_id: str, scheduler: TaskScheduler):
         if task_id in tasks:
             task = tasks[task_id]
-            if task.status == "started" or task.status == "done":
+            if task.pipeline is not None and (task.status == "started" or task.status == "done"):
                 try:
                     task.last_progress = tasks[
                         task_id
@@ -177,17 +478,19 @@ def create_api(app: FastAPI, docker: bool = False):
                 "status": task.status,
                 "progress": task.last_progress,
                 "error": task.error,
-            }
+            } | scheduler.queue_status(task_id)
         else:
             return {
                 "status": "error",
                 "progress": [],
                 "error": "Item ID Not Found",
+                "queue_position": None,
+                "estimated_start": None,
             }
 
     @app.get("/status/{task_id}")
-    async def check_status(task_id: str):
-        result = get_status(task_id)
+    async def check_status(task_id: str, request: Request):
+        result = get_status(task_id, request.state.scheduler)
 
         if result["error"] == "Item ID Not Found":
             return JSONResponse(result, status_code=404)
@@ -196,80 +499,171 @@ def create_api(app: FastAPI, docker: bool = False):
         else:
             return JSONResponse(result, status_code=200)
 
-    @app.get("/slice_status_stream/")
-    async def slice_status_stream(
-        request: Request, task_id: str, update_freq: int = 1000
-    ):
-        async def event_generator():
-            while True:
-                if await request.is_disconnected():
-                    break
+    # Latest status of each task, shared by all of its streams: (bus version, result, json)
+    status_cache = {}
 
-                result = get_status(task_id)
+    def get_status_json(task_id: str, request: Request, refresh: bool = False) -> tuple[dict, str]:
+        version = request.state.progress_bus.version(task_id)
+        cached = status_cache.get(task_id)
 
-                event = ""
+        if not refresh and cached is not None and cached[0] == version:
+            return cached[1], cached[2]
 
-                match result["status"]:
-                    case "error":
-                        event = "error_event"
-                    case "done":
-                        event = "done_event"
-                    case _:
-                        event = "update_event"
+        result = get_status(task_id, request.state.scheduler)
+        data = json.dumps(result)
+
+        # Tasks that are not found are never published, so do not cache them
+        if task_id in tasks:
+            status_cache[task_id] = (version, result, data)
 
-                yield {
-                    "event": event,
-                    "id": task_id,
-                    "retry": update_freq,
-                    "data": json.dumps(result),
-                }
+        return result, data
 
-                if event == "done":
-                    break
+    async def stream_status(request: Request, task_id: str, update_freq: int, deltas: bool):
+        """
+        Stream the status of a task as server-sent events, pushed when it changes.
+
+        Parameters
+        ----------
+        request : Request
+            The request of the stream.
+        task_id : str
+            The ID of the task.
+        update_freq : int
+            The minimum time between events in milliseconds. Changes in between are coalesced.
+        deltas : bool
+            Whether to send only the changed fields (as `delta_event`) after the first event.
+
+        Returns
+        -------
+        EventSourceResponse
+            The event stream.
+        """
 
-                await asyncio.sleep(update_freq / 1000.0)
+        progress_bus = request.state.progress_bus
+
+        async def event_generator():
+            changed = progress_bus.subscribe(task_id)
+            previous = None
+
+            try:
+                while True:
+                    refresh = False
+
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout=STREAM_KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        if await request.is_disconnected():
+                            break
+                        # Estimated start times move with the clock, so refresh them occasionally
+                        if previous is None or previous["status"] != "enqueued":
+                            continue
+                        refresh = True
+
+                    changed.clear()
+
+                    result, data = get_status_json(task_id, request, refresh)
+
+                    match result["status"]:
+                        case "error":
+                            event = "error_event"
+                        case "done":
+                            event = "done_event"
+                        case _:
+                            event = "update_event"
+
+                    if result != previous:
+                        if deltas and previous is not None and event == "update_event":
+                            yield {
+                                "event": "delta_event",
+                                "id": task_id,
+                                "retry": update_freq,
+                                "data": json.dumps(status_delta(previous, result)),
+                            }
+                        else:
+                            yield {
+                                "event": event,
+                                "id": task_id,
+                                "retry": update_freq,
+                                "data": data,
+                            }
+                        previous = result
+
+                    if event != "update_event":
+                        break
+
+                    # Rate limit the stream, changes in the meantime are sent together
+                    await asyncio.sleep(update_freq / 1000.0)
+            finally:
+                progress_bus.unsubscribe(task_id, changed)
+                if not progress_bus.has_subscribers(task_id):
+                    status_cache.pop(task_id, None)
 
         return EventSourceResponse(event_generator())
 
+    @app.get("/slice_status_stream/")
+    async def slice_status_stream(
+        request: Request, task_id: str, update_freq: int = 1000, deltas: bool = False
+    ):
+        return await stream_status(request, task_id, update_freq, deltas)
+
     @app.get("/backproject_status_stream/")
     async def backproject_status_stream(
-        request: Request, task_id: str, update_freq: int = 2000
+        request: Request, task_id: str, update_freq: int = 2000, deltas: bool = False
     ):
-        async def event_generator():
-            while True:
-                if await request.is_disconnected():
-                    break
+        return await stream_status(request, task_id, update_freq, deltas)
+
+    @app.get("/trace/")
+    async def get_trace(task_id: str):
+        """
+        Get the spans recorded for a task submitted with `trace=true`, as a Chrome trace
+        (open it in Perfetto or chrome://tracing). A task that is still running returns the spans so far.
+        """
 
-                result = get_status(task_id)
+        if task_id not in tasks:
+            return JSONResponse({"error": "Item ID Not Found"}, status_code=404)
 
-                event = ""
+        tracer = tasks[task_id].tracer
 
-                match result["status"]:
-                    case "error":
-                        event = "error_event"
-                    case "done":
-                        event = "done_event"
-                    case _:
-                        event = "update_event"
+        if tracer is None:
+            return JSONResponse({"error": "The task was not submitted with trace=true."}, status_code=404)
 
-                yield {
-                    "event": event,
-                    "id": task_id,
-                    "retry": update_freq,
-                    "data": json.dumps(result),
-                }
+        return await asyncio.get_running_loop().run_in_executor(
+            None, lambda: Response(json.dumps(tracer.to_chrome_trace()), media_type="application/json")
+        )
 
-                if event == "done":
-                    break
+    @app.get("/metrics")
+    async def get_metrics(request: Request):
+        """
+        Get throughput counters (shared with the worker processes), queue gauges and step duration
+        histograms in the Prometheus text format.
+        """
 
-                await asyncio.sleep(update_freq / 1000.0)
+        scheduler = request.state.scheduler
+        worker_pool = request.state.worker_pool
 
-        return EventSourceResponse(event_generator())
+        gauges = {
+            "queue_depth": (scheduler.queue_depth, "Tasks waiting to start."),
+            "tasks_running": (scheduler.running_count, "Tasks running."),
+            "worker_processes": (worker_pool.max_workers, "Worker processes shared by the tasks."),
+        }
+
+        return Response(render_metrics(gauges), media_type="text/plain; version=0.0.4")
+
+    @app.get("/tasks/")
+    async def list_tasks():
+        """
+        Get compact summaries of all known tasks, including finished tasks kept by the task store.
+        """
+
+        return JSONResponse([tasks.summary(task) for task in tasks.values()], status_code=200)
 
     @app.post("/delete/")
-    async def delete_task(task_id: str):
+    async def delete_task(task_id: str, request: Request):
         if task_id in tasks:
+            # Tasks that have not started yet are dropped from the queue
+            request.state.scheduler.cancel(task_id)
             del tasks[task_id]
+            status_cache.pop(task_id, None)
             return JSONResponse({"success": True}, status_code=200)
         else:
             return JSONResponse({"success": False}, status_code=404)
@@ -7,35 +7,71 @@ from ouroboros.common.file_system import (
     save_output_for_slice_docker,
 )
 from ouroboros.common.logging import logger
-from ouroboros.common.pipelines import backproject_pipeline, slice_pipeline
-from ouroboros.common.server_types import BackProjectTask, SliceTask, Task
+from ouroboros.common.server_types import BackProjectTask, BatchSliceTask, SliceTask, Task
+from ouroboros.common.visualization import visualization_data
 from ouroboros.common.volume_server_interface import clear_plugin_folder
-from ouroboros.helpers.files import combine_unknown_folder
+from ouroboros.helpers.files import (
+    combine_unknown_folder,
+    format_slice_output_file,
+    format_slice_output_multiple,
+    format_slice_output_zarr,
+)
+from ouroboros.helpers.memory_usage import GIGABYTE
 from ouroboros.helpers.options import BackprojectOptions, SliceOptions
+from ouroboros.helpers.tracing import tracing
+from ouroboros.helpers.worker_pool import WorkerPool
+
 
+def handle_slice_core(task: SliceTask, slice_options: SliceOptions, worker_pool: WorkerPool = None):
+    # The pipelines are slow to import, so they are loaded by the first task rather than at startup
+    from ouroboros.common.pipelines import slice_pipeline
 
-def handle_slice_core(task: SliceTask, slice_options: SliceOptions):
-    pipeline, input_data = slice_pipeline(slice_options)
+    pipeline, input_data = slice_pipeline(
+        slice_options,
+        worker_pool=worker_pool,
+        processes=task.processes,
+        resume=task.resume,
+    )
 
-    # Store the pipeline in the task
-    task.pipeline = pipeline
+    # Store the pipeline in the task and publish its progress
+    task.watch_pipeline(pipeline)
 
     # Store the input data in the task
     task.pipeline_input = input_data
 
     task.status = "started"
 
-    _, error = pipeline.process(input_data)
+    # Spans are recorded into the tracer of the task, if it has one
+    with tracing(task.tracer):
+        _, error = pipeline.process(input_data)
 
     if error:
         return error
 
+    # Keep what is needed after the pipeline state is dropped
+    task.timings = pipeline.get_step_statistics()
+    # Streamed slicing releases the slice rects of each window once it is written
+    if input_data.slice_rects is not None:
+        task.visualization = visualization_data(input_data.slice_rects, input_data.volume_cache)
+    task.outputs = {
+        "output_file": combine_unknown_folder(
+            slice_options.output_file_folder,
+            format_slice_output_zarr(slice_options.output_file_name)
+            if slice_options.output_format == "ome-zarr"
+            else format_slice_output_file(slice_options.output_file_name),
+        )
+    }
+    if not slice_options.make_single_file and slice_options.output_format != "ome-zarr":
+        task.outputs["output_slices"] = combine_unknown_folder(
+            slice_options.output_file_folder, format_slice_output_multiple(slice_options.output_file_name)
+        )
+
     # Log the pipeline statistics
     logger.info("Slice Pipeline Statistics:")
-    logger.info(pipeline.get_step_statistics())
+    logger.info(task.timings)
 
 
-def handle_slice(task: SliceTask):
+def handle_slice(task: SliceTask, worker_pool: WorkerPool = None):
     slice_options = load_options_for_slice(task.options)
 
     if isinstance(slice_options, str):
@@ -43,7 +79,7 @@ def handle_slice(task: SliceTask):
         task.status = "error"
         return
 
-    slice_result = handle_slice_core(task, slice_options)
+    slice_result = handle_slice_core(task, slice_options, worker_pool)
 
     if isinstance(slice_result, str):
         task.error = slice_result
@@ -51,7 +87,7 @@ def handle_slice(task: SliceTask):
         return
 
 
-def handle_slice_docker(task: SliceTask):
+def handle_slice_docker(task: SliceTask, worker_pool: WorkerPool = None):
     load_result = load_options_for_slice_docker(task.options)
 
     if isinstance(load_result, str):
@@ -62,7 +98,7 @@ def handle_slice_docker(task: SliceTask):
 
     slice_options, host_output_file, host_output_slices = load_result
 
-    slice_result = handle_slice_core(task, slice_options)
+    slice_result = handle_slice_core(task, slice_options, worker_pool)
 
     if isinstance(slice_result, str):
         task.error = slice_result
@@ -70,6 +106,10 @@ def handle_slice_docker(task: SliceTask):
         clear_plugin_folder()
         return
 
+    task.outputs = {"output_file": host_output_file}
+    if host_output_slices is not None:
+        task.outputs["output_slices"] = host_output_slices
+
     save_result = save_output_for_slice_docker(
         host_output_file, host_output_slices=host_output_slices
     )
@@ -80,30 +120,109 @@ def handle_slice_docker(task: SliceTask):
         clear_plugin_folder()
 
 
-def handle_backproject_core(task: BackProjectTask, options: BackprojectOptions, slice_options: SliceOptions):
-    pipeline, input_data = backproject_pipeline(options, slice_options)
+def handle_batch_slice(task: BatchSliceTask, worker_pool: WorkerPool = None):
+    from ouroboros.common.pipelines import batch_slice_options, batch_slice_pipeline
+
+    options = []
+
+    for options_path in task.options:
+        slice_options = load_options_for_slice(options_path)
+
+        if isinstance(slice_options, str):
+            task.error = slice_options
+            task.status = "error"
+            return
+
+        options.append(slice_options)
+
+    options = batch_slice_options(options, task.layers, task.all_layers)
+
+    if isinstance(options, str):
+        task.error = options
+        task.status = "error"
+        return
+
+    pipeline, input_data = batch_slice_pipeline(
+        options,
+        worker_pool=worker_pool,
+        processes=task.processes,
+        resume=task.resume,
+    )
 
-    # Store the pipeline in the task
-    task.pipeline = pipeline
+    # Store the pipeline in the task and publish its progress
+    task.watch_pipeline(pipeline)
 
     # Store the input data in the task
     task.pipeline_input = input_data
 
     task.status = "started"
 
-    output, error = pipeline.process(input_data)
+    # Spans are recorded into the tracer of the task, if it has one
+    with tracing(task.tracer):
+        _, error = pipeline.process(input_data)
+
+    if error:
+        task.error = error
+        task.status = "error"
+        return
+
+    # Keep what is needed after the pipeline state is dropped, with the output of each path by name
+    task.timings = pipeline.get_step_statistics()
+    task.outputs = {
+        path_input.slice_options.output_file_name: path_input.output_file_path
+        for path_input in input_data.batch_inputs
+    }
+
+    # Log the pipeline statistics
+    logger.info("Batch Slice Pipeline Statistics:")
+    logger.info(task.timings)
+
+
+def handle_backproject_core(
+    task: BackProjectTask,
+    options: BackprojectOptions,
+    slice_options: SliceOptions,
+    worker_pool: WorkerPool = None,
+):
+    from ouroboros.common.pipelines import backproject_pipeline
+
+    pipeline, input_data = backproject_pipeline(
+        options,
+        slice_options,
+        worker_pool=worker_pool,
+        processes=task.processes,
+        resume=task.resume,
+    )
+
+    # Store the pipeline in the task and publish its progress
+    task.watch_pipeline(pipeline)
+
+    # Store the input data in the task
+    task.pipeline_input = input_data
+
+    task.status = "started"
+
+    # Spans are recorded into the tracer of the task, if it has one
+    with tracing(task.tracer):
+        output, error = pipeline.process(input_data)
 
     if error:
         return error
 
+    # Keep what is needed after the pipeline state is dropped
+    task.timings = pipeline.get_step_statistics()
+    task.outputs = {
+        "output_file": combine_unknown_folder(options.output_file_folder, output.output_file_path)
+    }
+
     # Log the pipeline statistics
     logger.info("Backproject Pipeline Statistics:")
-    logger.info(pipeline.get_step_statistics())
+    logger.info(task.timings)
 
     return output
 
 
-def handle_backproject(task: BackProjectTask):
+def handle_backproject(task: BackProjectTask, worker_pool: WorkerPool = None):
     options = load_options_for_backproject(task.options)
 
     if isinstance(options, str):
@@ -118,7 +237,7 @@ def handle_backproject(task: BackProjectTask):
         task.status = "error"
         return
 
-    backproject_result = handle_backproject_core(task, options, slice_options)
+    backproject_result = handle_backproject_core(task, options, slice_options, worker_pool)
 
     if isinstance(backproject_result, str):
         task.error = backproject_result
@@ -126,7 +245,7 @@ def handle_backproject(task: BackProjectTask):
         return
 
 
-def handle_backproject_docker(task: BackProjectTask):
+def handle_backproject_docker(task: BackProjectTask, worker_pool: WorkerPool = None):
     load_result = load_options_for_backproject_docker(task.options)
 
     if isinstance(load_result, str):
@@ -143,7 +262,7 @@ def handle_backproject_docker(task: BackProjectTask):
         host_output_folder,
     ) = load_result
 
-    backproject_result = handle_backproject_core(task, options, slice_options)
+    backproject_result = handle_backproject_core(task, options, slice_options, worker_pool)
 
     if isinstance(backproject_result, str):
         task.error = f"Error during backprojection:\n{backproject_result}"
@@ -151,7 +270,7 @@ def handle_backproject_docker(task: BackProjectTask):
         clear_plugin_folder()
         return
     else:
-        if options.make_single_file:
+        if options.make_single_file or options.output_format != "tiff":
             host_output_file = combine_unknown_folder(
                 host_output_folder, backproject_result.output_file_path
             )
@@ -160,6 +279,12 @@ def handle_backproject_docker(task: BackProjectTask):
                 host_output_folder, backproject_result.output_file_path
             )
 
+    task.outputs = {
+        "output_file": host_output_file
+        if options.make_single_file or options.output_format != "tiff"
+        else host_output_slices
+    }
+
     save_result = save_output_for_backproject_docker(
         host_output_file,
         host_output_slices=host_output_slices,
@@ -171,7 +296,7 @@ def handle_backproject_docker(task: BackProjectTask):
         clear_plugin_folder()
 
 
-def handle_task(task: Task):
+def handle_task(task: Task, worker_pool: WorkerPool = None):
     """
     Handle a server task.
 
@@ -179,13 +304,17 @@ def handle_task(task: Task):
     ----------
     task : Task
         The task to handle.
+    worker_pool : WorkerPool, optional
+        The shared pool of worker processes, by default None
     """
 
     try:
         if isinstance(task, SliceTask):
-            handle_slice(task)
+            handle_slice(task, worker_pool)
+        elif isinstance(task, BatchSliceTask):
+            handle_batch_slice(task, worker_pool)
         elif isinstance(task, BackProjectTask):
-            handle_backproject(task)
+            handle_backproject(task, worker_pool)
         else:
             raise ValueError("Invalid task type")
     except BaseException as e:
@@ -193,7 +322,7 @@ def handle_task(task: Task):
         task.error = str(e)
 
 
-def handle_task_docker(task: Task):
+def handle_task_docker(task: Task, worker_pool: WorkerPool = None):
     """
     Handle a server task in a docker environment.
 
@@ -201,15 +330,67 @@ def handle_task_docker(task: Task):
     ----------
     task : Task
         The task to handle.
+    worker_pool : WorkerPool, optional
+        The shared pool of worker processes, by default None
     """
 
     try:
         if isinstance(task, SliceTask):
-            handle_slice_docker(task)
+            handle_slice_docker(task, worker_pool)
         elif isinstance(task, BackProjectTask):
-            handle_backproject_docker(task)
+            handle_backproject_docker(task, worker_pool)
+        elif isinstance(task, BatchSliceTask):
+            raise ValueError("Batch slicing is not supported in the Docker server.")
         else:
             raise ValueError("Invalid task type")
     except BaseException as e:
         task.status = "error"
         task.error = str(e)
+
+
+def estimate_task_resources(task: Task, processes: int) -> tuple[float, float]:
+    """
+    Estimate the RAM and disk a task needs from a plan of its job (see `ouroboros.common.plan`).
+
+    Only the geometry of the job is computed, nothing is downloaded or written.
+
+    Parameters
+    ----------
+    task : Task
+        The task to estimate.
+    processes : int
+        The number of processes the task may run with.
+
+    Returns
+    -------
+    tuple[float, float]
+        The peak RAM and the disk written (output and intermediates), in GB.
+    """
+
+    from ouroboros.common.pipelines import batch_slice_options
+    from ouroboros.common.plan import plan_backproject, plan_slice
+
+    if isinstance(task, SliceTask):
+        plans = [plan_slice(load_options_for_slice(task.options), processes)]
+    elif isinstance(task, BatchSliceTask):
+        options = batch_slice_options(
+            [load_options_for_slice(options_path) for options_path in task.options], task.layers, task.all_layers
+        )
+        if isinstance(options, str):
+            raise ValueError(options)
+        plans = [plan_slice(slice_options, processes) for slice_options in options]
+    elif isinstance(task, BackProjectTask):
+        options = load_options_for_backproject(task.options)
+        plans = [plan_backproject(options, load_options_for_slice(options.slice_options_path), processes)]
+    else:
+        raise ValueError("Invalid task type")
+
+    for plan in plans:
+        if isinstance(plan, str):
+            raise ValueError(plan)
+
+    # The paths of a batch share the worker processes, but each writes its own output
+    ram_bytes = max(plan["memory"]["peak_bytes"] for plan in plans)
+    disk_bytes = sum(plan["output"]["bytes"] + plan.get("intermediates", {}).get("bytes", 0) for plan in plans)
+
+    return ram_bytes / GIGABYTE, disk_bytes / GIGABYTE
@@ -1,5 +1,11 @@
 from dataclasses import dataclass, field
-from ouroboros.pipeline import PipelineInput, Pipeline
+from typing import TYPE_CHECKING, Callable
+
+from ouroboros.helpers.tracing import Tracer
+
+# The pipelines are only imported once a task runs, so the server starts fast
+if TYPE_CHECKING:
+    from ouroboros.pipeline import PipelineInput, Pipeline
 
 
 # Note: kw_only=True is used to make the fields keyword-only,
@@ -7,18 +13,77 @@ from ouroboros.pipeline import PipelineInput, Pipeline
 @dataclass(kw_only=True)
 class Task:
     task_id: str
-    pipeline_input: PipelineInput = None
-    pipeline: Pipeline = None
+    pipeline_input: "PipelineInput" = None
+    pipeline: "Pipeline" = None
     last_progress: list[tuple[str, float]] = field(default_factory=list)
     status: str = "enqueued"
     error: str = None
+    # Scheduling: lower priority values run first, resources are reserved while running
+    priority: int = 1
+    cpus: float = 1
+    ram_gb: float = 0
+    disk_gb: float = 0
+    # The worker processes the task runs with, which may exceed its CPU reservation (set when it starts)
+    processes: int = None
+    # Whether RAM and disk requests are still to be estimated from a plan of the task
+    estimating: bool = False
+    enqueued_at: float = None
+    started_at: float = None
+    finished_at: float = None
+    # Kept after the pipeline state is dropped
+    timings: list[dict] = field(default_factory=list)
+    outputs: dict[str, str] = field(default_factory=dict)
+    # The slice visualization data (kept in memory only, it is not saved with the task)
+    visualization: dict = field(default=None, repr=False)
+    # Records the spans of the pipeline when a trace was requested (kept in memory only)
+    tracer: Tracer = field(default=None, repr=False)
+    # Called (from any thread) whenever the status or progress of the task changes
+    listeners: list[Callable[["Task"], None]] = field(default_factory=list, repr=False)
+
+    def notify(self):
+        for listener in self.listeners:
+            listener(self)
+
+    def compact(self):
+        """
+        Drop the pipeline state of a finished task, keeping its final progress.
+        """
+
+        if self.pipeline is not None:
+            try:
+                self.last_progress = self.pipeline.get_steps_progress_and_durations()
+            except BaseException:
+                pass
+
+        self.pipeline = None
+        self.pipeline_input = None
+
+    def watch_pipeline(self, pipeline: "Pipeline"):
+        """
+        Store the pipeline of the task and notify listeners when its progress changes.
+        """
+
+        self.pipeline = pipeline
+
+        for step in pipeline.steps:
+            step.listen_for_progress(lambda _: self.notify())
 
 
 @dataclass(kw_only=True)
 class SliceTask(Task):
     options: str
+    resume: bool = False
+
+
+@dataclass(kw_only=True)
+class BatchSliceTask(Task):
+    options: list[str]
+    layers: list[str] | None = None
+    all_layers: bool = False
+    resume: bool = False
 
 
 @dataclass(kw_only=True)
 class BackProjectTask(Task):
     options: str
+    resume: bool = False
@@ -0,0 +1,251 @@
+import json
+import sqlite3
+import threading
+import time
+
+from ouroboros.common.logging import logger
+from ouroboros.common.server_types import BackProjectTask, BatchSliceTask, SliceTask, Task
+
+# Finished tasks are forgotten after this many seconds
+DEFAULT_TASK_TTL_SECONDS = 24 * 60 * 60
+
+# Maximum number of finished tasks kept
+DEFAULT_MAX_TASKS = 1000
+
+FINISHED_STATUSES = ("done", "error")
+
+TASK_TYPES = {
+    "SliceTask": SliceTask,
+    "BatchSliceTask": BatchSliceTask,
+    "BackProjectTask": BackProjectTask,
+}
+
+# Task fields saved to SQLite, the rest are runtime state
+PERSISTED_FIELDS = (
+    "status",
+    "error",
+    "priority",
+    "cpus",
+    "ram_gb",
+    "disk_gb",
+    "enqueued_at",
+    "started_at",
+    "finished_at",
+)
+PERSISTED_JSON_FIELDS = ("last_progress", "timings", "outputs")
+
+
+def _to_builtin(value: any) -> any:
+    # Numpy scalars and arrays in timings
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def _options_column(task: Task) -> str | None:
+    # Batch tasks have a list of options files
+    options = getattr(task, "options", None)
+    return json.dumps(options) if isinstance(options, list) else options
+
+
+class TaskStore:
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TASK_TTL_SECONDS,
+        max_tasks: int = DEFAULT_MAX_TASKS,
+        db_path: str | None = None,
+    ) -> None:
+        """
+        Keep the server's tasks, forgetting finished tasks after a TTL or when there are too many.
+
+        Once a task finishes, its pipeline state is dropped and only a compact summary
+        (status, progress, timings and outputs) is kept, along with the slice visualization.
+        With a database path, the summaries are saved to SQLite and loaded again on startup,
+        but the visualization is kept in memory only, so it is not available after a restart.
+        Queued and running tasks are never evicted.
+
+        Parameters
+        ----------
+            ttl_seconds : float, optional
+                How long finished tasks are kept, by default DEFAULT_TASK_TTL_SECONDS
+            max_tasks : int, optional
+                The maximum number of finished tasks, by default DEFAULT_MAX_TASKS
+            db_path : str | None, optional
+                The SQLite file to persist finished tasks to, by default None (in memory only)
+        """
+
+        self.ttl_seconds = ttl_seconds
+        self.max_tasks = max_tasks
+
+        self._tasks = {}
+        self._lock = threading.RLock()
+        self._db = None
+
+        if db_path is not None:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                task_type TEXT NOT NULL,
+                options TEXT,
+                finished_at REAL,
+                data TEXT NOT NULL
+            )
+            """
+        )
+        self._db.commit()
+
+        self._delete_expired_rows()
+
+        for task_id, task_type, options, data in self._db.execute(
+            "SELECT task_id, task_type, options, data FROM tasks ORDER BY finished_at"
+        ):
+            try:
+                self._tasks[task_id] = self._task_from_row(task_id, task_type, options, data)
+            except BaseException as e:
+                logger.error(f"Could not load task {task_id}: {e}")
+
+    def _task_from_row(self, task_id: str, task_type: str, options: str, data: str) -> Task:
+        values = json.loads(data)
+        task_class = TASK_TYPES[task_type]
+        task = task_class(task_id=task_id, options=json.loads(options) if task_class is BatchSliceTask else options)
+
+        for key in PERSISTED_FIELDS + PERSISTED_JSON_FIELDS:
+            if key in values:
+                setattr(task, key, values[key])
+
+        return task
+
+    def _save(self, task: Task):
+        if self._db is None:
+            return
+
+        data = {key: getattr(task, key) for key in PERSISTED_FIELDS + PERSISTED_JSON_FIELDS}
+
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?)",
+                    (
+                        task.task_id,
+                        type(task).__name__,
+                        _options_column(task),
+                        task.finished_at,
+                        json.dumps(data, default=_to_builtin),
+                    ),
+                )
+                self._db.commit()
+        except BaseException as e:
+            logger.error(f"Could not save task {task.task_id}: {e}")
+
+    def _delete_rows(self, task_ids: list[str]):
+        if self._db is None or len(task_ids) == 0:
+            return
+
+        with self._lock:
+            self._db.executemany("DELETE FROM tasks WHERE task_id = ?", [(task_id,) for task_id in task_ids])
+            self._db.commit()
+
+    def _delete_expired_rows(self):
+        with self._lock:
+            self._db.execute("DELETE FROM tasks WHERE finished_at < ?", (time.time() - self.ttl_seconds,))
+            self._db.execute(
+                "DELETE FROM tasks WHERE task_id NOT IN "
+                "(SELECT task_id FROM tasks ORDER BY finished_at DESC LIMIT ?)",
+                (self.max_tasks,),
+            )
+            self._db.commit()
+
+    def _on_change(self, task: Task):
+        # The scheduler sets finished_at before notifying, once the handler has returned
+        if task.finished_at is not None and task.status in FINISHED_STATUSES:
+            self.finish(task)
+
+    def finish(self, task: Task):
+        """
+        Compact a finished task and save its summary.
+        """
+
+        task.compact()
+        self._save(task)
+        self.evict()
+
+    def evict(self):
+        """
+        Forget finished tasks that are past the TTL, then the oldest beyond the size limit.
+        """
+
+        now = time.time()
+
+        with self._lock:
+            finished = sorted(
+                (
+                    task
+                    for task in self._tasks.values()
+                    if task.status in FINISHED_STATUSES and task.finished_at is not None
+                ),
+                key=lambda task: task.finished_at,
+            )
+
+            expired = [task for task in finished if now - task.finished_at > self.ttl_seconds]
+            remaining = len(finished) - len(expired)
+            expired += finished[len(expired):len(expired) + max(remaining - self.max_tasks, 0)]
+
+            for task in expired:
+                del self._tasks[task.task_id]
+
+            self._delete_rows([task.task_id for task in expired])
+
+    def __setitem__(self, task_id: str, task: Task):
+        task.listeners.append(self._on_change)
+
+        with self._lock:
+            self._tasks[task_id] = task
+
+        self.evict()
+
+    def __getitem__(self, task_id: str) -> Task:
+        return self._tasks[task_id]
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._tasks
+
+    def __delitem__(self, task_id: str):
+        with self._lock:
+            del self._tasks[task_id]
+
+        self._delete_rows([task_id])
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def get(self, task_id: str, default: Task | None = None) -> Task | None:
+        return self._tasks.get(task_id, default)
+
+    def values(self) -> list[Task]:
+        with self._lock:
+            return list(self._tasks.values())
+
+    def summary(self, task: Task) -> dict:
+        """
+        A compact, JSON serializable summary of a task.
+        """
+
+        summary = {
+            "task_id": task.task_id,
+            "task_type": type(task).__name__,
+            "options": getattr(task, "options", None),
+        } | {key: getattr(task, key) for key in PERSISTED_FIELDS + PERSISTED_JSON_FIELDS}
+
+        return json.loads(json.dumps(summary, default=_to_builtin))
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,303 @@
+from collections import OrderedDict
+import gzip
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from ouroboros.helpers.volume_cache import VolumeCache
+
+VISUALIZATION_FORMATS = ("json", "binary", "npy")
+VISUALIZATION_COMPRESSIONS = ("gzip", "zstd")
+
+VISUALIZATION_MEDIA_TYPES = {
+    "json": "application/json",
+    "binary": "application/octet-stream",
+    "npy": "application/octet-stream",
+}
+
+# Start of every binary payload, followed by the header length (uint32 little-endian)
+BINARY_MAGIC = b"OUROVIS1"
+
+# Fast compression levels, since payloads are compressed on every request
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+# Number of on-demand visualization results kept in memory
+VISUALIZATION_CACHE_SIZE = 16
+
+
+def decimate_indices(count: int, step: int = 1, max_rects: int = 0) -> np.ndarray:
+    """
+    Select the rects to send, keeping every k-th rect and always the last one.
+
+    Parameters
+    ----------
+    count : int
+        The number of rects.
+    step : int, optional
+        Keep every `step`-th rect, by default 1 (all rects)
+    max_rects : int, optional
+        The maximum number of rects, raising the step if needed, by default 0 (no limit)
+
+    Returns
+    -------
+    np.ndarray
+        The indices of the selected rects.
+    """
+
+    step = max(step, 1)
+
+    if max_rects == 1:
+        return np.arange(max(count - 1, 0), count)
+
+    # The rects are spread over max_rects - 1 gaps, leaving room for the last one
+    if max_rects > 1:
+        step = max(step, int(np.ceil((count - 1) / (max_rects - 1))))
+
+    indices = np.arange(0, count, step)
+
+    # Keep the end of the path so it is drawn to the end
+    if count > 0 and indices[-1] != count - 1:
+        indices = np.append(indices, count - 1)
+
+    return indices
+
+
+def visualization_data(slice_rects: np.ndarray, volume_cache: "VolumeCache") -> dict:
+    """
+    Gather the slice visualization data.
+
+    Parameters
+    ----------
+    slice_rects : np.ndarray
+        The slice rects, of shape (n, 4, 3).
+    volume_cache : VolumeCache
+        The volume cache holding the bounding boxes of the slices.
+
+    Returns
+    -------
+    dict
+        The rects (as an array), bounding boxes and the bounding box of each rect.
+    """
+
+    return {
+        "rects": np.asarray(slice_rects),
+        "bounding_boxes": [
+            {
+                "min": [bbox.x_min, bbox.y_min, bbox.z_min],
+                "max": [bbox.x_max, bbox.y_max, bbox.z_max],
+            }
+            for bbox in volume_cache.bounding_boxes
+        ],
+        "link_rects": list(volume_cache.link_rects),
+    }
+
+
+def decimate_visualization(data: dict, step: int = 1, max_rects: int = 0) -> dict:
+    """
+    Lower the level of detail of the visualization data. All bounding boxes are kept.
+
+    Parameters
+    ----------
+    data : dict
+        The data from `visualization_data`.
+    step : int, optional
+        Keep every `step`-th rect, by default 1 (all rects)
+    max_rects : int, optional
+        The maximum number of rects, by default 0 (no limit)
+
+    Returns
+    -------
+    dict
+        The decimated data.
+    """
+
+    if step <= 1 and (max_rects <= 0 or len(data["rects"]) <= max_rects):
+        return data
+
+    indices = decimate_indices(len(data["rects"]), step, max_rects)
+
+    return data | {
+        "rects": data["rects"][indices],
+        "link_rects": np.asarray(data["link_rects"])[indices].tolist(),
+    }
+
+
+def encode_visualization(data: dict, format: str = "json") -> bytes:
+    """
+    Encode the slice visualization data.
+
+    Formats:
+    - json: {"data": {"rects", "bounding_boxes", "link_rects"}, "error": null}
+    - binary: BINARY_MAGIC, the header length (uint32 little-endian), a JSON header with
+      the shape and dtype of the rects, the bounding boxes and link rects, then the rects
+      as raw little-endian float32
+    - npy: the rects as a float32 .npy file
+
+    Parameters
+    ----------
+    data : dict
+        The data from `visualization_data` or `decimate_visualization`.
+    format : str, optional
+        One of VISUALIZATION_FORMATS, by default "json"
+
+    Returns
+    -------
+    bytes
+        The encoded data.
+    """
+
+    if format == "json":
+        return json.dumps(
+            {"data": data | {"rects": data["rects"].tolist()}, "error": None}
+        ).encode()
+
+    rects = np.ascontiguousarray(data["rects"], dtype="<f4")
+
+    if format == "npy":
+        buffer = io.BytesIO()
+        np.save(buffer, rects)
+        return buffer.getvalue()
+
+    if format == "binary":
+        header = json.dumps(
+            {
+                "shape": rects.shape,
+                "dtype": rects.dtype.str,
+                "bounding_boxes": data["bounding_boxes"],
+                "link_rects": data["link_rects"],
+            }
+        ).encode()
+        return BINARY_MAGIC + struct.pack("<I", len(header)) + header + rects.tobytes()
+
+    raise ValueError(f"Invalid format: {format}. Use one of {VISUALIZATION_FORMATS}.")
+
+
+def compress_payload(payload: bytes, compression: str) -> bytes:
+    """
+    Compress a response payload, to be sent with a matching Content-Encoding header.
+
+    Parameters
+    ----------
+    payload : bytes
+        The payload.
+    compression : str
+        One of VISUALIZATION_COMPRESSIONS.
+
+    Returns
+    -------
+    bytes
+        The compressed payload.
+    """
+
+    if compression == "gzip":
+        return gzip.compress(payload, compresslevel=GZIP_LEVEL)
+
+    if compression == "zstd":
+        import imagecodecs
+
+        return imagecodecs.zstd_encode(payload, level=ZSTD_LEVEL)
+
+    raise ValueError(f"Invalid compression: {compression}. Use one of {VISUALIZATION_COMPRESSIONS}.")
+
+
+class VisualizationCache:
+    def __init__(self, max_entries: int = VISUALIZATION_CACHE_SIZE) -> None:
+        """
+        A thread-safe LRU cache of on-demand visualization results.
+
+        Results are keyed by the options file path and content hash, and by the
+        modification time of the neuroglancer JSON it points to. File hashes are reused
+        while the path, mtime and size of a file are unchanged.
+
+        Parameters
+        ----------
+            max_entries : int, optional
+                The maximum number of results, by default VISUALIZATION_CACHE_SIZE
+        """
+
+        self.max_entries = max_entries
+
+        self._results = OrderedDict()
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def _file_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._hashes.get(path)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+
+        with self._lock:
+            self._hashes[path] = (signature, digest)
+
+        return digest
+
+    def key(self, options_path: str, neuroglancer_json: str | None = None) -> tuple | None:
+        """
+        The cache key of an options file, or None if a file cannot be read.
+
+        Parameters
+        ----------
+            options_path : str
+                The path to the slice options file.
+            neuroglancer_json : str | None, optional
+                The path to the neuroglancer JSON file of the options, by default None
+
+        Returns
+        -------
+            tuple | None
+                The key.
+        """
+
+        try:
+            options_path = os.path.abspath(options_path)
+            key = (options_path, self._file_hash(options_path))
+
+            if neuroglancer_json:
+                stat = os.stat(neuroglancer_json)
+                key += (os.path.abspath(neuroglancer_json), stat.st_mtime_ns, stat.st_size)
+
+            return key
+        except OSError:
+            return None
+
+    def get(self, key: tuple | None):
+        if key is None:
+            return None
+
+        with self._lock:
+            if key not in self._results:
+                return None
+
+            self._results.move_to_end(key)
+            return self._results[key]
+
+    def put(self, key: tuple | None, value):
+        if key is None:
+            return
+
+        with self._lock:
+            self._results[key] = value
+            self._results.move_to_end(key)
+
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._hashes.clear()
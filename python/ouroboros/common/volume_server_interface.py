@@ -1,5 +1,3 @@
-import requests
-
 VOLUME_SERVER_URL = "http://host.docker.internal:3001"
 PLUGIN_NAME = "main"
 
@@ -98,6 +96,9 @@ def request_volume_server(path: str, data: dict) -> tuple[bool, str]:
         was not.
     """
 
+    # Only the docker server talks to the volume server, so requests is not imported at startup
+    import requests
+
     url = f"{VOLUME_SERVER_URL}/{path}"
     try:
         result = requests.post(
@@ -1,7 +1,10 @@
 import numpy as np
 
-from cloudvolume import Bbox
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from cloudvolume import Bbox
 
 DEFAULT_SPLIT_THRESHOLD = 0.9
 DEFAULT_MAX_DEPTH = 10
@@ -178,10 +181,32 @@ class BoundingBox:
 
         return x_min, x_max, y_min, y_max, z_min, z_max
 
-    def to_cloudvolume_bbox(self) -> Bbox:
-        return Bbox(
-            (self.x_min, self.y_min, self.z_min), (self.x_max, self.y_max, self.z_max)
-        )
+    def to_cloudvolume_bbox(self, volume_max: tuple[int, int, int] | None = None) -> "Bbox":
+        """
+        The voxels to download for the bounding box: from the voxel at its min to the voxel after its max,
+        so every point in the box can be interpolated from the voxels around it.
+
+        Parameters:
+        ----------
+            volume_max (tuple[int, int, int] | None): The end of the volume (X, Y, Z). The voxel after the max
+                is left out where it would be past the end, rather than making the download fail.
+
+        Returns:
+        -------
+            (Bbox): The integer bounds to download.
+        """
+
+        # cloudvolume is slow to import, so only load it once a volume is accessed
+        from cloudvolume import Bbox
+
+        min_point = self.get_min(float).astype(int)
+        max_point = self.get_max(float).astype(int)
+        support_max = np.ceil(self.get_max(float)).astype(int) + 1
+
+        if volume_max is not None:
+            support_max = np.minimum(support_max, volume_max)
+
+        return Bbox(min_point, np.maximum(support_max, max_point))
 
     def approx_bounds(self) -> tuple:
         if self.approx_bounds_memo is not None:
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Iterable
+
+import numpy as np
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_fingerprint(*parts: any) -> str:
+    """
+    Hash the inputs that determine the output, so a checkpoint is only reused for the same job.
+
+    Parameters
+    ----------
+    *parts : any
+        Numpy arrays (hashed by dtype, shape and content) or JSON serializable values.
+
+    Returns
+    -------
+    str
+        The fingerprint.
+    """
+
+    digest = hashlib.sha256()
+
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            digest.update(str((part.dtype.str, part.shape)).encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+
+    return digest.hexdigest()
+
+
+class CheckpointManifest:
+    def __init__(self, path: str, fingerprint: str, total: int) -> None:
+        """
+        An append-only record of completed work items, kept next to an output.
+
+        The first line is a JSON header with the fingerprint of the job and the number of
+        items, every following line is the index of a completed item. Lines are flushed as
+        they are written, so a killed job loses at most the item being recorded.
+
+        Parameters
+        ----------
+            path : str
+                The path to the manifest file.
+            fingerprint : str
+                The fingerprint of the job (see `checkpoint_fingerprint`).
+            total : int
+                The number of work items.
+        """
+
+        self.path = path
+        self.fingerprint = fingerprint
+        self.total = total
+
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self) -> set[int]:
+        """
+        Read the completed items, or an empty set if the manifest is missing or belongs to another job.
+        """
+
+        try:
+            with open(self.path, "r") as f:
+                lines = f.read().split("\n")
+        except OSError:
+            return set()
+
+        try:
+            header = json.loads(lines[0])
+        except (json.JSONDecodeError, IndexError):
+            return set()
+
+        if header != self._header():
+            return set()
+
+        completed = set()
+
+        for line in lines[1:]:
+            # The last line may have been cut off by a crash
+            try:
+                index = int(line)
+            except ValueError:
+                continue
+
+            if 0 <= index < self.total:
+                completed.add(index)
+
+        return completed
+
+    def _header(self) -> dict:
+        return {
+            "version": CHECKPOINT_VERSION,
+            "fingerprint": self.fingerprint,
+            "total": self.total,
+        }
+
+    def open(self, completed: Iterable[int] = ()):
+        """
+        Start recording, keeping the given completed items (e.g. from `load` when resuming).
+
+        Parameters
+        ----------
+            completed : Iterable[int], optional
+                The items that are already completed, by default () (start over)
+        """
+
+        # Rewrite the manifest so it only holds the items that are still valid
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(json.dumps(self._header()) + "\n")
+            f.writelines(f"{index}\n" for index in sorted(completed))
+        os.replace(temp_path, self.path)
+
+        self._file = open(self.path, "a")
+
+    def mark(self, index: int):
+        """
+        Record a completed item. Only call this once its output is written.
+
+        Safe to call from future callbacks in other threads.
+        """
+
+        with self._lock:
+            if self._file is None:
+                return
+
+            self._file.write(f"{index}\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self):
+        """
+        Delete the manifest, once the job is complete.
+        """
+
+        self.close()
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self) -> "CheckpointManifest":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
@@ -0,0 +1,248 @@
+import time
+
+import numpy as np
+
+from .bounding_boxes import BoundingBox
+from .slice import backproject_box, coordinate_grid, slice_volume_from_grids
+
+# Bytes per voxel of a backprojection intermediate: a uint32 lookup, a float32 value and a float32 weight
+INTERMEDIATE_BYTES_PER_VOXEL = 12
+
+# Voxels of intermediates per pixel of the straightened volume, for each voxel between slices (up to 2, when
+# slices no longer share voxels). Each pixel spreads over its 8 neighbouring voxels, which it shares with the
+# pixels around it; 1.5 was measured on paths through synthetic and real volumes.
+INTERMEDIATE_VOXELS_PER_PIXEL = 1.5
+
+# Bytes per pixel of the coordinate grid of a slice (three float32 coordinates)
+GRID_BYTES_PER_PIXEL = 12
+
+# Bytes per voxel of the accumulation volume of a backprojected chunk (float32 value and weight)
+ACCUMULATION_BYTES_PER_VOXEL = 8
+
+# Bytes per straightened pixel while a chunk is backprojected: its coordinates, the voxel it lands on,
+# its interpolation weights and its value
+BACKPROJECT_BYTES_PER_PIXEL = 32
+
+# Bytes per voxel of an output plane while intermediates are merged into it (float32 value and weight, uint16 output)
+MERGE_BYTES_PER_VOXEL = 10
+
+
+def cutout_bounds(bounding_boxes: list[BoundingBox], volume_max: tuple[int, int, int] | None = None) -> np.ndarray:
+    """
+    The voxels downloaded for each bounding box (see `BoundingBox.to_cloudvolume_bbox`).
+
+    Parameters
+    ----------
+    bounding_boxes : list[BoundingBox]
+        The bounding boxes.
+    volume_max : tuple[int, int, int] | None, optional
+        The end of the volume (X, Y, Z), see `VolumeCache.get_volume_max`, by default None
+
+    Returns
+    -------
+    np.ndarray
+        The bounds (n, 6) as (x_min, x_max, y_min, y_max, z_min, z_max), with the max excluded.
+    """
+
+    return np.array(
+        [bbox_bounds(bounding_box.to_cloudvolume_bbox(volume_max)) for bounding_box in bounding_boxes], dtype=np.int64
+    ).reshape(-1, 6)
+
+
+def bbox_bounds(bbox) -> tuple[int, ...]:
+    """
+    The half-open integer bounds of a CloudVolume Bbox, as (x_min, x_max, y_min, y_max, z_min, z_max).
+    """
+
+    # CloudVolume truncates the bounds of a Bbox to integers before downloading
+    bbox = bbox.astype(int)
+    return tuple(int(value) for value in np.stack([bbox.minpt, bbox.maxpt], axis=1).reshape(6))
+
+
+def box_voxels(bounds: np.ndarray) -> np.ndarray:
+    bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 6)
+    return np.prod(np.maximum(bounds[:, 1::2] - bounds[:, 0::2], 0), axis=1)
+
+
+def _union_area(rects: np.ndarray) -> int:
+    # Union area of rects (n, 4) as (x_min, x_max, y_min, y_max), one strip of X at a time
+    xs = np.unique(rects[:, :2])
+    area = 0
+
+    for x0, x1 in zip(xs[:-1], xs[1:]):
+        active = rects[(rects[:, 0] <= x0) & (rects[:, 1] >= x1)]
+
+        if len(active) == 0:
+            continue
+
+        covered = 0
+        end = None
+
+        for y0, y1 in sorted(zip(active[:, 2].tolist(), active[:, 3].tolist())):
+            if end is None or y0 > end:
+                covered += y1 - y0
+                end = y1
+            elif y1 > end:
+                covered += y1 - end
+                end = y1
+
+        area += covered * int(x1 - x0)
+
+    return area
+
+
+def union_voxels(bounds: np.ndarray) -> int:
+    """
+    The number of voxels covered by any of a set of boxes, counting overlaps once.
+
+    Parameters
+    ----------
+    bounds : np.ndarray
+        Half-open integer bounds (n, 6) as (x_min, x_max, y_min, y_max, z_min, z_max).
+
+    Returns
+    -------
+    int
+        The number of voxels in the union of the boxes.
+    """
+
+    bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 6)
+    bounds = bounds[np.all(bounds[:, 1::2] > bounds[:, 0::2], axis=1)]
+
+    # Sweep along Z: between two consecutive Z bounds the same boxes are present
+    zs = np.unique(bounds[:, 4:])
+    voxels = 0
+
+    for z0, z1 in zip(zs[:-1], zs[1:]):
+        active = bounds[(bounds[:, 4] <= z0) & (bounds[:, 5] >= z1)]
+
+        if len(active) > 0:
+            voxels += _union_area(active[:, :4]) * int(z1 - z0)
+
+    return int(voxels)
+
+
+def chunk_bounds(bounds: np.ndarray, chunk_size: tuple[int, int, int], offset: tuple[int, int, int]) -> np.ndarray:
+    """
+    The chunks of a chunked volume that each box reads, as half-open bounds in chunk indices.
+
+    Parameters
+    ----------
+    bounds : np.ndarray
+        Half-open integer bounds (n, 6) as (x_min, x_max, y_min, y_max, z_min, z_max).
+    chunk_size : tuple[int, int, int]
+        The chunk size of the volume (X, Y, Z).
+    offset : tuple[int, int, int]
+        The voxel offset of the volume (X, Y, Z), where the chunk grid starts.
+
+    Returns
+    -------
+    np.ndarray
+        The chunk bounds (n, 6), in the same layout.
+    """
+
+    bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 6)
+    chunk_size = np.repeat(np.asarray(chunk_size, dtype=np.int64), 2)
+    offset = np.repeat(np.asarray(offset, dtype=np.int64), 2)
+
+    chunks = (bounds - offset) // chunk_size
+    chunks[:, 1::2] = -((offset[1::2] - bounds[:, 1::2]) // chunk_size[1::2])
+
+    return chunks
+
+
+def clip_bounds(bounds: np.ndarray, offset: tuple[int, int, int], size: tuple[int, int, int]) -> np.ndarray:
+    """
+    Clip box bounds to a volume with the given voxel offset and size (X, Y, Z).
+    """
+
+    bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 6)
+    low = np.repeat(np.asarray(offset, dtype=np.int64), 2)
+    high = low + np.repeat(np.asarray(size, dtype=np.int64), 2)
+
+    return np.clip(bounds, low, high)
+
+
+def intermediate_voxels(num_pixels: int, dist_between_slices: float) -> float:
+    """
+    Estimate the voxels of backprojection intermediates written for a number of straightened pixels.
+    """
+
+    return num_pixels * INTERMEDIATE_VOXELS_PER_PIXEL * min(max(float(dist_between_slices), 1.0), 2.0)
+
+
+def pyramid_fraction(levels: int, factor: tuple[int, int, int]) -> float:
+    """
+    The size of the downsampled levels of a pyramid, as a fraction of the full resolution level.
+    """
+
+    reduction = float(np.prod(factor))
+    return sum(reduction**-level for level in range(1, levels + 1)) if reduction > 1 else float(levels)
+
+
+def _calibration_rects(shape: tuple[int, int], num_slices: int) -> np.ndarray:
+    # Parallel slices one voxel apart, off the voxel grid so every sample has all 8 neighbours in the box
+    height, width = shape
+    margin = max(height, width) / 4 + 0.5
+
+    return np.array([
+        [[0, 0, z], [width - 1, 0, z], [width - 1, height - 1, z], [0, height - 1, z]]
+        for z in range(num_slices)
+    ], dtype=np.float64) + margin
+
+
+def calibrate_sampling(shape: tuple[int, int] = (64, 64), num_slices: int = 16, repeat: int = 3) -> float:
+    """
+    Time slicing a small random volume, to estimate how long sampling takes on this machine.
+
+    This is the hot path of SliceParallelPipelineStep (see the slice_volume_from_grids benchmark).
+
+    Returns
+    -------
+    float
+        The seconds to generate the grid of and sample one slice pixel.
+    """
+
+    rng = np.random.default_rng(0)
+    height, width = shape
+    rects = _calibration_rects(shape, num_slices)
+    bounding_box = BoundingBox.from_rects(rects)
+    volume = rng.integers(0, 255, bounding_box.get_shape(), dtype=np.uint8)
+
+    best = np.inf
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        grids = np.array([coordinate_grid(rect, (height, width)) for rect in rects])
+        slice_volume_from_grids(volume, bounding_box, grids, width, height)
+        best = min(best, time.perf_counter() - start)
+
+    return best / (num_slices * height * width)
+
+
+def calibrate_backprojection(shape: tuple[int, int] = (64, 64), num_slices: int = 16, repeat: int = 3) -> float:
+    """
+    Time backprojecting a few random slices, to estimate how long backprojection takes on this machine.
+
+    This is the hot path of BackprojectPipelineStep (see the backproject_box benchmark).
+
+    Returns
+    -------
+    float
+        The seconds to backproject one straightened pixel.
+    """
+
+    rng = np.random.default_rng(0)
+    height, width = shape
+    rects = _calibration_rects(shape, num_slices)
+    bounding_box = BoundingBox.from_rects(rects)
+    slices = rng.random((num_slices, height, width), dtype=np.float32) * 255
+
+    best = np.inf
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backproject_box(bounding_box, rects, slices)
+        best = min(best, time.perf_counter() - start)
+
+    return best / (num_slices * height * width)
@@ -11,6 +11,8 @@ from tifffile import imread, TiffWriter, TiffFile
 import time
 
 from .shapes import DataShape
+from .metrics import count
+from .tracing import record_span
 
 
 def get_sorted_tif_files(directory: str) -> list[str]:
@@ -81,10 +83,22 @@ def format_slice_output_multiple(output_name: str) -> str:
     return output_name + "-slices"
 
 
+def format_slice_output_zarr(output_name: str) -> str:
+    return output_name + ".ome.zarr"
+
+
 def format_slice_output_config_file(output_name: str) -> str:
     return output_name + "-configuration.json"
 
 
+def format_slice_checkpoint_file(output_name: str) -> str:
+    return output_name + "-checkpoint.jsonl"
+
+
+def format_slice_stream_checkpoint_file(output_name: str) -> str:
+    return output_name + "-stream-checkpoint.jsonl"
+
+
 def format_backproject_output_file(output_name: str, offset: tuple[int] | None = None) -> str:
     if offset is not None:
         offset_str = "-".join(map(str, offset))
@@ -103,6 +117,14 @@ def format_backproject_output_multiple(
     return output_name + "-backprojected"
 
 
+def format_backproject_output_precomputed(output_name: str) -> str:
+    return output_name + ".precomputed"
+
+
+def format_backproject_checkpoint_file(output_name: str) -> str:
+    return output_name + "-checkpoint.jsonl"
+
+
 def format_backproject_tempvolumes(output_name: str) -> str:
     return output_name + "-tempvolumes"
 
@@ -211,12 +233,47 @@ def volume_from_intermediates(path: Path, shape: DataShape, thread_count: int =
     return vol[0]
 
 
-def write_conv_vol(writer: callable, source_path, shape, dtype, *args, **kwargs):
+def write_conv_vol(writer: callable, source_path, shape, dtype, *args, thread_count: int = 4, **kwargs):
     perf = {}
     start = time.perf_counter()
-    vol = volume_from_intermediates(source_path, shape)
-    perf["Merge Volume"] = time.perf_counter() - start
+    vol = volume_from_intermediates(source_path, shape, thread_count)
+    end = time.perf_counter()
+    perf["Merge Volume"] = end - start
+    record_span("merge_volume", start, end)
     start = time.perf_counter()
-    writer(*args, data=np_convert(dtype, vol.reshape(shape.Y, shape.X), False), **kwargs)
-    perf["Write Merged"] = time.perf_counter() - start
+    data = np_convert(dtype, vol.reshape(shape.Y, shape.X), False)
+    writer(*args, data=data, **kwargs)
+    end = time.perf_counter()
+    perf["Write Merged"] = end - start
+    record_span("write_merged", start, end, data.nbytes)
+    count("write_bytes", data.nbytes)
     return perf
+
+
+def write_conv_slab(writer: callable, source_paths: list, shape, dtype, thread_count: int = 4, reduce: callable = None):
+    perf = {}
+    start = time.perf_counter()
+    slab = np.stack([
+        np_convert(dtype, volume_from_intermediates(source_path, shape, thread_count).reshape(shape.Y, shape.X), False)
+        for source_path in source_paths
+    ])
+    end = time.perf_counter()
+    perf["Merge Volume"] = end - start
+    record_span("merge_volume", start, end)
+    start = time.perf_counter()
+    writer(data=slab)
+    end = time.perf_counter()
+    perf["Write Merged"] = end - start
+    record_span("write_merged", start, end, slab.nbytes)
+    count("write_bytes", slab.nbytes)
+
+    # Reduce the slab for downsampled levels while it is in memory, so it is not read back
+    reduced = None
+    if reduce is not None:
+        start = time.perf_counter()
+        reduced = reduce(slab)
+        end = time.perf_counter()
+        perf["Reduce Merged"] = end - start
+        record_span("reduce_merged", start, end)
+
+    return perf, reduced
@@ -0,0 +1,183 @@
+import bisect
+import multiprocessing
+import threading
+
+# Counters shared by the server and its worker processes, with their help text
+COUNTERS = {
+    "slices_sampled": "Slices sampled from downloaded volumes.",
+    "downloads": "Volume downloads.",
+    "download_bytes": "Bytes downloaded from source volumes.",
+    "volume_cache_hits": "Volumes that were already in the volume cache when requested.",
+    "volume_cache_misses": "Volumes that had to be downloaded when requested.",
+    "shared_download_reuses": "Volumes cut from a download already made for another path of a batch.",
+    "write_bytes": "Bytes written to outputs (slices, backprojected planes and intermediates).",
+    "chunks_backprojected": "Chunks backprojected into intermediates.",
+    "worker_busy_seconds": "Seconds worker processes spent sampling slices or backprojecting chunks.",
+}
+
+# Upper bounds of the step duration histogram, in seconds
+STEP_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+
+METRIC_PREFIX = "ouroboros_"
+
+
+class SharedCounters:
+    def __init__(self, names: tuple[str, ...] = tuple(COUNTERS)) -> None:
+        """
+        Counters in shared memory, incremented by any process that was given them at startup.
+
+        They can only be passed to a process when it starts (e.g. in the initializer arguments
+        of a process pool), not as an argument of a task.
+
+        Parameters
+        ----------
+            names : tuple[str, ...], optional
+                The names of the counters, by default the names of COUNTERS
+        """
+
+        self.names = tuple(names)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self._values = multiprocessing.RawArray("d", len(self.names))
+        self._lock = multiprocessing.Lock()
+
+    def add(self, name: str, value: float = 1):
+        index = self._index[name]
+
+        with self._lock:
+            self._values[index] += value
+
+    def values(self) -> dict[str, float]:
+        with self._lock:
+            return dict(zip(self.names, self._values[:]))
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        """
+        A cumulative histogram in the Prometheus format, for one process.
+        """
+
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> list[int]:
+        counts = []
+        total = 0
+
+        for count in self.counts:
+            total += count
+            counts.append(total)
+
+        return counts
+
+
+# The counters of this process, None while metrics are off
+_counters: SharedCounters | None = None
+
+# Step durations, only observed in the process that runs the pipelines
+_step_durations: dict[str, Histogram] = {}
+_step_durations_lock = threading.Lock()
+
+
+def enable_metrics() -> SharedCounters:
+    """
+    Turn on metrics in this process, creating its shared counters if needed.
+
+    Enable metrics before starting worker processes, so they can be given the counters.
+    """
+
+    global _counters
+
+    if _counters is None:
+        _counters = SharedCounters()
+
+    return _counters
+
+
+def attach_metrics(counters: SharedCounters | None):
+    """
+    Use the shared counters of another process, e.g. in the initializer of a worker process.
+    """
+
+    global _counters
+    _counters = counters
+
+
+def shared_counters() -> SharedCounters | None:
+    return _counters
+
+
+def count(name: str, value: float = 1):
+    """
+    Increment a shared counter. Does nothing when metrics are off.
+    """
+
+    counters = _counters
+
+    if counters is not None:
+        counters.add(name, value)
+
+
+def observe_step_duration(step_name: str, seconds: float):
+    if _counters is None:
+        return
+
+    with _step_durations_lock:
+        if step_name not in _step_durations:
+            _step_durations[step_name] = Histogram(STEP_DURATION_BUCKETS)
+
+        _step_durations[step_name].observe(seconds)
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_metrics(gauges: dict[str, tuple[float, str]] | None = None) -> str:
+    """
+    Render the counters, step duration histograms and any gauges in the Prometheus text format.
+
+    Parameters
+    ----------
+    gauges : dict[str, tuple[float, str]] | None, optional
+        Current values (e.g. queue depth) by name, with their help text, by default None
+
+    Returns
+    -------
+    str
+        The metrics, with names prefixed by METRIC_PREFIX and counters suffixed by _total.
+    """
+
+    lines = []
+    counters = _counters.values() if _counters is not None else {name: 0.0 for name in COUNTERS}
+
+    for name, value in counters.items():
+        metric = f"{METRIC_PREFIX}{name}_total"
+        lines += [f"# HELP {metric} {COUNTERS[name]}", f"# TYPE {metric} counter", f"{metric} {_format_value(value)}"]
+
+    for name, (value, help_text) in (gauges or {}).items():
+        metric = f"{METRIC_PREFIX}{name}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge", f"{metric} {_format_value(value)}"]
+
+    metric = f"{METRIC_PREFIX}step_duration_seconds"
+    lines += [f"# HELP {metric} Duration of pipeline steps.", f"# TYPE {metric} histogram"]
+
+    with _step_durations_lock:
+        for step_name, histogram in sorted(_step_durations.items()):
+            labels = f'step="{step_name}"'
+            bounds = [_format_value(bound) for bound in histogram.buckets] + ["+Inf"]
+
+            for bound, cumulative in zip(bounds, histogram.cumulative_counts()):
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+
+            lines.append(f"{metric}_sum{{{labels}}} {_format_value(histogram.sum)}")
+            lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+
+    return "\n".join(lines) + "\n"
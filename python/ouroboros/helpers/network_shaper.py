@@ -0,0 +1,110 @@
+import threading
+import time
+from typing import Callable
+
+
+class NetworkShaper:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        bandwidth: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """
+        Simulated network conditions for volume downloads, e.g. to profile a local volume as if it were remote.
+
+        Every request waits for the latency, then its bytes are sent over one link of the given
+        bandwidth that concurrent requests share in the order they reach it. A request that took
+        longer than that (e.g. reading a local file) is not delayed further.
+
+        Parameters
+        ----------
+            latency : float, optional
+                The time to first byte of each request in seconds, by default 0.0
+            bandwidth : float, optional
+                The bandwidth of the link in bytes per second, by default 0.0 (unlimited)
+            clock : Callable[[], float], optional
+                The clock to measure time with, by default time.monotonic
+            sleep : Callable[[float], None], optional
+                The function to wait with, by default time.sleep
+        """
+
+        self.latency = max(float(latency), 0.0)
+        self.bandwidth = max(float(bandwidth), 0.0)
+        self.clock = clock
+        self.sleep = sleep
+
+        # When the link finishes sending everything reserved so far
+        self._link_free = 0.0
+        self._lock = threading.Lock()
+
+    def to_dict(self) -> dict:
+        return {"latency": self.latency, "bandwidth": self.bandwidth}
+
+    @staticmethod
+    def from_dict(data: dict | None) -> "NetworkShaper | None":
+        if data is None:
+            return None
+
+        return NetworkShaper(data.get("latency", 0.0), data.get("bandwidth", 0.0))
+
+    def __getstate__(self) -> dict:
+        # Locks cannot be pickled, and each process simulates its own link
+        return self.to_dict()
+
+    def __setstate__(self, state: dict):
+        self.__init__(state["latency"], state["bandwidth"])
+
+    @property
+    def enabled(self) -> bool:
+        return self.latency > 0 or self.bandwidth > 0
+
+    def reserve(self, num_bytes: int, requested_at: float) -> float:
+        """
+        Reserve the link for a response and get when it would have fully arrived.
+
+        Parameters
+        ----------
+        num_bytes : int
+            The size of the response.
+        requested_at : float
+            When the request was made, by `clock`.
+
+        Returns
+        -------
+        float
+            When the response arrives, by `clock`.
+        """
+
+        first_byte = requested_at + self.latency
+
+        if self.bandwidth == 0:
+            return first_byte
+
+        with self._lock:
+            start = max(first_byte, self._link_free)
+            self._link_free = start + num_bytes / self.bandwidth
+
+            return self._link_free
+
+    def wait(self, num_bytes: int, requested_at: float) -> float:
+        """
+        Wait until a response of `num_bytes` requested at `requested_at` would have arrived.
+
+        Returns
+        -------
+        float
+            The time waited in seconds.
+        """
+
+        if not self.enabled:
+            return 0.0
+
+        remaining = self.reserve(num_bytes, requested_at) - self.clock()
+
+        if remaining > 0:
+            self.sleep(remaining)
+            return remaining
+
+        return 0.0
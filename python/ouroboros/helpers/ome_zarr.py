@@ -0,0 +1,756 @@
+from collections import defaultdict
+import concurrent.futures
+from dataclasses import dataclass
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Callable
+import zlib
+
+import numpy as np
+
+from .metrics import count
+from .tracing import record_span, traced_executor
+
+OUTPUT_FORMATS = ("tiff", "ome-zarr")
+
+ZARR_COMPRESSIONS = ("none", "zlib", "gzip", "zstd", "blosc")
+
+OME_ZARR_VERSION = "0.4"
+
+# Chunks are stored in nested folders (e.g. 0/1/2), which keeps folders small for large arrays
+DIMENSION_SEPARATOR = "/"
+
+
+def zarr_compressor(compression: str, level: int) -> dict | None:
+    """
+    The numcodecs configuration of a compression, as stored in .zarray.
+
+    Parameters
+    ----------
+    compression : str
+        One of ZARR_COMPRESSIONS.
+    level : int
+        The compression level.
+
+    Returns
+    -------
+    dict | None
+        The compressor, or None for no compression.
+    """
+
+    if compression == "none":
+        return None
+    if compression in ("zlib", "gzip", "zstd"):
+        return {"id": compression, "level": level}
+    if compression == "blosc":
+        return {"id": "blosc", "cname": "zstd", "clevel": level, "shuffle": 1, "blocksize": 0}
+
+    raise ValueError(f"Invalid compression: {compression}. Use one of {ZARR_COMPRESSIONS}.")
+
+
+def encode_chunk(data: np.ndarray, compression: str, level: int) -> bytes:
+    """
+    Encode a chunk as stored by zarr v2 (C order, then compressed).
+    """
+
+    raw = np.ascontiguousarray(data).tobytes()
+
+    if compression == "none":
+        return raw
+    if compression == "zlib":
+        return zlib.compress(raw, level)
+
+    import imagecodecs
+
+    if compression == "gzip":
+        return imagecodecs.gzip_encode(raw, level=level)
+    if compression == "zstd":
+        return imagecodecs.zstd_encode(raw, level=level)
+    if compression == "blosc":
+        return imagecodecs.blosc_encode(
+            raw, level=level, compressor="zstd", shuffle=1, typesize=data.dtype.itemsize
+        )
+
+    raise ValueError(f"Invalid compression: {compression}. Use one of {ZARR_COMPRESSIONS}.")
+
+
+def decode_chunk(buffer: bytes, compression: str) -> bytes:
+    if compression == "none":
+        return buffer
+    if compression == "zlib":
+        return zlib.decompress(buffer)
+
+    import imagecodecs
+
+    if compression == "gzip":
+        return imagecodecs.gzip_decode(buffer)
+    if compression == "zstd":
+        return imagecodecs.zstd_decode(buffer)
+    if compression == "blosc":
+        return imagecodecs.blosc_decode(buffer)
+
+    raise ValueError(f"Invalid compression: {compression}. Use one of {ZARR_COMPRESSIONS}.")
+
+
+@dataclass(frozen=True)
+class ZarrArrayLayout:
+    path: str  # The folder of the array
+    shape: tuple[int, ...]
+    chunks: tuple[int, ...]
+    dtype: str  # Numpy dtype string
+    compression: str = "zstd"
+    compression_level: int = 3
+
+    @property
+    def chunk_grid(self) -> tuple[int, ...]:
+        """
+        The number of chunks along each axis.
+        """
+
+        return tuple(-(-length // chunk) for length, chunk in zip(self.shape, self.chunks))
+
+    def chunk_path(self, index: tuple[int, ...]) -> str:
+        return os.path.join(self.path, *map(str, index))
+
+    def chunk_region(self, index: tuple[int, ...]) -> tuple[slice, ...]:
+        """
+        The region of the array covered by a chunk, clipped to the array.
+        """
+
+        return tuple(
+            slice(i * chunk, min((i + 1) * chunk, length))
+            for i, chunk, length in zip(index, self.chunks, self.shape)
+        )
+
+    def chunks_in_region(self, start: tuple[int, ...], stop: tuple[int, ...]) -> list[tuple[int, ...]]:
+        """
+        The indices of the chunks overlapping a region.
+        """
+
+        ranges = [
+            range(begin // chunk, -(-min(end, length) // chunk))
+            for begin, end, chunk, length in zip(start, stop, self.chunks, self.shape)
+        ]
+
+        return list(itertools.product(*ranges))
+
+    def to_zarray(self) -> dict:
+        return {
+            "zarr_format": 2,
+            "shape": list(self.shape),
+            "chunks": list(self.chunks),
+            "dtype": np.dtype(self.dtype).str,
+            "compressor": zarr_compressor(self.compression, self.compression_level),
+            "fill_value": 0,
+            "order": "C",
+            "filters": None,
+            "dimension_separator": DIMENSION_SEPARATOR,
+        }
+
+
+def _write_json(path: str, value: dict):
+    with open(path, "w") as f:
+        json.dump(value, f, indent=4)
+
+
+def create_zarr_array(
+    path: str,
+    shape: tuple[int, ...],
+    chunks: tuple[int, ...],
+    dtype: np.dtype,
+    compression: str = "zstd",
+    compression_level: int = 3,
+) -> ZarrArrayLayout:
+    """
+    Create an empty zarr v2 array in a local folder. Chunks are clipped to the shape of the array.
+
+    Returns
+    -------
+    ZarrArrayLayout
+        The layout, to write chunks with `write_chunk` (e.g. from worker processes).
+    """
+
+    shape = tuple(int(length) for length in shape)
+    chunks = tuple(max(min(int(chunk), length), 1) for chunk, length in zip(chunks, shape))
+
+    # Validate the compression before creating anything
+    zarr_compressor(compression, compression_level)
+
+    layout = ZarrArrayLayout(
+        path=path,
+        shape=shape,
+        chunks=chunks,
+        dtype=np.dtype(dtype).str,
+        compression=compression,
+        compression_level=compression_level,
+    )
+
+    os.makedirs(path, exist_ok=True)
+    _write_json(os.path.join(path, ".zarray"), layout.to_zarray())
+
+    return layout
+
+
+def read_zarray(path: str) -> dict | None:
+    """
+    Read the metadata of a zarr v2 array, or None if there is no array at the path.
+    """
+
+    try:
+        with open(os.path.join(path, ".zarray"), "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def pyramid_shapes(
+    shape: tuple[int, ...], spatial_axes: tuple[int, ...], levels: int, factors: tuple[int, ...] | None = None
+) -> list[tuple[int, ...]]:
+    """
+    The shape of each level of a multiscale pyramid, dividing each axis by its factor at every level
+    (by default, halving the spatial axes).
+    """
+
+    if factors is None:
+        factors = tuple(2 if axis in spatial_axes else 1 for axis in range(len(shape)))
+
+    shapes = [tuple(shape)]
+
+    for _ in range(levels):
+        shapes.append(tuple(-(-length // factor) for length, factor in zip(shapes[-1], factors)))
+
+    return shapes
+
+
+def create_ome_zarr(
+    path: str,
+    shape: tuple[int, ...],
+    dtype: np.dtype,
+    chunks: tuple[int, ...],
+    axes: list[dict],
+    scale: list[float],
+    translation: list[float] | None = None,
+    compression: str = "zstd",
+    compression_level: int = 3,
+    levels: int = 0,
+    name: str = "",
+    factors: tuple[int, ...] | None = None,
+    method: str = "mean",
+) -> list[ZarrArrayLayout]:
+    """
+    Create an empty OME-Zarr (v0.4, zarr v2) image with multiscale levels in a local folder.
+
+    Level `i` is stored in the array `path/i`, with the spatial axes downsampled by 2**i (or factors**i).
+
+    Parameters
+    ----------
+    path : str
+        The folder of the image (conventionally ending in .ome.zarr).
+    shape : tuple[int, ...]
+        The shape of the full resolution level.
+    dtype : np.dtype
+        The data type.
+    chunks : tuple[int, ...]
+        The chunk shape, clipped to the shape of each level.
+    axes : list[dict]
+        The OME axes, e.g. [{"name": "z", "type": "space", "unit": "micrometer"}, ...].
+    scale : list[float]
+        The physical size of a voxel of the full resolution level along each axis.
+    translation : list[float] | None, optional
+        The physical position of the first voxel, by default None
+    compression : str, optional
+        One of ZARR_COMPRESSIONS, by default "zstd"
+    compression_level : int, optional
+        The compression level, by default 3
+    levels : int, optional
+        The number of downsampled levels, by default 0
+    name : str, optional
+        The name of the image, by default ""
+    factors : tuple[int, ...] | None, optional
+        The downsampling of each level from the one above it along each axis, by default None (2 along
+        the spatial axes)
+    method : str, optional
+        How each level is downsampled, by default "mean"
+
+    Returns
+    -------
+    list[ZarrArrayLayout]
+        The layout of each level, full resolution first.
+    """
+
+    spatial_axes = tuple(i for i, axis in enumerate(axes) if axis.get("type") == "space")
+    if factors is None:
+        factors = tuple(2 if axis in spatial_axes else 1 for axis in range(len(shape)))
+
+    os.makedirs(path, exist_ok=True)
+    _write_json(os.path.join(path, ".zgroup"), {"zarr_format": 2})
+
+    layouts = []
+    datasets = []
+
+    for level, level_shape in enumerate(pyramid_shapes(shape, spatial_axes, levels, factors)):
+        layouts.append(
+            create_zarr_array(
+                os.path.join(path, str(level)),
+                level_shape,
+                chunks,
+                dtype,
+                compression,
+                compression_level,
+            )
+        )
+
+        transformations = [
+            {
+                "type": "scale",
+                "scale": [
+                    float(value) * factor**level
+                    for value, factor in zip(scale, factors)
+                ],
+            }
+        ]
+        if translation is not None:
+            transformations.append({"type": "translation", "translation": [float(value) for value in translation]})
+
+        datasets.append({"path": str(level), "coordinateTransformations": transformations})
+
+    _write_json(
+        os.path.join(path, ".zattrs"),
+        {
+            "multiscales": [
+                {
+                    "version": OME_ZARR_VERSION,
+                    "name": name,
+                    "axes": axes,
+                    "datasets": datasets,
+                    "type": method,
+                }
+            ]
+        },
+    )
+
+    return layouts
+
+
+def write_chunk(layout: ZarrArrayLayout, index: tuple[int, ...], data: np.ndarray):
+    """
+    Write one chunk, given the data of its region (clipped at the edges of the array).
+
+    The chunk is written to a temporary file and renamed into place, so readers never see a partial
+    chunk. Writers of different chunks never touch the same file, so they need no lock.
+    """
+
+    region = layout.chunk_region(index)
+    expected = tuple(s.stop - s.start for s in region)
+
+    if data.shape != expected:
+        raise ValueError(f"Chunk {index} has shape {expected}, but the data has shape {data.shape}.")
+
+    data = np.asarray(data, dtype=layout.dtype)
+
+    # Edge chunks are stored at the full chunk shape
+    if expected != layout.chunks:
+        padded = np.zeros(layout.chunks, dtype=layout.dtype)
+        padded[tuple(slice(0, length) for length in expected)] = data
+        data = padded
+
+    path = layout.chunk_path(index)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(encode_chunk(data, layout.compression, layout.compression_level))
+    os.replace(temp_path, path)
+
+
+def read_chunk(layout: ZarrArrayLayout, index: tuple[int, ...]) -> np.ndarray | None:
+    """
+    Read one chunk, clipped to the array, or None if it was not written.
+    """
+
+    try:
+        with open(layout.chunk_path(index), "rb") as f:
+            buffer = f.read()
+    except FileNotFoundError:
+        return None
+
+    data = np.frombuffer(decode_chunk(buffer, layout.compression), dtype=layout.dtype).reshape(layout.chunks)
+    region = layout.chunk_region(index)
+
+    return data[tuple(slice(0, s.stop - s.start) for s in region)]
+
+
+def write_region(layout: ZarrArrayLayout, start: tuple[int, ...], data: np.ndarray) -> int:
+    """
+    Write a region of the array, chunk by chunk.
+
+    Chunks only partially covered by the region are read and merged first, so concurrent writers
+    must write regions that do not share chunks (e.g. aligned to the chunk shape).
+
+    Returns
+    -------
+    int
+        The number of chunks written.
+    """
+
+    stop = tuple(begin + length for begin, length in zip(start, data.shape))
+    chunks = layout.chunks_in_region(start, stop)
+
+    for index in chunks:
+        region = layout.chunk_region(index)
+        overlap = tuple(slice(max(s.start, begin), min(s.stop, end)) for s, begin, end in zip(region, start, stop))
+        source = tuple(slice(o.start - begin, o.stop - begin) for o, begin in zip(overlap, start))
+
+        if overlap == region:
+            chunk = data[source]
+        else:
+            existing = read_chunk(layout, index)
+            chunk = (
+                np.zeros(tuple(s.stop - s.start for s in region), dtype=layout.dtype)
+                if existing is None
+                else existing.copy()
+            )
+            chunk[tuple(slice(o.start - s.start, o.stop - s.start) for o, s in zip(overlap, region))] = data[source]
+
+        write_chunk(layout, index, chunk)
+
+    return len(chunks)
+
+
+def read_region(layout: ZarrArrayLayout, start: tuple[int, ...], stop: tuple[int, ...]) -> np.ndarray:
+    """
+    Read a region of the array. Chunks that were not written read as zeros.
+    """
+
+    stop = tuple(min(end, length) for end, length in zip(stop, layout.shape))
+    result = np.zeros(tuple(end - begin for begin, end in zip(start, stop)), dtype=layout.dtype)
+
+    for index in layout.chunks_in_region(start, stop):
+        chunk = read_chunk(layout, index)
+        if chunk is None:
+            continue
+
+        region = layout.chunk_region(index)
+        overlap = tuple(slice(max(s.start, begin), min(s.stop, end)) for s, begin, end in zip(region, start, stop))
+        result[tuple(slice(o.start - begin, o.stop - begin) for o, begin in zip(overlap, start))] = chunk[
+            tuple(slice(o.start - s.start, o.stop - s.start) for o, s in zip(overlap, region))
+        ]
+
+    return result
+
+
+def downsample_mean(data: np.ndarray, axes: tuple[int, ...]) -> np.ndarray:
+    """
+    Downsample by 2 along the given axes, averaging each block. Odd edges are averaged over what exists.
+    """
+
+    result = data.astype(np.float64)
+
+    for axis in axes:
+        length = result.shape[axis]
+        pairs = length // 2
+
+        even = np.take(result, np.arange(0, 2 * pairs, 2), axis=axis)
+        odd = np.take(result, np.arange(1, 2 * pairs, 2), axis=axis)
+        halved = (even + odd) / 2
+
+        if length % 2 == 1:
+            halved = np.concatenate([halved, np.take(result, [length - 1], axis=axis)], axis=axis)
+
+        result = halved
+
+    if np.issubdtype(data.dtype, np.integer):
+        result = np.rint(result)
+
+    return result.astype(data.dtype)
+
+
+def write_pyramid_chunk(
+    source: ZarrArrayLayout, target: ZarrArrayLayout, index: tuple[int, ...], spatial_axes: tuple[int, ...]
+):
+    """
+    Write one chunk of a downsampled level from the level above it.
+    """
+
+    region = target.chunk_region(index)
+    start = tuple(s.start * 2 if axis in spatial_axes else s.start for axis, s in enumerate(region))
+    stop = tuple(s.stop * 2 if axis in spatial_axes else s.stop for axis, s in enumerate(region))
+
+    write_chunk(target, index, downsample_mean(read_region(source, start, stop), spatial_axes))
+
+
+def build_pyramid(layouts: list[ZarrArrayLayout], spatial_axes: tuple[int, ...], executor=None):
+    """
+    Write every downsampled level from the full resolution level, one level after another.
+
+    Parameters
+    ----------
+    layouts : list[ZarrArrayLayout]
+        The layout of each level, from `create_ome_zarr`.
+    spatial_axes : tuple[int, ...]
+        The axes that are downsampled.
+    executor : concurrent.futures.Executor, optional
+        Writes the chunks of each level in parallel, by default None (serially)
+    """
+
+    for source, target in zip(layouts[:-1], layouts[1:]):
+        indices = list(itertools.product(*(range(count) for count in target.chunk_grid)))
+
+        if executor is None:
+            for index in indices:
+                write_pyramid_chunk(source, target, index, spatial_axes)
+        else:
+            futures = [executor.submit(write_pyramid_chunk, source, target, index, spatial_axes) for index in indices]
+            for future in futures:
+                future.result()
+
+
+def aligned_planes(layout: ZarrArrayLayout, indices: np.ndarray, channels_first: bool = False) -> np.ndarray:
+    """
+    Find the planes that fill whole slabs of chunks on their own.
+
+    A slab is one chunk deep along the plane axis (the first axis, or the second if channels come first).
+    Planes are only written together with the other planes of their slab, so a slab filled by these
+    planes alone can be written without waiting for (or reading back) any other plane.
+
+    Parameters
+    ----------
+    layout : ZarrArrayLayout
+        The array the planes are written to.
+    indices : np.ndarray
+        The plane indices, without repeats.
+    channels_first : bool, optional
+        Whether the array has its channels before the planes, by default False
+
+    Returns
+    -------
+    np.ndarray
+        A mask of the indices whose slab they fill.
+    """
+
+    plane_axis = 1 if channels_first else 0
+    depth = layout.chunks[plane_axis]
+
+    slabs = np.asarray(indices, dtype=np.int64) // depth
+    unique, counts = np.unique(slabs, return_counts=True)
+    sizes = np.minimum((unique + 1) * depth, layout.shape[plane_axis]) - unique * depth
+
+    return np.isin(slabs, unique[counts == sizes])
+
+
+def write_aligned_planes(
+    layout: ZarrArrayLayout, indices: np.ndarray, planes: np.ndarray, channels_first: bool = False
+) -> int:
+    """
+    Write the planes that fill whole slabs of chunks (see `aligned_planes`), one slab at a time.
+
+    Slabs never share a chunk, so several processes can write the slabs they fill at once without a lock.
+
+    Parameters
+    ----------
+    layout : ZarrArrayLayout
+        The array to write.
+    indices : np.ndarray
+        The plane index of each plane, without repeats.
+    planes : np.ndarray
+        The planes, with channels last.
+    channels_first : bool, optional
+        Whether the array has its channels before the planes, by default False
+
+    Returns
+    -------
+    int
+        The number of bytes written.
+    """
+
+    plane_axis = 1 if channels_first else 0
+    depth = layout.chunks[plane_axis]
+
+    indices = np.asarray(indices, dtype=np.int64)
+    aligned = aligned_planes(layout, indices, channels_first)
+    written = 0
+
+    for slab in np.unique(indices[aligned] // depth):
+        members = np.flatnonzero(aligned & (indices // depth == slab))
+        data = planes[members[np.argsort(indices[members])]]
+
+        start = [0] * len(layout.shape)
+        start[plane_axis] = int(slab) * depth
+        write_region(layout, tuple(start), np.moveaxis(data, -1, 0) if channels_first else data)
+        written += data.nbytes
+
+    return written
+
+
+class ZarrSlabWriter:
+    def __init__(
+        self,
+        layout: ZarrArrayLayout,
+        groups: dict[int, list[int]],
+        on_group_written: Callable[[int], None] | None = None,
+        threads: int = 4,
+        channels_first: bool = False,
+    ) -> None:
+        """
+        Write planes that arrive in any order to a zarr array, one slab of whole chunks at a time.
+
+        Planes along the first axis of the output (e.g. slices) are gathered into slabs as deep as
+        the chunks. Once every expected plane of a slab has arrived, the slab is written by a pool of
+        threads. Slabs never share a chunk, so the writes need no lock. Planes that are not expected
+        (e.g. written by an earlier run that is being resumed) are read back from the array.
+        Slabs filled by the planes of a single group can instead be written where the group is made,
+        with `write_aligned_planes`, leaving only the slabs shared between groups to this writer.
+
+        Planes are submitted in groups (e.g. the slices of a volume). A group is reported as written
+        once all of the slabs holding its planes are written.
+
+        Parameters
+        ----------
+            layout : ZarrArrayLayout
+                The array to write.
+            groups : dict[int, list[int]]
+                The plane indices expected from each group.
+            on_group_written : Callable[[int], None] | None, optional
+                Called with a group once its planes are written, by default None
+            threads : int, optional
+                The number of writer threads, by default 4
+            channels_first : bool, optional
+                Whether planes have their channels last but the array has them first, by default False
+        """
+
+        self.layout = layout
+        self.on_group_written = on_group_written
+        self.channels_first = channels_first
+
+        self.plane_axis = 1 if channels_first else 0
+        self.depth = layout.chunks[self.plane_axis]
+
+        self._lock = threading.Lock()
+        self._executor = traced_executor(concurrent.futures.ThreadPoolExecutor(max_workers=max(int(threads), 1)))
+        self._futures = set()
+        self._slabs = {}
+        self._durations = {"write": [], "write_bytes": []}
+        self._errors = []
+
+        # Planes still to arrive for each slab, and slabs still to be written for each group
+        self._missing = defaultdict(int)
+        self._slab_groups = defaultdict(set)
+        self._group_slabs = defaultdict(set)
+
+        for group, planes in groups.items():
+            for plane in planes:
+                slab = plane // self.depth
+                self._missing[slab] += 1
+                self._slab_groups[slab].add(group)
+                self._group_slabs[group].add(slab)
+
+    def _slab_shape(self, slab: int) -> tuple[int, ...]:
+        plane_shape = tuple(
+            length for axis, length in enumerate(self.layout.shape) if axis != self.plane_axis
+        )
+        if self.channels_first:
+            plane_shape = plane_shape[1:] + plane_shape[:1]
+
+        depth = min((slab + 1) * self.depth, self.layout.shape[self.plane_axis]) - slab * self.depth
+        return (depth,) + plane_shape
+
+    def _slab_start(self, slab: int) -> tuple[int, ...]:
+        start = [0] * len(self.layout.shape)
+        start[self.plane_axis] = slab * self.depth
+        return tuple(start)
+
+    def _existing_slab(self, slab: int) -> np.ndarray:
+        start = self._slab_start(slab)
+        shape = self._slab_shape(slab)
+        stop = list(self.layout.shape)
+        stop[self.plane_axis] = start[self.plane_axis] + shape[0]
+
+        data = read_region(self.layout, start, tuple(stop))
+        return np.moveaxis(data, 0, -1) if self.channels_first else data
+
+    def submit(self, group: int, indices: list[int], planes: np.ndarray):
+        """
+        Add the planes of a group, writing the slabs they complete. Does not wait for the writes.
+        """
+
+        ready = []
+
+        with self._lock:
+            for index, plane in zip(indices, planes):
+                slab, offset = divmod(int(index), self.depth)
+
+                if slab not in self._slabs:
+                    self._slabs[slab] = self._existing_slab(slab)
+
+                self._slabs[slab][offset] = plane
+                self._missing[slab] -= 1
+
+                if self._missing[slab] == 0:
+                    ready.append((slab, self._slabs.pop(slab)))
+
+            # A group without planes is written as soon as it arrives
+            empty = len(self._group_slabs[group]) == 0
+
+        for slab, data in ready:
+            future = self._executor.submit(self._write_slab, slab, data)
+            with self._lock:
+                self._futures.add(future)
+            future.add_done_callback(lambda future, slab=slab: self._slab_written(future, slab))
+
+        if empty:
+            self._group_written(group)
+
+    def _write_slab(self, slab: int, data: np.ndarray) -> dict[str, list[float]]:
+        start = time.perf_counter()
+        write_region(self.layout, self._slab_start(slab), np.moveaxis(data, -1, 0) if self.channels_first else data)
+        end = time.perf_counter()
+        record_span("write", start, end, data.nbytes)
+        count("write_bytes", data.nbytes)
+        return {"write": [end - start], "write_bytes": [int(data.nbytes)]}
+
+    def _slab_written(self, future: concurrent.futures.Future, slab: int):
+        written = []
+
+        with self._lock:
+            self._futures.discard(future)
+
+            if future.cancelled():
+                return
+
+            if future.exception() is not None:
+                self._errors.append(future.exception())
+                return
+
+            for key, value in future.result().items():
+                self._durations[key].extend(value)
+
+            for group in self._slab_groups.pop(slab, ()):
+                self._group_slabs[group].discard(slab)
+                if len(self._group_slabs[group]) == 0:
+                    written.append(group)
+
+        for group in written:
+            self._group_written(group)
+
+    def _group_written(self, group: int):
+        if self.on_group_written is not None:
+            self.on_group_written(group)
+
+    @property
+    def futures(self) -> set[concurrent.futures.Future]:
+        with self._lock:
+            return set(self._futures)
+
+    @property
+    def errors(self) -> list[BaseException]:
+        return self._errors
+
+    @property
+    def durations(self) -> dict[str, list[float]]:
+        return self._durations
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
@@ -5,6 +5,13 @@ from ouroboros.helpers.bounding_boxes import BoundingBoxParams
 from ouroboros.helpers.models import model_with_json
 
 
+class ZarrParams(BaseModel):
+    chunk_shape: list[int] = [64, 256, 256]  # Chunk shape of OME-Zarr output (Z, Y, X), clipped to the output
+    compression: str = "zstd"  # Compression of OME-Zarr chunks: none, zlib, gzip, zstd or blosc
+    compression_level: int = 3  # Compression level of OME-Zarr chunks
+    pyramid_levels: int = 0  # Number of downsampled levels to add to OME-Zarr output
+
+
 @model_with_json
 class CommonOptions(BaseModel):
     output_file_folder: str  # Folder to save the output file
@@ -13,12 +20,15 @@ class CommonOptions(BaseModel):
     make_single_file: bool = True  # Whether to save the output to a single file
     max_ram_gb: int = 0  # Maximum amount of RAM to use in GB (0 means no limit)
     output_mip_level: int = 0  # MIP level for the output image layer
+    output_format: str = "tiff"  # Output format, "tiff", "ome-zarr" or "neuroglancer-precomputed" (backprojection only)
+    zarr_params: ZarrParams = ZarrParams()  # Chunking, compression and pyramid levels for OME-Zarr output
 
 
 class SlicingParams(BaseModel):
     dist_between_slices: int | float = 1  # Distance between slices
     use_adaptive_slicing: bool = True  # Whether to use adaptive sampling for slicing
     adaptive_slicing_ratio: float = 0.5  # Ratio of adaptive slicing
+    stream_window_slices: int = 0  # Slice the path this many slices at a time, to bound memory (0 means all at once)
 
 
 @model_with_json
@@ -40,6 +50,7 @@ class SliceOptions(CommonOptions):
         False  # Whether to connect the start and end of the given annotation points
     )
     annotation_mip_level: int = 0  # MIP level for the annotation layer
+    slice_compression: str = "none"  # Compression type for the slice files (folder output only)
 
     @field_serializer("bounding_box_params")
     def serialize_bounding_box_params(self, value: BoundingBoxParams):
@@ -53,6 +64,19 @@ class SliceOptions(CommonOptions):
         return value
 
 
+class PrecomputedParams(BaseModel):
+    chunk_size: list[int] = [128, 128, 64]  # Chunk size of neuroglancer precomputed output (X, Y, Z)
+    compress: bool = False  # Whether to gzip neuroglancer precomputed chunks
+    pyramid_levels: int = 0  # Number of downsampled levels to add to neuroglancer precomputed output
+
+
+class WorkerParams(BaseModel):
+    compute_processes: int = 0  # Number of compute processes (0 means derive from the CPU count)
+    writer_processes: int = 0  # Number of writer processes (0 means derive from the CPU count)
+    io_threads: int = 0  # Number of I/O threads per process (0 means use the per-stage defaults)
+    auto_tune: bool = False  # Whether to rebalance compute and writer processes from measured throughput
+
+
 @model_with_json
 class BackprojectOptions(CommonOptions):
     straightened_volume_path: str  # Path to the straightened volume
@@ -68,6 +92,12 @@ class BackprojectOptions(CommonOptions):
     )
     upsample_order: int = 2  # Order of the interpolation for upsampling
     offset_in_name: bool = True  # Whether to include the offset in the output file name
+    worker_params: WorkerParams = WorkerParams()  # Process and thread counts for backprojection
+    precomputed_params: PrecomputedParams = (
+        PrecomputedParams()
+    )  # Chunking, compression and pyramid levels for neuroglancer precomputed output
+    pyramid_factor: list[int] = [2, 2, 2]  # Downsampling of each pyramid level (X, Y, Z), e.g. [2, 2, 1] if anisotropic
+    pyramid_method: str = "auto"  # Pyramid downsampling: auto, mean, max or mode (binary only)
 
 
 DEFAULT_SLICE_OPTIONS = SliceOptions(
@@ -1,7 +1,10 @@
+from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
+import os
 
 import numpy as np
-from pydantic import BaseModel, ValidatorFunctionWrapHandler, field_validator
+from pydantic import BaseModel, ConfigDict, ValidatorFunctionWrapHandler, field_serializer, field_validator
 
 from ouroboros.helpers.models import model_with_json
 
@@ -28,16 +31,79 @@ class LayerModel(BaseModel):
     name: str
 
 
-class AnnotationModel(BaseModel):
-    point: list[float]
-    type: str
+# Number of parsed neuroglancer states kept, so pipelines for many layers of a state only parse it once
+PARSE_CACHE_SIZE = 8
+
+
+@dataclass
+class LayerAnnotations:
+    points: np.ndarray  # Point annotations (n, 3)
+    lines: np.ndarray  # Line annotations (m, 2, 3), from pointA to pointB
+    path: np.ndarray  # The points and line ends in the order of the annotations (k, 3), see `from_list`
+
+    @staticmethod
+    def from_list(annotations: list[dict]) -> "LayerAnnotations":
+        """
+        Gather the point and line annotations of a layer into arrays, in one pass.
+
+        The path visits the annotations in order. A line adds both of its ends, but its start is
+        skipped where it continues the previous line, so lines drawn end to end form a single path.
+        Other annotation types (e.g. bounding boxes and ellipsoids) are ignored.
+        """
+
+        points = []
+        lines = []
+        path = []
+
+        for annotation in annotations:
+            annotation_type = annotation.get("type")
+
+            if annotation_type == "point":
+                point = annotation["point"]
+                points.append(point)
+                path.append(point)
+            elif annotation_type == "line":
+                line = (annotation["pointA"], annotation["pointB"])
+                lines.append(line)
+
+                if len(path) == 0 or path[-1] != line[0]:
+                    path.append(line[0])
+                path.append(line[1])
+
+        return LayerAnnotations(
+            points=np.array(points, dtype=float).reshape(-1, 3),
+            lines=np.array(lines, dtype=float).reshape(-1, 2, 3),
+            path=np.array(path, dtype=float).reshape(-1, 3),
+        )
+
+    def to_list(self) -> list[dict]:
+        return [{"point": point, "type": "point"} for point in self.points.tolist()] + [
+            {"pointA": a, "pointB": b, "type": "line"} for a, b in self.lines.tolist()
+        ]
 
 
 class AnnotationLayerModel(LayerModel):
-    annotations: list[AnnotationModel]
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    annotations: LayerAnnotations
     type: str
     name: str
 
+    @field_validator("annotations", mode="before")
+    @classmethod
+    def parse_annotations(cls, value: any) -> LayerAnnotations:
+        # Annotations are kept as compact arrays, rather than a model per annotation
+        if isinstance(value, list):
+            try:
+                return LayerAnnotations.from_list(value)
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                raise ValueError(f"Invalid annotation: {e}")
+        return value
+
+    @field_serializer("annotations")
+    def serialize_annotations(self, value: LayerAnnotations) -> list[dict]:
+        return value.to_list()
+
 
 class SourceModel(BaseModel):
     url: str
@@ -86,7 +152,13 @@ def parse_neuroglancer_json(json_path: str) -> ParseResult:
         A tuple containing the parsed JSON (NeuroglancerJSONModel) and an error if one occurred.
     """
 
-    neuroglancer_json_or_error = NeuroglancerJSONModel.load_from_json(json_path)
+    # Parsed states are cached until the file changes, and must not be modified
+    try:
+        stat = os.stat(json_path)
+    except OSError as e:
+        return None, str(e)
+
+    neuroglancer_json_or_error = _load_neuroglancer_json(os.path.abspath(json_path), stat.st_mtime_ns, stat.st_size)
 
     if isinstance(neuroglancer_json_or_error, str):
         return None, neuroglancer_json_or_error
@@ -94,23 +166,29 @@ def parse_neuroglancer_json(json_path: str) -> ParseResult:
     return neuroglancer_json_or_error, None
 
 
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _load_neuroglancer_json(json_path: str, mtime_ns: int, size: int) -> NeuroglancerJSONModel | str:
+    # The modification time and size are part of the key, so a changed file is parsed again
+    return NeuroglancerJSONModel.load_from_json(json_path)
+
+
 def neuroglancer_config_to_annotation(
     config: NeuroglancerJSONModel, neuroglancer_annotation_layer: str
 ) -> Result:
     """
-    Extract the first annotation from a neuroglancer state JSON dictionary as a numpy array.
+    Extract the path of an annotation layer from a neuroglancer state JSON dictionary as a numpy array.
 
     Parameters
     ----------
     config : NeuroglancerJSONModel
         The neuroglancer state JSON object.
     neuroglancer_annotation_layer : str
-        The name of the annotation layer.
+        The name of the annotation layer, or "" for the first annotation layer.
 
     Returns
     -------
     Result
-        A tuple containing the annotation points and an error if one occurred.
+        A tuple containing the path of point and line annotations (see `LayerAnnotations`) and an error if one occurred.
     """
 
     valid_layer_name = neuroglancer_annotation_layer != ""
@@ -120,20 +198,42 @@ def neuroglancer_config_to_annotation(
             if layer.type == "annotation" and (
                 layer.name == neuroglancer_annotation_layer or not valid_layer_name
             ):
-                annotations = layer.annotations
-
-                return (
-                    np.array(
-                        [data.point for data in annotations if data.type == "point"]
-                    ),
-                    None,
-                )
+                # A copy, as the parsed state is cached
+                return layer.annotations.path.copy(), None
     except BaseException as e:
         return None, f"Error extracting annotations: {e}"
 
     return None, "The selected annotation layer was not found in the file."
 
 
+def neuroglancer_config_to_annotations(config: NeuroglancerJSONModel) -> Result:
+    """
+    Extract every annotation layer from a neuroglancer state JSON dictionary.
+
+    Parameters
+    ----------
+    config : NeuroglancerJSONModel
+        The neuroglancer state JSON object.
+
+    Returns
+    -------
+    Result
+        A tuple containing the annotations of each layer by name (dict[str, LayerAnnotations]), in the order of
+        the layers, and an error if one occurred. Only the first of several layers with the same name is kept.
+    """
+
+    try:
+        annotations = {}
+
+        for layer in config.layers:
+            if isinstance(layer, AnnotationLayerModel) and layer.name not in annotations:
+                annotations[layer.name] = layer.annotations
+
+        return annotations, None
+    except BaseException as e:
+        return None, f"Error extracting annotations: {e}"
+
+
 def neuroglancer_config_to_source(
     config: NeuroglancerJSONModel, neuroglancer_image_layer: str
 ) -> Result:
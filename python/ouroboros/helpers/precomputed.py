@@ -0,0 +1,173 @@
+import json
+import os
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from cloudvolume import CloudVolume
+
+PRECOMPUTED_FORMAT = "neuroglancer-precomputed"
+
+
+def precomputed_url(path: str) -> str:
+    """
+    The CloudVolume url of a local precomputed volume.
+    """
+
+    return "file://" + os.path.abspath(path)
+
+
+def precomputed_info(
+    size: tuple[int, int, int],
+    dtype: np.dtype,
+    resolution: tuple[float, float, float],
+    voxel_offset: tuple[int, int, int],
+    chunk_size: tuple[int, int, int],
+    layer_type: str = "image",
+    levels: int = 0,
+    factor: tuple[int, int, int] = (2, 2, 2),
+    num_channels: int = 1,
+) -> dict:
+    """
+    The info of a raw encoded precomputed volume with downsampled levels.
+
+    Parameters
+    ----------
+    size : tuple[int, int, int]
+        The size of the full resolution level (X, Y, Z).
+    dtype : np.dtype
+        The data type.
+    resolution : tuple[float, float, float]
+        The voxel size in nanometers (X, Y, Z).
+    voxel_offset : tuple[int, int, int]
+        The position of the first voxel in the coordinates of the full resolution level (X, Y, Z).
+    chunk_size : tuple[int, int, int]
+        The chunk size of every level (X, Y, Z).
+    layer_type : str, optional
+        The neuroglancer layer type, by default "image"
+    levels : int, optional
+        The number of downsampled levels, by default 0
+    factor : tuple[int, int, int], optional
+        The downsampling of each level from the one above it (X, Y, Z), by default (2, 2, 2)
+    num_channels : int, optional
+        The number of channels, by default 1
+
+    Returns
+    -------
+    dict
+        The info, as stored in the info file of the volume.
+    """
+
+    from cloudvolume import CloudVolume
+
+    info = CloudVolume.create_new_info(
+        num_channels=int(num_channels),
+        layer_type=layer_type,
+        data_type=np.dtype(dtype).name,
+        encoding="raw",
+        resolution=[float(value) for value in resolution],
+        voxel_offset=[int(value) for value in voxel_offset],
+        volume_size=[int(value) for value in size],
+        chunk_size=[int(value) for value in chunk_size],
+    )
+
+    for level in range(1, levels + 1):
+        scale = {
+            "encoding": "raw",
+            "chunk_sizes": [[int(value) for value in chunk_size]],
+            "resolution": [float(value) * axis_factor**level for value, axis_factor in zip(resolution, factor)],
+            "voxel_offset": [int(value) // axis_factor**level for value, axis_factor in zip(voxel_offset, factor)],
+            "size": info["scales"][-1]["size"],
+        }
+        scale["size"] = [-(-int(value) // axis_factor) for value, axis_factor in zip(scale["size"], factor)]
+        scale["key"] = "_".join(map(str, scale["resolution"]))
+        info["scales"].append(scale)
+
+    return info
+
+
+def create_precomputed(path: str, info: dict) -> str:
+    """
+    Create an empty local precomputed volume.
+
+    Returns
+    -------
+    str
+        The url of the volume.
+    """
+
+    from cloudvolume import CloudVolume
+
+    url = precomputed_url(path)
+    CloudVolume(url, info=info, progress=False).commit_info()
+
+    return url
+
+
+def read_precomputed_info(path: str) -> dict | None:
+    """
+    Read the info of a local precomputed volume, or None if there is no volume at the path.
+    """
+
+    try:
+        with open(os.path.join(path, "info"), "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _open_level(url: str, level: int, compress: bool) -> "CloudVolume":
+    from cloudvolume import CloudVolume
+
+    return CloudVolume(
+        url, mip=level, progress=False, fill_missing=True, compress=compress, parallel=False, cache=False
+    )
+
+
+def write_precomputed(url: str, start: tuple[int, int, int], data: np.ndarray, level: int = 0, compress: bool = False):
+    """
+    Write a region of a level of a precomputed volume.
+
+    The region must be aligned to the chunks of the level (or end at its edge), so concurrent writers
+    of different regions never touch the same chunk and need no lock.
+
+    Parameters
+    ----------
+    url : str
+        The url of the volume.
+    start : tuple[int, int, int]
+        The start of the region (Z, Y, X), relative to the voxel offset of the level.
+    data : np.ndarray
+        The data of the region (Z, Y, X), or (Z, Y, X, C) for several channels.
+    level : int, optional
+        The level to write, by default 0
+    compress : bool, optional
+        Whether to gzip the chunks, by default False
+    """
+
+    volume = _open_level(url, level, compress)
+    offset = volume.voxel_offset
+
+    begin = [int(offset[axis]) + int(start[2 - axis]) for axis in range(3)]
+    end = [value + data.shape[2 - axis] for axis, value in enumerate(begin)]
+
+    # Precomputed volumes are indexed X, Y, Z (, C)
+    data = np.asarray(data)
+    volume[begin[0]:end[0], begin[1]:end[1], begin[2]:end[2]] = data.transpose((2, 1, 0) + tuple(range(3, data.ndim)))
+
+
+def read_precomputed(url: str, start: tuple[int, int, int], stop: tuple[int, int, int], level: int = 0) -> np.ndarray:
+    """
+    Read a region (Z, Y, X) of a level of a precomputed volume, relative to its voxel offset and clipped to it.
+    """
+
+    volume = _open_level(url, level, False)
+    offset = volume.voxel_offset
+    size = volume.volume_size
+
+    stop = [min(int(stop[axis]), int(size[2 - axis])) for axis in range(3)]
+    begin = [int(offset[axis]) + int(start[2 - axis]) for axis in range(3)]
+    end = [int(offset[axis]) + stop[2 - axis] for axis in range(3)]
+
+    return np.asarray(volume[begin[0]:end[0], begin[1]:end[1], begin[2]:end[2]])[..., 0].transpose(2, 1, 0)
@@ -0,0 +1,257 @@
+from collections.abc import Callable
+
+import numpy as np
+
+PYRAMID_METHODS = ("auto", "mean", "max", "mode")
+
+
+def resolve_pyramid_method(method: str, binary: bool) -> str:
+    """
+    The method used to reduce each block of a pyramid level.
+
+    Parameters
+    ----------
+    method : str
+        One of PYRAMID_METHODS. "auto" averages images and keeps any set voxel of binary masks.
+    binary : bool
+        Whether the volume is a binary mask. Masks are reduced from whether each voxel is set.
+
+    Returns
+    -------
+    str
+        "mean", "max" or "mode".
+    """
+
+    if method not in PYRAMID_METHODS:
+        raise ValueError(f"Invalid pyramid method: {method}. Use one of {PYRAMID_METHODS}.")
+
+    if method == "auto":
+        return "max" if binary else "mean"
+
+    if method == "mode" and not binary:
+        raise ValueError("The mode pyramid method is only supported for binary backprojections.")
+
+    return method
+
+
+def block_reduce(data: np.ndarray, factors: tuple[int, ...], reduction: str) -> np.ndarray:
+    """
+    Sum or take the maximum of blocks of `factors` voxels. Blocks at the far edges are partial.
+    """
+
+    result = data
+
+    for axis, factor in enumerate(factors):
+        if factor == 1:
+            continue
+
+        length = result.shape[axis]
+        padding = -length % factor
+
+        if padding > 0:
+            pad_width = [(0, 0)] * result.ndim
+            pad_width[axis] = (0, padding)
+            fill = 0 if reduction == "sum" else _lowest(result.dtype)
+            result = np.pad(result, pad_width, constant_values=fill)
+
+        blocks = result.reshape(result.shape[:axis] + (-1, factor) + result.shape[axis + 1:])
+        result = blocks.sum(axis=axis + 1) if reduction == "sum" else blocks.max(axis=axis + 1)
+
+    return result
+
+
+def _lowest(dtype: np.dtype):
+    if np.issubdtype(dtype, np.bool_):
+        return False
+    return np.iinfo(dtype).min if np.issubdtype(dtype, np.integer) else -np.inf
+
+
+def block_counts(length: int, factor: int, start: int, count: int) -> np.ndarray:
+    """
+    The number of voxels of a level in each of `count` blocks along an axis, from block `start`.
+    """
+
+    blocks = np.arange(start, start + count)
+    return np.clip(length - blocks * factor, 0, factor)
+
+
+def pyramid_partial(data: np.ndarray, factors: tuple[int, ...], method: str, binary: bool) -> np.ndarray:
+    """
+    Partly reduce data for the next pyramid level. Partial reductions combine by adding (mean and mode) or
+    by taking their maximum (max), so the blocks of a level can be reduced from pieces in any order.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        The data of the level.
+    factors : tuple[int, ...]
+        The reduction along each axis of the data (1 for an axis that is reduced later).
+    method : str
+        "mean", "max" or "mode", from `resolve_pyramid_method`.
+    binary : bool
+        Whether to reduce whether each voxel is set, rather than its value.
+
+    Returns
+    -------
+    np.ndarray
+        The sums (float64 or uint64) or maximums of each block.
+    """
+
+    if binary:
+        data = data > 0
+
+    if method == "max":
+        return block_reduce(data.astype(np.uint8) if binary else data, factors, "max")
+
+    total_type = np.float64 if np.issubdtype(data.dtype, np.floating) else np.uint64
+    return block_reduce(data.astype(total_type), factors, "sum")
+
+
+def pyramid_level(partial: np.ndarray, counts: np.ndarray, method: str, dtype: np.dtype) -> np.ndarray:
+    """
+    Finish a level from the full reduction of each block, given the number of voxels in each block.
+    """
+
+    if method == "max":
+        return partial.astype(dtype)
+
+    if method == "mode":
+        # Ties keep the voxel set, so thin structures are not dropped
+        return (2 * partial >= counts).astype(dtype)
+
+    mean = partial / counts
+    if np.issubdtype(dtype, np.integer):
+        mean = np.rint(mean)
+
+    return mean.astype(dtype)
+
+
+class StreamingPyramid:
+    def __init__(
+        self,
+        shape: tuple[int, int, int],
+        factors: tuple[int, int, int],
+        depths: list[int],
+        method: str,
+        binary: bool,
+        dtype: np.dtype,
+        write: Callable[[int, int, np.ndarray], None],
+    ) -> None:
+        """
+        Build every downsampled level of a volume in one pass, from slabs of the full resolution
+        level that arrive in any order.
+
+        Each slab arrives partly reduced along Y and X (see `pyramid_partial`), e.g. by the worker
+        that wrote it. Its planes are reduced into rolling buffers, one per slab of the next level.
+        Once every plane of a buffer has arrived, the slab of that level is finished, written, and
+        reduced in turn into the level below it. Only the slabs still being filled are kept in memory.
+
+        Parameters
+        ----------
+            shape : tuple[int, int, int]
+                The shape of the full resolution level (Z, Y, X).
+            factors : tuple[int, int, int]
+                The reduction of each level from the one above it (Z, Y, X), e.g. (1, 2, 2) for anisotropic volumes.
+            depths : list[int]
+                The depth of the slabs of each downsampled level (e.g. of its chunks), from level 1.
+            method : str
+                "mean", "max" or "mode", from `resolve_pyramid_method`.
+            binary : bool
+                Whether the volume is a binary mask.
+            dtype : np.dtype
+                The data type of the levels.
+            write : Callable[[int, int, np.ndarray], None]
+                Called with the level, the first plane and the data (Z, Y, X) of each finished slab.
+        """
+
+        self.factors = tuple(int(factor) for factor in factors)
+        self.method = method
+        self.binary = binary
+        self.dtype = np.dtype(dtype)
+        self.write = write
+
+        self.shapes = [tuple(int(length) for length in shape)]
+        for _ in depths:
+            self.shapes.append(tuple(-(-length // factor) for length, factor in zip(self.shapes[-1], self.factors)))
+
+        self.depths = [None] + [max(min(int(depth), shape[0]), 1) for depth, shape in zip(depths, self.shapes[1:])]
+
+        # The buffer and the number of planes still to arrive for each unfinished slab of each level
+        self._buffers = [{} for _ in self.shapes]
+        self._remaining = [{} for _ in self.shapes]
+
+    @property
+    def levels(self) -> int:
+        return len(self.shapes) - 1
+
+    @property
+    def partial_factors(self) -> tuple[int, int, int]:
+        """
+        The reduction of the slabs given to `add`, which is done before planes are gathered.
+        """
+
+        return (1,) + self.factors[1:]
+
+    def partial(self, data: np.ndarray) -> np.ndarray:
+        return pyramid_partial(data, self.partial_factors, self.method, self.binary)
+
+    def add(self, start: int, partial: np.ndarray):
+        """
+        Add a slab of full resolution planes, starting at plane `start` and reduced by `partial`.
+        """
+
+        if self.levels > 0:
+            self._add(1, int(start), partial)
+
+    def _add(self, level: int, start: int, partial: np.ndarray):
+        factor = self.factors[0]
+        depth = self.depths[level]
+        source_length = self.shapes[level - 1][0]
+
+        # The plane of this level that each source plane is reduced into
+        targets = (start + np.arange(partial.shape[0])) // factor
+
+        for slab in np.unique(targets // depth):
+            slab = int(slab)
+            begin = slab * depth
+            end = min(begin + depth, self.shapes[level][0])
+
+            if slab not in self._buffers[level]:
+                fill = 0 if self.method != "max" or self.binary else _lowest(partial.dtype)
+                self._buffers[level][slab] = np.full((end - begin,) + partial.shape[1:], fill, dtype=partial.dtype)
+                self._remaining[level][slab] = min(end * factor, source_length) - begin * factor
+
+            mask = (targets // depth) == slab
+            reduce = np.maximum if self.method == "max" else np.add
+            reduce.at(self._buffers[level][slab], targets[mask] - begin, partial[mask])
+            self._remaining[level][slab] -= int(np.sum(mask))
+
+            if self._remaining[level][slab] == 0:
+                self._finish(level, slab)
+
+    def _finish(self, level: int, slab: int):
+        buffer = self._buffers[level].pop(slab)
+        del self._remaining[level][slab]
+
+        begin = slab * self.depths[level]
+        source_shape = self.shapes[level - 1]
+
+        counts = (
+            block_counts(source_shape[0], self.factors[0], begin, buffer.shape[0])[:, None, None]
+            * block_counts(source_shape[1], self.factors[1], 0, buffer.shape[1])[None, :, None]
+            * block_counts(source_shape[2], self.factors[2], 0, buffer.shape[2])[None, None, :]
+        )
+
+        data = pyramid_level(buffer, counts, self.method, self.dtype)
+        self.write(level, begin, data)
+
+        if level < self.levels:
+            self._add(level + 1, begin, self.partial(data))
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of slabs still being filled.
+        """
+
+        return sum(len(buffers) for buffers in self._buffers)
@@ -0,0 +1,166 @@
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from .cost_estimate import bbox_bounds, box_voxels
+from .metrics import count
+
+# A shared download may hold at most this many times the voxels of the largest box it serves
+MAX_GROUP_FACTOR = 4
+
+
+def plan_shared_downloads(bounds: np.ndarray, max_voxels: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Group boxes so that each group is downloaded once, as the box around its members.
+
+    A box joins a group only if downloading the grown group takes no more voxels than downloading
+    its members separately, so sharing never downloads more than the boxes on their own.
+
+    Parameters
+    ----------
+    bounds : np.ndarray
+        Half-open integer bounds (n, 6) as (x_min, x_max, y_min, y_max, z_min, z_max).
+    max_voxels : int | None, optional
+        The most voxels a group may hold, by default None (MAX_GROUP_FACTOR times the largest box)
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        The bounds of the groups (g, 6) and the group of each box (n,).
+    """
+
+    bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 6)
+    voxels = box_voxels(bounds)
+
+    if max_voxels is None:
+        max_voxels = MAX_GROUP_FACTOR * int(voxels.max()) if len(voxels) > 0 else 0
+
+    group_bounds = np.zeros((0, 6), dtype=np.int64)
+    separate_voxels = np.zeros(0, dtype=np.int64)
+    groups = np.zeros(len(bounds), dtype=np.int64)
+
+    # Large boxes first, so smaller ones can join the groups they fall in
+    for i in np.argsort(-voxels, kind="stable"):
+        hull = group_bounds.copy()
+        hull[:, 0::2] = np.minimum(hull[:, 0::2], bounds[i, 0::2])
+        hull[:, 1::2] = np.maximum(hull[:, 1::2], bounds[i, 1::2])
+        hull_voxels = box_voxels(hull)
+
+        fits = (hull_voxels <= separate_voxels + voxels[i]) & (hull_voxels <= max_voxels)
+
+        if np.any(fits):
+            # Join the group that grows the least
+            group = int(np.argmin(np.where(fits, hull_voxels - box_voxels(group_bounds), np.iinfo(np.int64).max)))
+            group_bounds[group] = hull[group]
+            separate_voxels[group] += voxels[i]
+        else:
+            group = len(group_bounds)
+            group_bounds = np.vstack([group_bounds, bounds[i]])
+            separate_voxels = np.append(separate_voxels, voxels[i])
+
+        groups[i] = group
+
+    return group_bounds, groups
+
+
+class SharedDownloads:
+    def __init__(self, bounds: np.ndarray, folder: str, max_voxels: int | None = None) -> None:
+        """
+        Downloads of overlapping boxes (e.g. of several paths through the same volume), made once and shared.
+
+        A group downloaded for one of its boxes is kept on disk until each of its boxes has been cut from it.
+        Boxes alone in their group are downloaded as usual.
+
+        Parameters
+        ----------
+            bounds : np.ndarray
+                The boxes that will be downloaded (see `cutout_bounds`), once per request.
+            folder : str
+                The folder to keep the shared downloads in, removed by `close`.
+            max_voxels : int | None, optional
+                The most voxels a shared download may hold, by default None (see `plan_shared_downloads`)
+        """
+
+        bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 6)
+        self.group_bounds, groups = plan_shared_downloads(bounds, max_voxels)
+        members = np.bincount(groups, minlength=len(self.group_bounds))
+
+        self.folder = folder
+        self._group_of = {tuple(box): int(group) for box, group in zip(bounds.tolist(), groups) if members[group] > 1}
+        self._uses = members.tolist()
+        self._stored = [False] * len(self.group_bounds)
+        self._locks = [threading.Lock() for _ in range(len(self.group_bounds))]
+
+        shared = members[groups] > 1
+        download_voxels = box_voxels(bounds[~shared]).sum() + box_voxels(self.group_bounds[members > 1]).sum()
+        self.stats = {
+            "boxes": len(bounds),
+            "shared_boxes": int(np.count_nonzero(shared)),
+            "downloads": len(self.group_bounds),
+            "box_voxels": int(box_voxels(bounds).sum()),
+            "download_voxels": int(download_voxels),
+        }
+
+    def download(self, cv, bbox, mip: int, parallel=False) -> np.ndarray:
+        """
+        Download a box through the shared downloads, as `cv.download` would.
+
+        Parameters
+        ----------
+            cv : CloudVolumeInterface
+                The volume to download from.
+            bbox : Bbox
+                The box to download, as given to `cv.download`.
+            mip : int
+                The MIP level to download.
+            parallel : bool, optional
+                Whether to download in parallel, by default False
+
+        Returns
+        -------
+            np.ndarray
+                The voxels of the box (x, y, z, c).
+        """
+
+        from cloudvolume import Bbox
+
+        box = bbox_bounds(bbox)
+        group = self._group_of.get(box)
+
+        if group is None:
+            return cv.download(bbox, mip=mip, parallel=parallel)
+
+        group_min = self.group_bounds[group, 0::2]
+        path = os.path.join(self.folder, f"{group}.npy")
+
+        with self._locks[group]:
+            if self._stored[group]:
+                volume = np.load(path, mmap_mode="r")
+                count("shared_download_reuses")
+            else:
+                volume = cv.download(Bbox(group_min, self.group_bounds[group, 1::2]), mip=mip, parallel=parallel)
+                os.makedirs(self.folder, exist_ok=True)
+                np.save(path, np.asarray(volume))
+                self._stored[group] = True
+
+            low = np.array(box[0::2]) - group_min
+            high = np.array(box[1::2]) - group_min
+            cutout = np.array(volume[low[0]:high[0], low[1]:high[1], low[2]:high[2]])
+
+            # The group is no longer needed once every box has been cut from it
+            self._uses[group] -= 1
+
+            if self._uses[group] == 0:
+                del volume
+                os.remove(path)
+
+        return cutout
+
+    def close(self):
+        """
+        Remove the shared downloads left on disk (e.g. by boxes a resumed run skipped).
+        """
+
+        shutil.rmtree(self.folder, ignore_errors=True)
@@ -1,7 +1,7 @@
 from dataclasses import dataclass, asdict, fields, astuple
 from functools import partial
+from typing import TYPE_CHECKING, Iterator
 
-from cloudvolume import VolumeCutout
 import numpy as np
 from scipy.ndimage import map_coordinates
 
@@ -9,6 +9,9 @@ from .bounding_boxes import BoundingBox
 from .spline import Spline
 from .shapes import DataShape, TFIter, DataRange
 
+if TYPE_CHECKING:
+    from cloudvolume import VolumeCutout
+
 INDEXING = "xy"
 
 NO_COLOR_CHANNELS_DIMENSIONS = 3
@@ -53,9 +56,55 @@ def calculate_slice_rects(
     if spline_points is None:
         spline_points = spline(times)
 
-    # (3, n) -> (n, 3)
-    spline_points = spline_points.T
+    return _frame_rects(spline_points.T, normal_vectors, binormal_vectors, width, height)
+
+
+def iter_slice_rect_windows(
+    times: np.ndarray, spline: Spline, width, height, window_size: int
+) -> Iterator[tuple[int, np.ndarray]]:
+    """
+    Calculate the slice rectangles for a spline one window of time points at a time.
+
+    The rotation minimizing frames are carried from each window to the next, so the rects match those of
+    `calculate_slice_rects` for all of the time points (to floating point precision), while only one window
+    of them is held at once.
+
+    Parameters:
+    ----------
+        times (numpy.ndarray): The time points at which to calculate the slice rectangles.
+        spline (Spline): The spline object.
+        width (float): The width of the slice rectangles.
+        height (float): The height of the slice rectangles.
+        window_size (int): The number of time points in each window.
+
+    Yields:
+    -------
+        tuple: The index of the first time point of the window and its slice rectangles (m, 4, 3).
+    """
+
+    frame = None
+
+    for start in range(0, len(times), window_size):
+        end = min(start + window_size, len(times))
+
+        # Windows after the first start from the last frame of the previous window
+        first = start if frame is None else start - 1
 
+        _, normal_vectors, binormal_vectors = spline.calculate_rotation_minimizing_vectors(
+            times[first:end], initial_frame=frame
+        )
+
+        normal_vectors = normal_vectors.T[start - first:]
+        binormal_vectors = binormal_vectors.T[start - first:]
+        frame = (normal_vectors[-1], binormal_vectors[-1])
+
+        yield start, _frame_rects(spline(times[start:end]).T, normal_vectors, binormal_vectors, width, height)
+
+
+def _frame_rects(
+    spline_points: np.ndarray, normal_vectors: np.ndarray, binormal_vectors: np.ndarray, width, height
+) -> np.ndarray:
+    # The rects (n, 4, 3) centered on the points (n, 3), spanned by the normal and binormal vectors (n, 3)
     rects = []
 
     _width, w_remainder = divmod(width, 2)
@@ -67,7 +116,7 @@ def calculate_slice_rects(
     height_top = _height
     height_bottom = _height + h_remainder
 
-    for i in range(len(times)):
+    for i in range(len(spline_points)):
         point = spline_points[i]
 
         localx = normal_vectors[i]
@@ -122,7 +171,7 @@ def coordinate_grid(rect: np.ndarray, shape: tuple[int, int] | FrontProj,
 
 
 def slice_volume_from_grids(
-    volume: VolumeCutout, bounding_box: BoundingBox, grids: np.ndarray, width, height
+    volume: "VolumeCutout", bounding_box: BoundingBox, grids: np.ndarray, width, height
 ) -> np.ndarray:
     """
     Slice a volume based on a grid of coordinates.
@@ -140,13 +189,14 @@ def slice_volume_from_grids(
         numpy.ndarray: The slice of the volume as a 2D array.
     """
 
-    # Normalize grid coordinates based on bounding box (since volume coordinates are truncated)
-    bounding_box_min = np.array(
+    # Normalize grid coordinates based on bounding box. CloudVolume truncates the bounds it downloads,
+    # so the volume starts at the truncated min, and any box around the same point samples it alike.
+    volume_min = np.array(
         [bounding_box.x_min, bounding_box.y_min, bounding_box.z_min]
-    )
+    ).astype(int)
 
-    # Subtract the bounding box min from the grids (n, width, height, 3)
-    normalized_grid = grids - bounding_box_min
+    # Subtract the volume min from the grids (n, width, height, 3)
+    normalized_grid = grids - volume_min
 
     # Reshape the grids to be (3, n * width * height)
     normalized_grid = normalized_grid.reshape(-1, 3).T
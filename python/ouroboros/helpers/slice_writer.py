@@ -0,0 +1,506 @@
+from collections import OrderedDict
+import concurrent.futures
+from dataclasses import dataclass
+import io
+import os
+import threading
+import time
+
+import numpy as np
+from tifffile import TiffFile, imwrite
+
+from .metrics import count
+from .tracing import record_span, traced_executor
+
+# Number of threads encoding and writing slices
+DEFAULT_WRITER_THREADS = 4
+
+# Slices encoded and written by one writer task, so small slices do not pay a task each
+DEFAULT_WRITER_BATCH_SIZE = 16
+
+# Slices waiting to be written before producers are held back
+DEFAULT_MAX_PENDING_SLICES = 1024
+
+# How workers write into a single output file: positional writes on a file descriptor,
+# or a memory mapping of the pages. Both are opened once per worker process.
+SINGLE_FILE_WRITE_MODES = ("pwrite", "mmap")
+DEFAULT_SINGLE_FILE_WRITE_MODE = "pwrite"
+
+# Data size above which a single output file is written as a BigTIFF, leaving room for the
+# tiff structures below the 4 GB limit of classic tiff offsets
+BIGTIFF_THRESHOLD_BYTES = 2**32 - 2**25
+
+# Output files each worker process keeps open
+MAX_WORKER_OUTPUTS = 4
+
+# Per-process cache of open output files, keyed by path and write mode
+_worker_outputs = OrderedDict()
+
+# Per-process slice writer and the settings it was created with
+_worker_writer = None
+
+
+def normalize_compression(compression: str | None) -> str | None:
+    """
+    Map the "none" option value to None, which tifffile treats as uncompressed.
+    """
+
+    if compression is None or compression.lower() == "none":
+        return None
+    return compression
+
+
+def encode_tiff(data: np.ndarray, compression: str | None = None, **kwargs) -> bytes:
+    """
+    Encode an image as a tiff file in memory.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        The image.
+    compression : str | None, optional
+        The tifffile compression, by default None (uncompressed)
+    **kwargs
+        Passed on to tifffile.imwrite.
+
+    Returns
+    -------
+    bytes
+        The tiff file.
+    """
+
+    buffer = io.BytesIO()
+    imwrite(buffer, data, compression=normalize_compression(compression), **kwargs)
+    return buffer.getvalue()
+
+
+def write_slice_batch(
+    paths: list[str], slices: np.ndarray, compression: str | None = None, **kwargs
+) -> dict[str, list[float]]:
+    """
+    Encode and write a batch of slices to one tiff file each, timing both separately.
+
+    Returns
+    -------
+    dict[str, list[float]]
+        The "encode" and "write" durations of each slice, and the "write_bytes" written.
+    """
+
+    durations = {"encode": [], "write": [], "write_bytes": []}
+
+    for path, data in zip(paths, slices):
+        start = time.perf_counter()
+        encoded = encode_tiff(data, compression, **kwargs)
+        end = time.perf_counter()
+        durations["encode"].append(end - start)
+        record_span("encode", start, end)
+
+        start = time.perf_counter()
+        with open(path, "wb") as f:
+            f.write(encoded)
+        end = time.perf_counter()
+        durations["write"].append(end - start)
+        record_span("write", start, end, len(encoded))
+        count("write_bytes", len(encoded))
+        durations["write_bytes"].append(len(encoded))
+
+    return durations
+
+
+class SliceWriter:
+    def __init__(
+        self,
+        threads: int = DEFAULT_WRITER_THREADS,
+        batch_size: int = DEFAULT_WRITER_BATCH_SIZE,
+        max_pending: int = DEFAULT_MAX_PENDING_SLICES,
+        compression: str | None = None,
+        **kwargs,
+    ) -> None:
+        """
+        A persistent writer stage for slice tiff files.
+
+        Slices are handed over without waiting for the disk, and written by a fixed pool of
+        threads in batches. Encoding (compression) and writing are timed separately.
+        Producers can call `wait_for_capacity` to hold back while too many slices are pending,
+        which bounds the memory held by the writer.
+
+        Parameters
+        ----------
+            threads : int, optional
+                The number of writer threads, by default DEFAULT_WRITER_THREADS
+            batch_size : int, optional
+                The number of slices per writer task, by default DEFAULT_WRITER_BATCH_SIZE
+            max_pending : int, optional
+                The number of pending slices before `wait_for_capacity` blocks,
+                by default DEFAULT_MAX_PENDING_SLICES
+            compression : str | None, optional
+                The tifffile compression (e.g. "zlib", "zstd"), by default None (uncompressed)
+            **kwargs
+                Passed on to tifffile.imwrite for every slice (e.g. software).
+        """
+
+        self.batch_size = max(int(batch_size), 1)
+        self.max_pending = max(int(max_pending), 1)
+        self.compression = normalize_compression(compression)
+        self.kwargs = kwargs
+
+        self._executor = traced_executor(concurrent.futures.ThreadPoolExecutor(max_workers=max(int(threads), 1)))
+        self._pending = 0
+        self._capacity = threading.Condition()
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of slices handed over that are not written yet.
+        """
+
+        return self._pending
+
+    def submit(self, paths: list[str], slices: np.ndarray) -> concurrent.futures.Future:
+        """
+        Queue slices to be written, without blocking.
+
+        Safe to call from any thread, including future callbacks.
+
+        Parameters
+        ----------
+            paths : list[str]
+                The output file of each slice.
+            slices : np.ndarray
+                The slices.
+
+        Returns
+        -------
+            concurrent.futures.Future
+                Resolves to the merged durations of `write_slice_batch` once every slice is written,
+                or to the first error.
+        """
+
+        result = concurrent.futures.Future()
+        batches = [
+            (paths[i:i + self.batch_size], slices[i:i + self.batch_size])
+            for i in range(0, len(paths), self.batch_size)
+        ]
+
+        if len(batches) == 0:
+            result.set_result({"encode": [], "write": [], "write_bytes": []})
+            return result
+
+        with self._capacity:
+            self._pending += len(paths)
+
+        remaining = [len(batches)]
+        durations = {"encode": [], "write": [], "write_bytes": []}
+        lock = threading.Lock()
+
+        def batch_done(future: concurrent.futures.Future, count: int):
+            with self._capacity:
+                self._pending -= count
+                self._capacity.notify_all()
+
+            with lock:
+                if result.done():
+                    return
+
+                if future.cancelled():
+                    result.cancel()
+                    return
+
+                if future.exception() is not None:
+                    result.set_exception(future.exception())
+                    return
+
+                for key, value in future.result().items():
+                    durations[key].extend(value)
+
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    result.set_result(durations)
+
+        for batch_paths, batch_slices in batches:
+            future = self._executor.submit(
+                write_slice_batch, batch_paths, batch_slices, self.compression, **self.kwargs
+            )
+            future.add_done_callback(lambda future, count=len(batch_paths): batch_done(future, count))
+
+        return result
+
+    def wait_for_capacity(self, timeout: float | None = None) -> bool:
+        """
+        Block while more than `max_pending` slices are waiting to be written.
+
+        Returns
+        -------
+            bool
+                Whether there is capacity (False if the timeout passed first).
+        """
+
+        with self._capacity:
+            return self._capacity.wait_for(lambda: self._pending <= self.max_pending, timeout)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def __enter__(self) -> "SliceWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown(wait=True, cancel_futures=exc_type is not None)
+        return False
+
+
+def get_worker_writer(threads: int = DEFAULT_WRITER_THREADS, compression: str | None = None, **kwargs) -> SliceWriter:
+    """
+    Get the slice writer of this worker process, creating it once and keeping it for later calls.
+
+    Parameters
+    ----------
+    threads : int, optional
+        The number of writer threads, by default DEFAULT_WRITER_THREADS
+    compression : str | None, optional
+        The tifffile compression, by default None (uncompressed)
+    **kwargs
+        Passed on to tifffile.imwrite for every slice.
+
+    Returns
+    -------
+    SliceWriter
+        The writer, replaced if it was created with other settings.
+    """
+
+    global _worker_writer
+
+    settings = (max(int(threads), 1), normalize_compression(compression), kwargs)
+
+    if _worker_writer is not None and _worker_writer[0] != settings:
+        _worker_writer[1].shutdown()
+        _worker_writer = None
+
+    if _worker_writer is None:
+        _worker_writer = (settings, SliceWriter(threads, compression=compression, **kwargs))
+
+    return _worker_writer[1]
+
+
+@dataclass(frozen=True)
+class TiffPageLayout:
+    path: str
+    file_id: tuple[int, int]  # (st_dev, st_ino) of the file, to detect it being replaced
+    data_offset: int  # Byte offset of the first page
+    page_shape: tuple[int, ...]
+    dtype: str  # Numpy dtype string, in the byte order of the file
+    num_pages: int
+
+    @property
+    def page_nbytes(self) -> int:
+        return int(np.prod(self.page_shape)) * np.dtype(self.dtype).itemsize
+
+    def page_offsets(self, indices: np.ndarray) -> np.ndarray:
+        return self.data_offset + np.asarray(indices, dtype=np.int64) * self.page_nbytes
+
+
+def tiff_page_layout(path: str) -> TiffPageLayout | None:
+    """
+    Find where the pages of an uncompressed tiff stack are stored, so they can be written in place.
+
+    Parameters
+    ----------
+    path : str
+        The path to the tiff file.
+
+    Returns
+    -------
+    TiffPageLayout | None
+        The layout, or None if the pages are not stored contiguously and uncompressed.
+    """
+
+    with TiffFile(path) as tif:
+        series = tif.series[0]
+        data_offset = series.dataoffset
+
+        if data_offset is None:
+            return None
+
+        stat = os.stat(path)
+
+        return TiffPageLayout(
+            path=path,
+            file_id=(stat.st_dev, stat.st_ino),
+            data_offset=int(data_offset),
+            page_shape=tuple(series.shape[1:]),
+            dtype=series.dtype.newbyteorder(tif.byteorder).str,
+            num_pages=series.shape[0],
+        )
+
+
+def create_empty_tiff(path: str, shape: tuple[int, ...], dtype: np.dtype, **kwargs) -> TiffPageLayout | None:
+    """
+    Create an uncompressed tiff stack without writing its data, to be filled in with `write_pages`.
+
+    Only the tiff header and the page structures are written. The data region is left sparse
+    (a seek past it), so the file is created quickly and without memory for any size.
+    A BigTIFF is written once the data is larger than BIGTIFF_THRESHOLD_BYTES.
+
+    Parameters
+    ----------
+    path : str
+        The path to the tiff file.
+    shape : tuple[int, ...]
+        The shape of the stack, with the pages along the first axis.
+    dtype : np.dtype
+        The data type.
+    **kwargs
+        Passed on to tifffile.imwrite (e.g. resolution, photometric, metadata).
+
+    Returns
+    -------
+    TiffPageLayout | None
+        The layout of the pages, see `tiff_page_layout`.
+    """
+
+    shape = tuple(int(length) for length in shape)
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape, dtype=np.uint64)) * dtype.itemsize
+
+    imwrite(path, shape=shape, dtype=dtype, bigtiff=nbytes > BIGTIFF_THRESHOLD_BYTES, **kwargs)
+
+    return tiff_page_layout(path)
+
+
+def contiguous_runs(indices: np.ndarray) -> list[tuple[int, int]]:
+    """
+    Split sorted indices into runs of consecutive values.
+
+    Returns
+    -------
+    list[tuple[int, int]]
+        The (start, stop) positions of each run within `indices`.
+    """
+
+    if len(indices) == 0:
+        return []
+
+    breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    stops = np.concatenate((breaks, [len(indices)]))
+
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def _open_worker_output(layout: TiffPageLayout, mode: str):
+    key = (layout.path, mode)
+    cached = _worker_outputs.get(key)
+
+    if cached is not None and cached[0] == layout:
+        _worker_outputs.move_to_end(key)
+        return cached[1]
+
+    if cached is not None:
+        _close_worker_output(key)
+
+    if mode == "pwrite":
+        output = os.open(layout.path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+        stat = os.fstat(output)
+    else:
+        output = np.memmap(
+            layout.path,
+            dtype=layout.dtype,
+            mode="r+",
+            offset=layout.data_offset,
+            shape=(layout.num_pages,) + layout.page_shape,
+        )
+        stat = os.stat(layout.path)
+
+    _worker_outputs[key] = (layout, output)
+
+    # The file at the path was replaced since the layout was read
+    if (stat.st_dev, stat.st_ino) != layout.file_id:
+        _close_worker_output(key)
+        raise RuntimeError(f"The output file {layout.path} changed while it was being written.")
+
+    while len(_worker_outputs) > MAX_WORKER_OUTPUTS:
+        _close_worker_output(next(iter(_worker_outputs)))
+
+    return output
+
+
+def _close_worker_output(key: tuple[str, str]):
+    _, output = _worker_outputs.pop(key)
+
+    if isinstance(output, int):
+        os.close(output)
+    else:
+        del output
+
+
+def _pwrite(fd: int, data: memoryview, offset: int) -> int:
+    if hasattr(os, "pwrite"):
+        return os.pwrite(fd, data, offset)
+
+    # Windows has no pwrite, but the descriptor is only used by this process
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.write(fd, data)
+
+
+def write_pages(
+    layout: TiffPageLayout,
+    indices: np.ndarray,
+    pages: np.ndarray,
+    mode: str = DEFAULT_SINGLE_FILE_WRITE_MODE,
+) -> int:
+    """
+    Write pages directly at their offsets in a single output file.
+
+    The output file is opened once per worker process and kept open for later calls.
+    Consecutive pages are written with one call each.
+
+    Parameters
+    ----------
+    layout : TiffPageLayout
+        The layout of the output file, from `tiff_page_layout`.
+    indices : np.ndarray
+        The page index of each page.
+    pages : np.ndarray
+        The pages.
+    mode : str, optional
+        One of SINGLE_FILE_WRITE_MODES, by default DEFAULT_SINGLE_FILE_WRITE_MODE
+
+    Returns
+    -------
+    int
+        The number of bytes written.
+    """
+
+    if mode not in SINGLE_FILE_WRITE_MODES:
+        raise ValueError(f"Invalid write mode: {mode}. Use one of {SINGLE_FILE_WRITE_MODES}.")
+
+    indices = np.asarray(indices, dtype=np.int64)
+    order = np.argsort(indices, kind="stable")
+    indices = indices[order]
+    pages = np.asarray(pages)[order].astype(layout.dtype, copy=False)
+    pages = pages.reshape((len(indices),) + layout.page_shape)
+
+    if len(indices) > 0 and (indices[0] < 0 or indices[-1] >= layout.num_pages):
+        raise IndexError(f"Page indices must be between 0 and {layout.num_pages - 1}.")
+
+    output = _open_worker_output(layout, mode)
+    offsets = layout.page_offsets(indices)
+    written = 0
+
+    for start, stop in contiguous_runs(indices):
+        run = np.ascontiguousarray(pages[start:stop])
+
+        if mode == "pwrite":
+            view = memoryview(run).cast("B")
+            offset = int(offsets[start])
+            # pwrite may write less than asked for
+            while len(view) > 0:
+                count = _pwrite(output, view, offset)
+                view = view[count:]
+                offset += count
+        else:
+            output[indices[start]:indices[stop - 1] + 1] = run
+
+        written += run.nbytes
+
+    return written
@@ -94,7 +94,7 @@ class Spline:
 
         return tangent_vectors, normal_vectors, binormal_vectors
 
-    def calculate_rotation_minimizing_vectors(self, times: np.ndarray) -> tuple:
+    def calculate_rotation_minimizing_vectors(self, times: np.ndarray, initial_frame: tuple | None = None) -> tuple:
         """
         Calculate the rotation minimizing frames of the spline at a set of time points.
 
@@ -108,6 +108,8 @@ class Spline:
         Parameters:
         ----------
             times (numpy.ndarray): The time points at which to calculate the rotation minimizing frames.
+            initial_frame (tuple): The normal and binormal vectors (3,) at the first time point, e.g. to continue
+                                   the frames of earlier time points (default is None, an arbitrary frame).
 
         Returns:
         -------
@@ -129,20 +131,23 @@ class Spline:
         # Calculate initial frame
         initial_tangent = tangent_vectors[0]
 
-        # Choose an arbitrary vector that is not parallel to the tangent
-        if np.abs(initial_tangent[0]) < 1e-6 and np.abs(initial_tangent[1]) < 1e-6:
-            initial_normal = np.array([0, 1, 0])
+        if initial_frame is not None:
+            initial_normal, initial_binormal = (np.array(vector, dtype=float) for vector in initial_frame)
         else:
-            initial_normal = np.array([-initial_tangent[1], initial_tangent[0], 0])
+            # Choose an arbitrary vector that is not parallel to the tangent
+            if np.abs(initial_tangent[0]) < 1e-6 and np.abs(initial_tangent[1]) < 1e-6:
+                initial_normal = np.array([0, 1, 0])
+            else:
+                initial_normal = np.array([-initial_tangent[1], initial_tangent[0], 0])
 
-        # Normalize the normal vector
-        initial_normal /= np.linalg.norm(initial_normal)
+            # Normalize the normal vector
+            initial_normal /= np.linalg.norm(initial_normal)
 
-        # Compute the binormal vector as the cross product of T0 and N0
-        initial_binormal = np.cross(initial_tangent, initial_normal)
+            # Compute the binormal vector as the cross product of T0 and N0
+            initial_binormal = np.cross(initial_tangent, initial_normal)
 
-        # Recompute the normal vector as the cross product of B0 and T0
-        initial_normal = np.cross(initial_binormal, initial_tangent)
+            # Recompute the normal vector as the cross product of B0 and T0
+            initial_normal = np.cross(initial_binormal, initial_tangent)
 
         tangents = [initial_tangent]
         normals = [initial_normal]
@@ -0,0 +1,187 @@
+import math
+import threading
+
+import numpy as np
+
+# Quantiles are within this fraction of the true value
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Values at or below this are counted as zero (timings are seconds, so this is far below any clock's resolution)
+MIN_TRACKED_VALUE = 1e-12
+
+SUMMARY_QUANTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+
+class StreamingStats:
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY) -> None:
+        """
+        Summary statistics of a stream of non-negative values (e.g. durations or byte counts) in fixed memory.
+
+        The count, mean and variance are kept with Welford's algorithm, and quantiles come from a
+        histogram of logarithmic buckets (as in DDSketch), so every quantile is within
+        `relative_accuracy` of the true value. Values from 1 us to 1 day need under 1300 buckets at 1%.
+
+        Parameters
+        ----------
+            relative_accuracy : float, optional
+                The relative accuracy of the quantiles, by default DEFAULT_RELATIVE_ACCURACY
+        """
+
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.total = 0.0
+
+        self._zeros = 0
+        self._buckets: dict[int, int] = {}
+        self._summary = None
+
+        # Values are added by the step while its statistics are read by status requests
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, value: float):
+        value = float(value)
+
+        with self._lock:
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+            self.total += value
+
+            if value <= MIN_TRACKED_VALUE:
+                self._zeros += 1
+            else:
+                bucket = math.ceil(math.log(value) / self._log_gamma)
+                self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+            self._summary = None
+
+    def add_many(self, values) -> None:
+        """
+        Add a batch of values, combining their moments with the running ones (Chan et al.).
+        """
+
+        values = np.asarray(values, dtype=np.float64).ravel()
+
+        if len(values) == 0:
+            return
+
+        tracked = values[values > MIN_TRACKED_VALUE]
+        buckets, counts = np.unique(np.ceil(np.log(tracked) / self._log_gamma).astype(np.int64), return_counts=True)
+
+        with self._lock:
+            self._merge_moments(len(values), float(np.mean(values)), float(np.var(values) * len(values)))
+            self.min = min(self.min, float(np.min(values)))
+            self.max = max(self.max, float(np.max(values)))
+            self.total += float(np.sum(values))
+
+            self._zeros += len(values) - len(tracked)
+            for bucket, count in zip(buckets.tolist(), counts.tolist()):
+                self._buckets[bucket] = self._buckets.get(bucket, 0) + count
+
+            self._summary = None
+
+    def merge(self, other: "StreamingStats"):
+        """
+        Add every value of another accumulator with the same relative accuracy.
+        """
+
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only statistics with the same relative accuracy can be merged.")
+
+        with other._lock:
+            count, mean, m2 = other.count, other.mean, other.m2
+            minimum, maximum, total = other.min, other.max, other.total
+            zeros, buckets = other._zeros, dict(other._buckets)
+
+        if count == 0:
+            return
+
+        with self._lock:
+            self._merge_moments(count, mean, m2)
+            self.min = min(self.min, minimum)
+            self.max = max(self.max, maximum)
+            self.total += total
+
+            self._zeros += zeros
+            for bucket, bucket_count in buckets.items():
+                self._buckets[bucket] = self._buckets.get(bucket, 0) + bucket_count
+
+            self._summary = None
+
+    def _merge_moments(self, count: int, mean: float, m2: float):
+        # Must be called with the lock held
+        combined = self.count + count
+        delta = mean - self.mean
+
+        self.mean += delta * count / combined
+        self.m2 += m2 + delta**2 * self.count * count / combined
+        self.count = combined
+
+    def quantile(self, q: float) -> float:
+        with self._lock:
+            return self._quantile(q)
+
+    def _quantile(self, q: float) -> float:
+        # Must be called with the lock held
+        if self.count == 0:
+            return math.nan
+
+        # The extremes are known exactly
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+
+        if rank < self._zeros:
+            return max(self.min, 0.0)
+
+        seen = self._zeros
+        value = self.max
+
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+
+            if seen > rank:
+                # The value that is within the relative accuracy of everything in the bucket
+                value = 2 * self._gamma**bucket / (self._gamma + 1)
+                break
+
+        return min(max(value, self.min), self.max)
+
+    def summary(self) -> dict:
+        """
+        The statistics of the values so far, computed once per change, so it is cheap to call often.
+
+        Returns
+        -------
+        dict
+            The mean, std (population), min, max, total, loops (count) and the p50, p95 and p99 quantiles.
+        """
+
+        with self._lock:
+            if self._summary is None:
+                self._summary = {
+                    "mean": self.mean,
+                    "std": math.sqrt(self.m2 / self.count) if self.count > 0 else 0.0,
+                    "min": self.min,
+                    "max": self.max,
+                    "total": self.total,
+                    "loops": self.count,
+                } | {name: self._quantile(q) for name, q in SUMMARY_QUANTILES.items()}
+
+            return dict(self._summary)
@@ -0,0 +1,353 @@
+from dataclasses import dataclass
+import json
+import os
+
+import numpy as np
+
+from .precomputed import create_precomputed, precomputed_info, write_precomputed
+from .pyramid import StreamingPyramid
+
+DEFAULT_SIZE = (256, 256, 160)
+DEFAULT_CHUNK_SIZE = (64, 64, 64)
+DEFAULT_RESOLUTION = (8, 8, 8)
+
+# The slice size of the default slice options (width, height)
+DEFAULT_SLICE_SIZE = (100, 100)
+
+# Voxels around a slice that its bounding box and the cubic spline interpolation read, plus one spare
+SLICE_SUPPORT = 3
+
+# The size of the blocks of the background noise, in voxels
+NOISE_FEATURE_SIZE = 8
+
+# The radius of the bright tube along the path, in voxels
+TUBE_RADIUS = 3
+
+
+@dataclass
+class SyntheticDataset:
+    source_url: str  # The url of the local precomputed volume
+    neuroglancer_json: str  # The path of the neuroglancer JSON with the volume and the path
+    points: np.ndarray  # The annotation points of the path (n, 3), in voxels of the full resolution level (X, Y, Z)
+
+
+def synthetic_path(
+    size: tuple[int, int, int], times: np.ndarray, turns: float = 1.5, margin: float = None
+) -> np.ndarray:
+    """
+    Points along a helix around the Z axis of a volume, rising from its bottom to its top.
+
+    Parameters
+    ----------
+    size : tuple[int, int, int]
+        The size of the volume (X, Y, Z).
+    times : np.ndarray
+        The positions of the points along the helix, from 0 (start) to 1 (end).
+    turns : float, optional
+        The number of turns of the helix, by default 1.5
+    margin : float, optional
+        The distance from the path to the sides of the volume, by default a third of the smallest side.
+        See `slice_margin` for the margin that slices of a given size need.
+
+    Returns
+    -------
+    np.ndarray
+        The points (n, 3) in voxels (X, Y, Z).
+    """
+
+    if margin is None:
+        margin = min(size) / 3
+
+    times = np.asarray(times, dtype=np.float64)
+    angle = 2 * np.pi * turns * times
+    radius = max(min(size[0], size[1]) / 2 - margin, 0)
+
+    return np.stack(
+        [
+            size[0] / 2 + radius * np.cos(angle),
+            size[1] / 2 + radius * np.sin(angle),
+            margin + max(size[2] - 2 * margin, 0) * times,
+        ],
+        axis=1,
+    )
+
+
+def slice_margin(slice_size: tuple[int, int]) -> float:
+    """
+    The margin (see `synthetic_path`) that keeps slices of a size inside the volume, whatever their orientation.
+
+    Parameters
+    ----------
+    slice_size : tuple[int, int]
+        The slice size (width, height).
+
+    Returns
+    -------
+    float
+        Half the diagonal of a slice, plus SLICE_SUPPORT voxels.
+    """
+
+    return float(np.hypot(*slice_size)) / 2 + SLICE_SUPPORT
+
+
+def _value_range(dtype: np.dtype) -> tuple[float, float]:
+    # The background noise fills the lower half of the range, the tube is the brightest value
+    if np.issubdtype(dtype, np.integer):
+        return np.iinfo(dtype).max // 2, np.iinfo(dtype).max
+
+    return 0.5, 1.0
+
+
+def synthetic_slab(
+    noise: np.ndarray, tube_points: np.ndarray, size: tuple[int, int, int], start: int, depth: int, dtype: np.dtype
+) -> np.ndarray:
+    """
+    Planes `start` to `start + depth` of a synthetic volume: blocky noise with a bright tube along a path.
+
+    Parameters
+    ----------
+    noise : np.ndarray
+        The noise of each block of NOISE_FEATURE_SIZE voxels (Z, Y, X, C).
+    tube_points : np.ndarray
+        Points (n, 3) along the path (X, Y, Z), dense enough to draw a continuous tube.
+    size : tuple[int, int, int]
+        The size of the volume (X, Y, Z).
+    start : int
+        The first plane.
+    depth : int
+        The number of planes.
+    dtype : np.dtype
+        The data type.
+
+    Returns
+    -------
+    np.ndarray
+        The slab (Z, Y, X, C).
+    """
+
+    depth = min(depth, size[2] - start)
+    feature = NOISE_FEATURE_SIZE
+    blocks = noise[start // feature:-(-(start + depth) // feature)]
+
+    # Blocky noise is cheap to make and, unlike white noise, interpolates like real images
+    slab = blocks.repeat(feature, axis=0).repeat(feature, axis=1).repeat(feature, axis=2)
+    first = start - (start // feature) * feature
+    slab = np.ascontiguousarray(slab[first:first + depth, : size[1], : size[0]]).astype(dtype)
+
+    _, bright = _value_range(np.dtype(dtype))
+    r = TUBE_RADIUS
+    offsets = np.stack(np.meshgrid(*[np.arange(-r, r + 1)] * 3, indexing="ij"), axis=-1).reshape(-1, 3)
+    offsets = offsets[np.sum(offsets**2, axis=1) <= r**2]
+
+    near = tube_points[(tube_points[:, 2] >= start - r - 1) & (tube_points[:, 2] < start + depth + r + 1)]
+
+    if len(near) > 0:
+        # Every voxel within the radius of a point of the path (offsets are X, Y, Z)
+        voxels = (np.rint(near)[:, None, :].astype(np.int64) + offsets[None]).reshape(-1, 3)
+        voxels[:, 2] -= start
+        inside = np.all((voxels >= 0) & (voxels < (size[0], size[1], depth)), axis=1)
+        voxels = voxels[inside]
+        slab[voxels[:, 2], voxels[:, 1], voxels[:, 0]] = bright
+
+    return slab
+
+
+def write_synthetic_volume(
+    path: str,
+    size: tuple[int, int, int] = DEFAULT_SIZE,
+    dtype: np.dtype = np.uint8,
+    chunk_size: tuple[int, int, int] = DEFAULT_CHUNK_SIZE,
+    channels: int = 1,
+    mips: int = 1,
+    resolution: tuple[float, float, float] = DEFAULT_RESOLUTION,
+    factor: tuple[int, int, int] = (2, 2, 2),
+    tube_points: np.ndarray | None = None,
+    seed: int = 0,
+) -> str:
+    """
+    Write a local precomputed volume of synthetic data, one slab of chunks at a time.
+
+    Parameters
+    ----------
+    path : str
+        The folder of the volume.
+    size : tuple[int, int, int], optional
+        The size of the full resolution level (X, Y, Z), by default DEFAULT_SIZE
+    dtype : np.dtype, optional
+        The data type, by default np.uint8
+    chunk_size : tuple[int, int, int], optional
+        The chunk size of every level (X, Y, Z), by default DEFAULT_CHUNK_SIZE
+    channels : int, optional
+        The number of channels, by default 1
+    mips : int, optional
+        The number of levels (MIPs), including the full resolution one, by default 1
+    resolution : tuple[float, float, float], optional
+        The voxel size in nanometers (X, Y, Z), by default DEFAULT_RESOLUTION
+    factor : tuple[int, int, int], optional
+        The downsampling of each level from the one above it (X, Y, Z), by default (2, 2, 2)
+    tube_points : np.ndarray | None, optional
+        Dense points (n, 3) along a path to draw as a bright tube (X, Y, Z), by default None (no tube)
+    seed : int, optional
+        The seed of the noise, by default 0
+
+    Returns
+    -------
+    str
+        The url of the volume.
+    """
+
+    dtype = np.dtype(dtype)
+    size = tuple(int(value) for value in size)
+    levels = max(int(mips), 1) - 1
+
+    info = precomputed_info(size, dtype, resolution, (0, 0, 0), chunk_size, levels=levels, factor=factor,
+                            num_channels=channels)
+    url = create_precomputed(path, info)
+
+    low, _ = _value_range(dtype)
+    blocks = [-(-value // NOISE_FEATURE_SIZE) for value in size]
+    noise = np.random.default_rng(seed).random((blocks[2], blocks[1], blocks[0], channels)) * low
+
+    if tube_points is None:
+        tube_points = np.empty((0, 3))
+
+    # Each finished slab of a downsampled level is written once every channel has produced it
+    pending = {}
+
+    def collect(channel, level, start, data):
+        pending.setdefault((level, start), {})[channel] = data
+
+        if len(pending[(level, start)]) == channels:
+            slab = pending.pop((level, start))
+            write_precomputed(url, (start, 0, 0), np.stack([slab[c] for c in range(channels)], axis=-1), level)
+
+    pyramids = [
+        StreamingPyramid(
+            (size[2], size[1], size[0]),
+            tuple(reversed(factor)),
+            [chunk_size[2]] * levels,
+            "mean",
+            False,
+            dtype,
+            lambda level, start, data, channel=channel: collect(channel, level, start, data),
+        )
+        for channel in range(channels)
+    ]
+
+    for start in range(0, size[2], chunk_size[2]):
+        slab = synthetic_slab(noise, tube_points, size, start, chunk_size[2], dtype)
+        write_precomputed(url, (start, 0, 0), slab)
+
+        for channel, pyramid in enumerate(pyramids):
+            pyramid.add(start, pyramid.partial(slab[..., channel]))
+
+    return url
+
+
+def write_neuroglancer_json(
+    path: str,
+    source_url: str,
+    points: np.ndarray,
+    resolution: tuple[float, float, float] = DEFAULT_RESOLUTION,
+    image_layer: str = "image",
+    annotation_layer: str = "path",
+) -> str:
+    """
+    Write a neuroglancer JSON with an image layer and a point annotation layer, as read by `parse_neuroglancer_json`.
+
+    Returns
+    -------
+    str
+        The path of the JSON file.
+    """
+
+    data = {
+        "dimensions": {axis: [value * 1e-9, "m"] for axis, value in zip("xyz", resolution)},
+        "layers": [
+            {"type": "image", "source": f"precomputed://{source_url}", "name": image_layer},
+            {
+                "type": "annotation",
+                "name": annotation_layer,
+                "annotations": [{"point": point.tolist(), "type": "point"} for point in np.asarray(points)],
+            },
+        ],
+    }
+
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+    return path
+
+
+def create_synthetic_dataset(
+    folder: str,
+    size: tuple[int, int, int] = DEFAULT_SIZE,
+    dtype: np.dtype = np.uint8,
+    chunk_size: tuple[int, int, int] = DEFAULT_CHUNK_SIZE,
+    channels: int = 1,
+    mips: int = 1,
+    resolution: tuple[float, float, float] = DEFAULT_RESOLUTION,
+    num_points: int = 40,
+    turns: float = 1.5,
+    margin: float = None,
+    slice_size: tuple[int, int] | None = None,
+    seed: int = 0,
+) -> SyntheticDataset:
+    """
+    Create a synthetic dataset for offline, reproducible slicing: a local precomputed volume with a
+    bright tube along a curved path, and a neuroglancer JSON annotating points on that path.
+
+    Parameters
+    ----------
+    folder : str
+        The folder to create the volume (`volume`) and the JSON (`neuroglancer.json`) in.
+    size, dtype, chunk_size, channels, mips, resolution, seed
+        See `write_synthetic_volume`.
+    num_points : int, optional
+        The number of annotation points, by default 40
+    turns, margin
+        See `synthetic_path`.
+    slice_size : tuple[int, int] | None, optional
+        The largest slice size (width, height) the path is sliced with, which sets the margin
+        (see `slice_margin`) unless one is given. Raises a ValueError if such slices do not fit
+        in the volume. By default None
+
+    Returns
+    -------
+    SyntheticDataset
+        The dataset.
+    """
+
+    if margin is None and slice_size is not None:
+        margin = slice_margin(slice_size)
+
+        if 2 * margin > min(size):
+            raise ValueError(
+                f"Slices of {slice_size[0]}x{slice_size[1]} do not fit in a volume of size {tuple(size)}, "
+                f"every side must be at least {int(np.ceil(2 * margin))}."
+            )
+
+    os.makedirs(folder, exist_ok=True)
+
+    points = synthetic_path(size, np.linspace(0, 1, num_points), turns, margin)
+
+    # Two points per voxel along the path, so the tube has no gaps
+    length = np.sum(np.linalg.norm(np.diff(points, axis=0), axis=1))
+    tube_points = synthetic_path(size, np.linspace(0, 1, max(int(length * 2), 2)), turns, margin)
+
+    source_url = write_synthetic_volume(
+        os.path.join(folder, "volume"),
+        size,
+        dtype,
+        chunk_size,
+        channels,
+        mips,
+        resolution,
+        tube_points=tube_points,
+        seed=seed,
+    )
+    neuroglancer_json = write_neuroglancer_json(
+        os.path.join(folder, "neuroglancer.json"), source_url, points, resolution
+    )
+
+    return SyntheticDataset(source_url, neuroglancer_json, points)
@@ -0,0 +1,166 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+# Historical per-stage thread defaults, used when no explicit I/O thread count is given
+DEFAULT_CHUNK_IO_THREADS = 12
+DEFAULT_MERGE_IO_THREADS = 4
+
+# Fraction of the process budget given to writers when the split is derived from the CPU count
+DEFAULT_WRITER_FRACTION = 0.25
+
+
+@dataclass
+class WorkerTopology:
+    compute_processes: int
+    writer_processes: int
+    chunk_io_threads: int = DEFAULT_CHUNK_IO_THREADS
+    merge_io_threads: int = DEFAULT_MERGE_IO_THREADS
+    auto_tune: bool = False
+
+    @property
+    def total_processes(self) -> int:
+        return self.compute_processes + self.writer_processes
+
+    def to_dict(self) -> dict:
+        return {
+            "compute_processes": self.compute_processes,
+            "writer_processes": self.writer_processes,
+            "chunk_io_threads": self.chunk_io_threads,
+            "merge_io_threads": self.merge_io_threads,
+            "auto_tune": self.auto_tune,
+        }
+
+
+def resolve_worker_topology(
+    process_budget: int,
+    compute_processes: int = 0,
+    writer_processes: int = 0,
+    io_threads: int = 0,
+    auto_tune: bool = False,
+) -> WorkerTopology:
+    """
+    Determine the number of compute processes, writer processes and I/O threads to use.
+
+    Explicit (non-zero) values are always respected. Any value left at 0 is derived from the process budget,
+    always leaving at least one process for each stage.
+
+    Parameters
+    ----------
+    process_budget : int
+        The total number of processes available (usually the CPU count).
+    compute_processes : int, optional
+        The number of compute processes, by default 0 (derive from the budget).
+    writer_processes : int, optional
+        The number of writer processes, by default 0 (derive from the budget).
+    io_threads : int, optional
+        The number of I/O threads per process, by default 0 (use the per-stage defaults).
+    auto_tune : bool, optional
+        Whether to rebalance the stages from measured throughput during the run, by default False.
+
+    Returns
+    -------
+    WorkerTopology
+        The resolved topology.
+    """
+
+    process_budget = max(int(process_budget), 2)
+
+    if writer_processes <= 0 and compute_processes > 0:
+        writer_processes = max(process_budget - compute_processes, 1)
+    elif writer_processes <= 0:
+        writer_processes = max(int(process_budget * DEFAULT_WRITER_FRACTION), 1)
+
+    if compute_processes <= 0:
+        compute_processes = max(process_budget - writer_processes, 1)
+
+    return WorkerTopology(
+        compute_processes=compute_processes,
+        writer_processes=writer_processes,
+        chunk_io_threads=io_threads if io_threads > 0 else DEFAULT_CHUNK_IO_THREADS,
+        merge_io_threads=io_threads if io_threads > 0 else DEFAULT_MERGE_IO_THREADS,
+        auto_tune=auto_tune,
+    )
+
+
+class StageBalancer:
+    def __init__(self, topology: WorkerTopology) -> None:
+        """
+        Split a process budget between a compute stage and a writer stage.
+
+        Without auto tuning, the split is the one given by the topology.
+        With auto tuning, the split follows the measured cost of the remaining work in each stage,
+        and writer slots that have nothing to write are lent to the compute stage.
+
+        Parameters
+        ----------
+            topology : WorkerTopology
+                The topology to balance.
+        """
+
+        self.topology = topology
+        self.durations = {"compute": [0.0, 0], "write": [0.0, 0]}
+
+    @property
+    def pool_sizes(self) -> tuple[int, int]:
+        """
+        The sizes of the (compute, writer) process pools.
+
+        With auto tuning, either stage may use the entire budget, so both stages share one pool
+        of the whole budget and the writer pool size is 0. The pool then caps the processes of
+        both stages together, while `slots` sets the mix.
+        """
+
+        if self.topology.auto_tune:
+            return self.topology.total_processes, 0
+
+        return self.topology.compute_processes, self.topology.writer_processes
+
+    def record(self, stage: str, seconds: float):
+        total, count = self.durations[stage]
+        self.durations[stage] = [total + seconds, count + 1]
+
+    def mean_duration(self, stage: str) -> float | None:
+        total, count = self.durations[stage]
+        return total / count if count > 0 else None
+
+    def slots(self, remaining_compute: int, remaining_writes: int, available_writes: int) -> tuple[int, int]:
+        """
+        Calculate how many tasks of each stage may be in flight.
+
+        Parameters
+        ----------
+            remaining_compute : int
+                The number of compute tasks not yet finished.
+            remaining_writes : int
+                The number of write tasks not yet finished (including those not yet available).
+            available_writes : int
+                The number of write tasks that can be run right now (queued or in flight).
+
+        Returns
+        -------
+            tuple[int, int]
+                The number of (compute, writer) slots. With auto tuning, they add up to the budget,
+                and writers only get slots for available writes.
+        """
+
+        if not self.topology.auto_tune:
+            return self.topology.compute_processes, self.topology.writer_processes
+
+        total = self.topology.total_processes
+        compute_mean = self.mean_duration("compute")
+        write_mean = self.mean_duration("write")
+
+        if remaining_compute <= 0:
+            writer_share = total
+        elif compute_mean is None or write_mean is None:
+            writer_share = self.topology.writer_processes
+        else:
+            compute_work = remaining_compute * compute_mean
+            write_work = remaining_writes * write_mean
+            writer_share = int(np.round(total * write_work / max(compute_work + write_work, 1e-9)))
+            writer_share = int(np.clip(writer_share, 1, total - 1))
+
+        writers = min(writer_share, available_writes)
+
+        return total - writers, writers
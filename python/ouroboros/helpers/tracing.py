@@ -0,0 +1,240 @@
+import concurrent.futures
+import contextvars
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+
+# A span is (name, pid, thread id, start, end, bytes), with times in seconds of time.perf_counter,
+# which is monotonic and shared by every process on the machine.
+Span = tuple[str, int, int, float, float, int]
+
+# The tracer that spans of the current thread (or task) are recorded into, None when tracing is off
+_current_tracer = contextvars.ContextVar("ouroboros_tracer", default=None)
+
+
+class Tracer:
+    def __init__(self) -> None:
+        """
+        A buffer of spans, recorded by the pipeline steps and the workers they start, that can be
+        exported as a Chrome trace (viewable in Perfetto or chrome://tracing).
+        """
+
+        # Appending to a list is atomic, so threads record without a lock
+        self.spans: list[Span] = []
+
+    def record(self, name: str, start: float, end: float, num_bytes: int = 0):
+        self.spans.append((name, os.getpid(), threading.get_ident(), start, end, int(num_bytes)))
+
+    def extend(self, spans: list[Span]):
+        self.spans.extend(spans)
+
+    def to_chrome_trace(self) -> dict:
+        return chrome_trace(self.spans)
+
+    def write(self, path: str):
+        """
+        Write the spans to a Chrome trace JSON file.
+        """
+
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+def current_tracer() -> Tracer | None:
+    return _current_tracer.get()
+
+
+@contextmanager
+def tracing(tracer: Tracer | None):
+    """
+    Record the spans of the current thread into a tracer while the context is open.
+
+    Threads and processes started through `traced_executor` record into the same tracer.
+    A tracer of None turns tracing off.
+    """
+
+    token = _current_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current_tracer.reset(token)
+
+
+def record_span(name: str, start: float, end: float, num_bytes: int = 0):
+    """
+    Record a span that was already timed with time.perf_counter. Does nothing when tracing is off.
+    """
+
+    tracer = _current_tracer.get()
+
+    if tracer is not None:
+        tracer.record(name, start, end, num_bytes)
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "bytes", "start")
+
+    def __init__(self, tracer: Tracer, name: str, num_bytes: int) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.bytes = num_bytes
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.tracer.record(self.name, self.start, time.perf_counter(), self.bytes)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    # Assigning the bytes of a span is ignored when tracing is off
+    bytes = property(lambda self: 0, lambda self, value: None)
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, num_bytes: int = 0) -> _Span | _NullSpan:
+    """
+    Time the enclosed block as a span. The bytes can also be set on the span inside the block.
+
+    Example
+    -------
+        with span("download") as s:
+            data = download()
+            s.bytes = data.nbytes
+    """
+
+    tracer = _current_tracer.get()
+
+    if tracer is None:
+        return _NULL_SPAN
+
+    return _Span(tracer, name, num_bytes)
+
+
+def _run_in_thread(tracer: Tracer, fn, args, kwargs):
+    with tracing(tracer):
+        return fn(*args, **kwargs)
+
+
+def _run_in_process(fn, args, kwargs):
+    # Runs in a worker process, which keeps its spans in its own buffer and returns them with the result
+    tracer = Tracer()
+
+    with tracing(tracer):
+        result = fn(*args, **kwargs)
+
+    return result, tracer.spans
+
+
+class TracingExecutor(concurrent.futures.Executor):
+    def __init__(self, executor: concurrent.futures.Executor, tracer: Tracer, processes: bool) -> None:
+        """
+        Wrap an executor so the tasks it runs record spans into a tracer.
+
+        Tasks in threads record directly into the tracer. Tasks in processes record into a buffer
+        of their own, which is merged into the tracer when the task is done. The tracer is kept
+        by the executor, since tasks are often submitted from callbacks of other threads.
+        """
+
+        self._executor = executor
+        self._tracer = tracer
+        self._processes = processes
+
+    def submit(self, fn, /, *args, **kwargs) -> concurrent.futures.Future:
+        if not self._processes:
+            return self._executor.submit(_run_in_thread, self._tracer, fn, args, kwargs)
+
+        inner = self._executor.submit(_run_in_process, fn, args, kwargs)
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+
+        def complete(inner: concurrent.futures.Future):
+            if inner.cancelled():
+                future.set_exception(concurrent.futures.CancelledError())
+            elif inner.exception() is not None:
+                future.set_exception(inner.exception())
+            else:
+                result, spans = inner.result()
+                self._tracer.extend(spans)
+                future.set_result(result)
+
+        inner.add_done_callback(complete)
+
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+def traced_executor(executor: concurrent.futures.Executor, processes: bool = False) -> concurrent.futures.Executor:
+    """
+    Wrap an executor in a `TracingExecutor` when tracing is on, otherwise return it as is.
+
+    Parameters
+    ----------
+        executor : concurrent.futures.Executor
+            The executor.
+        processes : bool, optional
+            Whether the executor runs tasks in other processes, by default False
+
+    Returns
+    -------
+        concurrent.futures.Executor
+            The executor to submit tasks to.
+    """
+
+    tracer = _current_tracer.get()
+
+    if tracer is None:
+        return executor
+
+    return TracingExecutor(executor, tracer, processes)
+
+
+def chrome_trace(spans: list[Span]) -> dict:
+    """
+    Convert spans to the Chrome trace event format, with times in microseconds from the first span.
+
+    Each process is shown as its own track, with a row per thread.
+    """
+
+    origin = min((start for _, _, _, start, _, _ in spans), default=0.0)
+    events = []
+    pids = set()
+
+    for name, pid, tid, start, end, num_bytes in sorted(spans, key=lambda s: s[3]):
+        event = {
+            "name": name,
+            "ph": "X",
+            "pid": pid,
+            "tid": tid,
+            "ts": (start - origin) * 1e6,
+            "dur": max(end - start, 0.0) * 1e6,
+        }
+
+        if num_bytes > 0:
+            event["args"] = {"bytes": num_bytes}
+
+        events.append(event)
+        pids.add(pid)
+
+    parent = os.getpid()
+
+    for pid in sorted(pids):
+        name = "ouroboros" if pid == parent else f"worker {pid}"
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": name}})
+
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -1,8 +1,12 @@
 from cloudvolume import CloudVolume, VolumeCutout
 import numpy as np
+import time
 
 from .bounding_boxes import BoundingBox, boxes_dim_range
 from .memory_usage import calculate_gigabytes_from_dimensions
+from .metrics import count
+from .network_shaper import NetworkShaper
+from .tracing import record_span
 
 FLUSH_CACHE = False
 
@@ -25,6 +29,9 @@ class VolumeCache:
 
         self.last_requested_slice = None
 
+        # Downloads shared with other paths of a batch (see SharedDownloads), set by the batch
+        self.shared_downloads = None
+
         # Stores the volume data for each bounding box
         self.volumes = [None] * len(bounding_boxes)
 
@@ -67,6 +74,16 @@ class VolumeCache:
     def get_volume_shape(self) -> tuple[int, ...]:
         return self.cv.get_volume_shape(self.mip)
 
+    def get_voxel_offset(self) -> tuple[int, ...]:
+        return self.cv.get_voxel_offset(self.mip)
+
+    def get_chunk_size(self) -> tuple[int, ...]:
+        return self.cv.get_chunk_size(self.mip)
+
+    def get_volume_max(self) -> np.ndarray:
+        # The end of the volume (X, Y, Z), past the last voxel
+        return np.asarray(self.get_voxel_offset()[:3]) + np.asarray(self.get_volume_shape()[:3])
+
     def has_color_channels(self) -> bool:
         return self.cv.has_color_channels
 
@@ -82,6 +99,9 @@ class VolumeCache:
     def set_volume_mip(self, mip: int):
         self.mip = mip
 
+    def get_resolution_nm(self):
+        return self.cv.get_resolution_nm(self.mip)
+
     def get_resolution_um(self):
         return self.cv.get_resolution_um(self.mip)
 
@@ -117,7 +137,10 @@ class VolumeCache:
 
         # Download the volume if it is not already cached
         if self.volumes[vol_index] is None:
+            count("volume_cache_misses")
             self.download_volume(vol_index, bounding_box)
+        else:
+            count("volume_cache_hits")
 
         # Remove the last requested volume if it is not to be cached
         if (
@@ -141,10 +164,13 @@ class VolumeCache:
     def download_volume(
         self, volume_index: int, bounding_box: BoundingBox, parallel=False
     ) -> VolumeCutout:
-        bbox = bounding_box.to_cloudvolume_bbox()
+        bbox = bounding_box.to_cloudvolume_bbox(self.get_volume_max())
 
-        # Download the bounding box volume
-        volume = self.cv.cv.download(bbox, mip=self.mip, parallel=parallel)
+        # Download the bounding box volume, or cut it from a download shared with other paths
+        if self.shared_downloads is not None:
+            volume = self.shared_downloads.download(self.cv, bbox, mip=self.mip, parallel=parallel)
+        else:
+            volume = self.cv.download(bbox, mip=self.mip, parallel=parallel)
 
         # Store the volume in the cache
         self.volumes[volume_index] = volume
@@ -170,7 +196,10 @@ class VolumeCache:
 
         # Download the volume if it is not already cached
         if self.volumes[volume_index] is None:
+            count("volume_cache_misses")
             self.download_volume(volume_index, bounding_box, parallel=parallel)
+        else:
+            count("volume_cache_hits")
 
         # Get all slice indices associated with this volume
         slice_indices = self.get_slice_indices(volume_index)
@@ -186,8 +215,9 @@ class VolumeCache:
 
 
 class CloudVolumeInterface:
-    def __init__(self, source_url: str):
+    def __init__(self, source_url: str, network_shaper: NetworkShaper | None = None):
         self.source_url = source_url
+        self.network_shaper = network_shaper
 
         self.cv = CloudVolume(self.source_url, parallel=True, cache=True)
 
@@ -195,12 +225,37 @@ class CloudVolumeInterface:
         self.dtype = self.cv.dtype
 
     def to_dict(self):
-        return {"source_url": self.source_url}
+        result = {"source_url": self.source_url}
+
+        if self.network_shaper is not None:
+            result["network_shaper"] = self.network_shaper.to_dict()
+
+        return result
 
     @staticmethod
     def from_dict(data: dict) -> "CloudVolumeInterface":
         source_url = data["source_url"]
-        return CloudVolumeInterface(source_url)
+        network_shaper = NetworkShaper.from_dict(data.get("network_shaper"))
+        return CloudVolumeInterface(source_url, network_shaper)
+
+    def download(self, bbox, mip: int, parallel=False) -> VolumeCutout:
+        """
+        Download a region of the volume, delayed by the network shaper (if any).
+        """
+
+        requested_at = self.network_shaper.clock() if self.network_shaper is not None else 0.0
+        start = time.perf_counter()
+
+        volume = self.cv.download(bbox, mip=mip, parallel=parallel)
+
+        if self.network_shaper is not None:
+            self.network_shaper.wait(volume.nbytes, requested_at)
+
+        record_span("download", start, time.perf_counter(), volume.nbytes)
+        count("downloads")
+        count("download_bytes", volume.nbytes)
+
+        return volume
 
     @property
     def has_color_channels(self) -> bool:
@@ -213,6 +268,12 @@ class CloudVolumeInterface:
     def get_volume_shape(self, mip: int) -> tuple[int, ...]:
         return self.cv.mip_volume_size(mip)
 
+    def get_voxel_offset(self, mip: int) -> tuple[int, ...]:
+        return self.cv.meta.voxel_offset(mip)
+
+    def get_chunk_size(self, mip: int) -> tuple[int, ...]:
+        return self.cv.meta.chunk_size(mip)
+
     def get_resolution_nm(self, mip: int) -> tuple[float, ...]:
         return self.cv.mip_resolution(mip)
 
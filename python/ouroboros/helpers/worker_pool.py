@@ -0,0 +1,197 @@
+from collections import deque
+import concurrent.futures
+from functools import partial
+import importlib
+from multiprocessing import cpu_count
+import threading
+
+from ouroboros.helpers.metrics import SharedCounters, attach_metrics, shared_counters
+
+# Modules imported by every worker process before it accepts work
+WARM_MODULES = ("numpy", "scipy.ndimage", "tifffile", "cloudvolume")
+
+
+def warm_worker(modules: tuple[str, ...] = WARM_MODULES):
+    """
+    Initialize a worker process by importing heavy modules.
+
+    Failures are ignored, since warming is only an optimization.
+
+    Parameters
+    ----------
+    modules : tuple[str, ...], optional
+        The modules to import, by default WARM_MODULES
+    """
+
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except BaseException:
+            pass
+
+
+def _init_worker(modules: tuple[str, ...], counters: SharedCounters | None):
+    attach_metrics(counters)
+    warm_worker(modules)
+
+
+def _noop():
+    return None
+
+
+class WorkerPool:
+    def __init__(self, max_workers: int = None, warm_modules: tuple[str, ...] = WARM_MODULES) -> None:
+        """
+        A long-lived pool of pre-warmed worker processes, shared by pipeline steps.
+
+        Steps borrow a view of the pool (see `borrow`) instead of creating their own
+        process pool, so process startup and imports are only paid once.
+
+        Parameters
+        ----------
+            max_workers : int, optional
+                The number of worker processes, by default the CPU count.
+            warm_modules : tuple[str, ...], optional
+                The modules to import in each worker, by default WARM_MODULES
+        """
+
+        self.max_workers = max_workers if max_workers is not None else cpu_count()
+        self.warm_modules = warm_modules
+
+        self._lock = threading.Lock()
+        self._executor = self._create_executor()
+
+    def _create_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(self.warm_modules, shared_counters()),
+        )
+
+    @property
+    def executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            # A worker dying (e.g. out of memory) breaks the whole executor, so replace it
+            if getattr(self._executor, "_broken", False):
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._create_executor()
+
+            return self._executor
+
+    def prestart(self) -> "WorkerPool":
+        """
+        Start and warm every worker process now rather than on first use.
+        """
+
+        for _ in range(self.max_workers):
+            self.executor.submit(_noop)
+
+        return self
+
+    def borrow(self, max_workers: int = None) -> "BorrowedExecutor":
+        """
+        Borrow the pool as an executor limited to a number of concurrent tasks.
+
+        Shutting down the borrowed executor only waits for (or cancels) its own tasks.
+
+        Parameters
+        ----------
+            max_workers : int, optional
+                The maximum number of tasks run at once, by default the size of the pool.
+
+        Returns
+        -------
+            BorrowedExecutor
+                The borrowed executor.
+        """
+
+        return BorrowedExecutor(self, max_workers if max_workers is not None else self.max_workers)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+        return False
+
+
+class BorrowedExecutor(concurrent.futures.Executor):
+    def __init__(self, pool: WorkerPool, max_workers: int) -> None:
+        self._pool = pool
+        self._max_workers = max(max_workers, 1)
+
+        # Re-entrant, since an inner future that is already done runs its callback immediately
+        self._lock = threading.RLock()
+        self._pending = deque()
+        self._futures = set()
+        self._inner = {}
+        self._running = 0
+        self._shutdown = False
+
+    def submit(self, fn, /, *args, **kwargs) -> concurrent.futures.Future:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+
+            future = concurrent.futures.Future()
+            self._futures.add(future)
+            self._pending.append((future, fn, args, kwargs))
+            self._dispatch()
+
+        return future
+
+    def _dispatch(self):
+        # Must be called with the lock held
+        while len(self._pending) > 0 and self._running < self._max_workers:
+            future, fn, args, kwargs = self._pending.popleft()
+
+            if not future.set_running_or_notify_cancel():
+                self._futures.discard(future)
+                continue
+
+            try:
+                inner = self._pool.executor.submit(fn, *args, **kwargs)
+            except BaseException as e:
+                self._futures.discard(future)
+                future.set_exception(e)
+                continue
+
+            self._running += 1
+            self._inner[future] = inner
+            inner.add_done_callback(partial(self._complete, future))
+
+    def _complete(self, future: concurrent.futures.Future, inner: concurrent.futures.Future):
+        with self._lock:
+            self._running -= 1
+            self._futures.discard(future)
+            self._inner.pop(future, None)
+            self._dispatch()
+
+        if inner.cancelled():
+            future.set_exception(concurrent.futures.CancelledError())
+        elif inner.exception() is not None:
+            future.set_exception(inner.exception())
+        else:
+            future.set_result(inner.result())
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._lock:
+            self._shutdown = True
+
+            if cancel_futures:
+                while len(self._pending) > 0:
+                    future, *_ = self._pending.popleft()
+                    future.cancel()
+                    self._futures.discard(future)
+
+                # Cancelling runs the completion callback, which removes entries from _inner
+                for inner in list(self._inner.values()):
+                    inner.cancel()
+
+            futures = list(self._futures)
+
+        if wait:
+            concurrent.futures.wait(futures)
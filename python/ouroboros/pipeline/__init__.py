@@ -4,6 +4,8 @@ from .slices_geom_pipeline import SlicesGeometryPipelineStep
 from .volume_cache_pipeline import VolumeCachePipelineStep
 from .slice_parallel_pipeline import SliceParallelPipelineStep
 from .backproject_pipeline import BackprojectPipelineStep
+from .slice_stream_pipeline import SliceStreamPipelineStep
+from .batch_slice_pipeline import BatchGeometryPipelineStep, BatchSlicePipelineStep
 from .save_config_pipeline import SaveConfigPipelineStep
 from .load_config_pipeline import LoadConfigPipelineStep
 
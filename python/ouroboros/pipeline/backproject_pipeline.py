@@ -1,8 +1,11 @@
+from collections import deque
 import concurrent.futures
+from contextlib import nullcontext
 from dataclasses import astuple
 from functools import partial
 from multiprocessing import cpu_count
 from multiprocessing.pool import ThreadPool
+import json
 import os
 from pathlib import Path
 import shutil
@@ -28,25 +31,50 @@ from ouroboros.helpers.slice import (        # noqa: F401
 )
 from ouroboros.helpers.volume_cache import VolumeCache, get_mip_volume_sizes, update_writable_rects
 from ouroboros.helpers.bounding_boxes import BoundingBox
+from ouroboros.helpers.checkpoint import CheckpointManifest, checkpoint_fingerprint
+from ouroboros.helpers.ome_zarr import OUTPUT_FORMATS, create_ome_zarr, read_region, read_zarray, write_region
+from ouroboros.helpers.precomputed import (
+    PRECOMPUTED_FORMAT,
+    create_precomputed,
+    precomputed_info,
+    read_precomputed,
+    read_precomputed_info,
+    write_precomputed
+)
+from ouroboros.helpers.pyramid import StreamingPyramid, pyramid_partial, resolve_pyramid_method
+from ouroboros.helpers.metrics import count
+from ouroboros.helpers.tracing import record_span, traced_executor
 from .pipeline import PipelineStep
 from ouroboros.helpers.options import BackprojectOptions
 from ouroboros.helpers.files import (
+    format_backproject_checkpoint_file,
+    format_backproject_output_precomputed,
     format_backproject_resave_volume,
+    format_slice_output_zarr,
     format_tiff_name,
     get_sorted_tif_files,
     join_path,
     num_digits_for_n_files,
     parse_tiff_name,
     generate_tiff_write,
+    write_conv_slab,
     write_conv_vol,
     write_small_intermediate
 )
 from ouroboros.helpers.shapes import DataRange, ImgSlice
+from ouroboros.helpers.topology import (
+    DEFAULT_CHUNK_IO_THREADS,
+    StageBalancer,
+    resolve_worker_topology
+)
 
 
 DEFAULT_CHUNK_SIZE = 160
 AXIS = 0
 
+# Backprojections are volumes in the space of the source, so they can also be written as a neuroglancer layer
+BACKPROJECT_OUTPUT_FORMATS = OUTPUT_FORMATS + (PRECOMPUTED_FORMAT,)
+
 
 class BackprojectPipelineStep(PipelineStep):
     def __init__(self, processes=cpu_count()) -> None:
@@ -59,6 +87,19 @@ class BackprojectPipelineStep(PipelineStep):
         )
 
         self.num_processes = processes
+        self.resume = False
+
+    def with_processes(self, processes: int) -> "BackprojectPipelineStep":
+        self.num_processes = processes
+        return self
+
+    def with_resume(self, resume: bool = True) -> "BackprojectPipelineStep":
+        """
+        Continue a previous run of the same job from its intermediates and written planes.
+        """
+
+        self.resume = resume
+        return self
 
     def _process(self, input_data: any) -> tuple[any, None] | tuple[None, any]:
         config, volume_cache, slice_rects, pipeline_input = input_data
@@ -79,7 +120,27 @@ class BackprojectPipelineStep(PipelineStep):
         if not isinstance(slice_rects, np.ndarray):
             return "Input data must contain an array of slice rects."
 
+        if config.output_format not in BACKPROJECT_OUTPUT_FORMATS:
+            return f"Invalid output format: {config.output_format}. Use one of {BACKPROJECT_OUTPUT_FORMATS}."
+
+        # OME-Zarr and precomputed output are written in slabs of whole chunks, rather than one tiff per plane
+        use_zarr = config.output_format == "ome-zarr"
+        use_precomputed = config.output_format == PRECOMPUTED_FORMAT
+        chunked_output = use_zarr or use_precomputed
+
+        if chunked_output and pipeline_input.slice_options.output_mip_level != config.output_mip_level:
+            return f"Rescaling the backprojection to another mip level is not supported for {config.output_format}."
+
+        try:
+            pyramid_method = resolve_pyramid_method(config.pyramid_method, config.make_backprojection_binary)
+        except ValueError as e:
+            return str(e)
+
+        # Pyramid levels are downsampled from the one above (Z, Y, X)
+        pyramid_factors = tuple(int(factor) for factor in reversed(config.pyramid_factor))
+
         straightened_volume_path = config.straightened_volume_path
+        source_stat = os.stat(straightened_volume_path) if os.path.exists(straightened_volume_path) else None
 
         # Make sure the straightened volume exists
         if not os.path.exists(straightened_volume_path):
@@ -129,7 +190,15 @@ class BackprojectPipelineStep(PipelineStep):
 
         pipeline_input.output_file_path = f"{config.output_file_name}_{'_'.join(map(str, full_bounding_box.get_min(np.uint32)))}"
         folder_path = Path(config.output_file_folder, pipeline_input.output_file_path)
-        folder_path.mkdir(exist_ok=True, parents=True)
+        chunked_path = Path(
+            config.output_file_folder,
+            format_slice_output_zarr(pipeline_input.output_file_path)
+            if use_zarr
+            else format_backproject_output_precomputed(pipeline_input.output_file_path)
+        )
+
+        if not chunked_output:
+            folder_path.mkdir(exist_ok=True, parents=True)
 
         i_path = Path(config.output_file_folder,
                       f"{config.output_file_name}_t_{'_'.join(map(str, full_bounding_box.get_min(np.uint32)))}")
@@ -145,28 +214,88 @@ class BackprojectPipelineStep(PipelineStep):
                             micron_resolution=volume_cache.get_resolution_um(),
                             backprojection_offset=bp_offset)
 
+        topology = resolve_worker_topology(
+            self.num_processes,
+            compute_processes=config.worker_params.compute_processes,
+            writer_processes=config.worker_params.writer_processes,
+            io_threads=config.worker_params.io_threads,
+            auto_tune=config.worker_params.auto_tune,
+        )
+        balancer = StageBalancer(topology)
+        self.timing["topology"] = topology.to_dict()
+
+        if use_zarr:
+            resolution = volume_cache.get_resolution_um()
+            scale = [resolution[2], resolution[1], resolution[0]]
+            create_zarr = partial(
+                create_ome_zarr,
+                str(chunked_path),
+                write_shape,
+                np.uint16,
+                tuple(config.zarr_params.chunk_shape),
+                [
+                    {"name": "z", "type": "space", "unit": "micrometer"},
+                    {"name": "y", "type": "space", "unit": "micrometer"},
+                    {"name": "x", "type": "space", "unit": "micrometer"},
+                ],
+                scale,
+                # Position the output in the coordinates of the source volume
+                translation=[offset * size for offset, size in zip(np.flip(full_bounding_box.get_min(int)), scale)],
+                compression=config.zarr_params.compression,
+                compression_level=config.zarr_params.compression_level,
+                levels=config.zarr_params.pyramid_levels,
+                name=config.output_file_name,
+                factors=pyramid_factors,
+                method=pyramid_method,
+            )
+
+            def create_output():
+                layouts = create_zarr()
+                return layouts, layouts[0].to_zarray()
+
+            read_output = partial(read_zarray, str(chunked_path.joinpath("0")))
+        elif use_precomputed:
+            # Precomputed volumes are X, Y, Z, in the voxel coordinates of the source
+            info = precomputed_info(
+                np.flip(write_shape),
+                np.uint16,
+                volume_cache.get_resolution_nm(),
+                full_bounding_box.get_min(int),
+                config.precomputed_params.chunk_size,
+                layer_type="segmentation" if config.make_backprojection_binary else "image",
+                levels=config.precomputed_params.pyramid_levels,
+                factor=config.pyramid_factor,
+            )
+
+            def create_output():
+                return create_precomputed(str(chunked_path), info), json.loads(json.dumps(info))
+
+            read_output = partial(read_precomputed_info, str(chunked_path))
+
+        output = None
+        pyramid = None
+        checkpoint = None
+
         # Process each bounding box in parallel, writing the results to the backprojected volume
         try:
-            with (concurrent.futures.ProcessPoolExecutor((self.num_processes // 4) * 3) as executor,
-                 concurrent.futures.ProcessPoolExecutor(self.num_processes // 4) as write_executor):
-                bp_futures = []
-                write_futures = []
+            # With auto tuning, both stages share one pool, so together they never exceed the budget
+            compute_pool_size, writer_pool_size = balancer.pool_sizes
+            with (self.create_process_executor(compute_pool_size) as executor,
+                 (self.create_process_executor(writer_pool_size) if writer_pool_size > 0
+                  else nullcontext(executor)) as write_executor,
+                 traced_executor(concurrent.futures.ThreadPoolExecutor(
+                     max(topology.writer_processes, 1)
+                 )) as pyramid_executor):
+                bp_futures = set()
+                pyramid_futures = []
+                write_futures = {}
+                write_queue = deque()
 
                 chunk_range = DataRange(FPShape.make_with(0), FPShape, FPShape.make_with(DEFAULT_CHUNK_SIZE))
                 chunk_iter = partial(BackProjectIter, shape=FPShape, slice_rects=np.array(slice_rects))
                 processed = np.zeros(astuple(chunk_range.length))
                 z_sources = np.zeros((write_shape[0], ) + astuple(chunk_range.length), dtype=bool)
-
-                for chunk, _, chunk_rects, _, index in chunk_range.get_iter(chunk_iter):
-                    bp_futures.append(executor.submit(
-                        process_chunk,
-                        config,
-                        straightened_volume_path,
-                        chunk_rects,
-                        chunk,
-                        index,
-                        full_bounding_box
-                    ))
+                total_chunks = len(chunk_range)
 
                 # Track what's written.
                 min_dim = full_bounding_box.get_min(int)[2]
@@ -174,56 +303,250 @@ class BackprojectPipelineStep(PipelineStep):
                 writeable = np.zeros(num_pages)
                 pages_written = 0
 
-                def note_written(write_future):
-                    nonlocal pages_written
-                    pages_written += 1
-                    self.update_progress((np.sum(processed) / len(chunk_range)) * (2 / 3)
-                                         + (pages_written / num_pages) * (1 / 3))
-                    for key, value in write_future.result().items():
-                        self.add_timing(key, value)
+                # Record finished chunks (0 to total_chunks - 1) and written planes (total_chunks onwards)
+                checkpoint = CheckpointManifest(
+                    str(Path(config.output_file_folder,
+                             format_backproject_checkpoint_file(pipeline_input.output_file_path))),
+                    checkpoint_fingerprint(
+                        np.array(slice_rects),
+                        astuple(FPShape),
+                        write_shape,
+                        config.straightened_volume_path,
+                        (source_stat.st_size, source_stat.st_mtime_ns) if source_stat else None,
+                        config.model_dump(exclude={"worker_params", "max_ram_gb", "flush_cache"}),
+                    ),
+                    total_chunks + num_pages,
+                )
+                completed = checkpoint.load() if self.resume else set()
+
+                if chunked_output:
+                    # Chunks written by the previous run can only be kept if the output is the same
+                    existing = read_output() if len(completed) > 0 else None
+                    if existing is None and chunked_path.exists():
+                        shutil.rmtree(chunked_path)
+                    output, metadata = create_output()
+                    if existing is not None and existing != metadata:
+                        completed = set()
+                        shutil.rmtree(chunked_path)
+                        output, metadata = create_output()
+
+                    # Planes are written a slab of chunks at a time, so a slab only counts once all of it is
+                    slab_depth = min(
+                        config.zarr_params.chunk_shape[0] if use_zarr else config.precomputed_params.chunk_size[2],
+                        num_pages
+                    )
+                    slab_pages = {
+                        slab: list(range(slab * slab_depth, min((slab + 1) * slab_depth, num_pages)))
+                        for slab in range(-(-num_pages // slab_depth))
+                    }
+                    slab_pending = {slab: len(pages) for slab, pages in slab_pages.items()}
+                    done_pages = set()
+                    for pages in slab_pages.values():
+                        if all(total_chunks + page in completed for page in pages):
+                            done_pages.update(pages)
+
+                    # Downsampled levels are built as the slabs of the full resolution level are written
+                    if use_zarr and len(output) > 1:
+                        def write_level(level, start, data):
+                            pyramid_futures.append(
+                                pyramid_executor.submit(write_region, output[level], (start, 0, 0), data)
+                            )
+
+                        pyramid = StreamingPyramid(
+                            write_shape, pyramid_factors, [layout.chunks[0] for layout in output[1:]],
+                            pyramid_method, config.make_backprojection_binary, np.uint16, write_level
+                        )
+                    elif use_precomputed and config.precomputed_params.pyramid_levels > 0:
+                        def write_level(level, start, data):
+                            pyramid_futures.append(pyramid_executor.submit(
+                                write_precomputed, output, (start, 0, 0), data, level,
+                                config.precomputed_params.compress
+                            ))
 
-                for bp_future in concurrent.futures.as_completed(bp_futures):
-                    start = time.perf_counter()
-                    # Store the durations for each bounding box
-                    durations, index, z_stack = bp_future.result()
-                    for key, value in durations.items():
-                        self.add_timing_list(key, value)
+                        pyramid = StreamingPyramid(
+                            write_shape, pyramid_factors,
+                            [config.precomputed_params.chunk_size[2]] * config.precomputed_params.pyramid_levels,
+                            pyramid_method, config.make_backprojection_binary, np.uint16, write_level
+                        )
+
+                    # Slabs written by the previous run are read back once for the downsampled levels
+                    if pyramid is not None:
+                        for pages in slab_pages.values():
+                            if pages[0] in done_pages:
+                                start, stop = (pages[0], 0, 0), (pages[-1] + 1, *write_shape[1:])
+                                pyramid.add(pages[0], pyramid.partial(
+                                    read_region(output[0], start, stop) if use_zarr
+                                    else read_precomputed(output, start, stop)
+                                ))
+                else:
+                    done_pages = {
+                        i - total_chunks for i in completed
+                        if i >= total_chunks and folder_path.joinpath(f"{i - total_chunks:05}.tif").exists()
+                    }
 
-                    z_sources[(z_stack, ) + index] = True
+                done_chunks = {i for i in completed if i < total_chunks}
 
-                    # Update the progress bar
-                    processed[index] = 1
-                    self.update_progress((np.sum(processed) / len(chunk_range)) * (2 / 3)
-                                         + (pages_written / num_pages) * (1 / 3))
+                # Intermediates of unfinished chunks may be partial, and writes append to them, so remove them
+                done_names = {f"{tuple(map(int, np.unravel_index(i, processed.shape)))}.tif" for i in done_chunks}
+                if i_path.exists():
+                    for intermediate in i_path.glob("i_*/*.tif"):
+                        if intermediate.name not in done_names:
+                            intermediate.unlink()
 
-                    update_writable_rects(processed, slice_rects, min_dim, writeable, DEFAULT_CHUNK_SIZE)
+                checkpoint.open(done_chunks | {total_chunks + page for page in done_pages})
 
-                    if np.any(writeable == 1):
-                        write = np.flatnonzero(writeable == 1)
-                        # Single File needs to be in order
-                        for index in write:
-                            write_futures.append(write_executor.submit(
-                                write_conv_vol,
-                                tif_write(tifffile.imwrite), i_path.joinpath(f"i_{index:05}"),
-                                ImgSlice(*write_shape[1:]), np.uint16, folder_path.joinpath(f"{index:05}.tif")
-                            ))
-                            write_futures[-1].add_done_callback(note_written)
+                for i in done_chunks:
+                    processed[np.unravel_index(i, processed.shape)] = 1
 
-                        writeable[write] = 2
+                if len(done_chunks) > 0:
+                    update_writable_rects(processed, slice_rects, min_dim, writeable, DEFAULT_CHUNK_SIZE)
 
-                    self.add_timing("Process Backproject Future", time.perf_counter() - start)
+                # Planes that were written are not written again
+                for page in done_pages:
+                    writeable[page] = 2
+                pages_written = len(done_pages)
+
+                def queue_writes(pages):
+                    if not chunked_output:
+                        write_queue.extend([int(page)] for page in pages)
+                        return
+
+                    for page in pages:
+                        slab = int(page) // slab_depth
+                        slab_pending[slab] -= 1
+                        if slab_pending[slab] == 0:
+                            write_queue.append(slab_pages[slab])
+
+                write = np.flatnonzero(writeable == 1)
+                queue_writes(write)
+                writeable[write] = 2
+
+                # Chunks are submitted as slots free up, rather than all at once
+                chunks = (
+                    chunk for chunk in chunk_range.get_iter(chunk_iter)
+                    if np.ravel_multi_index(chunk[4], processed.shape) not in done_chunks
+                )
+                chunks_to_submit = total_chunks - len(done_chunks)
+                chunks_submitted = 0
+
+                while True:
+                    compute_slots, writer_slots = balancer.slots(
+                        total_chunks - int(np.sum(processed)),
+                        num_pages - pages_written,
+                        len(write_queue) + len(write_futures),
+                    )
+
+                    while len(bp_futures) < compute_slots and chunks_submitted < chunks_to_submit:
+                        chunk, _, chunk_rects, _, index = next(chunks)
+                        bp_futures.add(executor.submit(
+                            process_chunk,
+                            config,
+                            straightened_volume_path,
+                            chunk_rects,
+                            chunk,
+                            index,
+                            full_bounding_box,
+                            topology.chunk_io_threads
+                        ))
+                        chunks_submitted += 1
+
+                    while len(write_futures) < writer_slots and len(write_queue) > 0:
+                        pages = write_queue.popleft()
+                        if not chunked_output:
+                            future = write_executor.submit(
+                                write_conv_vol,
+                                tif_write(tifffile.imwrite), i_path.joinpath(f"i_{pages[0]:05}"),
+                                ImgSlice(*write_shape[1:]), np.uint16, folder_path.joinpath(f"{pages[0]:05}.tif"),
+                                thread_count=topology.merge_io_threads
+                            )
+                        else:
+                            # Slabs never share a chunk, so they are written without a lock
+                            write_slab = (
+                                partial(write_region, output[0], (pages[0], 0, 0))
+                                if use_zarr
+                                else partial(write_precomputed, output, (pages[0], 0, 0),
+                                             compress=config.precomputed_params.compress)
+                            )
+                            future = write_executor.submit(
+                                write_conv_slab,
+                                write_slab, [i_path.joinpath(f"i_{page:05}") for page in pages],
+                                ImgSlice(*write_shape[1:]), np.uint16,
+                                thread_count=topology.merge_io_threads,
+                                reduce=(
+                                    partial(pyramid_partial, factors=pyramid.partial_factors, method=pyramid_method,
+                                            binary=config.make_backprojection_binary)
+                                    if pyramid is not None
+                                    else None
+                                )
+                            )
+                        write_futures[future] = pages
+
+                    if len(bp_futures) == 0 and len(write_futures) == 0:
+                        break
+
+                    done, _ = concurrent.futures.wait(bp_futures | write_futures.keys(),
+                                                      return_when=concurrent.futures.FIRST_COMPLETED)
+
+                    for future in done:
+                        if future in write_futures:
+                            pages = write_futures.pop(future)
+                            pages_written += len(pages)
+
+                            if chunked_output:
+                                perf, reduced = future.result()
+                                if pyramid is not None:
+                                    pyramid.add(pages[0], reduced)
+                            else:
+                                perf = future.result()
+                            for page in pages:
+                                checkpoint.mark(total_chunks + int(page))
+                            for key, value in perf.items():
+                                self.add_timing(key, value)
+                            balancer.record("write", sum(perf.values()))
+                        else:
+                            bp_futures.remove(future)
+                            start = time.perf_counter()
+
+                            # Store the durations for each bounding box
+                            durations, index, z_stack = future.result()
+                            for key, value in durations.items():
+                                self.add_timing_list(key, value)
+                            balancer.record("compute", durations["total_process"][0])
+
+                            z_sources[(z_stack, ) + index] = True
+                            processed[index] = 1
+                            checkpoint.mark(int(np.ravel_multi_index(index, processed.shape)))
+
+                            update_writable_rects(processed, slice_rects, min_dim, writeable, DEFAULT_CHUNK_SIZE)
+
+                            # Single File needs to be in order
+                            write = np.flatnonzero(writeable == 1)
+                            queue_writes(write)
+                            writeable[write] = 2
+
+                            self.add_timing("Process Backproject Future", time.perf_counter() - start)
+
+                        # Update the progress bar
+                        self.update_progress((np.sum(processed) / total_chunks) * (2 / 3)
+                                             + (pages_written / num_pages) * (1 / 3))
+
+                start = time.perf_counter()
+                for future in pyramid_futures:
+                    future.result()
+                if pyramid is not None:
+                    self.add_timing("pyramid", time.perf_counter() - start)
 
         except BaseException as e:
+            if checkpoint is not None:
+                checkpoint.close()
             traceback.print_tb(e.__traceback__, file=sys.stderr)
             return f"An error occurred while processing the bounding boxes: {e}"
 
-        for write_future in concurrent.futures.as_completed(write_futures):
-            # Consume them to make sure they're finished.
-            pass
-
         start = time.perf_counter()
 
-        if config.make_single_file:
+        if chunked_output:
+            pipeline_input.output_file_path = chunked_path.name
+        elif config.make_single_file:
             pipeline_input.output_file_path += ".tif"
             writer = tif_write(tifffile.TiffWriter(folder_path.with_suffix(".tiff"), bigtiff=is_big_tiff).write)
             for fname in get_sorted_tif_files(folder_path):
@@ -247,6 +570,7 @@ class BackprojectPipelineStep(PipelineStep):
             )
 
             if error is not None:
+                checkpoint.close()
                 return error
 
             # Remove the original backprojected volume
@@ -262,13 +586,16 @@ class BackprojectPipelineStep(PipelineStep):
                 os.rename(output_name, folder_path)
 
         # Update the pipeline input with the output file path
-        pipeline_input.backprojected_folder_path = folder_path
+        pipeline_input.backprojected_folder_path = chunked_path if chunked_output else folder_path
 
         self.add_timing("export", time.perf_counter() - start)
         
-        if config.make_single_file:        
+        if config.make_single_file and not chunked_output:        
             shutil.rmtree(folder_path)
 
+        # The output is complete, so there is nothing left to resume
+        checkpoint.remove()
+
         return None
 
 
@@ -278,7 +605,8 @@ def process_chunk(
     chunk_rects: list[np.ndarray],
     chunk: tuple[slice],
     index: tuple[int],
-    full_bounding_box: BoundingBox
+    full_bounding_box: BoundingBox,
+    io_threads: int = DEFAULT_CHUNK_IO_THREADS
 ) -> tuple[dict, str, int]:
     durations = {}
 
@@ -295,7 +623,9 @@ def process_chunk(
 
     # Close the memmap
     del straightened_volume
-    durations["get_slices"] = [time.perf_counter() - start]
+    end = time.perf_counter()
+    durations["get_slices"] = [end - start]
+    record_span("get_slices", start, end, slices.nbytes)
 
     start = time.perf_counter()
     try:
@@ -305,12 +635,16 @@ def process_chunk(
         traceback.print_tb(be.__traceback__, file=sys.stderr)
         raise be
 
-    durations["back_project"] = [time.perf_counter() - start]
+    end = time.perf_counter()
+    durations["back_project"] = [end - start]
+    record_span("back_project", start, end)
     durations["total_bytes"] = [int(lookup.nbytes + values.nbytes + weights.nbytes)]
 
     if len(values) == 0:
         # No data to write from this chunk, so return as such.
         durations["total_process"] = [time.perf_counter() - start_total]
+        count("chunks_backprojected")
+        count("worker_busy_seconds", durations["total_process"][0])
         return durations, index, []
 
     # Save the data
@@ -348,16 +682,21 @@ def process_chunk(
                                      np.fromiter(offset_dict.values(), dtype=np.uint32, count=4),
                                      yx_vals[z_slice], values[z_slice], weights[z_slice])
 
-        with ThreadPool(12) as pool:
+        with ThreadPool(io_threads) as pool:
             pool.starmap(write_z, enumerate(z_slices))
 
-        durations["write_intermediate"] = [time.perf_counter() - start]
+        end = time.perf_counter()
+        durations["write_intermediate"] = [end - start]
+        record_span("write_intermediate", start, end, durations["total_bytes"][0])
+        count("write_bytes", durations["total_bytes"][0])
     except BaseException as be:
         print(f"Error on BP: {be}")
         traceback.print_tb(be.__traceback__, file=sys.stderr)
         raise be
 
     durations["total_process"] = [time.perf_counter() - start_total]
+    count("chunks_backprojected")
+    count("worker_busy_seconds", durations["total_process"][0])
 
     return durations, index, z_stack + offset[0]
 
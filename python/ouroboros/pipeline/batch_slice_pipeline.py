@@ -0,0 +1,173 @@
+from ouroboros.helpers.files import join_path
+from ouroboros.helpers.network_shaper import NetworkShaper
+from ouroboros.helpers.cost_estimate import cutout_bounds
+from ouroboros.helpers.shared_downloads import SharedDownloads
+from ouroboros.helpers.options import SliceOptions
+from .parse_pipeline import ParseJSONPipelineStep
+from .pipeline import Pipeline, PipelineStep
+from .slice_parallel_pipeline import SliceParallelPipelineStep
+from .slices_geom_pipeline import SlicesGeometryPipelineStep
+from .volume_cache_pipeline import VolumeCachePipelineStep
+import numpy as np
+from collections import defaultdict
+import multiprocessing
+
+# Shared downloads are kept in folders with this prefix, in the output folder of the first path
+SHARED_DOWNLOADS_FOLDER = ".shared-downloads"
+
+
+def _batch_error(index: int, path_input, error: str) -> str:
+    return f"Error in path {index} ({path_input.json_path}): {error}"
+
+
+class BatchGeometryPipelineStep(PipelineStep):
+    def __init__(self) -> None:
+        super().__init__(inputs=("batch_inputs",))
+
+        self.network_shaper = None
+
+    def with_network_shaper(self, network_shaper: NetworkShaper | None) -> "BatchGeometryPipelineStep":
+        """
+        Delay the downloads of the volumes as if over a network with the given latency and bandwidth.
+        """
+
+        self.network_shaper = network_shaper
+        return self
+
+    def _process(self, input_data: tuple[any]) -> None | str:
+        batch_inputs, pipeline_input = input_data
+
+        # Verify that the paths are given
+        if not isinstance(batch_inputs, list) or len(batch_inputs) == 0:
+            return "Input data must contain a list of pipeline inputs, one per path."
+
+        # Paths writing to the same output would overwrite each other
+        outputs = {}
+
+        for i, path_input in enumerate(batch_inputs):
+            config = path_input.slice_options
+
+            if not isinstance(config, SliceOptions):
+                return _batch_error(i, path_input, "Input data must contain a SliceOptions object.")
+
+            # Downloads are shared by planning the boxes of every path up front
+            if config.slicing_params.stream_window_slices > 0:
+                return _batch_error(i, path_input, "Batch slicing does not support stream_window_slices.")
+
+            output = (config.output_file_folder, config.output_file_name)
+
+            if output in outputs:
+                return f"Paths {outputs[output]} and {i} write to the same output: {config.output_file_name}."
+
+            outputs[output] = i
+
+        # Parse each path and plan its slices and bounding boxes, as a single slicing run would
+        for i, path_input in enumerate(batch_inputs):
+            pipeline = Pipeline(
+                [
+                    ParseJSONPipelineStep(),
+                    SlicesGeometryPipelineStep(),
+                    VolumeCachePipelineStep().with_network_shaper(self.network_shaper),
+                ]
+            )
+
+            _, error = pipeline.process(path_input)
+
+            if error:
+                return _batch_error(i, path_input, error)
+
+            for step in pipeline.steps:
+                self.add_timing(step.step_name, step.get_duration())
+
+            self.update_progress((i + 1) / (len(batch_inputs) + 1))
+
+        # The boxes of all paths through the same volume are planned together, so overlapping boxes
+        # are downloaded once
+        volume_caches = defaultdict(list)
+
+        for path_input in batch_inputs:
+            volume_cache = path_input.volume_cache
+            volume_caches[(volume_cache.cv.source_url, volume_cache.mip)].append(volume_cache)
+
+        self.timing["shared_downloads"] = []
+
+        for i, caches in enumerate(volume_caches.values()):
+            shared_downloads = SharedDownloads(
+                np.concatenate([cutout_bounds(volume_cache.bounding_boxes, volume_cache.get_volume_max()) for volume_cache in caches]),
+                join_path(batch_inputs[0].slice_options.output_file_folder, f"{SHARED_DOWNLOADS_FOLDER}-{i}"),
+            )
+
+            for volume_cache in caches:
+                volume_cache.shared_downloads = shared_downloads
+
+            self.timing["shared_downloads"].append(shared_downloads.stats)
+
+        return None
+
+
+class BatchSlicePipelineStep(PipelineStep):
+    def __init__(self, processes=multiprocessing.cpu_count()) -> None:
+        super().__init__(inputs=("batch_inputs",))
+
+        self.num_processes = processes
+        self.resume = False
+
+    def with_processes(self, processes: int) -> "BatchSlicePipelineStep":
+        self.num_processes = processes
+        return self
+
+    def with_resume(self, resume: bool = True) -> "BatchSlicePipelineStep":
+        """
+        Continue a previous run of the same batch, skipping the volumes recorded in the checkpoint of each path.
+        """
+
+        self.resume = resume
+        return self
+
+    def _process(self, input_data: tuple[any]) -> None | str:
+        batch_inputs, pipeline_input = input_data
+
+        # Verify that the paths are given
+        if not isinstance(batch_inputs, list) or len(batch_inputs) == 0:
+            return "Input data must contain a list of pipeline inputs, one per path."
+
+        self.timing["paths"] = []
+
+        try:
+            # Each path is sliced into its own output, while its downloads are shared with the other paths
+            for i, path_input in enumerate(batch_inputs):
+                step = (
+                    SliceParallelPipelineStep()
+                    .with_worker_pool(self.worker_pool)
+                    .with_processes(self.num_processes)
+                    .with_resume(self.resume)
+                )
+                step.listen_for_progress(
+                    lambda progress, i=i: self.update_progress((i + progress) / len(batch_inputs))
+                )
+
+                _, error = step.process(path_input)
+
+                if error:
+                    return _batch_error(i, path_input, error)
+
+                for key, stats in step.timing["custom_times"].items():
+                    self._custom_time(key).merge(stats)
+
+                self.timing["paths"].append(
+                    {
+                        "output_file_path": path_input.output_file_path,
+                        "duration_seconds": step.get_duration(),
+                    }
+                )
+        finally:
+            shared_downloads = {
+                id(path_input.volume_cache.shared_downloads): path_input.volume_cache.shared_downloads
+                for path_input in batch_inputs
+                if path_input.volume_cache is not None and path_input.volume_cache.shared_downloads is not None
+            }
+
+            for downloads in shared_downloads.values():
+                downloads.close()
+
+        return None
@@ -24,6 +24,7 @@ class ParseJSONPipelineStep(PipelineStep):
         if not isinstance(json_path, str):
             return "Input data must contain a string containing a path to a JSON file."
 
+        # Parsed states are cached, so pipelines for many layers of the same state only parse it once
         ng_config, error = parse_neuroglancer_json(json_path)
 
         self.update_progress(0.5)
@@ -1,4 +1,4 @@
-import numpy as np
+import concurrent.futures
 import time
 from abc import ABC, abstractmethod
 from itertools import chain
@@ -6,6 +6,10 @@ from typing import Callable
 
 from tqdm import tqdm
 
+from ouroboros.helpers.metrics import attach_metrics, observe_step_duration, shared_counters
+from ouroboros.helpers.streaming_stats import StreamingStats
+from ouroboros.helpers.tracing import record_span, traced_executor
+from ouroboros.helpers.worker_pool import WorkerPool
 from ouroboros.pipeline.pipeline_input import BasePipelineInput
 
 
@@ -72,6 +76,7 @@ class PipelineStep(ABC):
         self.progress_listener_callables = []
         self.show_progress_bar = False
         self.progress_bar = None
+        self.worker_pool = None
 
         self.inputs = inputs
 
@@ -94,6 +99,8 @@ class PipelineStep(ABC):
         end = time.perf_counter()
         duration_seconds = end - start
         self.timing["duration_seconds"] = duration_seconds
+        record_span(self.step_name, start, end)
+        observe_step_duration(self.step_name, duration_seconds)
 
         # Update the progress to 100% after the step is done
         self.update_progress(1)
@@ -108,49 +115,69 @@ class PipelineStep(ABC):
         pass
 
     def get_time_statistics(self) -> dict:
-        # Replace custom timings with statistics about the custom timings
-        custom_times = self.timing["custom_times"]
+        """
+        The timing of the step, with a summary of each custom timing (see `StreamingStats.summary`).
 
-        # Remove any empty custom times
-        custom_times = {
-            key: value for key, value in custom_times.items() if len(value) > 0
-        }
+        The step keeps its accumulators, so this can be called at any time, as often as needed.
+        """
 
-        # Calculate statistics for each custom time
-        custom_times_statistics = {
-            key: {
-                "mean": np.mean(value),
-                "std": np.std(value),
-                "min": np.min(value).astype(float),
-                "max": np.max(value).astype(float),
-                "total": np.sum(value).astype(float),
-                "loops": len(value)
+        return self.timing | {
+            "custom_times": {
+                key: stats.summary() for key, stats in list(self.timing["custom_times"].items()) if len(stats) > 0
             }
-            for key, value in custom_times.items()
         }
-        self.timing["custom_times"] = custom_times_statistics
-
-        return self.timing
 
     def get_duration(self) -> float:
         return self.timing["duration_seconds"]
 
     def add_timing(self, key: str, value: float):
-        if key in self.timing["custom_times"]:
-            self.timing["custom_times"][key].append(value)
-        else:
-            self.timing["custom_times"][key] = [value]
+        self._custom_time(key).add(value)
 
     def add_timing_list(self, key: str, values: list[float]):
-        if key in self.timing["custom_times"]:
-            self.timing["custom_times"][key].extend(values)
-        else:
-            self.timing["custom_times"][key] = values
+        self._custom_time(key).add_many(values)
+
+    def _custom_time(self, key: str) -> StreamingStats:
+        # Timings are accumulated in fixed memory, rather than kept as a list per slice or chunk
+        custom_times = self.timing["custom_times"]
+
+        if key not in custom_times:
+            custom_times[key] = StreamingStats()
+
+        return custom_times[key]
 
     def with_progress_bar(self) -> "PipelineStep":
         self.show_progress_bar = True
         return self
 
+    def with_worker_pool(self, worker_pool: WorkerPool | None) -> "PipelineStep":
+        self.worker_pool = worker_pool
+        return self
+
+    def create_process_executor(self, max_workers: int) -> concurrent.futures.Executor:
+        """
+        Create a process executor for the step, borrowing from the shared worker pool when one is set.
+
+        Parameters
+        ----------
+            max_workers : int
+                The maximum number of tasks to run at once.
+
+        Returns
+        -------
+            concurrent.futures.Executor
+                The executor, to be used as a context manager.
+        """
+
+        if self.worker_pool is not None:
+            executor = self.worker_pool.borrow(max_workers)
+        else:
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers, initializer=attach_metrics, initargs=(shared_counters(),)
+            )
+
+        # Spans recorded by the workers are sent back with their results while tracing is on
+        return traced_executor(executor, processes=True)
+
     def update_progress(self, progress: float):
         self.progress = progress
 
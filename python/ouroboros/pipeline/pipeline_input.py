@@ -36,6 +36,7 @@ class PipelineInput(BasePipelineInput):
     backprojected_folder_path: str | None = None
     config_file_path: str | None = None
     backprojection_offset: str | None = None
+    batch_inputs: list["PipelineInput"] | None = None
 
     @field_serializer("sample_points", "slice_rects")
     def to_list(self, value) -> list | None:
@@ -2,10 +2,35 @@ from ouroboros.helpers.slice import (
     coordinate_grid,
     slice_volume_from_grids
 )
+from ouroboros.helpers.checkpoint import CheckpointManifest, checkpoint_fingerprint
+from ouroboros.helpers.ome_zarr import (
+    OUTPUT_FORMATS,
+    ZarrArrayLayout,
+    ZarrSlabWriter,
+    aligned_planes,
+    build_pyramid,
+    create_ome_zarr,
+    read_zarray,
+    write_aligned_planes,
+)
+from ouroboros.helpers.slice_writer import (
+    DEFAULT_SINGLE_FILE_WRITE_MODE,
+    DEFAULT_WRITER_THREADS,
+    SINGLE_FILE_WRITE_MODES,
+    TiffPageLayout,
+    create_empty_tiff,
+    get_worker_writer,
+    tiff_page_layout,
+    write_pages,
+)
+from ouroboros.helpers.metrics import count
+from ouroboros.helpers.tracing import record_span, span, traced_executor
 from ouroboros.helpers.volume_cache import VolumeCache
 from ouroboros.helpers.files import (
+    format_slice_checkpoint_file,
     format_slice_output_file,
     format_slice_output_multiple,
+    format_slice_output_zarr,
     format_tiff_name,
     join_path,
     num_digits_for_n_files,
@@ -13,10 +38,15 @@ from ouroboros.helpers.files import (
 from .pipeline import PipelineStep
 from ouroboros.helpers.options import SliceOptions
 import numpy as np
+from collections import defaultdict
 import concurrent.futures
-from tifffile import imwrite, memmap
+from contextlib import nullcontext
+from functools import partial
 import os
 import multiprocessing
+import queue
+import shutil
+import threading
 import time
 from multiprocessing import Queue
 from typing import Iterable
@@ -28,12 +58,18 @@ class SliceParallelPipelineStep(PipelineStep):
         threads=1,
         processes=multiprocessing.cpu_count(),
         delete_intermediate=False,
+        writer_threads=DEFAULT_WRITER_THREADS,
+        single_file_write_mode=DEFAULT_SINGLE_FILE_WRITE_MODE,
     ) -> None:
         super().__init__(inputs=("slice_options", "volume_cache", "slice_rects"))
 
         self.num_threads = threads
         self.num_processes = processes
         self.delete_intermediate = delete_intermediate
+        self.writer_threads = writer_threads
+        self.single_file_write_mode = single_file_write_mode
+        self.resume = False
+        self.output_window = None
 
     def with_delete_intermediate(self) -> "SliceParallelPipelineStep":
         self.delete_intermediate = True
@@ -43,6 +79,40 @@ class SliceParallelPipelineStep(PipelineStep):
         self.num_processes = processes
         return self
 
+    def with_writer_threads(self, writer_threads: int) -> "SliceParallelPipelineStep":
+        self.writer_threads = writer_threads
+        return self
+
+    def with_single_file_write_mode(self, mode: str) -> "SliceParallelPipelineStep":
+        """
+        Set how workers write into a single output file, one of SINGLE_FILE_WRITE_MODES.
+        """
+
+        if mode not in SINGLE_FILE_WRITE_MODES:
+            raise ValueError(f"Invalid write mode: {mode}. Use one of {SINGLE_FILE_WRITE_MODES}.")
+
+        self.single_file_write_mode = mode
+        return self
+
+    def with_resume(self, resume: bool = True) -> "SliceParallelPipelineStep":
+        """
+        Continue a previous run of the same job, skipping the volumes recorded in its checkpoint.
+        """
+
+        self.resume = resume
+        return self
+
+    def with_output_window(self, first_slice: int, num_slices: int) -> "SliceParallelPipelineStep":
+        """
+        Write the slice rects as the slices from `first_slice` of an output of `num_slices` slices.
+
+        The output is created by the window starting at the first slice, and later windows write into it
+        (see SliceStreamPipelineStep).
+        """
+
+        self.output_window = (first_slice, num_slices)
+        return self
+
     def _process(self, input_data: tuple[any]) -> None | str:
         config, volume_cache, slice_rects, pipeline_input = input_data
 
@@ -58,21 +128,76 @@ class SliceParallelPipelineStep(PipelineStep):
         if not isinstance(slice_rects, np.ndarray):
             return "Input data must contain an array of slice rects."
 
+        if config.output_format not in OUTPUT_FORMATS:
+            return f"Invalid output format: {config.output_format}. Use one of {OUTPUT_FORMATS}."
+
+        # The slice rects may be one window of the output, placed after the slices of the earlier windows
+        first_slice, num_slices = self.output_window if self.output_window is not None else (0, len(slice_rects))
+
+        # OME-Zarr output is a single chunked store, rather than a tiff file or a folder of tiff files
+        use_zarr = config.output_format == "ome-zarr"
+        single_file = config.make_single_file and not use_zarr
+
         # Create a folder with the same name as the output file
         folder_name = join_path(
             config.output_file_folder,
             format_slice_output_multiple(config.output_file_name),
         )
 
-        if config.make_single_file:
+        os.makedirs(config.output_file_folder, exist_ok=True)
+
+        if not single_file and not use_zarr:
             os.makedirs(folder_name, exist_ok=True)
 
         output_file_path = join_path(
-            config.output_file_folder, format_slice_output_file(config.output_file_name)
+            config.output_file_folder,
+            format_slice_output_zarr(config.output_file_name)
+            if use_zarr
+            else format_slice_output_file(config.output_file_name),
         )
 
+        # Record finished volumes so an interrupted run can be resumed
+        checkpoint = CheckpointManifest(
+            join_path(config.output_file_folder, format_slice_checkpoint_file(config.output_file_name)),
+            checkpoint_fingerprint(
+                slice_rects,
+                volume_cache.link_rects,
+                [bbox.to_dict() for bbox in volume_cache.bounding_boxes],
+                volume_cache.cv.source_url,
+                volume_cache.mip,
+                config.slice_width,
+                config.slice_height,
+                config.make_single_file,
+                config.slice_compression,
+                config.output_format,
+                config.zarr_params.model_dump() if use_zarr else None,
+            ),
+            len(volume_cache.volumes),
+        )
+        completed = checkpoint.load() if self.resume else set()
+
+        # Workers write their slices directly at the offsets of their pages in the single file
+        layout = None
+
+        # Slices written to a single file can only be kept if the file is still intact
+        if single_file and (len(completed) > 0 or first_slice > 0):
+            try:
+                layout = tiff_page_layout(output_file_path)
+                if layout is None or (layout.num_pages,) + layout.page_shape[:2] != (
+                    num_slices, config.slice_width, config.slice_height
+                ):
+                    layout = None
+            except BaseException:
+                layout = None
+
+            if layout is None and first_slice > 0:
+                return "The single tif file of the earlier windows is missing or does not match the path."
+
+            if layout is None:
+                completed = set()
+
         # Create an empty tiff to store the slices
-        if config.make_single_file:
+        if single_file and layout is None:
             # Make sure slice rects is not empty
             if len(slice_rects) == 0:
                 return "No slice rects were provided."
@@ -93,17 +218,17 @@ class SliceParallelPipelineStep(PipelineStep):
                     volume_cache.get_num_channels() if has_color_channels else None
                 )
 
-                # Create a single tif file with the same dimensions as the slices
-                temp_shape = (
-                    slice_rects.shape[0],
+                # Create a single tif file with the same dimensions as the slices, without writing any data
+                shape = (
+                    num_slices,
                     config.slice_width,
                     config.slice_height,
                 ) + ((num_color_channels,) if has_color_channels else ())
-                temp_data = np.zeros(temp_shape, dtype=volume_cache.get_volume_dtype())
 
-                imwrite(
+                layout = create_empty_tiff(
                     output_file_path,
-                    temp_data,
+                    shape,
+                    volume_cache.get_volume_dtype(),
                     software="ouroboros",
                     resolution=resolution[:2],     # XY Resolution
                     resolutionunit=resolutionunit,
@@ -114,27 +239,191 @@ class SliceParallelPipelineStep(PipelineStep):
                     ),
                     metadata=metadata,
                 )
+
+                # The page offsets are found once, rather than every worker parsing the file
+                if layout is None:
+                    return "Error creating single tif file: its pages are not stored contiguously."
             except BaseException as e:
                 return f"Error creating single tif file: {e}"
 
+        zarr_layouts = None
+        has_color_channels = volume_cache.has_color_channels()
+
+        if use_zarr:
+            try:
+                resolution = volume_cache.get_resolution_um()
+                shape = (num_slices, config.slice_width, config.slice_height)
+                chunks = tuple(config.zarr_params.chunk_shape)
+                axes = [
+                    {"name": "z", "type": "space", "unit": "micrometer"},
+                    {"name": "y", "type": "space", "unit": "micrometer"},
+                    {"name": "x", "type": "space", "unit": "micrometer"},
+                ]
+                scale = [resolution[2], resolution[0], resolution[1]]
+
+                # OME-Zarr stores channels before the spatial axes
+                if has_color_channels:
+                    shape = (volume_cache.get_num_channels(),) + shape
+                    chunks = (volume_cache.get_num_channels(),) + chunks
+                    axes = [{"name": "c", "type": "channel"}] + axes
+                    scale = [1.0] + scale
+
+                spatial_axes = tuple(range(len(shape) - 3, len(shape)))
+
+                create_output = partial(
+                    create_ome_zarr,
+                    output_file_path,
+                    shape,
+                    volume_cache.get_volume_dtype(),
+                    chunks,
+                    axes,
+                    scale,
+                    compression=config.zarr_params.compression,
+                    compression_level=config.zarr_params.compression_level,
+                    levels=config.zarr_params.pyramid_levels,
+                    name=config.output_file_name,
+                )
+
+                # Chunks written by the previous run (or windows) can only be kept if the array is the same
+                if len(completed) > 0 or first_slice > 0:
+                    existing = read_zarray(join_path(output_file_path, "0"))
+                    zarr_layouts = create_output()
+                    if existing != zarr_layouts[0].to_zarray():
+                        if first_slice > 0:
+                            return "The OME-Zarr output of the earlier windows is missing or does not match the path."
+                        completed = set()
+
+                if len(completed) == 0 and first_slice == 0:
+                    if os.path.exists(output_file_path):
+                        shutil.rmtree(output_file_path)
+                    zarr_layouts = create_output()
+            except BaseException as e:
+                return f"Error creating OME-Zarr output: {e}"
+
         # Calculate the number of digits needed to store the number of slices
-        num_digits = num_digits_for_n_files(len(slice_rects))
+        num_digits = num_digits_for_n_files(num_slices)
 
         # Create a queue to hold downloaded data for processing
         data_queue = multiprocessing.Queue()
 
+        checkpoint.open(completed)
+        remaining = np.array(
+            [i for i in range(len(volume_cache.volumes)) if i not in completed], dtype=int
+        )
+        self.update_progress(len(completed) / len(volume_cache.volumes))
+
+        # Workers write tiff output themselves, a folder of slices through a persistent writer in each
+        # worker process, so only the slice indices and timings come back rather than the slices.
+        # The writers report each volume on `write_reports` once its slices are on disk.
+        use_folder = not single_file and not use_zarr
+        folder_output = None
+        write_reports = None
+
+        # Workers write the OME-Zarr slabs their volume fills on its own, and send back only the slices
+        # of the slabs shared with other volumes
+        zarr_output = (zarr_layouts[0], has_color_channels) if use_zarr else None
+
+        lock = threading.Lock()
+        processing_futures = set()
+        finished_durations = []
+        write_bandwidth = defaultdict(lambda: {"bytes": 0, "seconds": 0.0})
+        errors = []
+        volumes_done = [len(completed)]
+
+        def volume_written(volume_index: int, durations: dict[str, list[float]]):
+            with lock:
+                finished_durations.append(durations)
+                volumes_done[0] += 1
+            checkpoint.mark(volume_index)
+
+        def add_write_bandwidth(write_stats: dict):
+            with lock:
+                bandwidth = write_bandwidth[write_stats["worker"]]
+                bandwidth["bytes"] += write_stats["bytes"]
+                bandwidth["seconds"] += write_stats["seconds"]
+
+        def volume_processed(future: concurrent.futures.Future):
+            try:
+                if not future.cancelled():
+                    volume_index, durations, slice_indices, slices, write_stats = future.result()
+
+                    if write_stats is not None:
+                        add_write_bandwidth(write_stats)
+
+                    if zarr_writer is not None:
+                        with lock:
+                            finished_durations.append(durations)
+                        zarr_writer.submit(volume_index, slice_indices, slices)
+                    elif use_folder:
+                        # The slices are still being written, and are reported on `write_reports`
+                        with lock:
+                            finished_durations.append(durations)
+                    else:
+                        volume_written(volume_index, durations)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                # Finished futures are dropped so their slices are not held until the end
+                with lock:
+                    processing_futures.discard(future)
+
+        def collect_write_reports(timeout: float = 0.0):
+            # Waits up to the timeout for the first report, then takes the reports already there
+            while write_reports is not None:
+                try:
+                    report = write_reports.get(timeout=timeout) if timeout > 0 else write_reports.get_nowait()
+                except queue.Empty:
+                    return
+
+                timeout = 0.0
+                volume_index, durations, write_stats, error = report
+
+                if error is not None:
+                    errors.append(RuntimeError(f"Error writing the slices of volume {volume_index}: {error}"))
+                    continue
+
+                add_write_bandwidth(write_stats)
+                volume_written(volume_index, durations)
+
+        def shared_planes(volume_index: int) -> list[int]:
+            indices = np.asarray(volume_cache.get_slice_indices(volume_index), dtype=int) + first_slice
+            return indices[~aligned_planes(zarr_layouts[0], indices, has_color_channels)].tolist()
+
+        # The other OME-Zarr slices are gathered into slabs of whole chunks, which are written once complete
+        zarr_writer = (
+            ZarrSlabWriter(
+                zarr_layouts[0],
+                {int(i): shared_planes(int(i)) for i in remaining},
+                on_group_written=lambda volume_index: volume_written(volume_index, {}),
+                threads=self.writer_threads,
+                channels_first=has_color_channels,
+            )
+            if use_zarr
+            else None
+        )
+
+        def shutdown_writers(wait: bool):
+            if zarr_writer is not None:
+                zarr_writer.shutdown(wait=wait, cancel_futures=not wait)
+
+        def update_progress():
+            self.update_progress(max(volumes_done[0] / len(volume_cache.volumes), self.get_progress()))
+
         # Start the download volumes process and process downloaded volumes as they become available in the queue
         try:
-            with concurrent.futures.ThreadPoolExecutor(
-                max_workers=self.num_threads
-            ) as download_executor, concurrent.futures.ProcessPoolExecutor(
-                max_workers=self.num_processes
+            with (multiprocessing.Manager() if use_folder else nullcontext()) as manager, traced_executor(
+                concurrent.futures.ThreadPoolExecutor(max_workers=self.num_threads)
+            ) as download_executor, self.create_process_executor(
+                self.num_processes
             ) as process_executor:
+                if use_folder:
+                    write_reports = manager.Queue()
+                    folder_output = (folder_name, num_digits, write_reports)
+
                 download_futures = []
 
-                ranges = np.array_split(
-                    np.arange(len(volume_cache.volumes)), self.num_threads
-                )
+                # Only download the volumes a previous run did not finish
+                ranges = np.array_split(remaining, self.num_threads)
 
                 # Download all volumes in parallel
                 for volumes_range in ranges:
@@ -148,8 +437,6 @@ class SliceParallelPipelineStep(PipelineStep):
                         )
                     )
 
-                processing_futures = []
-
                 # Check if all downloads are done
                 def downloads_done():
                     return all([future.done() for future in download_futures])
@@ -157,66 +444,129 @@ class SliceParallelPipelineStep(PipelineStep):
                 # Process downloaded data as it becomes available
                 while True:
                     try:
+                        start = time.perf_counter()
                         data = data_queue.get(timeout=1)
+                        record_span("wait_for_download", start, time.perf_counter())
 
                         # Process the data in a separate process
                         # Note: If the maximum number of processes is reached, this will enqueue the arguments
                         # and wait for a process to become available
                         # TODO: Avoid passing in all of slice rects, rather pass in either a smaller version
                         # or use shared memory
-                        processing_futures.append(
-                            process_executor.submit(
-                                process_worker_save_parallel,
-                                config,
-                                folder_name,
-                                data,
-                                slice_rects,
-                                self.num_threads,
-                                num_digits,
-                                single_output_path=(
-                                    output_file_path
-                                    if config.make_single_file
-                                    else None
-                                ),
-                            )
+                        future = process_executor.submit(
+                            process_worker_save_parallel,
+                            config,
+                            data,
+                            slice_rects,
+                            single_output=layout,
+                            single_file_write_mode=self.single_file_write_mode,
+                            first_slice=first_slice,
+                            folder_output=folder_output,
+                            writer_threads=self.writer_threads,
+                            zarr_output=zarr_output,
                         )
+                        with lock:
+                            processing_futures.add(future)
+                        future.add_done_callback(volume_processed)
 
-                        # Update progress
-                        self.update_progress(
-                            len(
-                                [
-                                    future
-                                    for future in processing_futures
-                                    if future.done()
-                                ]
-                            )
-                            / len(volume_cache.volumes)
-                        )
+                        collect_write_reports()
+
+                        if len(errors) > 0:
+                            raise errors[0]
+
+                        update_progress()
                     except multiprocessing.queues.Empty:
+                        collect_write_reports()
+
                         if downloads_done() and data_queue.empty():
+                            # A failed download leaves its volumes unsliced, so it fails the step
+                            for download_future in download_futures:
+                                if download_future.exception() is not None:
+                                    raise download_future.exception()
                             break
                     except BaseException as e:
                         download_executor.shutdown(wait=False, cancel_futures=True)
                         process_executor.shutdown(wait=False, cancel_futures=True)
+                        shutdown_writers(wait=False)
+                        # Volumes still queued are dropped, rather than blocking the exit
+                        data_queue.cancel_join_thread()
+                        checkpoint.close()
                         return f"Error processing data: {e}"
 
-                # Track the number of completed futures
-                completed = 0
-                total_futures = len(processing_futures)
-
-                for future in concurrent.futures.as_completed(processing_futures):
-                    _, durations = future.result()
-                    for key, value in durations.items():
-                        self.add_timing_list(key, value)
-
-                    # Update the progress bar
-                    completed += 1
-                    self.update_progress(
-                        max(completed / total_futures, self.get_progress())
-                    )
+                # Wait for the remaining volumes to be sampled and written
+                while True:
+                    collect_write_reports()
+
+                    with lock:
+                        waiting = set(processing_futures)
+                    if zarr_writer is not None:
+                        waiting |= zarr_writer.futures
+                        errors.extend(zarr_writer.errors)
+
+                    if len(errors) > 0:
+                        raise errors[0]
+
+                    # Sampled volumes of a folder output are only done once their writer reports them
+                    if len(waiting) == 0 and (not use_folder or volumes_done[0] == len(volume_cache.volumes)):
+                        break
+
+                    if len(waiting) > 0:
+                        concurrent.futures.wait(waiting, timeout=1, return_when=concurrent.futures.FIRST_COMPLETED)
+                    else:
+                        collect_write_reports(timeout=1)
+                    update_progress()
         except BaseException as e:
+            shutdown_writers(wait=False)
+            checkpoint.close()
             return f"Error downloading data: {e}"
 
+        shutdown_writers(wait=True)
+
+        if zarr_writer is not None:
+            finished_durations.append(zarr_writer.durations)
+
+            # Downsampled levels are built from the full resolution level once it is complete
+            if len(zarr_layouts) > 1 and first_slice + len(slice_rects) == num_slices:
+                start = time.perf_counter()
+                try:
+                    with self.create_process_executor(self.num_processes) as executor:
+                        build_pyramid(zarr_layouts, spatial_axes, executor)
+                except BaseException as e:
+                    checkpoint.close()
+                    return f"Error building the OME-Zarr pyramid: {e}"
+                self.add_timing("pyramid", time.perf_counter() - start)
+
+        for durations in finished_durations:
+            for key, value in durations.items():
+                if key == "write_bytes":
+                    # The writer threads share one entry
+                    write_bandwidth["writer"]["bytes"] += sum(value)
+                    write_bandwidth["writer"]["seconds"] += sum(durations["write"])
+                else:
+                    self.add_timing_list(key, value)
+
+        if use_folder:
+            self.timing["slice_writer"] = {
+                "threads_per_worker": self.writer_threads,
+                "compression": config.slice_compression,
+            }
+        elif zarr_writer is not None:
+            self.timing["zarr_writer"] = {
+                "threads": self.writer_threads,
+                "chunks": zarr_layouts[0].chunks,
+                "compression": config.zarr_params.compression,
+            }
+        else:
+            self.timing["single_file_write_mode"] = self.single_file_write_mode
+
+        self.timing["write_bandwidth"] = {
+            worker: stats | {"mb_per_second": stats["bytes"] / stats["seconds"] / 1e6 if stats["seconds"] > 0 else 0.0}
+            for worker, stats in write_bandwidth.items()
+        }
+
+        # Every volume is done, so there is nothing left to resume
+        checkpoint.remove()
+
         # Update the pipeline input with the output file path
         pipeline_input.output_file_path = output_file_path
 
@@ -239,24 +589,56 @@ def thread_worker_iterative(
 
 def process_worker_save_parallel(
     config: SliceOptions,
-    folder_name: str,
     processing_data: tuple[np.ndarray, np.ndarray, np.ndarray, int],
     slice_rects: np.ndarray,
-    num_threads: int,
-    num_digits: int,
-    single_output_path: str = None,
-) -> tuple[int, dict[str, list[float]]]:
+    single_output: TiffPageLayout | None = None,
+    single_file_write_mode: str = DEFAULT_SINGLE_FILE_WRITE_MODE,
+    first_slice: int = 0,
+    folder_output: tuple[str, int, queue.Queue] | None = None,
+    writer_threads: int = DEFAULT_WRITER_THREADS,
+    zarr_output: tuple[ZarrArrayLayout, bool] | None = None,
+) -> tuple[int, dict[str, list[float]], np.ndarray, np.ndarray | None, dict | None]:
+    """
+    Sample the slices of a volume.
+
+    Slices for a single output file are written here, directly at the offsets of their pages.
+    Slices for a folder output (`folder_output` is the folder, the digits of the file names and a queue
+    for write reports) are handed to the persistent writer of the worker process, which encodes and writes
+    them on `writer_threads` threads while the worker samples its next volume. The worker only waits for
+    the writer before sampling, while too many slices are pending. Once the slices of the volume are on
+    disk, the writer puts the volume index, the durations, the write stats and any error on the queue.
+    For OME-Zarr output (`zarr_output` is the full resolution array and whether
+    it has channels first), the slabs of chunks filled by this volume alone are written here, and the other
+    slices are returned to be gathered into slabs with the slices of the neighbouring volumes.
+
+    The slice rects may be one window of the output, starting at `first_slice`. The returned slice
+    indices are those of the output.
+
+    Returns
+    -------
+    tuple[int, dict[str, list[float]], np.ndarray, np.ndarray | None, dict | None]
+        The volume index, the durations, the indices of the slices left to write and those slices
+        (None if every slice is written or queued), and the worker, bytes and seconds of the writes
+        (None if they are reported on the queue).
+    """
+
     volume, bounding_box, slice_indices, volume_index = processing_data
 
     durations = {
         "generate_grid": [],
         "slice_volume": [],
-        "save": [],
         "total_process": [],
     }
+    write_stats = None
 
     start_total = time.perf_counter()
 
+    if folder_output is not None:
+        # Hold back while the writer is too far behind, which bounds the slices held by the worker
+        writer = get_worker_writer(writer_threads, config.slice_compression, software="ouroboros")
+        with span("wait_for_writer"):
+            writer.wait_for_capacity()
+
     # Generate a grid for each slice and stack them along the first axis
     start = time.perf_counter()
     grids = np.array(
@@ -267,41 +649,75 @@ def process_worker_save_parallel(
             for i in slice_indices
         ]
     )
-    durations["generate_grid"].append(time.perf_counter() - start)
+    end = time.perf_counter()
+    durations["generate_grid"].append(end - start)
+    record_span("generate_grid", start, end)
 
     # Slice the volume using the grids
     start = time.perf_counter()
     slices = slice_volume_from_grids(
         volume, bounding_box, grids, config.slice_width, config.slice_height
     )
-    durations["slice_volume"].append(time.perf_counter() - start)
+    end = time.perf_counter()
+    durations["slice_volume"].append(end - start)
+    record_span("slice_volume", start, end, slices.nbytes)
+
+    slice_indices = np.asarray(slice_indices, dtype=int) + first_slice
+
+    if single_output is not None:
+        # Save the slices to the previously created tiff file
+        start = time.perf_counter()
+        written = write_pages(single_output, slice_indices, slices, single_file_write_mode)
+        end = time.perf_counter()
+        durations["save"] = [end - start]
+        record_span("save", start, end, written)
+        count("write_bytes", written)
+        write_stats = {"worker": f"process-{os.getpid()}", "bytes": written, "seconds": durations["save"][0]}
+        slices = None
+    elif folder_output is not None:
+        folder_name, num_digits, write_reports = folder_output
+
+        # The volume is only reported once its slices are on disk, so the checkpoint never records unwritten slices
+        writer.submit(
+            [join_path(folder_name, format_tiff_name(i, num_digits)) for i in slice_indices], slices
+        ).add_done_callback(partial(report_written, write_reports, volume_index))
+        slices = None
+
+    elif zarr_output is not None:
+        layout, channels_first = zarr_output
+
+        start = time.perf_counter()
+        written = write_aligned_planes(layout, slice_indices, slices, channels_first)
+        end = time.perf_counter()
+        durations["save"] = [end - start]
+        record_span("save", start, end, written)
+        count("write_bytes", written)
+        write_stats = {"worker": f"process-{os.getpid()}", "bytes": written, "seconds": durations["save"][0]}
+
+        shared = ~aligned_planes(layout, slice_indices, channels_first)
+        slice_indices, slices = slice_indices[shared], slices[shared]
 
-    if single_output_path is None:
-        # Using a ThreadPoolExecutor within the process for saving slices
-        with concurrent.futures.ThreadPoolExecutor(
-            max_workers=num_threads
-        ) as thread_executor:
-            futures = []
+    durations["total_process"].append(time.perf_counter() - start_total)
+    count("slices_sampled", len(grids))
+    count("worker_busy_seconds", durations["total_process"][0])
 
-            for i, slice_i in zip(slice_indices, slices):
-                start = time.perf_counter()
-                filename = join_path(folder_name, format_tiff_name(i, num_digits))
-                futures.append(thread_executor.submit(save_thread, filename, slice_i))
-                durations["save"].append(time.perf_counter() - start)
-
-            for future in concurrent.futures.as_completed(futures):
-                future.result()
-    else:
-        # Save the slices to a previously created tiff file
-        mmap = memmap(single_output_path)
-        mmap[slice_indices] = slices
-        mmap.flush()
-        del mmap
+    return volume_index, durations, slice_indices, slices, write_stats
 
-    durations["total_process"].append(time.perf_counter() - start_total)
 
-    return volume_index, durations
+def report_written(write_reports: queue.Queue, volume_index: int, future: concurrent.futures.Future):
+    """
+    Report the slices of a volume written by the writer of a worker process (see `process_worker_save_parallel`).
+    """
 
+    try:
+        written = future.result()
+    except BaseException as e:
+        write_reports.put((volume_index, None, None, str(e) or type(e).__name__))
+        return
 
-def save_thread(filename: str, data: np.ndarray):
-    imwrite(filename, data, software="ouroboros")
+    write_stats = {
+        "worker": f"process-{os.getpid()}",
+        "bytes": sum(written["write_bytes"]),
+        "seconds": sum(written["write"]),
+    }
+    write_reports.put((volume_index, {"encode": written["encode"], "write": written["write"]}, write_stats, None))
@@ -0,0 +1,182 @@
+from ouroboros.helpers.bounding_boxes import calculate_bounding_boxes_bsp_link_rects
+from ouroboros.helpers.checkpoint import CheckpointManifest, checkpoint_fingerprint
+from ouroboros.helpers.files import (
+    format_slice_output_file,
+    format_slice_output_zarr,
+    format_slice_stream_checkpoint_file,
+    join_path,
+)
+from ouroboros.helpers.network_shaper import NetworkShaper
+from ouroboros.helpers.slice import iter_slice_rect_windows
+from ouroboros.helpers.volume_cache import CloudVolumeInterface, VolumeCache
+from ouroboros.helpers.worker_pool import WorkerPool
+from .pipeline import PipelineStep
+from .pipeline_input import PipelineInput
+from .slice_parallel_pipeline import SliceParallelPipelineStep
+from .slices_geom_pipeline import slice_path_parameters
+from ouroboros.helpers.options import SliceOptions
+import numpy as np
+import multiprocessing
+import time
+
+
+class SliceStreamPipelineStep(PipelineStep):
+    def __init__(self, processes=multiprocessing.cpu_count()) -> None:
+        """
+        Slice a path one window of slices at a time, for paths too long to plan all at once.
+
+        The slice rects and bounding boxes of each window are calculated along the path as it is
+        sliced, downloaded, sampled and written into the output, and released before the next window,
+        so memory does not grow with the length of the path. Only the time points of the slices
+        (8 bytes per slice) are kept for the whole path.
+        """
+
+        super().__init__(inputs=("slice_options", "sample_points", "source_url"))
+
+        self.num_processes = processes
+        self.resume = False
+        self.network_shaper = None
+
+    def with_processes(self, processes: int) -> "SliceStreamPipelineStep":
+        self.num_processes = processes
+        return self
+
+    def with_resume(self, resume: bool = True) -> "SliceStreamPipelineStep":
+        """
+        Continue a previous run of the same job, skipping the windows recorded in its checkpoint.
+        """
+
+        self.resume = resume
+        return self
+
+    def with_network_shaper(self, network_shaper: NetworkShaper | None) -> "SliceStreamPipelineStep":
+        """
+        Delay the downloads of the volume as if over a network with the given latency and bandwidth.
+        """
+
+        self.network_shaper = network_shaper
+        return self
+
+    def _process(self, input_data: tuple[any]) -> None | str:
+        config, sample_points, source_url, pipeline_input = input_data
+
+        # Verify that a config object is provided
+        if not isinstance(config, SliceOptions):
+            return "Input data must contain a SliceOptions object."
+
+        # Verify that sample points is given
+        if not isinstance(sample_points, np.ndarray):
+            return "Input data must contain an array of sample points."
+
+        window_size = config.slicing_params.stream_window_slices
+
+        if window_size <= 0:
+            return "The number of slices per window (stream_window_slices) must be positive."
+
+        start = time.perf_counter()
+        spline, times = slice_path_parameters(config, sample_points, source_url, pipeline_input)
+
+        if isinstance(spline, str):
+            return spline
+
+        # Remove sample_points from the pipeline input (it is no longer needed, and it is a large object)
+        pipeline_input.clear_entry("sample_points")
+
+        num_slices = len(times)
+        num_windows = -(-num_slices // window_size)
+        self.add_timing("path_parameters", time.perf_counter() - start)
+
+        if num_slices == 0:
+            return "No slice rects were provided."
+
+        cloud_volume_interface = CloudVolumeInterface(source_url, self.network_shaper)
+
+        # Record finished windows so an interrupted run can be resumed (each window keeps its own checkpoint
+        # of finished volumes while it runs)
+        checkpoint = CheckpointManifest(
+            join_path(config.output_file_folder, format_slice_stream_checkpoint_file(config.output_file_name)),
+            checkpoint_fingerprint(times, source_url, config.model_dump()),
+            num_windows,
+        )
+        completed = checkpoint.load() if self.resume else set()
+
+        # The windows share one pool of workers, rather than each starting its own
+        worker_pool = self.worker_pool if self.worker_pool is not None else WorkerPool(self.num_processes)
+
+        checkpoint.open(completed)
+        self.update_progress(len(completed) / num_windows)
+
+        self.timing["windows"] = {
+            "windows": num_windows,
+            "window_slices": window_size,
+            "boxes": 0,
+        }
+
+        try:
+            windows = iter_slice_rect_windows(times, spline, config.slice_width, config.slice_height, window_size)
+
+            for window, (first_slice, slice_rects) in enumerate(windows):
+                # Skipped windows are still calculated, as each continues the frames of the one before
+                if window in completed:
+                    continue
+
+                start = time.perf_counter()
+                bounding_boxes, link_rects = calculate_bounding_boxes_bsp_link_rects(
+                    slice_rects,
+                    target_slices_per_box=config.bounding_box_params.target_slices_per_box,
+                    max_depth=config.bounding_box_params.max_depth,
+                )
+                self.add_timing("window_geometry", time.perf_counter() - start)
+                self.timing["windows"]["boxes"] += len(bounding_boxes)
+
+                window_input = PipelineInput(
+                    slice_options=config,
+                    slice_rects=slice_rects,
+                    volume_cache=VolumeCache(
+                        bounding_boxes,
+                        link_rects,
+                        cloud_volume_interface,
+                        flush_cache=config.flush_cache,
+                        mip=config.output_mip_level,
+                    ),
+                )
+
+                step = (
+                    SliceParallelPipelineStep()
+                    .with_worker_pool(worker_pool)
+                    .with_processes(self.num_processes)
+                    .with_resume(self.resume)
+                    .with_output_window(first_slice, num_slices)
+                )
+                step.listen_for_progress(
+                    lambda progress, window=window: self.update_progress((window + progress) / num_windows)
+                )
+
+                _, error = step.process(window_input)
+
+                if error:
+                    last_slice = first_slice + len(slice_rects) - 1
+                    return f"Error in window {window} (slices {first_slice} to {last_slice}): {error}"
+
+                for key, stats in step.timing["custom_times"].items():
+                    self._custom_time(key).merge(stats)
+
+                checkpoint.mark(window)
+        finally:
+            checkpoint.close()
+
+            if self.worker_pool is None:
+                worker_pool.shutdown()
+
+        # Every window is done, so there is nothing left to resume
+        checkpoint.remove()
+
+        # Update the pipeline input with the output file path
+        pipeline_input.output_file_path = join_path(
+            config.output_file_folder,
+            format_slice_output_zarr(config.output_file_name)
+            if config.output_format == "ome-zarr"
+            else format_slice_output_file(config.output_file_name),
+        )
+
+        return None
@@ -22,42 +22,10 @@ class SlicesGeometryPipelineStep(PipelineStep):
         if not isinstance(sample_points, np.ndarray):
             return "Input data must contain an array of sample points."
 
-        # Rescale the sample points if the option is enabled
-        if config.annotation_mip_level != config.output_mip_level:
-            mip_sizes = get_mip_volume_sizes(source_url)
-
-            if len(mip_sizes) == 0:
-                return "Failed to get the mip sizes from the volume."
-
-            if (
-                config.annotation_mip_level not in mip_sizes
-                or config.output_mip_level not in mip_sizes
-            ):
-                return "The specified mip levels are not present in the volume."
-
-            sample_points = convert_points_between_volumes(
-                sample_points,
-                mip_sizes[config.annotation_mip_level],
-                mip_sizes[config.output_mip_level],
-            )
-
-            # Update the pipeline input with the rescaled sample points
-            # Note: this ensures that the rescaled sample points are saved to the JSON file,
-            # which is important for the backprojection step
-            pipeline_input.sample_points = sample_points
-
-        spline = Spline(sample_points, degree=3)
-
-        # Plot equidistant points along the spline
-        if config.slicing_params.use_adaptive_slicing:
-            equidistant_params = spline.calculate_adaptive_parameters(
-                config.slicing_params.dist_between_slices,
-                ratio=config.slicing_params.adaptive_slicing_ratio,
-            )
-        else:
-            equidistant_params = spline.calculate_equidistant_parameters(
-                config.slicing_params.dist_between_slices
-            )
+        spline, equidistant_params = slice_path_parameters(config, sample_points, source_url, pipeline_input)
+
+        if isinstance(spline, str):
+            return spline
 
         equidistant_points = spline(equidistant_params)
 
@@ -79,3 +47,55 @@ class SlicesGeometryPipelineStep(PipelineStep):
         pipeline_input.clear_entry("sample_points")
 
         return None
+
+
+def slice_path_parameters(
+    config: SliceOptions, sample_points: np.ndarray, source_url: str, pipeline_input
+) -> tuple[Spline, np.ndarray] | tuple[str, None]:
+    """
+    Fit the spline through the sample points and find the time points of the slices along it.
+
+    Returns
+    -------
+    tuple[Spline, np.ndarray] | tuple[str, None]
+        The spline and the time points of the slices, or an error message.
+    """
+
+    # Rescale the sample points if the option is enabled
+    if config.annotation_mip_level != config.output_mip_level:
+        mip_sizes = get_mip_volume_sizes(source_url)
+
+        if len(mip_sizes) == 0:
+            return "Failed to get the mip sizes from the volume.", None
+
+        if (
+            config.annotation_mip_level not in mip_sizes
+            or config.output_mip_level not in mip_sizes
+        ):
+            return "The specified mip levels are not present in the volume.", None
+
+        sample_points = convert_points_between_volumes(
+            sample_points,
+            mip_sizes[config.annotation_mip_level],
+            mip_sizes[config.output_mip_level],
+        )
+
+        # Update the pipeline input with the rescaled sample points
+        # Note: this ensures that the rescaled sample points are saved to the JSON file,
+        # which is important for the backprojection step
+        pipeline_input.sample_points = sample_points
+
+    spline = Spline(sample_points, degree=3)
+
+    # Plot equidistant points along the spline
+    if config.slicing_params.use_adaptive_slicing:
+        equidistant_params = spline.calculate_adaptive_parameters(
+            config.slicing_params.dist_between_slices,
+            ratio=config.slicing_params.adaptive_slicing_ratio,
+        )
+    else:
+        equidistant_params = spline.calculate_equidistant_parameters(
+            config.slicing_params.dist_between_slices
+        )
+
+    return spline, equidistant_params
@@ -1,4 +1,5 @@
 from ouroboros.helpers.bounding_boxes import calculate_bounding_boxes_bsp_link_rects
+from ouroboros.helpers.network_shaper import NetworkShaper
 from ouroboros.helpers.volume_cache import CloudVolumeInterface, VolumeCache
 from .pipeline import PipelineStep
 from ouroboros.helpers.options import SliceOptions
@@ -9,6 +10,16 @@ class VolumeCachePipelineStep(PipelineStep):
     def __init__(self) -> None:
         super().__init__(inputs=("slice_options", "slice_rects", "source_url"))
 
+        self.network_shaper = None
+
+    def with_network_shaper(self, network_shaper: NetworkShaper | None) -> "VolumeCachePipelineStep":
+        """
+        Delay the downloads of the volume as if over a network with the given latency and bandwidth.
+        """
+
+        self.network_shaper = network_shaper
+        return self
+
     def _process(self, input_data: tuple[any]) -> None | str:
         config, slice_rects, source_url, pipeline_input = input_data
 
@@ -28,7 +39,7 @@ class VolumeCachePipelineStep(PipelineStep):
 
         self.update_progress(0.5)
 
-        cloud_volume_interface = CloudVolumeInterface(source_url)
+        cloud_volume_interface = CloudVolumeInterface(source_url, self.network_shaper)
 
         volume_cache = VolumeCache(
             bounding_boxes,
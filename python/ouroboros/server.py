@@ -1,4 +1,5 @@
 from multiprocessing import freeze_support
+import os
 
 import uvicorn
 
@@ -6,7 +7,8 @@ from ouroboros.common.server import create_server
 from ouroboros.common.server import HOST, PORT
 from ouroboros.common.server_api import create_api
 
-app = create_server()
+# Optionally keep the task history in a SQLite file across restarts
+app = create_server(task_db_path=os.environ.get("OUROBOROS_TASK_DB"))
 
 create_api(app)
 
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+from ouroboros.common.progress_bus import ProgressBus, status_delta
+from ouroboros.common.server_types import SliceTask
+
+
+def test_delivery_is_coalesced():
+    async def main():
+        bus = ProgressBus(asyncio.get_running_loop())
+        task = SliceTask(task_id="a", options="options.json")
+        bus.track(task)
+
+        # Tasks without subscribers are not delivered
+        task.notify()
+        await asyncio.sleep(0)
+        assert bus.version("a") == 0
+
+        changed = bus.subscribe("a")
+        changed.clear()
+
+        # Many changes, from other threads too, before the loop runs are delivered once
+        threads = [threading.Thread(target=task.notify) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        task.notify()
+
+        await asyncio.sleep(0)
+        assert changed.is_set()
+        assert bus.version("a") == 1
+
+        changed.clear()
+        task.notify()
+        await asyncio.sleep(0)
+        assert bus.version("a") == 2
+
+    asyncio.run(main())
+
+
+def test_unsubscribe_cleans_up():
+    async def main():
+        bus = ProgressBus(asyncio.get_running_loop())
+        task = SliceTask(task_id="a", options="options.json")
+        bus.track(task)
+
+        # Reading the version of an unknown task does not keep any state for it
+        assert bus.version("unknown") == 0
+        assert "unknown" not in bus._versions
+
+        first = bus.subscribe("a")
+        second = bus.subscribe("a")
+        task.notify()
+        await asyncio.sleep(0)
+
+        bus.unsubscribe("a", first)
+        assert bus.has_subscribers("a")
+        assert bus.version("a") == 1
+
+        bus.unsubscribe("a", second)
+        assert not bus.has_subscribers("a")
+        assert "a" not in bus._versions
+        assert bus.version("a") == 0
+
+        # Unsubscribing again is harmless
+        bus.unsubscribe("a", second)
+
+    asyncio.run(main())
+
+
+def test_status_delta():
+    previous = {
+        "status": "started",
+        "error": None,
+        "progress": [["ParseJSONPipelineStep", 1.0, 0.5], ["SliceParallelPipelineStep", 0.2, 3.0]],
+    }
+    current = {
+        "status": "started",
+        "error": None,
+        "progress": [["ParseJSONPipelineStep", 1.0, 0.5], ["SliceParallelPipelineStep", 0.4, 4.0]],
+    }
+
+    # Only the changed steps are sent, with their index
+    assert status_delta(previous, current) == {"progress_changes": [[1, "SliceParallelPipelineStep", 0.4, 4.0]]}
+    assert status_delta(current, current) == {}
+
+    # Changed fields are sent, and the whole progress list once the steps change
+    steps = current | {"status": "done", "progress": current["progress"] + [["SaveOutputPipelineStep", 0.0, 0.0]]}
+    assert status_delta(previous, steps) == {"status": "done", "progress": steps["progress"]}
+
+    renamed = current | {"progress": [["Other", 1.0, 0.5], current["progress"][1]]}
+    assert status_delta(current, renamed) == {"progress": renamed["progress"]}
+
+    # Everything but fields that are still None is sent against an empty previous status
+    assert status_delta({}, current) == {"status": "started", "progress": current["progress"]}
@@ -0,0 +1,100 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from ouroboros.common.scheduler import TaskPriority, TaskScheduler
+from ouroboros.common.server_types import SliceTask
+
+
+def run_scheduler(test, estimator=None):
+    release = threading.Event()
+    started = []
+
+    def handler(task):
+        started.append(task.task_id)
+        release.wait(5)
+
+    async def main():
+        with ThreadPoolExecutor() as executor:
+            scheduler = TaskScheduler(handler, executor, cpus=8, ram_gb=16, disk_gb=100, estimator=estimator)
+            runner = asyncio.create_task(scheduler.run())
+            try:
+                await test(scheduler, started)
+            finally:
+                release.set()
+                runner.cancel()
+
+    asyncio.run(main())
+
+
+def submit(scheduler, task_id, **resources) -> SliceTask:
+    task = SliceTask(task_id=task_id, options="options.json")
+    assert scheduler.configure(task, None, TaskPriority.NORMAL, **resources) is None
+    scheduler.submit(task)
+    return task
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0.01)
+
+
+def test_lone_task_runs_with_whole_budget():
+    async def test(scheduler, started):
+        first = submit(scheduler, "first")
+        await settle()
+
+        # The task reserves half of the CPUs, but has the server to itself
+        assert first.cpus == 4
+        assert first.processes == 8
+        assert first.status == "started"
+        assert scheduler.queue_status("first")["queue_position"] is None
+
+        second = submit(scheduler, "second")
+        await settle()
+
+        assert second.status == "started"
+        assert second.processes == 4
+
+        third = submit(scheduler, "third", cpus=2)
+        await settle()
+
+        assert third.status == "enqueued"
+        assert third.processes == 2
+        assert scheduler.queue_status("third")["queue_position"] == 0
+
+    run_scheduler(test)
+
+
+def test_estimated_resources():
+    estimate = threading.Event()
+    calls = []
+
+    def estimator(task, processes):
+        calls.append((task.task_id, processes))
+        estimate.wait(5)
+        return 12.0, 30.0
+
+    async def test(scheduler, started):
+        first = submit(scheduler, "first", disk_gb=5)
+        await settle()
+
+        # The task waits for its estimate before it can start
+        assert first.estimating
+        assert started == []
+
+        estimate.set()
+        await settle()
+
+        assert calls == [("first", 8)]
+        assert (first.ram_gb, first.disk_gb) == (12.0, 5)
+        assert started == ["first"]
+
+        # Not enough RAM is left for a second estimated task
+        second = submit(scheduler, "second")
+        await settle()
+
+        assert second.ram_gb == 12.0
+        assert second.status == "enqueued"
+
+    run_scheduler(test, estimator)
@@ -0,0 +1,129 @@
+import time
+
+import numpy as np
+
+from ouroboros.common.server_types import BackProjectTask, BatchSliceTask, SliceTask
+from ouroboros.common.task_store import TaskStore
+from ouroboros.pipeline import ParseJSONPipelineStep, Pipeline
+
+
+def finished_task(task_id: str, finished_at: float, status: str = "done") -> SliceTask:
+    return SliceTask(task_id=task_id, options=f"{task_id}.json", status=status, finished_at=finished_at)
+
+
+def test_ttl_eviction():
+    store = TaskStore(ttl_seconds=60)
+    now = time.time()
+
+    store["running"] = SliceTask(task_id="running", options="running.json", status="started")
+    store["old"] = finished_task("old", now - 120)
+    store["new"] = finished_task("new", now - 10, status="error")
+
+    assert "old" not in store
+    assert "new" in store
+    assert "running" in store
+
+    # Running tasks are never evicted, however long ago they were enqueued
+    store["running"].enqueued_at = now - 1000
+    store.evict()
+    assert "running" in store
+
+
+def test_max_tasks_eviction():
+    store = TaskStore(max_tasks=2)
+    now = time.time()
+
+    store["enqueued"] = SliceTask(task_id="enqueued", options="enqueued.json")
+    for i in range(4):
+        store[f"task-{i}"] = finished_task(f"task-{i}", now - 10 + i)
+
+    # The oldest finished tasks go first, unfinished tasks don't count
+    assert sorted(task.task_id for task in store.values()) == ["enqueued", "task-2", "task-3"]
+    assert len(store) == 3
+
+
+def test_compaction_on_finish():
+    store = TaskStore()
+    task = SliceTask(task_id="a", options="a.json", status="started")
+    store["a"] = task
+
+    task.watch_pipeline(Pipeline([ParseJSONPipelineStep()]))
+    task.pipeline_input = object()
+    task.visualization = {"rects": np.zeros((1, 4, 3))}
+
+    # Changes are ignored until the task has finished
+    task.notify()
+    assert task.pipeline is not None
+
+    task.status = "done"
+    task.finished_at = time.time()
+    task.notify()
+
+    assert task.pipeline is None
+    assert task.pipeline_input is None
+    assert task.last_progress[0][0] == "ParseJSONPipelineStep"
+    assert task.visualization is not None
+
+
+def test_save_and_reload(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    now = time.time()
+
+    store = TaskStore(db_path=db_path)
+
+    slice_task = finished_task("slice", now - 2)
+    slice_task.timings = [{"step": "SliceParallelPipelineStep", "duration": np.float64(1.5)}]
+    slice_task.outputs = {"tiff": "out.tiff"}
+    slice_task.visualization = {"rects": np.zeros((1, 4, 3))}
+
+    batch_task = BatchSliceTask(
+        task_id="batch", options=["a.json", "b.json"], status="error", error="Failed", finished_at=now - 1
+    )
+    backproject_task = BackProjectTask(task_id="backproject", options="bp.json", status="done", finished_at=now)
+    running_task = SliceTask(task_id="running", options="running.json", status="started")
+
+    for task in (slice_task, batch_task, backproject_task, running_task):
+        store[task.task_id] = task
+    for task in (slice_task, batch_task, backproject_task):
+        store.finish(task)
+
+    store.close()
+
+    reloaded = TaskStore(db_path=db_path)
+
+    # Only finished tasks are saved
+    assert sorted(task.task_id for task in reloaded.values()) == ["backproject", "batch", "slice"]
+
+    for task in (slice_task, batch_task, backproject_task):
+        loaded = reloaded[task.task_id]
+        assert type(loaded) is type(task)
+        assert reloaded.summary(loaded) == store.summary(task)
+
+    assert reloaded["batch"].options == ["a.json", "b.json"]
+    assert reloaded["batch"].error == "Failed"
+    assert reloaded["slice"].timings == [{"step": "SliceParallelPipelineStep", "duration": 1.5}]
+    assert reloaded["slice"].outputs == {"tiff": "out.tiff"}
+
+    # The visualization is kept in memory only
+    assert reloaded["slice"].visualization is None
+
+    # Deleted tasks are not loaded again
+    del reloaded["batch"]
+    reloaded.close()
+
+    assert "batch" not in TaskStore(db_path=db_path)
+
+
+def test_reload_evicts(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    now = time.time()
+
+    store = TaskStore(db_path=db_path)
+    for i, finished_at in enumerate((now - 120, now - 3, now - 2, now - 1)):
+        task = finished_task(f"task-{i}", finished_at)
+        store[task.task_id] = task
+        store.finish(task)
+    store.close()
+
+    reloaded = TaskStore(ttl_seconds=60, max_tasks=2, db_path=db_path)
+    assert sorted(task.task_id for task in reloaded.values()) == ["task-2", "task-3"]
@@ -0,0 +1,111 @@
+import gzip
+import io
+import json
+import struct
+
+import imagecodecs
+import numpy as np
+import pytest
+
+from ouroboros.common.visualization import (
+    BINARY_MAGIC,
+    VISUALIZATION_COMPRESSIONS,
+    compress_payload,
+    decimate_indices,
+    decimate_visualization,
+    encode_visualization,
+)
+
+
+def sample_data(count: int = 10) -> dict:
+    return {
+        "rects": np.arange(count * 12, dtype=np.float64).reshape(count, 4, 3) / 2,
+        "bounding_boxes": [{"min": [0, 0, 0], "max": [4, 4, 4]}, {"min": [2, 2, 2], "max": [8, 8, 8]}],
+        "link_rects": [0] * (count // 2) + [1] * (count - count // 2),
+    }
+
+
+@pytest.mark.parametrize("count", [1, 2, 9, 10, 11, 100])
+@pytest.mark.parametrize("max_rects", [1, 2, 3, 4, 7])
+def test_decimate_indices_cap(count, max_rects):
+    indices = decimate_indices(count, max_rects=max_rects)
+
+    # The cap holds, and the end of the path is always kept
+    assert 0 < len(indices) <= max_rects
+    assert indices[-1] == count - 1
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_decimate_indices():
+    assert decimate_indices(10).tolist() == list(range(10))
+    assert decimate_indices(10, step=3).tolist() == [0, 3, 6, 9]
+    assert decimate_indices(10, step=4).tolist() == [0, 4, 8, 9]
+    assert decimate_indices(10, max_rects=3).tolist() == [0, 5, 9]
+    assert decimate_indices(10, max_rects=1).tolist() == [9]
+    assert decimate_indices(0, max_rects=3).tolist() == []
+
+
+def test_decimate_visualization():
+    data = sample_data()
+
+    # Nothing to drop
+    assert decimate_visualization(data, 1, 10) is data
+
+    decimated = decimate_visualization(data, max_rects=3)
+    assert np.array_equal(decimated["rects"], data["rects"][[0, 5, 9]])
+    assert decimated["link_rects"] == [0, 1, 1]
+    assert decimated["bounding_boxes"] == data["bounding_boxes"]
+
+
+def test_encode_json():
+    data = sample_data()
+    decoded = json.loads(encode_visualization(data, "json"))
+
+    assert decoded["error"] is None
+    assert np.array_equal(decoded["data"]["rects"], data["rects"])
+    assert decoded["data"]["bounding_boxes"] == data["bounding_boxes"]
+    assert decoded["data"]["link_rects"] == data["link_rects"]
+
+
+def test_encode_binary():
+    data = sample_data()
+    payload = encode_visualization(data, "binary")
+
+    assert payload.startswith(BINARY_MAGIC)
+    (length,) = struct.unpack("<I", payload[len(BINARY_MAGIC):len(BINARY_MAGIC) + 4])
+    start = len(BINARY_MAGIC) + 4
+    header = json.loads(payload[start:start + length])
+
+    assert header["shape"] == [10, 4, 3]
+    assert header["dtype"] == "<f4"
+    assert header["bounding_boxes"] == data["bounding_boxes"]
+    assert header["link_rects"] == data["link_rects"]
+
+    rects = np.frombuffer(payload[start + length:], dtype=header["dtype"]).reshape(header["shape"])
+    assert np.array_equal(rects, data["rects"].astype(np.float32))
+
+
+def test_encode_npy():
+    data = sample_data()
+    rects = np.load(io.BytesIO(encode_visualization(data, "npy")))
+
+    assert rects.dtype == np.dtype("<f4")
+    assert np.array_equal(rects, data["rects"].astype(np.float32))
+
+
+def test_encode_invalid_format():
+    with pytest.raises(ValueError):
+        encode_visualization(sample_data(), "xml")
+
+
+@pytest.mark.parametrize("compression", VISUALIZATION_COMPRESSIONS)
+def test_compress_payload(compression):
+    payload = encode_visualization(sample_data(100), "binary")
+    compressed = compress_payload(payload, compression)
+
+    decompress = gzip.decompress if compression == "gzip" else imagecodecs.zstd_decode
+    assert decompress(compressed) == payload
+    assert len(compressed) < len(payload)
+
+    with pytest.raises(ValueError):
+        compress_payload(payload, "brotli")
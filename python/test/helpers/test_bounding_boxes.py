@@ -199,10 +199,16 @@ def test_to_cloudvolume_bbox():
     rect = np.array([[0, 0, 0], [1, 1, 1]])
     bbox = BoundingBox(rect)
     cloudvolume_bbox = bbox.to_cloudvolume_bbox()
-    assert cloudvolume_bbox.dx == 1
-    assert cloudvolume_bbox.dy == 1
-    assert cloudvolume_bbox.dz == 1
+    # Both the voxel at the min and the voxel at the max are downloaded
+    assert cloudvolume_bbox.dx == 2
+    assert cloudvolume_bbox.dy == 2
+    assert cloudvolume_bbox.dz == 2
     assert cloudvolume_bbox.ndim == 3
+    assert tuple(cloudvolume_bbox.size3()) == bbox.get_shape()
+
+    # Up to the end of the volume
+    cloudvolume_bbox = bbox.to_cloudvolume_bbox((1, 2, 1))
+    assert tuple(cloudvolume_bbox.size3()) == (1, 2, 1)
 
 
 def test_longest_dimension():
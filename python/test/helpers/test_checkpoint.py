@@ -0,0 +1,66 @@
+import numpy as np
+
+from ouroboros.helpers.checkpoint import CheckpointManifest, checkpoint_fingerprint
+
+
+def test_checkpoint_fingerprint():
+    rects = np.arange(24, dtype=float).reshape(2, 4, 3)
+
+    assert checkpoint_fingerprint(rects, "url", 100) == checkpoint_fingerprint(rects.copy(), "url", 100)
+    assert checkpoint_fingerprint(rects, "url", 100) != checkpoint_fingerprint(rects + 1, "url", 100)
+    assert checkpoint_fingerprint(rects, "url", 100) != checkpoint_fingerprint(rects, "url", 101)
+    assert checkpoint_fingerprint(rects) != checkpoint_fingerprint(rects.astype(np.float32))
+
+
+def test_checkpoint_resume(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+
+    with CheckpointManifest(path, "job", 10) as checkpoint:
+        checkpoint.open()
+        checkpoint.mark(3)
+        checkpoint.mark(7)
+
+    # A crash can leave a partial line behind
+    with open(path, "a") as f:
+        f.write("1")
+
+    with CheckpointManifest(path, "job", 10) as checkpoint:
+        completed = checkpoint.load()
+        assert completed == {3, 7, 1}
+
+        # Items whose output went missing can be dropped when reopening
+        checkpoint.open(completed - {7})
+        checkpoint.mark(5)
+
+    assert CheckpointManifest(path, "job", 10).load() == {1, 3, 5}
+
+
+def test_checkpoint_ignores_other_jobs(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+
+    with CheckpointManifest(path, "job", 10) as checkpoint:
+        checkpoint.open()
+        checkpoint.mark(3)
+
+    assert CheckpointManifest(path, "other job", 10).load() == set()
+    assert CheckpointManifest(path, "job", 20).load() == set()
+
+    # Starting over discards the previous run
+    with CheckpointManifest(path, "job", 10) as checkpoint:
+        checkpoint.open()
+
+    assert CheckpointManifest(path, "job", 10).load() == set()
+
+
+def test_checkpoint_remove(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+
+    checkpoint = CheckpointManifest(str(path), "job", 10)
+    checkpoint.open()
+    checkpoint.remove()
+
+    assert not path.exists()
+    assert checkpoint.load() == set()
+
+    # Late marks after the job ended are ignored
+    checkpoint.mark(1)
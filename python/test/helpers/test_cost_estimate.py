@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from ouroboros.helpers.bounding_boxes import BoundingBox
+from ouroboros.helpers.cost_estimate import (
+    box_voxels,
+    calibrate_backprojection,
+    calibrate_sampling,
+    chunk_bounds,
+    clip_bounds,
+    cutout_bounds,
+    intermediate_voxels,
+    pyramid_fraction,
+    union_voxels,
+)
+
+
+def brute_force_union(bounds):
+    mask = np.zeros((40, 40, 40), dtype=bool)
+
+    for x0, x1, y0, y1, z0, z1 in bounds:
+        mask[x0:x1, y0:y1, z0:z1] = True
+
+    return int(mask.sum())
+
+
+def test_union_voxels_random():
+    rng = np.random.default_rng(0)
+
+    for _ in range(20):
+        low = rng.integers(0, 30, (8, 3))
+        high = low + rng.integers(1, 10, (8, 3))
+        bounds = np.stack([low, high], axis=2).reshape(-1, 6)
+
+        assert union_voxels(bounds) == brute_force_union(bounds)
+
+
+def test_union_voxels_edge_cases():
+    assert union_voxels(np.zeros((0, 6))) == 0
+
+    # Disjoint, touching and identical boxes
+    assert union_voxels([[0, 2, 0, 2, 0, 2], [5, 6, 5, 6, 5, 6]]) == 9
+    assert union_voxels([[0, 2, 0, 2, 0, 2], [2, 4, 0, 2, 0, 2]]) == 16
+    assert union_voxels([[0, 2, 0, 2, 0, 2]] * 3) == 8
+
+    # Empty boxes are ignored
+    assert union_voxels([[0, 2, 0, 2, 0, 2], [3, 3, 0, 5, 0, 5]]) == 8
+
+
+def test_cutout_bounds():
+    bounding_box = BoundingBox(np.array([[1.2, 0.0, 3.5], [4.8, 2.0, 3.6]]))
+    bounds = cutout_bounds([bounding_box])
+
+    # From the voxel at the min to the voxel after the max, which points near the max interpolate from
+    assert bounds.tolist() == [[1, 6, 0, 3, 3, 5]]
+    assert box_voxels(bounds).tolist() == [np.prod(bounding_box.get_shape())]
+    assert cutout_bounds([]).shape == (0, 6)
+
+    # The voxels after the max are left out past the end of the volume, but the box itself is not clipped
+    assert cutout_bounds([bounding_box], (5, 3, 4)).tolist() == [[1, 5, 0, 3, 3, 4]]
+    assert cutout_bounds([bounding_box], (3, 3, 3)).tolist() == [[1, 4, 0, 3, 3, 3]]
+
+
+def test_chunk_bounds():
+    bounds = [[0, 64, 10, 20, 100, 129], [5, 6, 64, 65, 130, 131]]
+    chunks = chunk_bounds(bounds, (64, 64, 64), (0, 0, 2))
+
+    assert chunks.tolist() == [[0, 1, 0, 1, 1, 2], [0, 1, 1, 2, 2, 3]]
+
+
+def test_clip_bounds():
+    clipped = clip_bounds([[-5, 5, 0, 200, 10, 20]], (0, 0, 0), (100, 100, 15))
+
+    assert clipped.tolist() == [[0, 5, 0, 100, 10, 15]]
+
+
+def test_intermediate_voxels():
+    assert intermediate_voxels(1000, 1) == pytest.approx(1500)
+    assert intermediate_voxels(1000, 0.5) == intermediate_voxels(1000, 1)
+    assert intermediate_voxels(1000, 10) == intermediate_voxels(1000, 2)
+
+
+def test_pyramid_fraction():
+    assert pyramid_fraction(0, (2, 2, 2)) == 0
+    assert pyramid_fraction(2, (2, 2, 1)) == pytest.approx(1 / 4 + 1 / 16)
+    assert pyramid_fraction(3, (1, 1, 1)) == 3
+
+
+def test_calibration():
+    assert 0 < calibrate_sampling((16, 16), 4, repeat=1) < 1
+    assert 0 < calibrate_backprojection((16, 16), 4, repeat=1) < 1
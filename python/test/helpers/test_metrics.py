@@ -0,0 +1,91 @@
+import concurrent.futures
+
+import pytest
+
+from ouroboros.helpers import metrics
+from ouroboros.helpers.metrics import (
+    Histogram,
+    SharedCounters,
+    attach_metrics,
+    count,
+    enable_metrics,
+    observe_step_duration,
+    render_metrics,
+    shared_counters,
+)
+
+
+@pytest.fixture
+def counters():
+    counters = enable_metrics()
+    yield counters
+    attach_metrics(None)
+    metrics._step_durations.clear()
+
+
+def sample_slices(n):
+    count("slices_sampled", n)
+
+
+def test_metrics_disabled():
+    assert shared_counters() is None
+
+    count("slices_sampled")
+    observe_step_duration("Step", 1.0)
+
+    assert "ouroboros_slices_sampled_total 0\n" in render_metrics()
+    assert "step_duration_seconds_bucket" not in render_metrics()
+
+
+def test_shared_counters_in_workers(counters):
+    with concurrent.futures.ProcessPoolExecutor(
+        2, initializer=attach_metrics, initargs=(shared_counters(),)
+    ) as executor:
+        list(executor.map(sample_slices, range(1, 11)))
+
+    count("download_bytes", 1.5e6)
+
+    values = counters.values()
+    assert values["slices_sampled"] == 55
+    assert values["download_bytes"] == 1.5e6
+
+    with pytest.raises(KeyError):
+        counters.add("unknown")
+
+
+def test_histogram():
+    histogram = Histogram((1, 5, 10))
+
+    for value in (0.5, 1, 3, 20):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 0, 1]
+    assert histogram.cumulative_counts() == [2, 3, 3, 4]
+    assert (histogram.sum, histogram.count) == (24.5, 4)
+
+
+def test_render_metrics(counters):
+    count("chunks_backprojected", 3)
+    observe_step_duration("SliceParallelPipelineStep", 0.2)
+    observe_step_duration("SliceParallelPipelineStep", 12)
+
+    text = render_metrics({"queue_depth": (2, "Tasks waiting to start.")})
+    lines = text.splitlines()
+
+    assert "# TYPE ouroboros_chunks_backprojected_total counter" in lines
+    assert "ouroboros_chunks_backprojected_total 3" in lines
+    assert "# TYPE ouroboros_queue_depth gauge" in lines
+    assert "ouroboros_queue_depth 2" in lines
+    assert 'ouroboros_step_duration_seconds_bucket{step="SliceParallelPipelineStep",le="0.5"} 1' in lines
+    assert 'ouroboros_step_duration_seconds_bucket{step="SliceParallelPipelineStep",le="10"} 1' in lines
+    assert 'ouroboros_step_duration_seconds_bucket{step="SliceParallelPipelineStep",le="+Inf"} 2' in lines
+    assert 'ouroboros_step_duration_seconds_sum{step="SliceParallelPipelineStep"} 12.2' in lines
+    assert 'ouroboros_step_duration_seconds_count{step="SliceParallelPipelineStep"} 2' in lines
+    assert text.endswith("\n")
+
+
+def test_shared_counters_names():
+    counters = SharedCounters(("a", "b"))
+    counters.add("b", 2)
+
+    assert counters.values() == {"a": 0, "b": 2}
@@ -0,0 +1,58 @@
+import pickle
+
+import pytest
+
+from ouroboros.helpers.network_shaper import NetworkShaper
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_network_shaper_latency():
+    clock = FakeClock()
+    shaper = NetworkShaper(latency=0.5, clock=clock, sleep=clock.sleep)
+
+    assert shaper.enabled
+    assert shaper.wait(10**9, 0.0) == 0.5
+
+    # A request that already took longer than the latency is not delayed
+    clock.now = 2.0
+    assert shaper.wait(100, 1.0) == 0.0
+    assert clock.sleeps == [0.5]
+
+
+def test_network_shaper_bandwidth():
+    clock = FakeClock()
+    shaper = NetworkShaper(latency=0.1, bandwidth=1000, clock=clock)
+
+    # Concurrent requests share the link, in the order they reach it
+    assert shaper.reserve(500, 0.0) == pytest.approx(0.6)
+    assert shaper.reserve(1000, 0.0) == pytest.approx(1.6)
+
+    # The link is idle again by the time a later request arrives
+    assert shaper.reserve(100, 5.0) == pytest.approx(5.2)
+
+
+def test_network_shaper_disabled():
+    shaper = NetworkShaper(sleep=lambda seconds: (_ for _ in ()).throw(AssertionError("slept")))
+
+    assert not shaper.enabled
+    assert shaper.wait(10**9, 0.0) == 0.0
+
+
+def test_network_shaper_serialization():
+    shaper = NetworkShaper(0.25, 1e6)
+
+    assert NetworkShaper.from_dict(shaper.to_dict()).to_dict() == {"latency": 0.25, "bandwidth": 1e6}
+    assert NetworkShaper.from_dict(None) is None
+    assert pickle.loads(pickle.dumps(shaper)).to_dict() == shaper.to_dict()
@@ -0,0 +1,202 @@
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from ouroboros.helpers.ome_zarr import (
+    ZARR_COMPRESSIONS,
+    ZarrSlabWriter,
+    aligned_planes,
+    build_pyramid,
+    create_ome_zarr,
+    create_zarr_array,
+    downsample_mean,
+    read_chunk,
+    read_region,
+    read_zarray,
+    write_aligned_planes,
+    write_chunk,
+    write_region,
+)
+
+
+@pytest.mark.parametrize("compression", ZARR_COMPRESSIONS)
+def test_write_chunk(tmp_path, compression):
+    layout = create_zarr_array(str(tmp_path / "array"), (10, 7), (4, 4), np.uint16, compression)
+    data = np.arange(10 * 7, dtype=np.uint16).reshape(10, 7)
+
+    # Edge chunks are clipped to the array
+    assert layout.chunk_grid == (3, 2)
+    assert layout.chunk_region((2, 1)) == (slice(8, 10), slice(4, 7))
+
+    for index in layout.chunks_in_region((0, 0), layout.shape):
+        write_chunk(layout, index, data[layout.chunk_region(index)])
+
+    assert np.array_equal(read_chunk(layout, (2, 1)), data[8:, 4:])
+    assert np.array_equal(read_region(layout, (0, 0), layout.shape), data)
+
+    # Edge chunks are stored at the full chunk shape
+    assert (tmp_path / "array" / "2" / "1").exists()
+
+    with pytest.raises(ValueError):
+        write_chunk(layout, (0, 0), data[:2, :2])
+
+
+def test_create_zarr_array(tmp_path):
+    layout = create_zarr_array(str(tmp_path / "array"), (3, 100, 100), (64, 32, 32), np.uint8, "zlib", 5)
+
+    # Chunks are clipped to the shape
+    assert layout.chunks == (3, 32, 32)
+
+    zarray = read_zarray(str(tmp_path / "array"))
+    assert zarray == layout.to_zarray()
+    assert zarray["dtype"] == "|u1"
+    assert zarray["compressor"] == {"id": "zlib", "level": 5}
+    assert zarray["dimension_separator"] == "/"
+
+    assert read_zarray(str(tmp_path / "missing")) is None
+
+    with pytest.raises(ValueError):
+        create_zarr_array(str(tmp_path / "invalid"), (4, 4), (2, 2), np.uint8, "lzma")
+
+
+def test_write_region(tmp_path):
+    layout = create_zarr_array(str(tmp_path / "array"), (8, 12), (4, 4), np.uint8, "none")
+    expected = np.zeros((8, 12), dtype=np.uint8)
+
+    # Chunks that are partially covered keep what was written before
+    write_region(layout, (1, 1), np.full((4, 4), 1, dtype=np.uint8))
+    write_region(layout, (3, 3), np.full((2, 5), 2, dtype=np.uint8))
+    expected[1:5, 1:5] = 1
+    expected[3:5, 3:8] = 2
+
+    assert np.array_equal(read_region(layout, (0, 0), (8, 12)), expected)
+    assert np.array_equal(read_region(layout, (2, 2), (20, 6)), expected[2:, 2:6])
+
+    # Chunks that were never written read as zeros
+    assert read_chunk(layout, (1, 2)) is None
+
+
+def test_downsample_mean():
+    data = np.array([[1, 3, 5], [3, 5, 7]], dtype=np.uint8)
+
+    assert np.array_equal(downsample_mean(data, (0, 1)), [[3, 6]])
+    assert np.array_equal(downsample_mean(data, (1,)), [[2, 5], [4, 7]])
+    assert downsample_mean(data.astype(np.float32), (0,)).dtype == np.float32
+
+
+def test_create_ome_zarr(tmp_path):
+    path = str(tmp_path / "image.ome.zarr")
+    axes = [
+        {"name": "c", "type": "channel"},
+        {"name": "z", "type": "space", "unit": "micrometer"},
+        {"name": "y", "type": "space", "unit": "micrometer"},
+        {"name": "x", "type": "space", "unit": "micrometer"},
+    ]
+
+    layouts = create_ome_zarr(
+        path, (2, 9, 16, 16), np.uint8, (2, 4, 8, 8), axes, [1, 0.5, 0.1, 0.1], translation=[0, 1, 2, 3], levels=2
+    )
+
+    assert [layout.shape for layout in layouts] == [(2, 9, 16, 16), (2, 5, 8, 8), (2, 3, 4, 4)]
+    assert layouts[2].chunks == (2, 3, 4, 4)
+
+    with open(tmp_path / "image.ome.zarr" / ".zattrs") as f:
+        multiscales = json.load(f)["multiscales"][0]
+
+    assert multiscales["axes"] == axes
+    assert [dataset["path"] for dataset in multiscales["datasets"]] == ["0", "1", "2"]
+    assert multiscales["datasets"][1]["coordinateTransformations"] == [
+        {"type": "scale", "scale": [1.0, 1.0, 0.2, 0.2]},
+        {"type": "translation", "translation": [0.0, 1.0, 2.0, 3.0]},
+    ]
+
+    data = np.random.randint(0, 255, (2, 9, 16, 16), dtype=np.uint8)
+    write_region(layouts[0], (0, 0, 0, 0), data)
+    build_pyramid(layouts, (1, 2, 3))
+
+    level_1 = downsample_mean(data, (1, 2, 3))
+    assert np.array_equal(read_region(layouts[1], (0, 0, 0, 0), layouts[1].shape), level_1)
+    assert np.array_equal(
+        read_region(layouts[2], (0, 0, 0, 0), layouts[2].shape), downsample_mean(level_1, (1, 2, 3))
+    )
+
+
+def test_create_ome_zarr_factors(tmp_path):
+    axes = [{"name": axis, "type": "space", "unit": "micrometer"} for axis in "zyx"]
+
+    layouts = create_ome_zarr(
+        str(tmp_path / "image.ome.zarr"), (9, 16, 16), np.uint8, (4, 8, 8), axes, [0.5, 0.1, 0.1],
+        levels=2, factors=(1, 2, 2), method="max",
+    )
+
+    assert [layout.shape for layout in layouts] == [(9, 16, 16), (9, 8, 8), (9, 4, 4)]
+
+    with open(tmp_path / "image.ome.zarr" / ".zattrs") as f:
+        multiscales = json.load(f)["multiscales"][0]
+
+    assert multiscales["type"] == "max"
+    assert multiscales["datasets"][2]["coordinateTransformations"][0]["scale"] == [0.5, 0.4, 0.4]
+
+
+def test_write_aligned_planes(tmp_path):
+    layout = create_zarr_array(str(tmp_path / "array"), (2, 10, 3, 3), (2, 4, 3, 3), np.uint8, "none")
+    planes = np.random.randint(1, 255, (10, 3, 3, 2), dtype=np.uint8)
+
+    # Planes 4-7 fill the second slab and 8-9 the last, shorter one, but 2-3 are half of the first
+    indices = np.array([9, 2, 5, 3, 4, 8, 7, 6])
+    assert aligned_planes(layout, indices, channels_first=True).tolist() == [
+        True, False, True, False, True, True, True, True
+    ]
+
+    written = write_aligned_planes(layout, indices, planes[indices], channels_first=True)
+    assert written == 6 * planes[0].nbytes
+
+    expected = np.moveaxis(planes, -1, 0).copy()
+    expected[:, :4] = 0
+    assert np.array_equal(read_region(layout, (0, 0, 0, 0), layout.shape), expected)
+
+
+def test_zarr_slab_writer(tmp_path):
+    layout = create_zarr_array(str(tmp_path / "array"), (10, 4, 4), (4, 4, 4), np.uint16, "zlib")
+    planes = np.arange(10 * 16, dtype=np.uint16).reshape(10, 4, 4) + 1
+
+    written = []
+    lock = threading.Lock()
+
+    def on_group_written(group):
+        with lock:
+            written.append(group)
+
+    groups = {0: [0, 5, 9], 1: [1, 2, 3, 4], 2: [6, 7, 8], 3: []}
+    writer = ZarrSlabWriter(layout, groups, on_group_written=on_group_written, threads=2)
+
+    # Planes arrive out of order, and only complete slabs are written
+    writer.submit(0, [9, 0, 5], planes[[9, 0, 5]])
+    writer.submit(3, [], planes[:0])
+    writer.submit(2, [8, 6, 7], planes[[8, 6, 7]])
+    writer.submit(1, [3, 1, 4, 2], planes[[3, 1, 4, 2]])
+
+    writer.shutdown()
+
+    assert writer.errors == []
+    assert sorted(written) == [0, 1, 2, 3]
+    assert len(writer.durations["write"]) == 3
+    assert np.array_equal(read_region(layout, (0, 0, 0), layout.shape), planes)
+
+
+def test_zarr_slab_writer_existing(tmp_path):
+    layout = create_zarr_array(str(tmp_path / "array"), (3, 6, 2, 2), (3, 2, 2, 2), np.uint8, "none")
+    planes = np.random.randint(0, 255, (6, 2, 2, 3), dtype=np.uint8)
+
+    # Planes written by an earlier run are kept
+    write_region(layout, (0, 0, 0, 0), np.moveaxis(planes[:2], -1, 0))
+    write_region(layout, (0, 4, 0, 0), np.moveaxis(planes[4:], -1, 0))
+
+    writer = ZarrSlabWriter(layout, {0: [3], 1: [2]}, channels_first=True)
+    writer.submit(0, [3], planes[3:4])
+    writer.submit(1, [2], planes[2:3])
+    writer.shutdown()
+
+    assert np.array_equal(read_region(layout, (0, 0, 0, 0), layout.shape), np.moveaxis(planes, -1, 0))
@@ -1,7 +1,13 @@
+import json
+import os
+
+import numpy as np
+
 from ouroboros.helpers.parse import (
     NeuroglancerJSONModel,
     parse_neuroglancer_json,
     neuroglancer_config_to_annotation,
+    neuroglancer_config_to_annotations,
     neuroglancer_config_to_source,
     SourceModel
 )
@@ -124,3 +130,87 @@ def test_parse_newv_image_layers(tmp_path):
     assert parsed_data.layers[2].source.url == "precomputed://http://sourcewebsite.com/image2"
 
     assert parsed_data.layers[1].source == "precomputed://http://sourcewebsite.com/image"
+
+
+def write_layers(tmp_path, layers, file_name="layers.json"):
+    path = tmp_path / file_name
+    path.write_text(json.dumps({"layers": layers}), encoding="utf-8")
+    return str(path)
+
+
+def test_parse_annotation_layers(tmp_path):
+    json_path = write_layers(
+        tmp_path,
+        [
+            {"type": "image", "source": "precomputed://http://sourcewebsite.com/image", "name": "image_layer"},
+            {
+                "type": "annotation",
+                "name": "lines",
+                "annotations": [
+                    {"pointA": [0, 0, 0], "pointB": [1, 0, 0], "type": "line", "id": "a"},
+                    {"pointA": [1, 0, 0], "pointB": [2, 1, 0], "type": "line", "id": "b"},
+                    {"pointA": [5, 5, 5], "pointB": [6, 5, 5], "type": "line", "id": "c"},
+                    {"center": [1, 1, 1], "radii": [1, 1, 1], "type": "ellipsoid", "id": "d"},
+                ],
+            },
+            {
+                "type": "annotation",
+                "name": "mixed",
+                "annotations": [
+                    {"point": [0, 0, 1], "type": "point"},
+                    {"pointA": [0, 0, 2], "pointB": [0, 0, 3], "type": "line"},
+                ],
+            },
+            {"type": "annotation", "name": "empty", "annotations": []},
+            {"type": "annotation", "name": "lines", "annotations": [{"point": [9, 9, 9], "type": "point"}]},
+        ],
+    )
+
+    parsed_data, error = parse_neuroglancer_json(json_path)
+    assert error is None
+
+    annotations, error = neuroglancer_config_to_annotations(parsed_data)
+    assert error is None
+
+    # Every annotation layer, keeping the first of layers with the same name
+    assert list(annotations) == ["lines", "mixed", "empty"]
+
+    # Lines drawn end to end form a single path
+    assert annotations["lines"].lines.shape == (3, 2, 3)
+    assert annotations["lines"].points.shape == (0, 3)
+    assert annotations["lines"].path.tolist() == [[0, 0, 0], [1, 0, 0], [2, 1, 0], [5, 5, 5], [6, 5, 5]]
+
+    assert annotations["mixed"].path.tolist() == [[0, 0, 1], [0, 0, 2], [0, 0, 3]]
+    assert annotations["empty"].path.shape == (0, 3)
+
+    # A single layer is extracted as its path
+    path, error = neuroglancer_config_to_annotation(parsed_data, "lines")
+    assert error is None
+    assert np.array_equal(path, annotations["lines"].path)
+
+    # The state can be written back
+    assert NeuroglancerJSONModel.from_json(parsed_data.to_json()).layers[1].annotations.lines.shape == (3, 2, 3)
+
+
+def test_parse_neuroglancer_json_cache(tmp_path):
+    json_path = generate_sample_neuroglancer_json(tmp_path)
+
+    first, _ = parse_neuroglancer_json(json_path)
+    second, _ = parse_neuroglancer_json(json_path)
+
+    # The file is only parsed once
+    assert first is second
+
+    # Extracted paths are copies, so the cached state is not changed
+    path, _ = neuroglancer_config_to_annotation(first, "annotations")
+    path[:] = 0
+    assert np.any(neuroglancer_config_to_annotation(second, "annotations")[0] != 0)
+
+    # A changed file is parsed again
+    write_layers(tmp_path, [{"type": "annotation", "name": "other", "annotations": []}], "sample_data.json")
+    stat = os.stat(json_path)
+    os.utime(json_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    third, _ = parse_neuroglancer_json(json_path)
+    assert third is not first
+    assert third.layers[0].name == "other"
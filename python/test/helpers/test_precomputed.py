@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+
+from ouroboros.helpers.precomputed import (
+    create_precomputed,
+    precomputed_info,
+    precomputed_url,
+    read_precomputed,
+    read_precomputed_info,
+    write_precomputed,
+)
+
+
+def test_precomputed_info():
+    info = precomputed_info((20, 12, 9), np.uint16, (8, 8, 40), (5, 3, 1), (8, 8, 4), levels=2)
+
+    assert info["data_type"] == "uint16"
+    assert info["type"] == "image"
+    assert [scale["resolution"] for scale in info["scales"]] == [[8, 8, 40], [16, 16, 80], [32, 32, 160]]
+    assert info["scales"][1]["voxel_offset"] == [2, 1, 0]
+    assert info["scales"][1]["size"] == [10, 6, 5]
+    assert info["scales"][2]["chunk_sizes"] == [[8, 8, 4]]
+
+    assert precomputed_info((4, 4, 4), np.uint16, (1, 1, 1), (0, 0, 0), (4, 4, 4), "segmentation")["type"] == (
+        "segmentation"
+    )
+
+
+def test_write_precomputed(tmp_path):
+    path = str(tmp_path / "volume.precomputed")
+    info = precomputed_info((20, 12, 9), np.uint16, (8, 8, 40), (5, 3, 1), (8, 8, 4))
+
+    url = create_precomputed(path, info)
+    assert url == precomputed_url(path)
+    assert read_precomputed_info(path) == json.loads(json.dumps(info))
+    assert read_precomputed_info(str(tmp_path / "missing")) is None
+
+    # Data is Z, Y, X and written in slabs as deep as the chunks
+    data = np.random.randint(0, 1000, (9, 12, 20)).astype(np.uint16)
+    for z in range(0, 9, 4):
+        write_precomputed(url, (z, 0, 0), data[z:z + 4])
+
+    assert np.array_equal(read_precomputed(url, (0, 0, 0), (9, 12, 20)), data)
+    assert np.array_equal(read_precomputed(url, (2, 3, 4), (100, 100, 100)), data[2:, 3:, 4:])
+
+    # Chunks are named by their position in the source volume
+    assert (tmp_path / "volume.precomputed" / "8.0_8.0_40.0" / "5-13_3-11_1-5").exists()
+
+
+def test_precomputed_info_factor():
+    info = precomputed_info((20, 12, 9), np.uint8, (8, 8, 40), (5, 3, 1), (8, 8, 4), levels=2, factor=(2, 2, 1))
+
+    assert info["scales"][2]["resolution"] == [32, 32, 40]
+    assert info["scales"][2]["voxel_offset"] == [1, 0, 1]
+    assert info["scales"][2]["size"] == [5, 3, 9]
+
+
+def test_write_precomputed_channels(tmp_path):
+    info = precomputed_info((8, 6, 4), np.uint8, (1, 1, 1), (0, 0, 0), (4, 4, 4), num_channels=3)
+    url = create_precomputed(str(tmp_path / "volume"), info)
+
+    # Several channels are written as (Z, Y, X, C)
+    data = np.random.randint(0, 255, (4, 6, 8, 3)).astype(np.uint8)
+    write_precomputed(url, (0, 0, 0), data)
+
+    assert info["num_channels"] == 3
+    assert np.array_equal(read_precomputed(url, (0, 0, 0), (4, 6, 8)), data[..., 0])
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from ouroboros.helpers.ome_zarr import downsample_mean
+from ouroboros.helpers.pyramid import (
+    StreamingPyramid,
+    block_counts,
+    block_reduce,
+    pyramid_level,
+    pyramid_partial,
+    resolve_pyramid_method,
+)
+
+
+def test_resolve_pyramid_method():
+    assert resolve_pyramid_method("auto", False) == "mean"
+    assert resolve_pyramid_method("auto", True) == "max"
+    assert resolve_pyramid_method("mode", True) == "mode"
+    assert resolve_pyramid_method("max", False) == "max"
+
+    with pytest.raises(ValueError):
+        resolve_pyramid_method("mode", False)
+
+    with pytest.raises(ValueError):
+        resolve_pyramid_method("median", False)
+
+
+def test_block_reduce():
+    data = np.array([[1, 2, 3], [4, 5, 6], [7, 8, 9]], dtype=np.int16) - 10
+
+    # Partial blocks at the edges only hold what exists
+    assert np.array_equal(block_reduce(data, (2, 2), "sum"), [[-28, -11], [-5, -1]])
+    assert np.array_equal(block_reduce(data, (2, 2), "max"), [[-5, -4], [-2, -1]])
+    assert np.array_equal(block_reduce(data, (1, 3), "max"), [[-7], [-4], [-1]])
+
+
+def test_block_counts():
+    assert np.array_equal(block_counts(5, 2, 0, 3), [2, 2, 1])
+    assert np.array_equal(block_counts(5, 2, 2, 1), [1])
+
+
+def test_pyramid_level():
+    data = np.array([[0, 3, 0, 0], [0, 5, 1, 0]], dtype=np.uint8)
+    counts = np.full((1, 2), 4)
+
+    mean = pyramid_level(pyramid_partial(data, (2, 2), "mean", False), counts, "mean", np.uint8)
+    assert np.array_equal(mean, [[2, 0]])
+
+    # Binary masks are reduced from whether each voxel is set
+    assert np.array_equal(pyramid_level(pyramid_partial(data, (2, 2), "max", True), counts, "max", np.uint8), [[1, 1]])
+    assert np.array_equal(
+        pyramid_level(pyramid_partial(data, (2, 2), "mode", True), counts, "mode", np.uint8), [[1, 0]]
+    )
+
+
+def test_streaming_pyramid():
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 1000, (37, 21, 30)).astype(np.uint16)
+
+    written = {}
+
+    def write(level, start, slab):
+        assert (level, start) not in written
+        written[(level, start)] = slab
+
+    pyramid = StreamingPyramid(data.shape, (2, 2, 2), [4, 3], "mean", False, np.uint16, write)
+
+    # Slabs of the full resolution level arrive in any order
+    starts = list(range(0, 37, 5))
+    rng.shuffle(starts)
+    for start in starts:
+        pyramid.add(start, pyramid.partial(data[start:start + 5]))
+
+    assert pyramid.pending == 0
+
+    def level(index):
+        return np.concatenate([written[key] for key in sorted(written) if key[0] == index])
+
+    level_1 = downsample_mean(data, (0, 1, 2))
+    assert np.array_equal(level(1), level_1)
+    assert np.array_equal(level(2), downsample_mean(level_1, (0, 1, 2)))
+    assert sorted(start for index, start in written if index == 2) == [0, 3, 6, 9]
+
+
+def test_streaming_pyramid_anisotropic():
+    rng = np.random.default_rng(1)
+    mask = (rng.random((10, 8, 8)) > 0.9).astype(np.uint16) * 255
+
+    written = {}
+    pyramid = StreamingPyramid(
+        mask.shape, (1, 2, 2), [4], "max", True, np.uint16, lambda level, start, slab: written.update({start: slab})
+    )
+
+    for start in (8, 0, 4):
+        pyramid.add(start, pyramid.partial(mask[start:start + 4]))
+
+    result = np.concatenate([written[start] for start in sorted(written)])
+    assert result.shape == (10, 4, 4)
+    assert np.array_equal(result, block_reduce(mask > 0, (1, 2, 2), "max"))
@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+from cloudvolume import Bbox
+
+from ouroboros.helpers.cost_estimate import box_voxels
+from ouroboros.helpers.shared_downloads import SharedDownloads, plan_shared_downloads
+
+
+class FakeVolume:
+    def __init__(self):
+        self.data = np.arange(40 * 40 * 40, dtype=np.int32).reshape(40, 40, 40, 1)
+        self.downloads = []
+
+    def download(self, bbox, mip, parallel=False):
+        bbox = bbox.astype(int)
+        self.downloads.append(bbox)
+        return self.data[bbox.to_slices()]
+
+
+def test_plan_shared_downloads():
+    bounds = np.array([
+        [0, 10, 0, 10, 0, 10],
+        [1, 11, 0, 10, 0, 10],  # Mostly overlaps the first box
+        [2, 5, 2, 5, 2, 5],  # Inside the first box
+        [30, 40, 30, 40, 30, 40],  # Far from the others
+    ])
+
+    group_bounds, groups = plan_shared_downloads(bounds)
+
+    assert groups[0] == groups[1] == groups[2] != groups[3]
+    assert group_bounds[groups[0]].tolist() == [0, 11, 0, 10, 0, 10]
+    assert group_bounds[groups[3]].tolist() == bounds[3].tolist()
+
+    # Sharing never downloads more than the boxes on their own
+    assert box_voxels(group_bounds).sum() <= box_voxels(bounds).sum()
+
+    # Groups are limited in size
+    _, groups = plan_shared_downloads(bounds, max_voxels=1000)
+    assert groups[0] != groups[1]
+
+
+def test_shared_downloads(tmp_path):
+    volume = FakeVolume()
+    bounds = np.array([[0, 10, 0, 10, 0, 10], [1, 11, 0, 10, 0, 10], [30, 40, 30, 40, 30, 40]])
+    bounds = np.concatenate([bounds, bounds[:1]])  # The first box again, as for a second path
+    shared = SharedDownloads(bounds, str(tmp_path / "shared"))
+
+    assert shared.stats["downloads"] == 2
+    assert shared.stats["download_voxels"] == 1100 + 1000
+
+    for box in bounds:
+        bbox = Bbox(box[0::2], box[1::2])
+        assert np.array_equal(shared.download(volume, bbox, mip=0), volume.data[bbox.to_slices()])
+
+    # The shared group is downloaded once and removed once each of its boxes was cut from it
+    assert len(volume.downloads) == 2
+    assert os.listdir(tmp_path / "shared") == []
+
+    shared.close()
+    assert not os.path.exists(tmp_path / "shared")
@@ -9,6 +9,7 @@ import tifffile as tf
 from ouroboros.helpers.bounding_boxes import BoundingBox
 from ouroboros.helpers.slice import (
     calculate_slice_rects,
+    iter_slice_rect_windows,
     detect_color_channels,
     make_volume_binary,
     slice_volume_from_grids,
@@ -86,6 +87,25 @@ def test_calculate_slice_rects():
         ), "Height should be 100"
 
 
+def test_iter_slice_rect_windows():
+    sample_points = generate_sample_curve_helix()
+    spline = Spline(sample_points, degree=3)
+    times = spline.calculate_equidistant_parameters(distance_between_points=0.5)
+
+    slice_rects = calculate_slice_rects(times, spline, 100, 80)
+
+    for window_size in [1, 7, len(times), len(times) + 10]:
+        windows = list(iter_slice_rect_windows(times, spline, 100, 80, window_size))
+
+        assert [start for start, _ in windows] == list(range(0, len(times), window_size))
+        assert all(len(rects) <= window_size for _, rects in windows)
+
+        # The frames continue across windows, so the rects match those of the whole path
+        assert np.allclose(np.concatenate([rects for _, rects in windows]), slice_rects)
+
+    assert list(iter_slice_rect_windows(times[:0], spline, 100, 80, 10)) == []
+
+
 def test_generate_coordinate_grid_for_rect():
     rect = np.array([[-42.64727347, -54.72166585,  -4.78695662],
                      [-47.22139466,  43.8212048,  -21.16926598],
@@ -0,0 +1,199 @@
+import io
+import os
+import threading
+
+import numpy as np
+import pytest
+import tifffile
+
+from ouroboros.helpers.slice_writer import (
+    SINGLE_FILE_WRITE_MODES,
+    SliceWriter,
+    contiguous_runs,
+    create_empty_tiff,
+    encode_tiff,
+    get_worker_writer,
+    normalize_compression,
+    tiff_page_layout,
+    write_pages,
+    write_slice_batch,
+)
+
+
+def test_normalize_compression():
+    assert normalize_compression(None) is None
+    assert normalize_compression("none") is None
+    assert normalize_compression("None") is None
+    assert normalize_compression("zlib") == "zlib"
+
+
+def test_encode_tiff():
+    data = np.zeros((64, 64), dtype=np.uint16)
+
+    uncompressed = encode_tiff(data)
+    compressed = encode_tiff(data, "zlib")
+
+    assert len(compressed) < len(uncompressed)
+    assert np.array_equal(tifffile.imread(io.BytesIO(compressed)), data)
+
+
+def test_write_slice_batch(tmp_path):
+    slices = np.arange(3 * 8 * 8, dtype=np.uint8).reshape(3, 8, 8)
+    paths = [str(tmp_path / f"{i}.tif") for i in range(3)]
+
+    durations = write_slice_batch(paths, slices, "zlib", software="ouroboros")
+
+    assert len(durations["encode"]) == 3
+    assert len(durations["write"]) == 3
+    assert len(durations["write_bytes"]) == 3
+
+    for path, data in zip(paths, slices):
+        assert np.array_equal(tifffile.imread(path), data)
+        with tifffile.TiffFile(path) as tif:
+            assert tif.pages[0].compression == tifffile.COMPRESSION.ADOBE_DEFLATE
+
+
+def test_slice_writer(tmp_path):
+    slices = np.random.randint(0, 255, (10, 8, 8), dtype=np.uint8)
+    paths = [str(tmp_path / f"{i}.tif") for i in range(10)]
+
+    with SliceWriter(threads=2, batch_size=3) as writer:
+        future = writer.submit(paths, slices)
+        durations = future.result()
+
+    assert len(durations["encode"]) == 10
+    assert writer.pending == 0
+
+    for path, data in zip(paths, slices):
+        assert np.array_equal(tifffile.imread(path), data)
+
+
+def test_slice_writer_empty():
+    with SliceWriter() as writer:
+        assert writer.submit([], np.zeros((0, 8, 8))).result()["write"] == []
+
+
+def test_slice_writer_error(tmp_path):
+    slices = np.zeros((2, 8, 8), dtype=np.uint8)
+    paths = [str(tmp_path / "0.tif"), str(tmp_path / "missing" / "1.tif")]
+
+    with SliceWriter(batch_size=1) as writer:
+        future = writer.submit(paths, slices)
+
+        with pytest.raises(FileNotFoundError):
+            future.result()
+
+    assert writer.pending == 0
+
+
+def test_slice_writer_capacity(tmp_path, monkeypatch):
+    release = threading.Event()
+
+    def blocked_write(paths, slices, compression=None, **kwargs):
+        release.wait()
+        return {"encode": [], "write": [], "write_bytes": []}
+
+    monkeypatch.setattr("ouroboros.helpers.slice_writer.write_slice_batch", blocked_write)
+
+    with SliceWriter(threads=1, batch_size=2, max_pending=2) as writer:
+        writer.submit(["a", "b", "c"], np.zeros((3, 8, 8)))
+
+        # Too many slices are pending until the writer catches up
+        assert writer.pending == 3
+        assert not writer.wait_for_capacity(timeout=0.05)
+
+        release.set()
+        assert writer.wait_for_capacity(timeout=5)
+
+
+def test_get_worker_writer(tmp_path):
+    writer = get_worker_writer(2, "none", software="ouroboros")
+
+    # The writer is kept for later volumes with the same settings
+    assert get_worker_writer(2, None, software="ouroboros") is writer
+    assert get_worker_writer(2, "zlib", software="ouroboros") is not writer
+
+    path = str(tmp_path / "slice.tif")
+    get_worker_writer(2, "zlib", software="ouroboros").submit([path], np.ones((1, 8, 8), dtype=np.uint8)).result()
+    assert np.array_equal(tifffile.imread(path), np.ones((8, 8), dtype=np.uint8))
+
+
+@pytest.mark.parametrize("mode", SINGLE_FILE_WRITE_MODES)
+def test_write_pages(tmp_path, mode):
+    path = str(tmp_path / "stack.tif")
+    tifffile.imwrite(path, np.zeros((6, 5, 4, 1), dtype=np.uint16), photometric="minisblack")
+
+    layout = tiff_page_layout(path)
+    assert layout.num_pages == 6
+    assert layout.page_shape == (5, 4, 1)
+    assert layout.page_nbytes == 5 * 4 * 2
+
+    pages = np.arange(4 * 20, dtype=np.uint16).reshape(4, 5, 4, 1) + 1
+    # Unsorted and not contiguous
+    indices = np.array([4, 0, 1, 5])
+
+    assert write_pages(layout, indices, pages, mode) == pages.nbytes
+
+    expected = np.zeros((6, 5, 4, 1), dtype=np.uint16)
+    expected[indices] = pages
+    assert np.array_equal(tifffile.imread(path), expected)
+
+    # The file stays open in this process and is reused
+    write_pages(layout, np.array([2]), pages[:1], mode)
+    expected[2] = pages[0]
+    assert np.array_equal(tifffile.imread(path), expected)
+
+
+def test_write_pages_replaced_file(tmp_path):
+    path = str(tmp_path / "stack.tif")
+    tifffile.imwrite(path, np.zeros((2, 4, 4), dtype=np.uint8))
+    old_layout = tiff_page_layout(path)
+
+    write_pages(old_layout, np.array([0]), np.ones((1, 4, 4), dtype=np.uint8), "pwrite")
+
+    os.remove(path)
+    tifffile.imwrite(path, np.zeros((2, 4, 4), dtype=np.uint8))
+
+    # The new file is opened, rather than writing into the one kept open
+    write_pages(tiff_page_layout(path), np.array([1]), np.ones((1, 4, 4), dtype=np.uint8), "pwrite")
+    assert np.array_equal(tifffile.imread(path)[:, 0, 0], [0, 1])
+
+    # A layout of a file that was replaced is rejected
+    with pytest.raises(RuntimeError):
+        write_pages(old_layout, np.array([0]), np.ones((1, 4, 4), dtype=np.uint8), "mmap")
+
+    # Out of range pages are rejected before writing
+    with pytest.raises(IndexError):
+        write_pages(tiff_page_layout(path), np.array([2]), np.ones((1, 4, 4), dtype=np.uint8))
+
+
+def test_tiff_page_layout_compressed(tmp_path):
+    path = str(tmp_path / "stack.tif")
+    tifffile.imwrite(path, np.zeros((2, 4, 4), dtype=np.uint8), compression="zlib")
+
+    assert tiff_page_layout(path) is None
+
+
+def test_contiguous_runs():
+    assert contiguous_runs(np.array([], dtype=int)) == []
+    assert contiguous_runs(np.array([0, 1, 2, 5, 6, 9])) == [(0, 3), (3, 5), (5, 6)]
+
+
+def test_create_empty_tiff(tmp_path, monkeypatch):
+    path = str(tmp_path / "stack.tif")
+
+    layout = create_empty_tiff(path, (3, 16, 8, 3), np.uint8, photometric="rgb", software="ouroboros")
+
+    assert layout.num_pages == 3
+    assert layout.page_shape == (16, 8, 3)
+    assert np.array_equal(tifffile.imread(path), np.zeros((3, 16, 8, 3), dtype=np.uint8))
+
+    with tifffile.TiffFile(path) as tif:
+        assert not tif.is_bigtiff
+
+    # Large outputs switch to BigTIFF
+    monkeypatch.setattr("ouroboros.helpers.slice_writer.BIGTIFF_THRESHOLD_BYTES", 100)
+    create_empty_tiff(path, (3, 16, 8), np.uint8, photometric="minisblack")
+
+    with tifffile.TiffFile(path) as tif:
+        assert tif.is_bigtiff
@@ -0,0 +1,87 @@
+import math
+
+import numpy as np
+import pytest
+
+from ouroboros.helpers.streaming_stats import StreamingStats
+
+
+def test_streaming_stats_moments():
+    values = np.random.default_rng(0).exponential(0.01, 10000)
+
+    stats = StreamingStats()
+    for value in values[:5000]:
+        stats.add(value)
+    stats.add_many(values[5000:])
+
+    summary = stats.summary()
+    assert summary["loops"] == len(values)
+    assert summary["mean"] == pytest.approx(np.mean(values))
+    assert summary["std"] == pytest.approx(np.std(values))
+    assert summary["min"] == np.min(values)
+    assert summary["max"] == np.max(values)
+    assert summary["total"] == pytest.approx(np.sum(values))
+
+
+@pytest.mark.parametrize("q, key", [(0.5, "p50"), (0.95, "p95"), (0.99, "p99")])
+def test_streaming_stats_quantiles(q, key):
+    values = np.random.default_rng(1).lognormal(-4, 1.5, 20000)
+
+    stats = StreamingStats(relative_accuracy=0.01)
+    stats.add_many(values)
+
+    expected = np.quantile(values, q, method="lower")
+    assert stats.quantile(q) == pytest.approx(expected, rel=0.01)
+    assert stats.summary()[key] == stats.quantile(q)
+
+
+def test_streaming_stats_memory():
+    stats = StreamingStats()
+    stats.add_many(np.geomspace(1e-6, 86400, 100000))
+
+    # The buckets do not grow with the number of values
+    assert len(stats._buckets) < 1300
+
+
+def test_streaming_stats_zeros():
+    stats = StreamingStats()
+    stats.add_many([0, 0, 0, 2.0])
+
+    assert stats.quantile(0.5) == 0.0
+    assert stats.quantile(1) == 2.0
+
+    empty = StreamingStats().summary()
+    assert empty["loops"] == 0 and math.isnan(empty["p50"])
+
+
+def test_streaming_stats_merge():
+    rng = np.random.default_rng(2)
+    first, second = rng.random(1000), rng.random(3000) * 5
+
+    stats = StreamingStats()
+    stats.add_many(first)
+    other = StreamingStats()
+    other.add_many(second)
+    stats.merge(other)
+
+    values = np.concatenate([first, second])
+    assert stats.count == len(values)
+    assert stats.mean == pytest.approx(np.mean(values))
+    assert stats.summary()["std"] == pytest.approx(np.std(values))
+    assert stats.quantile(0.95) == pytest.approx(np.quantile(values, 0.95), rel=0.02)
+
+    with pytest.raises(ValueError):
+        stats.merge(StreamingStats(relative_accuracy=0.05))
+
+
+def test_streaming_stats_summary_cached():
+    stats = StreamingStats()
+    stats.add(1.0)
+
+    summary = stats.summary()
+    summary["mean"] = 10
+
+    # Summaries are copies, and change when values are added
+    assert stats.summary()["mean"] == 1.0
+    stats.add(3.0)
+    assert stats.summary()["mean"] == 2.0
@@ -0,0 +1,105 @@
+import json
+
+from cloudvolume import CloudVolume
+import numpy as np
+import pytest
+
+from ouroboros.helpers.parse import (
+    neuroglancer_config_to_annotation,
+    neuroglancer_config_to_source,
+    parse_neuroglancer_json,
+)
+from ouroboros.helpers.pyramid import block_reduce
+from ouroboros.helpers.synthetic import (
+    NOISE_FEATURE_SIZE,
+    SLICE_SUPPORT,
+    create_synthetic_dataset,
+    slice_margin,
+    synthetic_path,
+    synthetic_slab,
+    write_synthetic_volume,
+)
+
+
+def test_synthetic_path():
+    size = (90, 90, 60)
+    points = synthetic_path(size, np.linspace(0, 1, 50))
+
+    assert points.shape == (50, 3)
+
+    # The path stays a margin away from every side
+    assert np.all(points >= 20 - 1e-9)
+    assert np.all(points <= np.array(size) - 20 + 1e-9)
+    assert np.allclose(points[[0, -1], 2], [20, 40])
+
+
+def test_slice_margin(tmp_path):
+    # Half the diagonal of the slice, plus the voxels read around it
+    assert slice_margin((30, 40)) == pytest.approx(25 + SLICE_SUPPORT)
+
+    dataset = create_synthetic_dataset(str(tmp_path), (64, 64, 60), chunk_size=(32, 32, 32), slice_size=(30, 40))
+    assert np.all(dataset.points >= slice_margin((30, 40)) - 1e-9)
+
+    with pytest.raises(ValueError):
+        create_synthetic_dataset(str(tmp_path), (64, 64, 40), slice_size=(30, 40))
+
+
+def test_synthetic_slab():
+    size = (20, 12, 30)
+    noise = np.random.default_rng(0).random((4, 2, 3, 1)) * 100
+    tube = np.array([[10.0, 6.0, 9.0]])
+
+    full = synthetic_slab(noise, tube, size, 0, 30, np.uint8)
+    assert full.shape == (30, 12, 20, 1)
+
+    # Slabs agree with the whole volume, and the last one is clipped to it
+    assert np.array_equal(synthetic_slab(noise, tube, size, 12, 8, np.uint8), full[12:20])
+    assert synthetic_slab(noise, tube, size, 24, 8, np.uint8).shape == (6, 12, 20, 1)
+
+    assert full[9, 6, 10, 0] == 255
+    assert full[9, 6, 12, 0] == 255
+    assert full[0, 0, 0, 0] == int(noise[0, 0, 0, 0])
+    assert full[NOISE_FEATURE_SIZE, 0, 0, 0] == int(noise[1, 0, 0, 0])
+
+
+def test_write_synthetic_volume(tmp_path):
+    url = write_synthetic_volume(
+        str(tmp_path / "volume"), (40, 36, 20), np.uint16, (16, 16, 8), channels=2, mips=3, factor=(2, 2, 1)
+    )
+
+    volume = CloudVolume(url, mip=0)
+    assert volume.shape == (40, 36, 20, 2)
+    assert volume.dtype == np.uint16
+    assert [tuple(volume.mip_volume_size(mip)) for mip in volume.available_mips] == [
+        (40, 36, 20), (20, 18, 20), (10, 9, 20)
+    ]
+
+    data = np.asarray(volume[:, :, :])
+    assert not np.array_equal(data[..., 0], data[..., 1])
+
+    # Each level is the mean of the one above it
+    level_1 = np.asarray(CloudVolume(url, mip=1)[:, :, :])
+    expected = block_reduce(data.astype(np.float64), (2, 2, 1, 1), "sum") / 4
+    assert np.array_equal(level_1, np.rint(expected).astype(np.uint16))
+
+
+def test_create_synthetic_dataset(tmp_path):
+    dataset = create_synthetic_dataset(str(tmp_path), (48, 48, 32), chunk_size=(16, 16, 16), num_points=10)
+
+    config, error = parse_neuroglancer_json(dataset.neuroglancer_json)
+    assert error is None
+
+    points, _ = neuroglancer_config_to_annotation(config, "")
+    source, _ = neuroglancer_config_to_source(config, "")
+
+    assert np.allclose(points, dataset.points)
+    assert source == f"precomputed://{dataset.source_url}"
+
+    with open(dataset.neuroglancer_json) as f:
+        assert json.load(f)["dimensions"]["x"] == [8e-9, "m"]
+
+    # The tube along the path is the brightest value
+    data = np.asarray(CloudVolume(dataset.source_url)[:, :, :])[..., 0]
+    x, y, z = np.rint(dataset.points[4]).astype(int)
+    assert data[x, y, z] == 255
+    assert np.mean(data == 255) < 0.1
@@ -0,0 +1,72 @@
+from ouroboros.helpers.topology import (
+    DEFAULT_CHUNK_IO_THREADS,
+    DEFAULT_MERGE_IO_THREADS,
+    StageBalancer,
+    WorkerTopology,
+    resolve_worker_topology,
+)
+
+
+def test_resolve_worker_topology_defaults():
+    topology = resolve_worker_topology(16)
+
+    assert topology.compute_processes == 12
+    assert topology.writer_processes == 4
+    assert topology.chunk_io_threads == DEFAULT_CHUNK_IO_THREADS
+    assert topology.merge_io_threads == DEFAULT_MERGE_IO_THREADS
+    assert topology.auto_tune is False
+
+
+def test_resolve_worker_topology_small_machine():
+    # Small machines used to get 0 writers
+    for budget in (1, 2, 3):
+        topology = resolve_worker_topology(budget)
+
+        assert topology.compute_processes >= 1
+        assert topology.writer_processes >= 1
+
+
+def test_resolve_worker_topology_explicit():
+    topology = resolve_worker_topology(128, compute_processes=24, writer_processes=8, io_threads=2)
+
+    assert topology.compute_processes == 24
+    assert topology.writer_processes == 8
+    assert topology.chunk_io_threads == 2
+    assert topology.merge_io_threads == 2
+    assert topology.total_processes == 32
+
+
+def test_resolve_worker_topology_partial():
+    topology = resolve_worker_topology(8, compute_processes=6)
+    assert (topology.compute_processes, topology.writer_processes) == (6, 2)
+
+    topology = resolve_worker_topology(8, writer_processes=3)
+    assert (topology.compute_processes, topology.writer_processes) == (5, 3)
+
+
+def test_stage_balancer_fixed():
+    balancer = StageBalancer(WorkerTopology(compute_processes=6, writer_processes=2))
+
+    assert balancer.pool_sizes == (6, 2)
+    assert balancer.slots(100, 100, 0) == (6, 2)
+
+
+def test_stage_balancer_auto():
+    balancer = StageBalancer(WorkerTopology(compute_processes=6, writer_processes=2, auto_tune=True))
+
+    # Both stages share one pool of the whole budget
+    assert balancer.pool_sizes == (8, 0)
+
+    # Before any measurements, writers only get slots for available writes
+    assert balancer.slots(100, 100, 0) == (8, 0)
+    assert balancer.slots(100, 100, 10) == (6, 2)
+
+    # Writes are much more expensive than compute, so writers get most of the budget
+    balancer.record("compute", 1.0)
+    balancer.record("write", 10.0)
+    compute, writers = balancer.slots(10, 10, 10)
+    assert writers > compute
+    assert compute + writers == 8
+
+    # All compute work is done, so writers get everything that is available
+    assert balancer.slots(0, 10, 10) == (0, 8)
@@ -0,0 +1,116 @@
+import concurrent.futures
+import json
+import os
+import time
+
+import pytest
+
+from ouroboros.helpers.tracing import (
+    Tracer,
+    chrome_trace,
+    current_tracer,
+    record_span,
+    span,
+    traced_executor,
+    tracing,
+)
+
+
+def traced_task(value):
+    with span("task", num_bytes=value):
+        return value * 2
+
+
+def failing_task():
+    raise ValueError("failed")
+
+
+def test_tracing_disabled():
+    assert current_tracer() is None
+
+    with span("ignored") as s:
+        s.bytes = 10
+    record_span("ignored", 0.0, 1.0)
+
+    executor = concurrent.futures.ThreadPoolExecutor(1)
+    assert traced_executor(executor) is executor
+    executor.shutdown()
+
+
+def test_span():
+    tracer = Tracer()
+
+    with tracing(tracer):
+        assert current_tracer() is tracer
+
+        with span("download") as s:
+            s.bytes = 100
+        record_span("slice", 1.0, 2.5, 7)
+
+    assert current_tracer() is None
+
+    (name, pid, _, start, end, num_bytes), second = tracer.spans
+    assert (name, pid, num_bytes) == ("download", os.getpid(), 100)
+    assert start <= end
+    assert second[0] == "slice" and second[3:] == (1.0, 2.5, 7)
+
+
+def test_traced_executor_threads():
+    tracer = Tracer()
+
+    with tracing(tracer):
+        with traced_executor(concurrent.futures.ThreadPoolExecutor(2)) as executor:
+            results = [future.result() for future in [executor.submit(traced_task, i) for i in range(4)]]
+
+    assert results == [0, 2, 4, 6]
+    assert sorted(s[5] for s in tracer.spans) == [0, 1, 2, 3]
+
+
+def test_traced_executor_processes():
+    tracer = Tracer()
+
+    with tracing(tracer):
+        with traced_executor(concurrent.futures.ProcessPoolExecutor(2), processes=True) as executor:
+            futures = [executor.submit(traced_task, i) for i in range(4)]
+            results = [future.result() for future in futures]
+
+            failed = executor.submit(failing_task)
+            with pytest.raises(ValueError):
+                failed.result()
+
+    # Spans recorded in the workers are merged into the tracer of the parent
+    assert results == [0, 2, 4, 6]
+    assert sorted(s[5] for s in tracer.spans) == [0, 1, 2, 3]
+    assert all(s[1] != os.getpid() for s in tracer.spans)
+
+    # Times of the workers are on the same clock as the parent
+    assert all(s[3] <= time.perf_counter() for s in tracer.spans)
+
+
+def test_chrome_trace(tmp_path):
+    pid = os.getpid()
+    spans = [
+        ("write", pid + 1, 2, 11.0, 11.5, 0),
+        ("download", pid, 1, 10.0, 10.25, 1024),
+    ]
+
+    trace = chrome_trace(spans)
+    events = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+
+    assert [event["name"] for event in events] == ["download", "write"]
+    assert events[0] == {
+        "name": "download", "ph": "X", "pid": pid, "tid": 1, "ts": 0.0, "dur": 250000.0, "args": {"bytes": 1024}
+    }
+    assert events[1]["ts"] == 1e6 and "args" not in events[1]
+
+    names = {event["pid"]: event["args"]["name"] for event in trace["traceEvents"] if event["ph"] == "M"}
+    assert names == {pid: "ouroboros", pid + 1: f"worker {pid + 1}"}
+
+    tracer = Tracer()
+    tracer.extend(spans)
+    tracer.write(str(tmp_path / "trace.json"))
+
+    with open(tmp_path / "trace.json") as f:
+        assert json.load(f) == trace
+
+    assert chrome_trace([])["traceEvents"] == []
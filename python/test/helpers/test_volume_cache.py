@@ -8,6 +8,7 @@ from ouroboros.helpers.volume_cache import (
     update_writable_rects
 )
 from ouroboros.helpers.bounding_boxes import BoundingBox, boxes_dim_range
+from ouroboros.helpers.network_shaper import NetworkShaper
 
 
 @pytest.fixture
@@ -19,6 +20,7 @@ def mock_cloud_volume():
         mock_cv.shape = (100, 100, 100, 3)
         mock_cv.cache.flush = MagicMock()
         mock_cv.mip_volume_size = lambda mip: (100, 100, 100)
+        mock_cv.meta.voxel_offset = lambda mip: (0, 0, 0)
         yield mock_cv
 
 
@@ -222,6 +224,23 @@ def test_cloud_volume_interface_from_dict(mock_cloud_volume):
     assert cvi.dtype == "uint8"
 
 
+def test_cloud_volume_interface_network_shaper(mock_cloud_volume):
+    sleeps = []
+    shaper = NetworkShaper(latency=0.5, bandwidth=100, clock=lambda: 0.0, sleep=sleeps.append)
+    mock_cloud_volume.download.return_value = MagicMock(nbytes=50)
+
+    cvi = CloudVolumeInterface("test_source_url", shaper)
+    assert cvi.download("bbox", mip=0) is mock_cloud_volume.download.return_value
+    mock_cloud_volume.download.assert_called_once_with("bbox", mip=0, parallel=False)
+
+    # The latency and the transfer of 50 bytes at 100 bytes per second
+    assert sleeps == [1.0]
+
+    cvi_dict = cvi.to_dict()
+    assert cvi_dict == {"source_url": "test_source_url", "network_shaper": {"latency": 0.5, "bandwidth": 100}}
+    assert CloudVolumeInterface.from_dict(cvi_dict).network_shaper.to_dict() == cvi_dict["network_shaper"]
+
+
 def test_cloud_volume_channels(cloud_volume_interface):
     assert cloud_volume_interface.num_channels == 3
 
@@ -0,0 +1,77 @@
+import concurrent.futures
+import os
+import time
+
+import pytest
+
+from ouroboros.helpers.worker_pool import (
+    BorrowedExecutor,
+    WorkerPool,
+    warm_worker,
+)
+
+
+@pytest.fixture(scope="module")
+def worker_pool():
+    with WorkerPool(max_workers=2, warm_modules=("numpy",)).prestart() as pool:
+        yield pool
+
+
+def test_borrow_results(worker_pool):
+    with worker_pool.borrow(1) as executor:
+        assert isinstance(executor, BorrowedExecutor)
+        futures = [executor.submit(pow, i, 2) for i in range(10)]
+
+    assert [future.result() for future in futures] == [i**2 for i in range(10)]
+
+
+def test_borrow_reuses_processes(worker_pool):
+    with worker_pool.borrow() as executor:
+        first = {executor.submit(os.getpid).result() for _ in range(4)}
+
+    with worker_pool.borrow() as executor:
+        second = {executor.submit(os.getpid).result() for _ in range(4)}
+
+    # Both borrows ran on the same long-lived worker processes
+    assert os.getpid() not in first
+    assert len(first | second) <= worker_pool.max_workers
+
+
+def test_borrow_exception(worker_pool):
+    with worker_pool.borrow() as executor:
+        future = executor.submit(int, "not a number")
+
+    with pytest.raises(ValueError):
+        future.result()
+
+
+def test_borrow_shutdown(worker_pool):
+    executor = worker_pool.borrow(1)
+    # The first task keeps the only slot busy, so the rest are still pending at shutdown
+    futures = [executor.submit(time.sleep, 0.5)] + [executor.submit(pow, 2, i) for i in range(20)]
+    executor.shutdown(wait=True, cancel_futures=True)
+
+    # Cancelled tasks never ran, everything else completed
+    assert all(future.done() for future in futures)
+    assert any(future.cancelled() for future in futures)
+
+    with pytest.raises(RuntimeError):
+        executor.submit(pow, 2, 2)
+
+    # The shared pool is still usable
+    with worker_pool.borrow() as other:
+        assert other.submit(pow, 3, 2).result() == 9
+
+
+def test_borrow_as_completed(worker_pool):
+    with worker_pool.borrow(2) as executor:
+        futures = [executor.submit(pow, 2, i) for i in range(5)]
+        results = sorted(future.result() for future in concurrent.futures.as_completed(futures))
+
+    assert results == [1, 2, 4, 8, 16]
+
+
+def test_warm_worker_ignores_failures():
+    # Missing modules must not break worker startup
+    warm_worker(("numpy", "module_that_does_not_exist"))
+
@@ -0,0 +1,100 @@
+import concurrent.futures
+import os
+import queue
+
+import numpy as np
+import tifffile
+
+from ouroboros.common.pipelines import slice_pipeline
+from ouroboros.helpers.ome_zarr import ZarrArrayLayout, read_region, read_zarray
+from ouroboros.helpers.options import SliceOptions, ZarrParams
+from ouroboros.helpers.synthetic import create_synthetic_dataset
+from ouroboros.pipeline.slice_parallel_pipeline import report_written
+
+
+def slice_synthetic_dataset(tmp_path, **options) -> tuple[str, str | None]:
+    dataset = create_synthetic_dataset(str(tmp_path / "dataset"), (64, 64, 48), chunk_size=(32, 32, 16))
+
+    slice_options = SliceOptions(
+        slice_width=16,
+        slice_height=16,
+        neuroglancer_json=dataset.neuroglancer_json,
+        **options,
+    )
+    pipeline, input_data = slice_pipeline(slice_options, processes=2)
+    output, error = pipeline.process(input_data)
+
+    return output.output_file_path if error is None else None, error
+
+
+def test_slice_into_missing_folder(tmp_path):
+    folder = str(tmp_path / "missing" / "output")
+    output_file_path, error = slice_synthetic_dataset(tmp_path, output_file_folder=folder, output_file_name="sample")
+
+    assert error is None
+    assert os.path.isfile(output_file_path)
+    assert os.path.dirname(output_file_path) == folder
+
+    slices = tifffile.imread(output_file_path)
+    assert slices.shape[1:3] == (16, 16)
+    assert np.any(slices > 0)
+
+
+def test_slice_folder_output_into_missing_folder(tmp_path):
+    folder = str(tmp_path / "missing" / "output")
+    _, error = slice_synthetic_dataset(
+        tmp_path, output_file_folder=folder, output_file_name="sample", make_single_file=False
+    )
+
+    assert error is None
+
+    # Every slice is written before the step finishes, and the checkpoint is removed once all are
+    slices = sorted(os.listdir(os.path.join(folder, "sample-slices")))
+    single_path, error = slice_synthetic_dataset(tmp_path, output_file_folder=folder, output_file_name="single")
+    assert error is None
+    assert len(slices) == len(tifffile.imread(single_path))
+    assert not any(name.endswith(".jsonl") for name in os.listdir(folder))
+
+
+def test_report_written():
+    reports = queue.Queue()
+
+    written = concurrent.futures.Future()
+    written.set_result({"encode": [0.1], "write": [0.2, 0.3], "write_bytes": [10, 20]})
+    report_written(reports, 3, written)
+
+    volume_index, durations, write_stats, error = reports.get_nowait()
+    assert (volume_index, durations, error) == (3, {"encode": [0.1], "write": [0.2, 0.3]}, None)
+    assert write_stats["bytes"] == 30
+    assert write_stats["seconds"] == 0.5
+
+    failed = concurrent.futures.Future()
+    failed.set_exception(OSError("disk full"))
+    report_written(reports, 4, failed)
+
+    assert reports.get_nowait() == (4, None, None, "disk full")
+
+
+def test_ome_zarr_output_matches_tiff(tmp_path):
+    folder = str(tmp_path / "output")
+    tiff_path, error = slice_synthetic_dataset(tmp_path, output_file_folder=folder, output_file_name="tiff")
+    assert error is None
+
+    # Chunks shallower than most volumes, so some slabs are written by the workers and some are shared
+    zarr_path, error = slice_synthetic_dataset(
+        tmp_path,
+        output_file_folder=folder,
+        output_file_name="zarr",
+        output_format="ome-zarr",
+        zarr_params=ZarrParams(chunk_shape=[4, 16, 16], compression="zlib"),
+    )
+    assert error is None
+
+    zarray = read_zarray(os.path.join(zarr_path, "0"))
+    layout = ZarrArrayLayout(
+        os.path.join(zarr_path, "0"), tuple(zarray["shape"]), tuple(zarray["chunks"]), zarray["dtype"], "zlib"
+    )
+    slices = tifffile.imread(tiff_path)
+
+    # The volume has a channel axis, which OME-Zarr stores first
+    assert np.array_equal(read_region(layout, (0,) * len(layout.shape), layout.shape), np.moveaxis(slices, -1, 0))
@@ -0,0 +1,36 @@
+import numpy as np
+import tifffile
+
+from ouroboros.common.pipelines import slice_pipeline
+from ouroboros.helpers.options import SliceOptions, SlicingParams
+from ouroboros.helpers.synthetic import create_synthetic_dataset
+
+
+def test_windows_match_whole_path(tmp_path):
+    dataset = create_synthetic_dataset(str(tmp_path / "dataset"), (64, 64, 48), chunk_size=(32, 32, 16))
+
+    outputs = {}
+
+    for window_slices in (0, 25):
+        slice_options = SliceOptions(
+            slice_width=16,
+            slice_height=16,
+            neuroglancer_json=dataset.neuroglancer_json,
+            output_file_folder=str(tmp_path / "output"),
+            output_file_name=f"window-{window_slices}",
+            slicing_params=SlicingParams(stream_window_slices=window_slices),
+        )
+        pipeline, input_data = slice_pipeline(slice_options, processes=2)
+        output, error = pipeline.process(input_data)
+
+        assert error is None
+        outputs[window_slices] = tifffile.imread(output.output_file_path).astype(np.int64)
+
+    whole, windowed = outputs[0], outputs[25]
+    assert whole.shape == windowed.shape
+    assert len(whole) > 50
+
+    # Boxes are laid out per window, which only changes the spline interpolation near their edges
+    difference = np.abs(whole - windowed)
+    assert np.mean(difference > 1) < 0.02
+    assert np.mean(difference) < 0.2
@@ -0,0 +1,14 @@
+import subprocess
+import sys
+
+
+def test_cli_imports_without_numpy():
+    # Commands import what they need when they run, so `--help` and quick commands start fast
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, ouroboros.cli; print('numpy' in sys.modules)"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "False"
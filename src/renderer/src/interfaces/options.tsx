@@ -240,6 +240,30 @@ export class SliceOptionsFile extends CompoundEntry {
 			new Entry('make_single_file', 'Output Single File', true, 'boolean').withDescription(
 				'Whether to output one tiff stack file or a folder of files.'
 			),
+			new Entry('slice_compression', 'Slice Compression', 'none', 'string').withDescription(
+				'The compression option to use for the slice tiffs when outputting a folder of files. Recommended options: `none`, `zlib`, `zstd`.'
+			),
+			new Entry('output_format', 'Output Format', 'tiff', 'string', [
+				'tiff',
+				'ome-zarr'
+			]).withDescription(
+				'Whether to output tiff(s) or a chunked OME-Zarr image, which other viewers and tools can read directly.'
+			),
+			new CompoundEntry('zarr_params', 'OME-Zarr Parameters', [
+				new Entry('compression', 'Compression', 'zstd', 'string', [
+					'none',
+					'zlib',
+					'gzip',
+					'zstd',
+					'blosc'
+				]).withDescription('The compression of the OME-Zarr chunks.'),
+				new Entry('compression_level', 'Compression Level', 3, 'number').withDescription(
+					'The compression level of the OME-Zarr chunks.'
+				),
+				new Entry('pyramid_levels', 'Pyramid Levels', 0, 'number').withDescription(
+					'The number of downsampled levels to add to the OME-Zarr image.'
+				)
+			]),
 			new Entry('connect_start_and_end', 'Connect Endpoints', false, 'boolean').withHidden(),
 			new Entry('flush_cache', 'Flush CloudVolume Cache', false, 'boolean').withHidden(),
 			new CompoundEntry('bounding_box_params', 'Bounding Box Parameters', [
@@ -308,6 +332,44 @@ export class BackprojectOptionsFile extends CompoundEntry {
 			new Entry('make_single_file', 'Output Single File', false, 'boolean').withDescription(
 				'Whether to output one tiff stack file or a folder of files.'
 			),
+			new Entry('output_format', 'Output Format', 'tiff', 'string', [
+				'tiff',
+				'ome-zarr',
+				'neuroglancer-precomputed'
+			]).withDescription(
+				'Whether to output tiff(s), a chunked OME-Zarr image, or a neuroglancer precomputed volume that opens next to the source volume.'
+			),
+			new CompoundEntry('zarr_params', 'OME-Zarr Parameters', [
+				new Entry('compression', 'Compression', 'zstd', 'string', [
+					'none',
+					'zlib',
+					'gzip',
+					'zstd',
+					'blosc'
+				]).withDescription('The compression of the OME-Zarr chunks.'),
+				new Entry('compression_level', 'Compression Level', 3, 'number').withDescription(
+					'The compression level of the OME-Zarr chunks.'
+				),
+				new Entry('pyramid_levels', 'Pyramid Levels', 0, 'number').withDescription(
+					'The number of downsampled levels to add to the OME-Zarr image.'
+				)
+			]),
+			new CompoundEntry('precomputed_params', 'Neuroglancer Precomputed Parameters', [
+				new Entry('compress', 'Compress', false, 'boolean').withDescription(
+					'Whether to gzip the chunks. Compressed chunks need a file server that sends them with a gzip content encoding.'
+				),
+				new Entry('pyramid_levels', 'Pyramid Levels', 0, 'number').withDescription(
+					'The number of downsampled levels to add to the precomputed volume.'
+				)
+			]),
+			new Entry('pyramid_method', 'Pyramid Method', 'auto', 'string', [
+				'auto',
+				'mean',
+				'max',
+				'mode'
+			]).withDescription(
+				'How the pyramid levels are downsampled. `auto` averages images and keeps any set voxel of binary backprojections. `mode` is only for binary backprojections.'
+			),
 			new Entry(
 				'backproject_min_bounding_box',
 				'Output Min Bounding Box',